@@ -0,0 +1,156 @@
+"""
+Cache of generated RAG answers.
+A repeated question is answered without retrieval, and a similar question that retrieves
+the same theses is answered without generation. The cache is dropped when the indices change.
+"""
+
+import threading
+import time
+import os
+from collections import OrderedDict
+from typing import Any, Dict, FrozenSet, Optional, Tuple
+import numpy as np
+from embedding_service import normalize_query
+from index_aliases import CONTENT_VERSION_META, resolve_indices
+
+ANSWER_CACHE_ENABLED = os.environ.get("ANSWER_CACHE_ENABLED", "true").lower() != "false"
+ANSWER_CACHE_SIZE = int(os.environ.get("ANSWER_CACHE_SIZE", 512))
+ANSWER_CACHE_TTL = float(os.environ.get("ANSWER_CACHE_TTL", 3600))
+ANSWER_CACHE_SIMILARITY = float(os.environ.get("ANSWER_CACHE_SIMILARITY", 0.95))
+ALIAS_CHECK_INTERVAL = float(os.environ.get("ANSWER_CACHE_ALIAS_CHECK_INTERVAL", 10))
+
+def unit_vector(vector) -> np.ndarray:
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+class AnswerCache:
+    """
+    Bounded LRU + TTL cache of RAG responses with an exact and a semantic lookup tier.
+    """
+
+    def __init__(self, max_size: int = ANSWER_CACHE_SIZE, ttl: float = ANSWER_CACHE_TTL,
+                 similarity: float = ANSWER_CACHE_SIMILARITY, alias_check_interval: float = ALIAS_CHECK_INTERVAL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.similarity = similarity
+        self.alias_check_interval = alias_check_interval
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._alias_generation = None
+        self._alias_checked = 0.0
+
+    @staticmethod
+    def make_key(query: str, model_id: str, department: Optional[str], top_k: int) -> Tuple:
+        return (normalize_query(query), model_id, department, top_k)
+
+    def _live(self, entry: Dict[str, Any], now: float) -> bool:
+        return now - entry["created"] < self.ttl
+
+    def get_exact(self, key: Tuple) -> Optional[Dict[str, Any]]:
+        """Cached response for exactly this query, model, department and top_k"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or not self._live(entry, now):
+                if entry is not None:
+                    del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            self.exact_hits += 1
+            return entry["response"]
+
+    def get_semantic(self, key: Tuple, vector, hash_codes: FrozenSet) -> Optional[Dict[str, Any]]:
+        """
+        Cached response of a similar query that retrieved the same documents.
+
+        :param key: Key of the new query, from make_key
+        :param vector: Embedding of the new query
+        :param hash_codes: hash_code set of the documents retrieved for the new query
+        :return: The cached response, or None
+        """
+        vector = unit_vector(vector)
+        now = time.monotonic()
+        with self._lock:
+            best_key, best_similarity = None, self.similarity
+            for cached_key, entry in self._entries.items():
+                if cached_key[1:] != key[1:] or entry["hash_codes"] != hash_codes or not self._live(entry, now):
+                    continue
+                similarity = float(np.dot(entry["vector"], vector))
+                if similarity >= best_similarity:
+                    best_key, best_similarity = cached_key, similarity
+
+            if best_key is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(best_key)
+            self.semantic_hits += 1
+            return self._entries[best_key]["response"]
+
+    def put(self, key: Tuple, vector, hash_codes: FrozenSet, response: Dict[str, Any]):
+        entry = {
+            "response": response,
+            "vector": unit_vector(vector),
+            "hash_codes": hash_codes,
+            "created": time.monotonic()
+        }
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def check_aliases(self, es):
+        """
+        Drop every entry once the semantic indices change: an alias points at a different
+        index, or a sync recorded a new content version in one of them.
+        Legacy concrete indices without an alias are resolved the same way.
+        Checked at most every alias_check_interval seconds.
+        """
+        now = time.monotonic()
+        if now - self._alias_checked < self.alias_check_interval:
+            return
+        self._alias_checked = now
+        try:
+            mappings = es.indices.get_mapping(index=resolve_indices(semantic=True), ignore_unavailable=True)
+            generation = frozenset(
+                (index_name, mapping.get("mappings", {}).get("_meta", {}).get(CONTENT_VERSION_META))
+                for index_name, mapping in mappings.items()
+            )
+        except Exception as e:
+            print(f"Error resolving aliases for the answer cache: {str(e)}")
+            return
+        with self._lock:
+            if self._alias_generation is not None and generation != self._alias_generation:
+                print("Semantic indices changed, clearing the answer cache")
+                self._entries.clear()
+            self._alias_generation = generation
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.exact_hits = 0
+            self.semantic_hits = 0
+            self.misses = 0
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            hits = self.exact_hits + self.semantic_hits
+            lookups = hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "exact_hits": self.exact_hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "hit_rate": hits / lookups if lookups else 0.0
+            }
+
+_answer_cache = AnswerCache() if ANSWER_CACHE_ENABLED else None
+
+def get_answer_cache() -> Optional[AnswerCache]:
+    """Get the shared answer cache, or None if ANSWER_CACHE_ENABLED is false"""
+    return _answer_cache
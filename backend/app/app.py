@@ -4,6 +4,7 @@ from elasticsearch import Elasticsearch
 from dotenv import load_dotenv
 import os
 from routes import search_routes
+from warmup import start_warmup
 
 load_dotenv()
 
@@ -24,6 +25,12 @@ app.register_blueprint(search_routes, url_prefix='/search')
 @app.before_request
 def before_request():
     g.es = es
+    # WSGI servers import the app without running __main__; warm up on the first request instead
+    if not app.testing:
+        start_warmup()
 
 if __name__ == '__main__':
+    # With debug=True the server runs in a reloader child process, so only warm up there
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        start_warmup()
     app.run(debug=True)
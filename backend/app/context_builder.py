@@ -0,0 +1,112 @@
+"""
+Builds the RAG context from the sentences of the retrieved abstracts that are most
+relevant to the query, packed into the token budget of the answering model.
+"""
+
+import math
+import re
+import os
+from typing import Any, Dict, List, Optional
+import numpy as np
+from embedding_service import encode_query, get_model
+
+DEFAULT_CONTEXT_TOKENS = int(os.environ.get("CONTEXT_TOKEN_BUDGET", 1200))
+CONTEXT_TOKEN_BUDGETS = {
+    "llama3.2:1b": 800,
+    "llama3.2:3b": 1200,
+    "llama3.1:8b": 1600,
+    "gemini-1.5-flash": 3000,
+    "gemini-1.5-pro": 3000
+}
+DUPLICATE_SIMILARITY = float(os.environ.get("CONTEXT_DUPLICATE_SIMILARITY", 0.9))
+CHARS_PER_TOKEN = 4
+
+CONTEXT_HEADER = "RELEVANT DOCUMENTS:\n\n"
+
+_SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+(?=[A-Z0-9\"'(])")
+
+def estimate_tokens(text: str) -> int:
+    """
+    Rough token count of a text. Llama and Gemini tokenizers average about
+    four characters per token on English prose.
+    """
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+def context_budget(model_id: Optional[str]) -> int:
+    """Prompt tokens reserved for retrieved documents when answering with a model"""
+    return CONTEXT_TOKEN_BUDGETS.get(model_id, DEFAULT_CONTEXT_TOKENS)
+
+def split_sentences(text: str) -> List[str]:
+    """Split an abstract into sentences, ignoring empty fragments"""
+    return [sentence.strip() for sentence in _SENTENCE_BOUNDARY.split(" ".join(text.split())) if sentence.strip()]
+
+def document_text(source: Dict[str, Any]) -> str:
+    """Text of a retrieved document: its matched full-text passages if any, otherwise its abstract"""
+    if source.get("passages"):
+        return " ".join(passage.get("text", "") for passage in source["passages"])
+    return source.get("abstract") or ""
+
+def document_header(source: Dict[str, Any]) -> str:
+    author = source.get("author", "Unknown Author")
+    year = source.get("year", "Unknown Year")
+    department = source.get("department", "Unknown Department")
+    label = "Passages" if source.get("passages") else "Abstract"
+    return f"[{author} ({year})]\nDepartment: {department}\n{label}: "
+
+def build_context(documents: List[Dict[str, Any]], query: str, token_budget: int) -> str:
+    """
+    Build the RAG context from the query-relevant sentences of the retrieved documents.
+
+    :param documents: Retrieved documents, best first
+    :param query: Question being answered
+    :param token_budget: Maximum estimated tokens of the returned context
+    :return: Context string for RAG
+    """
+    sentences = []
+    for doc_index, doc in enumerate(documents):
+        for position, sentence in enumerate(split_sentences(document_text(doc["_source"]))):
+            sentences.append({"doc": doc_index, "position": position, "text": sentence})
+
+    if not sentences:
+        return CONTEXT_HEADER
+
+    vectors = np.asarray(get_model().encode([s["text"] for s in sentences]), dtype=np.float32)
+    vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    query_vector = np.asarray(encode_query(query), dtype=np.float32)
+    query_vector = query_vector / max(float(np.linalg.norm(query_vector)), 1e-12)
+    scores = vectors @ query_vector
+
+    ranked = sorted(range(len(sentences)), key=lambda i: -scores[i])
+    remaining = token_budget - estimate_tokens(CONTEXT_HEADER)
+    selected = {}
+    chosen = []
+
+    def add(i: int) -> bool:
+        nonlocal remaining
+        if chosen and float(np.max(vectors[chosen] @ vectors[i])) >= DUPLICATE_SIMILARITY:
+            return False
+        doc = sentences[i]["doc"]
+        cost = estimate_tokens(sentences[i]["text"] + " ")
+        if doc not in selected:
+            cost += estimate_tokens(document_header(documents[doc]["_source"]) + "\n\n")
+        if cost > remaining:
+            return False
+        remaining -= cost
+        selected.setdefault(doc, []).append(i)
+        chosen.append(i)
+        return True
+
+    # The best new sentence of every document in retrieval order, then the rest by relevance
+    for doc in range(len(documents)):
+        for i in ranked:
+            if sentences[i]["doc"] == doc and add(i):
+                break
+    for i in ranked:
+        if i not in chosen:
+            add(i)
+
+    context = CONTEXT_HEADER
+    for doc in sorted(selected):
+        text = " ".join(sentences[i]["text"] for i in sorted(selected[doc], key=lambda i: sentences[i]["position"]))
+        context += document_header(documents[doc]["_source"]) + text + "\n\n"
+    return context
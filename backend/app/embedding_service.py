@@ -0,0 +1,248 @@
+from collections import OrderedDict
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Dict, List, Optional
+import numpy as np
+import threading
+import atexit
+import queue
+import time
+import os
+from encoder_backends import EMBEDDING_BACKEND, encoder_fingerprint, load_encoder
+
+modell_name = 'all-MiniLM-L6-v2'
+#modell_name = 'BAAI/bge-small-en'
+#modell_name = 'BAAI/bge-base-en'
+#modell_name = 'BAAI/bge-large-en'
+
+EMBEDDING_CACHE_SIZE = int(os.environ.get("EMBEDDING_CACHE_SIZE", 2048))
+EMBEDDING_CACHE_PATH = os.environ.get("EMBEDDING_CACHE_PATH")
+EMBEDDING_BATCH_WINDOW_MS = float(os.environ.get("EMBEDDING_BATCH_WINDOW_MS", 0))
+EMBEDDING_BATCH_TIMEOUT_S = float(os.environ.get("EMBEDDING_BATCH_TIMEOUT_S", 10))
+EMBEDDING_MAX_BATCH_SIZE = int(os.environ.get("EMBEDDING_MAX_BATCH_SIZE", 32))
+
+_model = None
+_model_lock = threading.Lock()
+
+def get_model():
+    """
+    Get or initialize the shared sentence encoder on the EMBEDDING_BACKEND backend.
+    A missing ONNX export falls back to the torch model, whose vectors the indices were built with.
+    """
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                try:
+                    _model = load_encoder(modell_name, EMBEDDING_BACKEND)
+                except (FileNotFoundError, ImportError) as e:
+                    print(f"Error loading the {EMBEDDING_BACKEND} encoder, using torch instead: {str(e)}")
+                    _model = load_encoder(modell_name, "torch")
+    return _model
+
+def normalize_query(query: str) -> str:
+    """
+    Normalize query text so trivially different spellings share a cache entry.
+    The MiniLM and BGE tokenizers are uncased, so lowercasing does not change the vector.
+
+    :param query: Raw query string
+    :return: Normalized query string
+    """
+    if not query:
+        return ""
+    return " ".join(query.lower().split())
+
+class QueryEmbeddingCache:
+    """
+    Bounded LRU cache mapping normalized query text to a float32 embedding.
+    Optionally persisted to an .npz file so popular queries survive restarts.
+    """
+
+    def __init__(self, max_size: int = EMBEDDING_CACHE_SIZE, persist_path: Optional[str] = None,
+                 model_name: str = encoder_fingerprint(modell_name)):
+        self.max_size = max_size
+        self.persist_path = persist_path
+        self.model_name = model_name
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        if persist_path:
+            self.load()
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return vector
+
+    def put(self, key: str, vector: np.ndarray):
+        vector = np.asarray(vector, dtype=np.float32)
+        vector.setflags(write=False)
+        with self._lock:
+            self._entries[key] = vector
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
+
+    def save(self):
+        """Write the cache to persist_path, most recently used entries last"""
+        if not self.persist_path:
+            return
+        with self._lock:
+            keys = list(self._entries.keys())
+            vectors = list(self._entries.values())
+        if not keys:
+            return
+        try:
+            tmp_path = self.persist_path + ".tmp.npz"
+            np.savez(tmp_path, model=np.array(self.model_name), keys=np.array(keys), vectors=np.stack(vectors))
+            os.replace(tmp_path, self.persist_path)
+        except Exception as e:
+            print(f"Error saving embedding cache: {e}")
+
+    def load(self):
+        """Load a previously saved cache, ignoring it if it was built with another model"""
+        if not self.persist_path or not os.path.exists(self.persist_path):
+            return
+        try:
+            with np.load(self.persist_path) as data:
+                if str(data["model"]) != self.model_name:
+                    print(f"Ignoring embedding cache built with model {data['model']}")
+                    return
+                for key, vector in zip(data["keys"], data["vectors"]):
+                    self.put(str(key), vector)
+            print(f"Loaded {len(self._entries)} cached query embeddings")
+        except Exception as e:
+            print(f"Error loading embedding cache: {e}")
+
+class BatchingEncoder:
+    """
+    Background worker that gathers query encodes arriving within a short window
+    and runs them as a single model.encode(batch) call.
+    Concurrent requests for the same text share one pending future.
+    """
+
+    def __init__(self, window_ms: float = EMBEDDING_BATCH_WINDOW_MS, max_batch_size: int = EMBEDDING_MAX_BATCH_SIZE,
+                 model_getter=None):
+        self.window = window_ms / 1000.0
+        self.max_batch_size = max(1, max_batch_size)
+        self.model_getter = model_getter
+        self.batches = 0
+        self.encoded = 0
+        self._queue = queue.Queue()
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._worker = None
+
+    def submit(self, text: str) -> Future:
+        with self._lock:
+            future = self._pending.get(text)
+            if future is not None:
+                return future
+            future = Future()
+            self._pending[text] = future
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+                self._worker.start()
+        self._queue.put(text)
+        return future
+
+    def encode(self, text: str, timeout: Optional[float] = None) -> np.ndarray:
+        """
+        :raises concurrent.futures.TimeoutError: If the batch is not encoded within timeout seconds
+        """
+        return self.submit(text).result(timeout=timeout)
+
+    def _collect_batch(self) -> List[str]:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+            with self._lock:
+                futures = [self._pending.pop(text) for text in batch]
+            try:
+                model = self.model_getter() if self.model_getter else get_model()
+                vectors = np.asarray(model.encode(batch), dtype=np.float32)
+                self.batches += 1
+                self.encoded += len(batch)
+                for future, vector in zip(futures, vectors):
+                    future.set_result(vector)
+            except Exception as e:
+                for future in futures:
+                    future.set_exception(e)
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "batches": self.batches,
+            "encoded": self.encoded,
+            "average_batch_size": self.encoded / self.batches if self.batches else 0.0
+        }
+
+_query_cache = QueryEmbeddingCache(EMBEDDING_CACHE_SIZE, EMBEDDING_CACHE_PATH)
+atexit.register(_query_cache.save)
+
+_batcher = BatchingEncoder() if EMBEDDING_BATCH_WINDOW_MS > 0 else None
+
+def encode_query(query: str) -> np.ndarray:
+    """
+    Encode a search query, serving repeated queries from the shared LRU cache.
+    Cache misses are micro-batched with other concurrent queries if
+    EMBEDDING_BATCH_WINDOW_MS is set, and encoded directly if the batch
+    does not complete within EMBEDDING_BATCH_TIMEOUT_S.
+
+    :param query: Query string
+    :return: Read-only float32 embedding vector
+    """
+    key = normalize_query(query)
+    vector = _query_cache.get(key)
+    if vector is None:
+        vector = None
+        if _batcher is not None:
+            try:
+                vector = _batcher.encode(key, EMBEDDING_BATCH_TIMEOUT_S)
+            except FutureTimeoutError:
+                print(f"Batched query encode timed out after {EMBEDDING_BATCH_TIMEOUT_S}s, encoding directly")
+        if vector is None:
+            vector = np.asarray(get_model().encode(key), dtype=np.float32)
+        _query_cache.put(key, vector)
+    return vector
+
+def get_cache_stats() -> Dict[str, float]:
+    """Get hit/miss counters of the shared query embedding cache and batching counters"""
+    stats = _query_cache.stats()
+    if _batcher is not None:
+        stats["batching"] = _batcher.stats()
+    return stats
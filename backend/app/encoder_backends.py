@@ -0,0 +1,241 @@
+"""
+Sentence encoder backends selected with EMBEDDING_BACKEND: the SentenceTransformer
+model (torch), or its ONNX export run with ONNX Runtime (onnx, onnx-int8).
+The ONNX backends import neither torch nor sentence_transformers.
+"""
+
+import json
+import os
+from typing import Any, Dict, List, Optional, Union
+import numpy as np
+
+EMBEDDING_BACKEND = os.environ.get("EMBEDDING_BACKEND", "torch")
+EMBEDDING_ONNX_ROOT = os.environ.get(
+    "EMBEDDING_ONNX_ROOT", os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'models', 'onnx'))
+EMBEDDING_ONNX_DIR = os.environ.get("EMBEDDING_ONNX_DIR")
+EMBEDDING_ONNX_THREADS = int(os.environ.get("EMBEDDING_ONNX_THREADS", 0))
+PARITY_MIN_COSINE = float(os.environ.get("EMBEDDING_PARITY_MIN_COSINE", 0.99))
+
+ONNX_FILES = {
+    "onnx": "model.onnx",
+    "onnx-int8": "model_int8.onnx"
+}
+BACKENDS = ("torch",) + tuple(ONNX_FILES)
+ENCODER_CONFIG = "encoder_config.json"
+
+def default_onnx_dir(model_name: str) -> str:
+    """Directory holding the ONNX export of a model"""
+    return EMBEDDING_ONNX_DIR or os.path.join(EMBEDDING_ONNX_ROOT, model_name.replace("/", "_"))
+
+def encoder_fingerprint(model_name: str, backend: Optional[str] = None) -> str:
+    """Name identifying the vectors of a model run on a backend, e.g. for persisted caches"""
+    backend = backend or EMBEDDING_BACKEND
+    return model_name if backend == "torch" else f"{model_name}@{backend}"
+
+class OnnxEncoder:
+    """
+    Sentence encoder running an exported transformer with ONNX Runtime.
+    Pooling and normalization follow the SentenceTransformer the model was exported from.
+    """
+
+    def __init__(self, session, tokenizer, pooling: str = "mean", normalize: bool = True,
+                 model_name: Optional[str] = None):
+        self.session = session
+        self.tokenizer = tokenizer
+        self.pooling = pooling
+        self.normalize = normalize
+        self.model_name = model_name
+        self.input_names = [node.name for node in session.get_inputs()]
+        self.dims = None
+
+    @classmethod
+    def from_dir(cls, model_dir: str, file_name: str = ONNX_FILES["onnx"], threads: int = EMBEDDING_ONNX_THREADS):
+        """
+        Load an export written by export_onnx().
+
+        :param model_dir: Export directory
+        :param file_name: ONNX file to run, model.onnx or model_int8.onnx
+        :param threads: Intra-op threads, 0 lets ONNX Runtime decide
+        :raises FileNotFoundError: If the export or the requested model file is missing
+        """
+        import onnxruntime
+        from tokenizers import Tokenizer
+
+        model_path = os.path.join(model_dir, file_name)
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(f"ONNX encoder not found at {model_path}, run export_onnx_encoder.py first")
+
+        with open(os.path.join(model_dir, ENCODER_CONFIG), "r", encoding="utf-8") as f:
+            config = json.load(f)
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads > 0:
+            options.intra_op_num_threads = threads
+        session = onnxruntime.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+
+        tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        tokenizer.enable_truncation(max_length=config["max_length"])
+        tokenizer.enable_padding(pad_id=config.get("pad_id", 0), pad_token=config.get("pad_token", "[PAD]"))
+
+        encoder = cls(session, tokenizer, config.get("pooling", "mean"), config.get("normalize", True),
+                      config.get("model_name"))
+        encoder.dims = config.get("dims")
+        return encoder
+
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(texts)
+        attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+        features = {
+            "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+            "attention_mask": attention_mask,
+            "token_type_ids": np.array([e.type_ids for e in encodings], dtype=np.int64)
+        }
+        hidden = self.session.run(None, {name: features[name] for name in self.input_names})[0]
+
+        if self.pooling == "cls":
+            vectors = hidden[:, 0]
+        else:
+            mask = attention_mask[:, :, None].astype(np.float32)
+            vectors = (hidden * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+        if self.normalize:
+            vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        return vectors.astype(np.float32)
+
+    def encode(self, sentences: Union[str, List[str]], batch_size: int = 32, show_progress_bar: bool = False,
+               **kwargs) -> np.ndarray:
+        """
+        Encode one text or a list of texts, like SentenceTransformer.encode().
+        Texts are batched by length so little padding is computed.
+
+        :param sentences: Text or list of texts
+        :param batch_size: Texts per session run
+        :return: Vector for a single text, otherwise a (len(sentences), dims) array
+        """
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        if not texts:
+            return np.zeros((0, self.get_sentence_embedding_dimension() or 0), dtype=np.float32)
+
+        order = sorted(range(len(texts)), key=lambda i: -len(texts[i]))
+        vectors = [None] * len(texts)
+        for start in range(0, len(order), batch_size):
+            batch = order[start:start + batch_size]
+            for i, vector in zip(batch, self._encode_batch([texts[i] for i in batch])):
+                vectors[i] = vector
+
+        result = np.stack(vectors)
+        if self.dims is None:
+            self.dims = result.shape[1]
+        return result[0] if single else result
+
+    def get_sentence_embedding_dimension(self) -> Optional[int]:
+        return self.dims
+
+def load_encoder(model_name: str, backend: Optional[str] = None, onnx_dir: Optional[str] = None):
+    """
+    Load a sentence encoder on the configured backend.
+
+    :param model_name: SentenceTransformer model name
+    :param backend: 'torch', 'onnx' or 'onnx-int8' (default: EMBEDDING_BACKEND)
+    :param onnx_dir: Export directory of the ONNX backends (default: derived from the model name)
+    :raises ValueError: If the backend is unknown or the export belongs to another model
+    :raises FileNotFoundError: If the ONNX export is missing
+    :return: Encoder with encode() and get_sentence_embedding_dimension()
+    """
+    backend = backend or EMBEDDING_BACKEND
+    if backend == "torch":
+        from sentence_transformers import SentenceTransformer
+        return SentenceTransformer(model_name)
+    if backend not in ONNX_FILES:
+        raise ValueError(f"Unknown embedding backend {backend}, expected one of {', '.join(BACKENDS)}")
+
+    encoder = OnnxEncoder.from_dir(onnx_dir or default_onnx_dir(model_name), ONNX_FILES[backend])
+    if encoder.model_name and encoder.model_name != model_name:
+        raise ValueError(f"ONNX export was made from {encoder.model_name}, not {model_name}")
+    return encoder
+
+def export_onnx(model_name: str, output_dir: str, quantize: bool = True, opset: int = 17) -> Dict[str, Any]:
+    """
+    Export a SentenceTransformer to ONNX, optionally with an int8 copy.
+    Needs torch and sentence_transformers, plus onnxruntime for quantizing.
+
+    :param model_name: SentenceTransformer model name
+    :param output_dir: Directory for model.onnx, model_int8.onnx, the tokenizer and the encoder config
+    :param quantize: Also write dynamically quantized int8 weights
+    :param opset: ONNX opset version
+    :return: Encoder config written next to the model
+    """
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    model = SentenceTransformer(model_name, device="cpu")
+    transformer = model[0].auto_model.eval()
+    tokenizer = model.tokenizer
+    os.makedirs(output_dir, exist_ok=True)
+    tokenizer.save_pretrained(output_dir)
+
+    sample = tokenizer(["An example sentence to trace the graph."], return_tensors="pt")
+    input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+
+    class HiddenStates(torch.nn.Module):
+        def __init__(self):
+            super().__init__()
+            self.transformer = transformer
+
+        def forward(self, *inputs):
+            return self.transformer(**dict(zip(input_names, inputs))).last_hidden_state
+
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names + ["last_hidden_state"]}
+    model_path = os.path.join(output_dir, ONNX_FILES["onnx"])
+    with torch.no_grad():
+        torch.onnx.export(HiddenStates(), tuple(sample[name] for name in input_names), model_path,
+                          input_names=input_names, output_names=["last_hidden_state"],
+                          dynamic_axes=dynamic_axes, opset_version=opset)
+
+    pooling_module = model[1]
+    config = {
+        "model_name": model_name,
+        "max_length": model.max_seq_length,
+        "pooling": "cls" if getattr(pooling_module, "pooling_mode_cls_token", False) else "mean",
+        "normalize": any(type(module).__name__ == "Normalize" for module in model),
+        "dims": model.get_sentence_embedding_dimension(),
+        "pad_id": tokenizer.pad_token_id or 0,
+        "pad_token": tokenizer.pad_token or "[PAD]"
+    }
+    with open(os.path.join(output_dir, ENCODER_CONFIG), "w", encoding="utf-8") as f:
+        json.dump(config, f, indent=2)
+
+    if quantize:
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+        quantize_dynamic(model_path, os.path.join(output_dir, ONNX_FILES["onnx-int8"]), weight_type=QuantType.QInt8)
+
+    return config
+
+def check_parity(expected: np.ndarray, actual: np.ndarray, min_cosine: float = PARITY_MIN_COSINE) -> Dict[str, float]:
+    """
+    Compare the vectors of a backend with the torch vectors of the same texts.
+
+    :param expected: Reference (torch) vectors, one row per text
+    :param actual: Vectors of the backend under test
+    :param min_cosine: Lowest acceptable per-text cosine similarity
+    :raises ValueError: If the shapes differ or a text falls below min_cosine
+    :return: Minimum and mean cosine similarity
+    """
+    expected = np.atleast_2d(np.asarray(expected, dtype=np.float32))
+    actual = np.atleast_2d(np.asarray(actual, dtype=np.float32))
+    if expected.shape != actual.shape:
+        raise ValueError(f"Vector shapes differ: {expected.shape} vs {actual.shape}")
+
+    expected = expected / np.maximum(np.linalg.norm(expected, axis=1, keepdims=True), 1e-12)
+    actual = actual / np.maximum(np.linalg.norm(actual, axis=1, keepdims=True), 1e-12)
+    cosines = np.sum(expected * actual, axis=1)
+    result = {
+        "texts": int(len(cosines)),
+        "min_cosine": float(cosines.min()),
+        "mean_cosine": float(cosines.mean())
+    }
+    if result["min_cosine"] < min_cosine:
+        raise ValueError(f"Cosine agreement {result['min_cosine']:.4f} is below {min_cosine} "
+                         f"(text {int(cosines.argmin())})")
+    return result
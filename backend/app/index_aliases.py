@@ -0,0 +1,55 @@
+"""
+Read aliases of the thesis indices and the content version recorded in their mapping,
+which tells caches over an index that an incremental sync changed it.
+"""
+
+import os
+import uuid
+
+CS_THESES_ALIAS = os.environ.get("CS_THESES_ALIAS", "cs_theses")
+CS_THESES_SEMANTIC_ALIAS = os.environ.get("CS_THESES_SEMANTIC_ALIAS", "cs_theses_semantic")
+INFOS_THESES_ALIAS = os.environ.get("INFOS_THESES_ALIAS", "infos_theses")
+INFOS_THESES_SEMANTIC_ALIAS = os.environ.get("INFOS_THESES_SEMANTIC_ALIAS", "infos_theses_semantic")
+CS_THESES_CHUNKS_ALIAS = os.environ.get("CS_THESES_CHUNKS_ALIAS", "cs_theses_chunks")
+INFOS_THESES_CHUNKS_ALIAS = os.environ.get("INFOS_THESES_CHUNKS_ALIAS", "infos_theses_chunks")
+
+CONTENT_VERSION_META = "content_version"
+
+INDEX_ALIASES = {
+    "cs": {
+        "keyword": CS_THESES_ALIAS,
+        "semantic": CS_THESES_SEMANTIC_ALIAS,
+        "chunks": CS_THESES_CHUNKS_ALIAS
+    },
+    "informatics": {
+        "keyword": INFOS_THESES_ALIAS,
+        "semantic": INFOS_THESES_SEMANTIC_ALIAS,
+        "chunks": INFOS_THESES_CHUNKS_ALIAS
+    }
+}
+
+def resolve_indices(department: str = None, semantic: bool = False, chunks: bool = False) -> str:
+    """
+    Resolve the aliases to search for a department.
+
+    :param department: Optional department ('cs' or 'informatics'); all departments if None or unknown
+    :param semantic: Whether to use the indices with abstract vectors
+    :param chunks: Whether to use the passage indices with one vector per full-text passage
+    :return: Comma-separated alias names for es.search(index=...)
+    """
+    kind = "chunks" if chunks else "semantic" if semantic else "keyword"
+    if department in INDEX_ALIASES:
+        return INDEX_ALIASES[department][kind]
+    return ",".join(aliases[kind] for aliases in INDEX_ALIASES.values())
+
+def mark_index_updated(es, index_name: str) -> str:
+    """
+    Record a new content version in the _meta of an index, or of the indices behind an alias.
+
+    :param es: Elasticsearch client instance
+    :param index_name: Index or alias whose documents changed
+    :return: The new content version
+    """
+    version = uuid.uuid4().hex
+    es.indices.put_mapping(index=index_name, body={"_meta": {CONTENT_VERSION_META: version}})
+    return version
@@ -0,0 +1,192 @@
+"""
+Keyword canonicalization, applied once at ingest time into the keywords_normalized
+field so the statistics can aggregate on it directly.
+"""
+
+import re
+import string
+from typing import Any, Dict, List
+
+NORMALIZED_KEYWORDS_FIELD = "keywords_normalized"
+
+KEYWORD_ALIASES = {
+    'javascript': 'JavaScript',
+    'python': 'Python',
+    'java': 'Java',
+    'react': 'React',
+    'angular': 'Angular',
+    'vue': 'Vue',
+    'nodejs': 'Node.js',
+    'node.js': 'Node.js',
+    'node js': 'Node.js',
+
+    'machine learning': 'Machine Learning',
+    'machine-learning': 'Machine Learning',
+    'ml': 'Machine Learning',
+    'artificial intelligence': 'Artificial Intelligence',
+    'artificial-intelligence': 'Artificial Intelligence',
+    'ai': 'Artificial Intelligence',
+    'deep learning': 'Deep Learning',
+    'deep-learning': 'Deep Learning',
+    'neural networks': 'Neural Networks',
+    'neural-networks': 'Neural Networks',
+    'cnn': 'CNN',
+    'convolutional neural networks': 'CNN',
+    'rnn': 'RNN',
+
+    'mysql': 'MySQL',
+    'postgresql': 'PostgreSQL',
+    'mongodb': 'MongoDB',
+    'database': 'Database',
+    'db': 'Database',
+
+    'html': 'HTML',
+    'css': 'CSS',
+    'web application': 'Web Application',
+    'web app': 'Web Application',
+    'webapp': 'Web Application',
+    'web-application': 'Web Application',
+    'mobile app': 'Mobile Application',
+    'mobile application': 'Mobile Application',
+    'mobile-application': 'Mobile Application',
+
+    'spring boot': 'Spring Boot',
+    'spring-boot': 'Spring Boot',
+    'express': 'Express.js',
+    'express.js': 'Express.js',
+    'expressjs': 'Express.js',
+    'flask': 'Flask',
+    'django': 'Django',
+
+    'iot': 'IoT',
+    'internet of things': 'IoT',
+    'api': 'API',
+    'rest api': 'REST API',
+    'rest-api': 'REST API',
+    'restapi': 'REST API',
+    'bluetooth': 'Bluetooth',
+    'wifi': 'WiFi',
+    'wi-fi': 'WiFi',
+
+    'image processing': 'Image Processing',
+    'image-processing': 'Image Processing',
+    'opencv': 'OpenCV',
+    'computer vision': 'Computer Vision',
+    'computer-vision': 'Computer Vision',
+
+    'arduino': 'Arduino',
+    'raspberry pi': 'Raspberry Pi',
+    'raspberry-pi': 'Raspberry Pi',
+    'esp32': 'ESP32',
+    'microcontroller': 'Microcontroller',
+    'fpga': 'FPGA',
+
+    'user interface': 'User Interface',
+    'user-interface': 'User Interface',
+    'ui': 'User Interface',
+    'user experience': 'User Experience',
+    'user-experience': 'User Experience',
+    'ux': 'User Experience',
+    'algorithm': 'Algorithm',
+    'algorithms': 'Algorithm',
+    'data mining': 'Data Mining',
+    'data-mining': 'Data Mining',
+    'data analysis': 'Data Analysis',
+    'data-analysis': 'Data Analysis',
+
+    'medical imaging': 'Medical Imaging',
+    'medical-imaging': 'Medical Imaging',
+    'healthcare': 'Healthcare',
+    'health care': 'Healthcare',
+    'telemedicine': 'Telemedicine',
+
+    'cybersecurity': 'Cybersecurity',
+    'cyber security': 'Cybersecurity',
+    'cyber-security': 'Cybersecurity',
+    'encryption': 'Encryption',
+    'authentication': 'Authentication',
+    'security': 'Security',
+
+    'network': 'Network',
+    'networking': 'Network',
+    'wireless': 'Wireless',
+    'protocol': 'Protocol',
+    'protocols': 'Protocol',
+}
+
+_EDGE_CHARACTERS = string.punctuation + ' '
+_REMOVED_PUNCTUATION = '.,;:!?()"\''
+
+# One pass over runs of whitespace, hyphens and removed punctuation: the
+# punctuation is dropped, whitespace collapses to ' ' and hyphens to '-'
+_SEPARATOR_RUN = re.compile(r'[\s.,;:!?()"\'-]+')
+
+def _collapse_separators(match) -> str:
+    run = match.group(0)
+    if run == ' ' or run == '-':
+        return run
+
+    collapsed = []
+    for char in run:
+        if char in _REMOVED_PUNCTUATION:
+            continue
+        separator = ' ' if char.isspace() else '-'
+        if not collapsed or collapsed[-1] != separator:
+            collapsed.append(separator)
+    return ''.join(collapsed)
+
+def normalize_keyword(keyword: str) -> str:
+    """
+    Normalize a keyword to handle duplicates and variations.
+    
+    :param keyword: Raw keyword string
+    :return: Normalized keyword string
+    """
+    if not keyword or not isinstance(keyword, str):
+        return ""
+
+    normalized = keyword.lower().strip().strip(_EDGE_CHARACTERS)
+    normalized = _SEPARATOR_RUN.sub(_collapse_separators, normalized)
+
+    canonical = KEYWORD_ALIASES.get(normalized)
+    if canonical:
+        return canonical
+
+    return normalized.title() if normalized else ""
+
+def extract_and_normalize_keywords(keyword_field) -> List[str]:
+    """
+    Extract and normalize keywords from various field formats.
+    
+    :param keyword_field: Keywords in string or list format
+    :return: List of normalized keywords
+    """
+    keywords = []
+    
+    if isinstance(keyword_field, str):
+        if ',' in keyword_field:
+            keywords = [kw.strip() for kw in keyword_field.split(',') if kw.strip()]
+        elif ';' in keyword_field:
+            keywords = [kw.strip() for kw in keyword_field.split(';') if kw.strip()]
+        elif keyword_field.strip():
+            keywords = [keyword_field.strip()]
+    elif isinstance(keyword_field, list):
+        keywords = [kw.strip() for kw in keyword_field if kw and isinstance(kw, str) and kw.strip()]
+
+    normalized_keywords = []
+    for keyword in keywords:
+        normalized = normalize_keyword(keyword)
+        if normalized and len(normalized) > 1:
+            normalized_keywords.append(normalized)
+    
+    return normalized_keywords
+
+def normalize_thesis_keywords(thesis: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Ingest stage storing the distinct canonical keywords of a thesis in keywords_normalized.
+
+    :param thesis: Thesis dictionary, updated in place
+    :return: The same thesis dictionary
+    """
+    thesis[NORMALIZED_KEYWORDS_FIELD] = list(dict.fromkeys(extract_and_normalize_keywords(thesis.get('keywords'))))
+    return thesis
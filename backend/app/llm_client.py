@@ -0,0 +1,137 @@
+"""
+Shared HTTP client for the LLM providers, with pooled connections, retries,
+timeouts and a concurrency limit per provider.
+"""
+
+import threading
+import time
+import os
+from contextlib import contextmanager
+from typing import Dict, Optional, Set
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+OLLAMA_API_BASE = os.environ.get("OLLAMA_API_BASE", "http://localhost:11434/api")
+
+LLM_CONNECT_TIMEOUT = float(os.environ.get("LLM_CONNECT_TIMEOUT", 3.05))
+LLM_READ_TIMEOUT = float(os.environ.get("LLM_READ_TIMEOUT", 60))
+LLM_MAX_RETRIES = int(os.environ.get("LLM_MAX_RETRIES", 2))
+LLM_RETRY_BACKOFF = float(os.environ.get("LLM_RETRY_BACKOFF", 0.5))
+LLM_POOL_SIZE = int(os.environ.get("LLM_POOL_SIZE", 16))
+LLM_QUEUE_TIMEOUT = float(os.environ.get("LLM_QUEUE_TIMEOUT", 30))
+MODEL_LIST_TTL = float(os.environ.get("MODEL_LIST_TTL", 30))
+
+PROVIDER_CONCURRENCY = {
+    "ollama": int(os.environ.get("OLLAMA_MAX_CONCURRENCY", 2)),
+    "gemini": int(os.environ.get("GEMINI_MAX_CONCURRENCY", 8))
+}
+
+RETRY_STATUSES = (429, 502, 503, 504)
+
+class ProviderBusyError(RuntimeError):
+    """Raised when no provider slot frees up within the queue timeout"""
+
+class ProviderClient:
+    """
+    Pooled HTTP session plus per-provider concurrency limits.
+    Read timeouts are not retried, since a generation that timed out would only time out again.
+    """
+
+    def __init__(self, api_base: Optional[str] = None, connect_timeout: float = LLM_CONNECT_TIMEOUT,
+                 read_timeout: float = LLM_READ_TIMEOUT, max_retries: int = LLM_MAX_RETRIES,
+                 backoff: float = LLM_RETRY_BACKOFF, pool_size: int = LLM_POOL_SIZE,
+                 concurrency: Optional[Dict[str, int]] = None, queue_timeout: float = LLM_QUEUE_TIMEOUT,
+                 model_list_ttl: float = MODEL_LIST_TTL):
+        self.api_base = api_base
+        self.timeout = (connect_timeout, read_timeout)
+        self.queue_timeout = queue_timeout
+        self.model_list_ttl = model_list_ttl
+
+        retry = Retry(
+            total=max_retries,
+            connect=max_retries,
+            read=0,
+            status=max_retries,
+            backoff_factor=backoff,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=frozenset({"GET", "POST"}),
+            respect_retry_after_header=True,
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        limits = dict(PROVIDER_CONCURRENCY, **(concurrency or {}))
+        self._slots = {provider: threading.BoundedSemaphore(max(1, limit)) for provider, limit in limits.items()}
+
+        self._models = None
+        self._models_expire = 0.0
+        self._models_lock = threading.Lock()
+
+    def url(self, path: str) -> str:
+        base = self.api_base or OLLAMA_API_BASE
+        return f"{base.rstrip('/')}/{path.lstrip('/')}"
+
+    @contextmanager
+    def slot(self, provider: str):
+        """Hold one of the provider's concurrency slots for the duration of the block"""
+        semaphore = self._slots.get(provider)
+        if semaphore is None:
+            yield
+            return
+        if not semaphore.acquire(timeout=self.queue_timeout):
+            raise ProviderBusyError(f"Too many concurrent {provider} requests, try again later")
+        try:
+            yield
+        finally:
+            semaphore.release()
+
+    def post(self, path: str, payload: Dict, stream: bool = False) -> requests.Response:
+        """POST JSON to the Ollama API through the pooled session"""
+        response = self.session.post(self.url(path), json=payload, stream=stream, timeout=self.timeout)
+        response.raise_for_status()
+        return response
+
+    def ollama_models(self) -> Optional[Set[str]]:
+        """
+        Names of the models installed in Ollama, cached for model_list_ttl seconds.
+        Failures are cached as well so an unreachable server is not probed on every request.
+
+        :return: Set of model names, or None if Ollama could not be reached
+        """
+        if time.monotonic() < self._models_expire:
+            return self._models
+        with self._models_lock:
+            if time.monotonic() < self._models_expire:
+                return self._models
+            try:
+                response = self.session.get(self.url("tags"), timeout=(self.timeout[0], 5))
+                response.raise_for_status()
+                self._models = {model["name"] for model in response.json().get("models", [])}
+            except Exception as e:
+                print(f"Error checking Ollama models: {str(e)}")
+                self._models = None
+            self._models_expire = time.monotonic() + self.model_list_ttl
+            return self._models
+
+    def invalidate_models(self):
+        with self._models_lock:
+            self._models_expire = 0.0
+
+    def close(self):
+        self.session.close()
+
+_client = None
+_client_lock = threading.Lock()
+
+def get_client() -> ProviderClient:
+    """Get or initialize the shared provider client"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = ProviderClient()
+    return _client
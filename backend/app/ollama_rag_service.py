@@ -1,20 +1,41 @@
-from sentence_transformers import SentenceTransformer
-import requests
 import json
-from typing import List, Dict, Any, Optional
+import time
+from typing import List, Dict, Any, Iterator, Optional
 import os
-import google.generativeai as genai
+import threading
+from embedding_service import encode_query
+from index_aliases import resolve_indices
+from llm_client import get_client
+from answer_cache import get_answer_cache
+from context_builder import build_context, context_budget, document_text
+from reranker import rerank_hits, RERANK_TOP_N
 
-modell_name = 'all-MiniLM-L6-v2'
-#modell_name = 'bge-small-en' 
-#modell_name = 'bge-base-en'
-#modell_name = 'bge-large-en'
-
-OLLAMA_API_BASE = os.environ.get("OLLAMA_API_BASE", "http://localhost:11434/api")
 GEMINI_API_KEY = os.environ.get("GEMINI_API_KEY")
 
-if GEMINI_API_KEY:
-    genai.configure(api_key=GEMINI_API_KEY)
+RAG_USE_PASSAGES = os.environ.get("RAG_USE_PASSAGES", "false").lower() == "true"
+RAG_PASSAGES_PER_THESIS = int(os.environ.get("RAG_PASSAGES_PER_THESIS", 3))
+PASSAGE_NUM_CANDIDATES = int(os.environ.get("PASSAGE_NUM_CANDIDATES", 200))
+RAG_RERANK = os.environ.get("RAG_RERANK", "false").lower() == "true"
+
+GENERATION_ERROR = "I encountered an error while generating a response"
+
+_genai = None
+_genai_lock = threading.Lock()
+
+def get_genai():
+    """
+    Import and configure the Gemini SDK on first use. It pulls in a large dependency
+    tree, so importing it lazily keeps it off the app's startup path.
+    """
+    global _genai
+    if _genai is None:
+        with _genai_lock:
+            if _genai is None:
+                import google.generativeai as genai
+                if GEMINI_API_KEY:
+                    genai.configure(api_key=GEMINI_API_KEY)
+                _genai = genai
+    return _genai
 
 AVAILABLE_MODELS = [
     {
@@ -49,15 +70,58 @@ AVAILABLE_MODELS = [
     }
 ]
 
-_embedding_model = None
+def retrieve_passages(es, query: str, top_k: int = 5, department: str = None,
+                      passages_per_thesis: int = RAG_PASSAGES_PER_THESIS) -> List[Dict[str, Any]]:
+    """
+    Retrieve full-text passages from the *_chunks indices, collapsed per thesis
 
-def get_embedding_model():
-    global _embedding_model
-    if _embedding_model is None:
-        _embedding_model = SentenceTransformer(modell_name)
-    return _embedding_model
+    :param es: Elasticsearch client instance
+    :param query: Query string
+    :param top_k: Number of theses to retrieve
+    :param department: Optional filter by department ('cs' or 'informatics')
+    :param passages_per_thesis: Number of best passages kept per thesis
+    :return: One hit per thesis, shaped like retrieve_documents hits, whose _source
+             also lists the matching passages in their order in the thesis
+    """
+    filter_clause = []
+    if department:
+        filter_clause.append({"term": {"department": department}})
 
-def retrieve_documents(es, query: str, top_k: int = 5, department: str = None) -> List[Dict[str, Any]]:
+    search_query = {
+        "query": {
+            "knn": {
+                "field": "passage_vector",
+                "query_vector": encode_query(query).tolist(),
+                "num_candidates": max(PASSAGE_NUM_CANDIDATES, top_k * passages_per_thesis),
+                "filter": filter_clause
+            }
+        },
+        "collapse": {
+            "field": "hash_code",
+            "inner_hits": {
+                "name": "passages",
+                "size": passages_per_thesis,
+                "_source": ["passage_index", "text"]
+            }
+        },
+        "_source": {"excludes": ["passage_vector", "text"]},
+        "size": top_k
+    }
+
+    response = es.search(index=resolve_indices(department, chunks=True), body=search_query)
+
+    documents = []
+    for hit in response['hits']['hits']:
+        inner = hit.get('inner_hits', {}).get('passages', {}).get('hits', {}).get('hits', [])
+        passages = sorted((passage['_source'] for passage in inner), key=lambda p: p.get('passage_index', 0))
+        source = dict(hit['_source'])
+        source.pop('passage_index', None)
+        source['passages'] = passages
+        documents.append({'_id': str(source.get('hash_code', hit['_id'])), '_score': hit['_score'], '_source': source})
+    return documents
+
+def retrieve_documents(es, query: str, top_k: int = 5, department: str = None,
+                       passages: bool = None, rerank: bool = None) -> List[Dict[str, Any]]:
     """
     Retrieve documents based on semantic similarity for RAG
 
@@ -65,11 +129,27 @@ def retrieve_documents(es, query: str, top_k: int = 5, department: str = None) -
     :param query: Query string
     :param top_k: Number of documents to retrieve
     :param department: Optional filter by department ('cs' or 'informatics')
+    :param passages: Retrieve full-text passages instead of abstracts (default RAG_USE_PASSAGES);
+                     falls back to abstracts if the passage indices are missing or empty
+    :param rerank: Retrieve RERANK_TOP_N candidates and keep the top_k best by cross-encoder
+                   score (default RAG_RERANK)
     :return: List of retrieved documents
     """
-    model = get_embedding_model()
-    
-    query_vector = model.encode(query).tolist()
+    rerank = RAG_RERANK if rerank is None else rerank
+    candidates = max(top_k, RERANK_TOP_N) if rerank else top_k
+
+    def finish(documents: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        return rerank_hits(query, documents)[:top_k] if rerank else documents
+
+    if RAG_USE_PASSAGES if passages is None else passages:
+        try:
+            documents = retrieve_passages(es, query, candidates, department)
+            if documents:
+                return finish(documents)
+        except Exception as e:
+            print(f"Passage retrieval failed, using abstracts: {str(e)}")
+
+    query_vector = encode_query(query).tolist()
     
     filter_clause = []
     if department:
@@ -91,34 +171,36 @@ def retrieve_documents(es, query: str, top_k: int = 5, department: str = None) -
                 }
             }
         },
-        "size": top_k
+        "size": candidates
     }
     
-    if department == "cs":
-        indices = ["cs_theses_semantic"]
-    elif department == "informatics":
-        indices = ["infos_theses_semantic"]
-    else:
-        indices = ["cs_theses_semantic", "infos_theses_semantic"] 
+    indices = resolve_indices(department, semantic=True)
     
-    response = es.search(index=",".join(indices), body=search_query)
+    response = es.search(index=indices, body=search_query)
     
-    return response['hits']['hits']
+    return finish(response['hits']['hits'])
 
-def prepare_context(documents: List[Dict[str, Any]]) -> str:
+def prepare_context(documents: List[Dict[str, Any]], query: Optional[str] = None,
+                    model_id: Optional[str] = None) -> str:
     """
     Prepare context from retrieved documents
     
     :param documents: List of retrieved documents
+    :param query: Optional question; if given, only its most relevant sentences are packed
+                  into the model's token budget instead of truncating every abstract
+    :param model_id: Model the context is for, selects the token budget
     :return: Context string for RAG
     """
+    if query:
+        return build_context(documents, query, context_budget(model_id))
+
     context = "RELEVANT DOCUMENTS:\n\n"
     
     for i, doc in enumerate(documents, 1):
         source = doc["_source"]
         author = source.get("author", "Unknown Author")
         year = source.get("year", "Unknown Year")
-        abstract = source.get("abstract", "No abstract available")
+        abstract = document_text(source) or "No abstract available"
         department = source.get("department", "Unknown Department")
         
         if len(abstract) > 500:
@@ -130,9 +212,9 @@ def prepare_context(documents: List[Dict[str, Any]]) -> str:
     
     return context
 
-def generate_answer_with_ollama(model_id: str, context: str, query: str) -> str:
-    """Generate answer using Ollama API"""
-    prompt = f"""You are a knowledgeable research expert who specializes in academic papers and theses.
+def build_prompt(context: str, query: str) -> str:
+    """Build the answer prompt shared by all providers"""
+    return f"""You are a knowledgeable research expert who specializes in academic papers and theses.
 
 I've provided some relevant research documents below. Using ONLY this information, answer the following question directly and concisely.
 
@@ -150,71 +232,119 @@ Question: {query}
 
 Answer:"""
 
+OLLAMA_OPTIONS = {
+    "temperature": 0.7,
+    "top_p": 0.9,
+    "top_k": 40,
+    "num_predict": 350
+}
+
+def generate_answer_with_ollama(model_id: str, context: str, query: str) -> str:
+    """Generate answer using Ollama API"""
+    prompt = build_prompt(context, query)
+
+    client = get_client()
     try:
-        response = requests.post(
-            f"{OLLAMA_API_BASE}/generate",
-            json={
+        with client.slot("ollama"):
+            response = client.post("generate", {
                 "model": model_id,
                 "prompt": prompt,
                 "stream": False,
-                "options": {
-                    "temperature": 0.7,
-                    "top_p": 0.9,
-                    "top_k": 40,
-                    "num_predict": 350 
-                }
-            },
-            timeout=60
-        )
-        response.raise_for_status()
+                "options": OLLAMA_OPTIONS
+            })
         result = response.json()
         return result.get("response", "")
     except Exception as e:
         print(f"Error calling Ollama API: {str(e)}")
-        return f"I encountered an error while generating a response: {str(e)}"
+        return f"{GENERATION_ERROR}: {str(e)}"
+
+def gemini_generation_config():
+    """Generation settings matching OLLAMA_OPTIONS"""
+    return get_genai().types.GenerationConfig(
+        temperature=0.7,
+        top_p=0.9,
+        top_k=40,
+        max_output_tokens=350,
+    )
 
 def generate_answer_with_gemini(model_id: str, context: str, query: str) -> str:
     """Generate answer using Gemini API"""
     if not GEMINI_API_KEY:
         return "Gemini API key not configured. Please set GEMINI_API_KEY environment variable."
     
-    prompt = f"""You are a knowledgeable research expert who specializes in academic papers and theses.
-
-I've provided some relevant research documents below. Using ONLY this information, answer the following question directly and concisely.
-
-Important guidelines:
-- Answer in a natural, conversational way - as if explaining to a colleague
-- When referring to the theses, use the author names (e.g., "As demonstrated by Smith (2023)..." or "The research by Jones (2022) shows...")
-- Do not use phrases like "Document 1" or "Document 2" - always refer to the authors by name
-- Keep your answer focused and concise
-- If the documents don't contain relevant information, simply state that you don't have enough information
-- Don't enumerate your points unless absolutely necessary
-
-{context}
-
-Question: {query}
-
-Answer:"""
+    prompt = build_prompt(context, query)
 
     try:
-        model = genai.GenerativeModel(model_id)
+        model = get_genai().GenerativeModel(model_id)
         
-        generation_config = genai.types.GenerationConfig(
-            temperature=0.7,
-            top_p=0.9,
-            top_k=40,
-            max_output_tokens=350,
-        )
-        
-        response = model.generate_content(
-            prompt,
-            generation_config=generation_config
-        )
+        with get_client().slot("gemini"):
+            response = model.generate_content(
+                prompt,
+                generation_config=gemini_generation_config(),
+                request_options={"timeout": get_client().timeout[1]}
+            )
         
         return response.text
     except Exception as e:
         print(f"Error calling Gemini API: {str(e)}")
-        return f"I encountered an error while generating a response: {str(e)}"
+        return f"{GENERATION_ERROR}: {str(e)}"
+
+def stream_answer_with_ollama(model_id: str, context: str, query: str) -> Iterator[Dict[str, Any]]:
+    """
+    Stream an answer from the Ollama API.
+
+    :param model_id: Ollama model ID
+    :param context: Context string for RAG
+    :param query: Query string
+    :return: Iterator over the NDJSON chunks of /api/generate; the last one has done=True
+    """
+    client = get_client()
+    with client.slot("ollama"), client.post("generate", {
+        "model": model_id,
+        "prompt": build_prompt(context, query),
+        "stream": True,
+        "options": OLLAMA_OPTIONS
+    }, stream=True) as response:
+        for line in response.iter_lines():
+            if not line:
+                continue
+            chunk = json.loads(line)
+            if chunk.get("error"):
+                raise RuntimeError(chunk["error"])
+            yield chunk
+            if chunk.get("done"):
+                return
+
+def stream_answer_with_gemini(model_id: str, context: str, query: str) -> Iterator[Dict[str, Any]]:
+    """Stream an answer from the Gemini API as Ollama-style chunks"""
+    if not GEMINI_API_KEY:
+        raise RuntimeError("Gemini API key not configured. Please set GEMINI_API_KEY environment variable.")
+
+    model = get_genai().GenerativeModel(model_id)
+    with get_client().slot("gemini"):
+        for chunk in model.generate_content(build_prompt(context, query),
+                                            generation_config=gemini_generation_config(), stream=True,
+                                            request_options={"timeout": get_client().timeout[1]}):
+            yield {"response": chunk.text, "done": False}
+    yield {"response": "", "done": True}
+
+def build_references(documents: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Summaries of the retrieved documents returned alongside the answer"""
+    references = []
+    for doc in documents:
+        source = doc["_source"]
+        references.append({
+            "id": doc["_id"],
+            "author": source.get("author", "Unknown"),
+            "year": source.get("year", "Unknown"),
+            "score": doc["_score"],
+            "abstract_snippet": document_text(source)[:150] + "...",
+            "department": source.get("department", "Unknown"),
+            "hash_code": source.get("hash_code", None)
+        })
+        if source.get("passages"):
+            references[-1]["passages"] = [passage.get("passage_index") for passage in source["passages"]]
+    return references
 
 def generate_rag_response(es, query: str, model_id: str, top_k: int = 5, department: str = None) -> Dict[str, Any]:
     """
@@ -237,10 +367,25 @@ def generate_rag_response(es, query: str, model_id: str, top_k: int = 5, departm
         
         model_name = model_info["name"]
         provider = model_info["provider"]
+
+        cache = get_answer_cache()
+        if cache is not None:
+            cache.check_aliases(es)
+            key = cache.make_key(query, model_id, department, top_k)
+            cached = cache.get_exact(key)
+            if cached is not None:
+                return dict(cached, cached="exact")
         
         documents = retrieve_documents(es, query, top_k, department)
+
+        if cache is not None:
+            query_vector = encode_query(query)
+            hash_codes = frozenset(doc["_source"].get("hash_code", doc["_id"]) for doc in documents)
+            cached = cache.get_semantic(key, query_vector, hash_codes)
+            if cached is not None:
+                return dict(cached, cached="semantic")
         
-        context = prepare_context(documents)
+        context = prepare_context(documents, query, model_id)
         
         if provider == "ollama":
             answer = generate_answer_with_ollama(model_id, context, query)
@@ -249,25 +394,18 @@ def generate_rag_response(es, query: str, model_id: str, top_k: int = 5, departm
         else:
             answer = f"Unknown provider: {provider}"
         
-        references = []
-        for doc in documents:
-            source = doc["_source"]
-            references.append({
-                "id": doc["_id"],
-                "author": source.get("author", "Unknown"),
-                "year": source.get("year", "Unknown"),
-                "score": doc["_score"],
-                "abstract_snippet": source.get("abstract", "")[:150] + "...",
-                "department": source.get("department", "Unknown"),
-                "hash_code": source.get("hash_code", None)
-            })
-        
-        return {
+        response = {
             "answer": answer,
-            "references": references,
+            "references": build_references(documents),
             "model": model_name,
             "provider": provider
         }
+
+        generated = provider == "ollama" or (provider == "gemini" and GEMINI_API_KEY)
+        if cache is not None and generated and not answer.startswith(GENERATION_ERROR):
+            cache.put(key, query_vector, hash_codes, response)
+
+        return response
         
     except Exception as e:
         print(f"Error in RAG process: {str(e)}")
@@ -277,21 +415,137 @@ def generate_rag_response(es, query: str, model_id: str, top_k: int = 5, departm
             "references": []
         }
 
+def replay_cached_answer(cached: Dict[str, Any], how: str, elapsed_ms) -> Iterator[Dict[str, Any]]:
+    """Stream a cached RAG response as the events of stream_rag_response, the answer as a single token"""
+    yield {
+        "event": "references",
+        "data": {
+            "references": cached["references"],
+            "model": cached["model"],
+            "provider": cached["provider"]
+        }
+    }
+    yield {"event": "token", "data": {"text": cached["answer"]}}
+    total_ms = elapsed_ms()
+    yield {"event": "done", "data": {"retrieval_ms": total_ms, "time_to_first_token_ms": total_ms,
+                                     "total_ms": total_ms, "cached": how}}
+
+def stream_rag_response(es, query: str, model_id: str, top_k: int = 5,
+                        department: str = None) -> Iterator[Dict[str, Any]]:
+    """
+    Stream a RAG response as events: the references first, then the answer
+    tokens as the model produces them, then the timings.
+    Answers are served from and stored in the same answer cache as generate_rag_response;
+    a cached answer is replayed as a single token and its 'done' event names the cache hit.
+
+    :param es: Elasticsearch client instance
+    :param query: Query string
+    :param model_id: Ollama model ID or Gemini model ID
+    :param top_k: Number of documents to retrieve
+    :param department: Optional filter by department ('cs' or 'informatics')
+    :return: Iterator over {"event": name, "data": payload} dictionaries, where name is
+             'references', 'token', 'done' or 'error'
+    """
+    started = time.perf_counter()
+
+    def elapsed_ms() -> float:
+        return round((time.perf_counter() - started) * 1000, 1)
+
+    model_info = next((m for m in AVAILABLE_MODELS if m["id"] == model_id), None)
+    if not model_info:
+        yield {"event": "error", "data": {"error": f"Model {model_id} not found"}}
+        return
+
+    cache = get_answer_cache()
+    try:
+        if cache is not None:
+            cache.check_aliases(es)
+            key = cache.make_key(query, model_id, department, top_k)
+            cached = cache.get_exact(key)
+            if cached is not None:
+                yield from replay_cached_answer(cached, "exact", elapsed_ms)
+                return
+
+        documents = retrieve_documents(es, query, top_k, department)
+
+        if cache is not None:
+            query_vector = encode_query(query)
+            hash_codes = frozenset(doc["_source"].get("hash_code", doc["_id"]) for doc in documents)
+            cached = cache.get_semantic(key, query_vector, hash_codes)
+            if cached is not None:
+                yield from replay_cached_answer(cached, "semantic", elapsed_ms)
+                return
+    except Exception as e:
+        print(f"Error in RAG retrieval: {str(e)}")
+        yield {"event": "error", "data": {"error": str(e)}}
+        return
+
+    retrieval_ms = elapsed_ms()
+    references = build_references(documents)
+    yield {
+        "event": "references",
+        "data": {
+            "references": references,
+            "model": model_info["name"],
+            "provider": model_info["provider"]
+        }
+    }
+
+    first_token_ms = None
+    final_chunk = {}
+    answer_parts = []
+    try:
+        context = prepare_context(documents, query, model_id)
+        if model_info["provider"] == "gemini":
+            chunks = stream_answer_with_gemini(model_id, context, query)
+        else:
+            chunks = stream_answer_with_ollama(model_id, context, query)
+
+        for chunk in chunks:
+            text = chunk.get("response", "")
+            if text:
+                if first_token_ms is None:
+                    first_token_ms = elapsed_ms()
+                answer_parts.append(text)
+                yield {"event": "token", "data": {"text": text}}
+            if chunk.get("done"):
+                final_chunk = chunk
+    except Exception as e:
+        print(f"Error streaming answer: {str(e)}")
+        yield {"event": "error", "data": {"error": str(e)}}
+        return
+
+    if cache is not None and answer_parts:
+        cache.put(key, query_vector, hash_codes, {
+            "answer": "".join(answer_parts),
+            "references": references,
+            "model": model_info["name"],
+            "provider": model_info["provider"]
+        })
+
+    timing = {
+        "retrieval_ms": retrieval_ms,
+        "time_to_first_token_ms": first_token_ms,
+        "total_ms": elapsed_ms()
+    }
+    # Ollama reports its durations in nanoseconds
+    for key in ("prompt_eval_duration", "eval_duration"):
+        if key in final_chunk:
+            timing[f"{key}_ms"] = round(final_chunk[key] / 1e6, 1)
+    if "eval_count" in final_chunk:
+        timing["eval_count"] = final_chunk["eval_count"]
+
+    yield {"event": "done", "data": timing}
+
 def get_available_models() -> List[Dict[str, str]]:
     """Get list of available models from both Ollama and Gemini"""
     available_models = []
     
-    try:
-        response = requests.get(f"{OLLAMA_API_BASE}/tags", timeout=5)
-        if response.status_code == 200:
-            ollama_models = response.json().get("models", [])
-            available_model_names = {model["name"] for model in ollama_models}
-            
-            for model in AVAILABLE_MODELS:
-                if model["provider"] == "ollama" and model["id"] in available_model_names:
-                    available_models.append(model)
-    except Exception as e:
-        print(f"Error checking Ollama models: {str(e)}")
+    available_model_names = get_client().ollama_models()
+    if available_model_names:
+        for model in AVAILABLE_MODELS:
+            if model["provider"] == "ollama" and model["id"] in available_model_names:
+                available_models.append(model)
     
     if GEMINI_API_KEY:
         for model in AVAILABLE_MODELS:
@@ -0,0 +1,236 @@
+"""
+Asynchronous RAG jobs, run by a bounded worker pool per provider outside the
+Flask request threads and followed by polling or Server-Sent Events.
+"""
+
+import threading
+import queue
+import time
+import uuid
+import os
+from typing import Any, Dict, Iterator, List, Optional
+from llm_client import PROVIDER_CONCURRENCY
+from ollama_rag_service import AVAILABLE_MODELS, stream_rag_response
+
+RAG_QUEUE_SIZE = int(os.environ.get("RAG_QUEUE_SIZE", 32))
+RAG_JOB_TTL = float(os.environ.get("RAG_JOB_TTL", 600))
+RAG_WORKERS = {
+    "ollama": int(os.environ.get("RAG_OLLAMA_WORKERS", PROVIDER_CONCURRENCY["ollama"])),
+    "gemini": int(os.environ.get("RAG_GEMINI_WORKERS", PROVIDER_CONCURRENCY["gemini"]))
+}
+
+class QueueFullError(Exception):
+    """Raised when a provider queue is full"""
+
+    def __init__(self, provider: str, retry_after: int):
+        super().__init__(f"The {provider} queue is full, retry in {retry_after} seconds")
+        self.provider = provider
+        self.retry_after = retry_after
+
+class RagJob:
+    """One queued question and the events produced while answering it"""
+
+    def __init__(self, es, query: str, model_id: str, top_k: int, department: Optional[str], provider: str):
+        self.id = uuid.uuid4().hex
+        self.es = es
+        self.query = query
+        self.model_id = model_id
+        self.top_k = top_k
+        self.department = department
+        self.provider = provider
+        self.status = "queued"
+        self.events = []
+        self.result = None
+        self.error = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self._changed = threading.Condition()
+
+    def add_event(self, event: Dict[str, Any]):
+        with self._changed:
+            self.events.append(event)
+            self._changed.notify_all()
+
+    def set_status(self, status: str):
+        with self._changed:
+            self.status = status
+            if status == "running":
+                self.started = time.time()
+            elif status in ("done", "failed"):
+                self.finished = time.time()
+            self._changed.notify_all()
+
+    @property
+    def finished_status(self) -> bool:
+        return self.status in ("done", "failed")
+
+    def follow(self, timeout: float = 15.0) -> Iterator[Optional[Dict[str, Any]]]:
+        """
+        Yield the job's events from the first one, waiting for new ones until the job finishes.
+        Yields None after timeout seconds without an event so callers can send keep-alives.
+        """
+        sent = 0
+        while True:
+            with self._changed:
+                if sent == len(self.events) and not self.finished_status:
+                    self._changed.wait(timeout)
+                pending = self.events[sent:]
+                finished = self.finished_status
+            sent += len(pending)
+            if pending:
+                yield from pending
+            elif finished:
+                return
+            else:
+                yield None
+
+    def to_dict(self) -> Dict[str, Any]:
+        job = {
+            "job_id": self.id,
+            "status": self.status,
+            "query": self.query,
+            "model": self.model_id,
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished
+        }
+        if self.result is not None:
+            job["result"] = self.result
+        if self.error is not None:
+            job["error"] = self.error
+        return job
+
+class RagJobQueue:
+    """
+    Bounded queue and fixed worker pool per provider.
+    Finished jobs are kept for job_ttl seconds so their results can be fetched.
+    """
+
+    def __init__(self, workers: Optional[Dict[str, int]] = None, queue_size: int = RAG_QUEUE_SIZE,
+                 job_ttl: float = RAG_JOB_TTL, runner=None):
+        self.workers = dict(RAG_WORKERS, **(workers or {}))
+        self.queue_size = queue_size
+        self.job_ttl = job_ttl
+        self.runner = runner or stream_rag_response
+        self._queues = {provider: queue.Queue(maxsize=queue_size) for provider in self.workers}
+        self._threads = {provider: [] for provider in self.workers}
+        self._durations = {provider: [] for provider in self.workers}
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, es, query: str, model_id: str, top_k: int = 5, department: Optional[str] = None) -> RagJob:
+        """
+        Enqueue a question.
+
+        :raises ValueError: If the model is unknown
+        :raises QueueFullError: If the provider queue is full
+        :return: The queued job
+        """
+        model_info = next((m for m in AVAILABLE_MODELS if m["id"] == model_id), None)
+        if not model_info:
+            raise ValueError(f"Model {model_id} not found")
+
+        provider = model_info["provider"]
+        job = RagJob(es, query, model_id, top_k, department, provider)
+        self._ensure_workers(provider)
+        with self._lock:
+            self._expire_jobs()
+            self._jobs[job.id] = job
+        try:
+            self._queues[provider].put_nowait(job)
+        except queue.Full:
+            with self._lock:
+                del self._jobs[job.id]
+            raise QueueFullError(provider, self.retry_after(provider))
+        return job
+
+    def get(self, job_id: str) -> Optional[RagJob]:
+        with self._lock:
+            self._expire_jobs()
+            return self._jobs.get(job_id)
+
+    def retry_after(self, provider: str) -> int:
+        """Seconds until a queue slot is likely to free up, from recent job durations"""
+        with self._lock:
+            durations = self._durations[provider]
+            average = sum(durations) / len(durations) if durations else 10.0
+        return max(1, int(round(average * self._queues[provider].qsize() / max(1, self.workers[provider]))))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            provider: {
+                "workers": self.workers[provider],
+                "queued": self._queues[provider].qsize(),
+                "queue_size": self.queue_size
+            }
+            for provider in self.workers
+        }
+
+    def _expire_jobs(self):
+        cutoff = time.time() - self.job_ttl
+        expired = [job_id for job_id, job in self._jobs.items() if job.finished and job.finished < cutoff]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def _ensure_workers(self, provider: str):
+        with self._lock:
+            threads = [thread for thread in self._threads[provider] if thread.is_alive()]
+            while len(threads) < self.workers[provider]:
+                thread = threading.Thread(target=self._work, args=(provider,),
+                                          name=f"rag-{provider}-{len(threads)}", daemon=True)
+                thread.start()
+                threads.append(thread)
+            self._threads[provider] = threads
+
+    def _work(self, provider: str):
+        jobs = self._queues[provider]
+        while True:
+            job = jobs.get()
+            try:
+                self._run(job)
+            finally:
+                jobs.task_done()
+
+    def _run(self, job: RagJob):
+        job.set_status("running")
+        tokens: List[str] = []
+        result = {}
+        try:
+            for event in self.runner(job.es, job.query, job.model_id, job.top_k, job.department):
+                job.add_event(event)
+                name, data = event["event"], event["data"]
+                if name == "references":
+                    result.update(data)
+                elif name == "token":
+                    tokens.append(data["text"])
+                elif name == "done":
+                    result["timing"] = data
+                elif name == "error":
+                    job.error = data["error"]
+        except Exception as e:
+            print(f"Error in RAG job {job.id}: {str(e)}")
+            job.error = str(e)
+            job.add_event({"event": "error", "data": {"error": str(e)}})
+
+        if job.error is None:
+            result["answer"] = "".join(tokens)
+            job.result = result
+
+        with self._lock:
+            durations = self._durations[job.provider]
+            durations.append(time.time() - job.started)
+            del durations[:-20]
+        job.set_status("failed" if job.error is not None else "done")
+
+_job_queue = None
+_job_queue_lock = threading.Lock()
+
+def get_job_queue() -> RagJobQueue:
+    """Get or initialize the shared RAG job queue"""
+    global _job_queue
+    if _job_queue is None:
+        with _job_queue_lock:
+            if _job_queue is None:
+                _job_queue = RagJobQueue()
+    return _job_queue
@@ -0,0 +1,179 @@
+"""
+Optional cross-encoder rerank of the top first-stage hits, with cached pair scores
+and a latency budget after which the first-stage order is kept.
+"""
+
+import hashlib
+import threading
+import os
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from embedding_service import normalize_query
+
+RERANK_MODEL = os.environ.get("RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+RERANK_TOP_N = int(os.environ.get("RERANK_TOP_N", 20))
+RERANK_BATCH_SIZE = int(os.environ.get("RERANK_BATCH_SIZE", 32))
+RERANK_BUDGET_MS = float(os.environ.get("RERANK_BUDGET_MS", 500))
+RERANK_CACHE_SIZE = int(os.environ.get("RERANK_CACHE_SIZE", 20000))
+RERANK_MAX_CHARS = 2000
+
+_model = None
+_model_lock = threading.Lock()
+
+# A single worker: concurrent reranks would only compete for the same CPU cores,
+# and time spent waiting for the worker counts against the latency budget
+_rerank_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rerank")
+
+def get_model():
+    """Get or initialize the shared CrossEncoder model"""
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                from sentence_transformers import CrossEncoder
+                _model = CrossEncoder(RERANK_MODEL, max_length=512)
+    return _model
+
+def query_hash(query: str) -> str:
+    return hashlib.sha1(normalize_query(query).encode("utf-8")).hexdigest()
+
+def hit_text(hit: Dict[str, Any]) -> str:
+    """Text a hit is reranked on: its abstract, or its retrieved passages"""
+    source = hit.get("_source", {})
+    if source.get("passages"):
+        return " ".join(passage.get("text", "") for passage in source["passages"])
+    return source.get("abstract") or ""
+
+def pair_key(hit: Dict[str, Any]):
+    source = hit.get("_source", {})
+    if source.get("hash_code") is not None:
+        return source["hash_code"]
+    return (hit.get("_index"), hit.get("_id"))
+
+class PairScoreCache:
+    """Bounded LRU cache of cross-encoder scores keyed by (query hash, hash_code)"""
+
+    def __init__(self, max_size: int = RERANK_CACHE_SIZE):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_many(self, keys: List[Tuple]) -> Dict[Tuple, float]:
+        found = {}
+        with self._lock:
+            for key in keys:
+                score = self._entries.get(key)
+                if score is None:
+                    self.misses += 1
+                    continue
+                self._entries.move_to_end(key)
+                self.hits += 1
+                found[key] = score
+        return found
+
+    def put_many(self, scores: Dict[Tuple, float]):
+        with self._lock:
+            for key, score in scores.items():
+                self._entries[key] = score
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
+
+_pair_cache = PairScoreCache()
+
+def score_pairs(query: str, hits: List[Dict[str, Any]], batch_size: int = RERANK_BATCH_SIZE,
+                cache: Optional[PairScoreCache] = None, model_getter: Optional[Callable] = None) -> List[float]:
+    """
+    Cross-encoder scores of (query, hit text) pairs, computing only the uncached ones.
+
+    :param query: Search query
+    :param hits: Elasticsearch hits
+    :param batch_size: Pairs per forward pass
+    :param cache: Pair score cache (default: the shared one)
+    :param model_getter: Optional callable returning the cross-encoder
+    :return: One score per hit
+    """
+    cache = cache if cache is not None else _pair_cache
+    prefix = query_hash(query)
+    keys = [(prefix, pair_key(hit)) for hit in hits]
+    scores = cache.get_many(keys)
+
+    missing = [i for i, key in enumerate(keys) if key not in scores]
+    if missing:
+        model = model_getter() if model_getter else get_model()
+        pairs = [(query, hit_text(hits[i])[:RERANK_MAX_CHARS]) for i in missing]
+        predicted = model.predict(pairs, batch_size=batch_size, show_progress_bar=False)
+        computed = {keys[i]: float(score) for i, score in zip(missing, predicted)}
+        cache.put_many(computed)
+        scores.update(computed)
+
+    return [scores[key] for key in keys]
+
+def rerank_hits(query: str, hits: List[Dict[str, Any]], top_n: int = RERANK_TOP_N,
+                budget_ms: float = RERANK_BUDGET_MS, batch_size: int = RERANK_BATCH_SIZE,
+                cache: Optional[PairScoreCache] = None, model_getter: Optional[Callable] = None) -> List[Dict[str, Any]]:
+    """
+    Reorder the top_n hits by cross-encoder score; the rest keep their first-stage order.
+    Reranked hits get a '_rerank_score'. If scoring takes longer than budget_ms
+    (including waiting for the rerank worker) or fails, the hits are returned unchanged.
+    The cross-encoder is loaded before the budget starts.
+
+    :param query: Search query
+    :param hits: First-stage Elasticsearch hits, best first
+    :param top_n: Number of leading hits to rescore
+    :param budget_ms: Latency budget of the rerank stage in milliseconds
+    :param batch_size: Pairs per forward pass
+    :param cache: Pair score cache (default: the shared one)
+    :param model_getter: Optional callable returning the cross-encoder
+    :return: Reranked hits
+    """
+    candidates = hits[:top_n]
+    if not query or len(candidates) < 2:
+        return hits
+
+    try:
+        model = model_getter() if model_getter else get_model()
+    except Exception as e:
+        print(f"Rerank model unavailable, keeping the first-stage order: {str(e)}")
+        return hits
+
+    future = _rerank_executor.submit(score_pairs, query, candidates, batch_size, cache, lambda: model)
+    try:
+        scores = future.result(timeout=budget_ms / 1000.0)
+    except FutureTimeoutError:
+        print(f"Rerank exceeded its {budget_ms:.0f} ms budget, keeping the first-stage order")
+        return hits
+    except Exception as e:
+        print(f"Rerank failed, keeping the first-stage order: {str(e)}")
+        return hits
+
+    reranked = []
+    for hit, score in sorted(zip(candidates, scores), key=lambda pair: -pair[1]):
+        hit = dict(hit)
+        hit["_rerank_score"] = score
+        reranked.append(hit)
+    return reranked + hits[top_n:]
+
+def get_cache_stats() -> Dict[str, float]:
+    """Get hit/miss counters of the shared pair score cache"""
+    return _pair_cache.stats()
@@ -1,9 +1,13 @@
-from flask import Blueprint, request, jsonify, g, redirect
-from search_services import perform_search, perform_semantic_search, get_document_by_hash
-from ollama_rag_service import generate_rag_response, get_available_models
+import json
+from flask import Blueprint, request, jsonify, g, redirect, Response, stream_with_context
+from search_services import perform_search, perform_semantic_search, perform_hybrid_search, get_document_by_hash
+from ollama_rag_service import generate_rag_response, stream_rag_response, get_available_models
+from rag_jobs import get_job_queue, QueueFullError
+from warmup import get_warmup
 
 try:
-    from statistics_service import get_statistics, get_unique_supervisors, get_unique_years
+    from statistics_service import get_unique_supervisors, get_unique_years
+    from statistics_store import get_statistics
     print("Successfully imported statistics functions")
 except ImportError as e:
     print(f"Failed to import statistics functions: {e}")
@@ -25,6 +29,8 @@ def search():
     Add 'department=cs' or 'department=informatics' to filter by department.
     Add 'search_supervisors=true' to include supervisor field in search.
     Add 'limit=50' to control number of results (default: 50, max: 100).
+    Add 'rerank=true' to rescore the top results with a cross-encoder; results are then
+    sorted by relevance unless 'sort' is given explicitly.
     """
     es = getattr(g, 'es', None)
 
@@ -33,14 +39,16 @@ def search():
 
     query = request.args.get('q', '')
     year = request.args.get('year')
-    sort_order = request.args.get('sort', 'desc')
+    rerank = request.args.get('rerank', '').lower() == 'true'
+    sort_order = request.args.get('sort', None if rerank else 'desc')
     department = request.args.get('department') 
     limit = min(int(request.args.get('limit', 50)), 100)
     
     is_phrase_search = request.args.get('phrase', '').lower() == 'true'
     search_supervisors = request.args.get('search_supervisors', '').lower() == 'true'
 
-    response = perform_search(es, query, year, sort_order, is_phrase_search, department, search_supervisors, limit)
+    response = perform_search(es, query, year, sort_order, is_phrase_search, department, search_supervisors, limit,
+                              rerank)
 
     return jsonify(response)
 
@@ -49,6 +57,11 @@ def semantic_search():
     """
     Semantic search API using vector embeddings.
     Queries are transformed into vectors and compared using cosine similarity.
+    Uses approximate kNN retrieval by default; add 'knn=false' for brute-force scoring.
+    Add 'num_candidates=200' to tune the number of kNN candidates per shard.
+    Add 'rescore=true' to rescore the kNN candidates with exact cosine similarity.
+    Add 'rerank=true' to rescore the top results with a cross-encoder; the year is then
+    not used as a tie-breaker unless 'sort' is given explicitly, which skips the rerank.
     """
     es = getattr(g, 'es', None)
 
@@ -57,19 +70,62 @@ def semantic_search():
 
     query = request.args.get('q', '')
     year = request.args.get('year')
-    sort_order = request.args.get('sort', 'desc')
+    rerank = request.args.get('rerank', '').lower() == 'true'
+    sort_order = request.args.get('sort', None if rerank else 'desc')
     limit = request.args.get('limit', 10, type=int)
     department = request.args.get('department') 
+    use_knn = request.args.get('knn', 'true').lower() != 'false'
+    num_candidates = request.args.get('num_candidates', type=int)
+    exact_rescore = request.args.get('rescore', '').lower() == 'true'
 
     if not query:
         return jsonify([])
 
     try:
-        response = perform_semantic_search(es, query, year, sort_order, limit, department)
+        response = perform_semantic_search(es, query, year, sort_order, limit, department,
+                                           use_knn, num_candidates, exact_rescore, rerank)
         return jsonify(response)
     except Exception as e:
         return jsonify({"error": f"Semantic search failed: {str(e)}"}), 500
 
+@search_routes.route('/hybrid', methods=['GET'])
+def hybrid_search():
+    """
+    Hybrid search API combining BM25 and vector retrieval.
+    Both legs run concurrently and are fused into one ranked list, deduplicated by hash_code.
+    Add 'fusion=weighted' for normalized score fusion instead of reciprocal rank fusion.
+    Add 'lexical_weight=0.3&semantic_weight=0.7' to weight the legs.
+    Add 'phrase=true' for exact phrase matching in the lexical leg.
+    """
+    es = getattr(g, 'es', None)
+
+    if not es:
+        return jsonify({"error": "Elasticsearch connection is not available."}), 500
+
+    query = request.args.get('q', '')
+    year = request.args.get('year')
+    sort_order = request.args.get('sort')
+    department = request.args.get('department')
+    limit = min(request.args.get('limit', 20, type=int), 100)
+    fusion = request.args.get('fusion', 'rrf').lower()
+    lexical_weight = request.args.get('lexical_weight', 1.0, type=float)
+    semantic_weight = request.args.get('semantic_weight', 1.0, type=float)
+    num_candidates = request.args.get('num_candidates', type=int)
+    is_phrase_search = request.args.get('phrase', '').lower() == 'true'
+
+    if not query:
+        return jsonify([])
+
+    try:
+        response = perform_hybrid_search(es, query, year, sort_order, department, limit, fusion,
+                                         lexical_weight, semantic_weight, num_candidates=num_candidates,
+                                         is_phrase_search=is_phrase_search)
+        return jsonify(response)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": f"Hybrid search failed: {str(e)}"}), 500
+
 @search_routes.route('/rag', methods=['POST'])
 def rag():
     """
@@ -95,6 +151,117 @@ def rag():
     except Exception as e:
         return jsonify({"error": f"RAG processing failed: {str(e)}"}), 500
 
+def format_sse(event: str, data) -> str:
+    """Frame one Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@search_routes.route('/rag/stream', methods=['GET', 'POST'])
+def rag_stream():
+    """
+    Streaming RAG API. Sends the references as soon as retrieval finishes,
+    then the answer token by token, then a 'done' event with the timings.
+    Accepts a JSON body (POST) or query parameters (GET, for EventSource).
+    """
+    es = getattr(g, 'es', None)
+
+    if not es:
+        return jsonify({"error": "Elasticsearch connection is not available."}), 500
+
+    data = (request.get_json(silent=True) or {}) if request.method == 'POST' else request.args
+    query = data.get('query', '')
+    model_id = data.get('model', 'llama3.2:3b')
+    department = data.get('department')
+
+    try:
+        top_k = int(data.get('top_k', 5))
+    except (TypeError, ValueError):
+        return jsonify({"error": "top_k must be an integer"}), 400
+
+    if not query:
+        return jsonify({"error": "No query provided"}), 400
+
+    def generate():
+        for event in stream_rag_response(es, query, model_id, top_k, department):
+            yield format_sse(event["event"], event["data"])
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@search_routes.route('/rag/jobs', methods=['POST'])
+def submit_rag_job():
+    """
+    Queue a RAG question and return its job id without waiting for the answer.
+    Responds with 429 and Retry-After when the provider queue is full.
+    """
+    es = getattr(g, 'es', None)
+
+    if not es:
+        return jsonify({"error": "Elasticsearch connection is not available."}), 500
+
+    data = request.get_json(silent=True) or {}
+    query = data.get('query', '')
+    model_id = data.get('model', 'llama3.2:3b')
+    department = data.get('department')
+
+    try:
+        top_k = int(data.get('top_k', 5))
+    except (TypeError, ValueError):
+        return jsonify({"error": "top_k must be an integer"}), 400
+
+    if not query:
+        return jsonify({"error": "No query provided"}), 400
+
+    try:
+        job = get_job_queue().submit(es, query, model_id, top_k, department)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except QueueFullError as e:
+        response = jsonify({"error": str(e), "retry_after": e.retry_after})
+        response.headers["Retry-After"] = str(e.retry_after)
+        return response, 429
+
+    return jsonify({
+        "job_id": job.id,
+        "status": job.status,
+        "status_url": f"/search/rag/jobs/{job.id}",
+        "stream_url": f"/search/rag/jobs/{job.id}/stream"
+    }), 202
+
+@search_routes.route('/rag/jobs/<job_id>', methods=['GET'])
+def rag_job_status(job_id):
+    """
+    Poll a RAG job. The result is included once the status is 'done'.
+    """
+    job = get_job_queue().get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job.to_dict())
+
+@search_routes.route('/rag/jobs/<job_id>/stream', methods=['GET'])
+def rag_job_stream(job_id):
+    """
+    Follow a RAG job over Server-Sent Events, replaying the events sent so far.
+    """
+    job = get_job_queue().get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+
+    def generate():
+        for event in job.follow():
+            if event is None:
+                yield ": keep-alive\n\n"
+            else:
+                yield format_sse(event["event"], event["data"])
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @search_routes.route('/models', methods=['GET'])
 def models():
     try:
@@ -103,6 +270,17 @@ def models():
     except Exception as e:
         return jsonify({"error": f"Failed to get models: {str(e)}"}), 500
     
+@search_routes.route('/ready', methods=['GET'])
+def ready():
+    """
+    Readiness of the search capabilities. Keyword search is ready right after startup;
+    semantic search, reranking and Gemini are ready once their models are warm.
+    Returns 503 until keyword and semantic search are ready; the optional capabilities,
+    and the models loaded on demand when the warm-up is disabled, do not hold it back.
+    """
+    status = get_warmup().status()
+    return jsonify(status), 200 if status["ready"] else 503
+
 @search_routes.route('/departments', methods=['GET'])
 def get_departments():
     """
@@ -119,6 +297,7 @@ def statistics():
     """
     Get statistics about theses with optional filtering.
     Supports filtering by department, year, and supervisor.
+    Answered from the materialized statistics store when it has been populated.
     """
     es = getattr(g, 'es', None)
 
@@ -1,12 +1,13 @@
-from sentence_transformers import SentenceTransformer
+import os
+from concurrent.futures import ThreadPoolExecutor
 from utils import remove_stop_words, get_important_terms
+from embedding_service import encode_query
+from index_aliases import resolve_indices
+from reranker import rerank_hits, RERANK_TOP_N
+from vector_store import LOCAL_VECTOR_STORE, get_vector_store
 
-modell_name = 'all-MiniLM-L6-v2'
-#modell_name = 'BAAI/bge-small-en' 
-#modell_name = 'BAAI/bge-base-en'
-#modell_name = 'BAAI/bge-large-en'
-
-def perform_search(es, query, year=None, sort_order=None, is_phrase_search=False, department=None, search_supervisors=False, limit=50):
+def perform_search(es, query, year=None, sort_order=None, is_phrase_search=False, department=None, search_supervisors=False, limit=50,
+                   rerank=False):
     """
     Perform a search query in Elasticsearch.
 
@@ -19,6 +20,8 @@ def perform_search(es, query, year=None, sort_order=None, is_phrase_search=False
     :param department: Optional filter by department ('cs' or 'informatics')
     :param search_supervisors: Whether to include supervisor field in search
     :param limit: Maximum number of results to return (default: 50)
+    :param rerank: Rescore the top RERANK_TOP_N hits with the cross-encoder;
+                   ignored when sorting by year
     :return: Search results as a dictionary
     """
     if not query:
@@ -112,7 +115,7 @@ def perform_search(es, query, year=None, sort_order=None, is_phrase_search=False
         "highlight": {
             "fields": {}
         },
-        "size": limit
+        "size": max(limit, RERANK_TOP_N) if rerank else limit
     }
     
     if search_supervisors:
@@ -129,27 +132,99 @@ def perform_search(es, query, year=None, sort_order=None, is_phrase_search=False
     else:
         search_query["sort"] = ["_score"]
 
-    if department == "cs":
-        indices = ["cs_theses"]
-    elif department == "informatics":
-        indices = ["infos_theses"]
-    else:
-        indices = ["cs_theses", "infos_theses"] 
+    indices = resolve_indices(department)
+
+    response = es.search(index=indices, body=search_query)
+    hits = response['hits']['hits']
 
-    response = es.search(index=",".join(indices), body=search_query)
+    if rerank and sort_order not in ["asc", "desc"]:
+        hits = rerank_hits(query, hits)
 
-    return response['hits']['hits']
+    return hits[:limit]
 
-_model = None
+SEMANTIC_NUM_CANDIDATES = 100
 
-def get_model():
-    """Get or initialize the SentenceTransformer model"""
-    global _model
-    if _model is None:
-        _model = SentenceTransformer(modell_name)
-    return _model
+def build_semantic_query(query_vector, filter_clause, num_results, use_knn=True, num_candidates=None, exact_rescore=False):
+    """
+    Build the query part of a semantic search request.
 
-def perform_semantic_search(es, query, year=None, sort_order=None, num_results=100, department=None):
+    :param query_vector: Query embedding as a list of floats
+    :param filter_clause: List of filter clauses (year, department, ...)
+    :param num_results: Number of results to return
+    :param use_knn: Use approximate kNN over the indexed HNSW graph instead of
+                    a brute-force script_score over every filtered document
+    :param num_candidates: Number of nearest neighbour candidates to consider per shard
+    :param exact_rescore: Rescore the kNN candidates with exact cosine similarity
+    :return: Dictionary with the 'query' and, if requested, the 'rescore' section
+    """
+    exact_script = {
+        "source": "cosineSimilarity(params.query_vector, 'abstract_vector') + 1.0",
+        "params": {
+            "query_vector": query_vector
+        }
+    }
+
+    if not use_knn:
+        return {
+            "query": {
+                "script_score": {
+                    "query": {
+                        "bool": {
+                            "filter": filter_clause
+                        }
+                    },
+                    "script": exact_script
+                }
+            }
+        }
+
+    num_candidates = max(num_candidates or SEMANTIC_NUM_CANDIDATES, num_results)
+
+    semantic_query = {
+        "query": {
+            "knn": {
+                "field": "abstract_vector",
+                "query_vector": query_vector,
+                "num_candidates": num_candidates,
+                "filter": filter_clause
+            }
+        }
+    }
+
+    if exact_rescore:
+        semantic_query["rescore"] = {
+            "window_size": num_candidates,
+            "query": {
+                "rescore_query": {
+                    "script_score": {
+                        "query": {"match_all": {}},
+                        "script": exact_script
+                    }
+                },
+                "query_weight": 0.0,
+                "rescore_query_weight": 1.0
+            }
+        }
+
+    return semantic_query
+
+def sort_semantic_hits(hits, sort_order=None):
+    """
+    Order hits of the local vector store like the Elasticsearch semantic search request:
+    by _score, ties broken by year in sort_order.
+
+    :param hits: Hits, best first
+    :param sort_order: 'desc' or 'asc', or None for _score only
+    :return: Sorted list of hits
+    """
+    if sort_order not in ["asc", "desc"]:
+        return hits
+    direction = -1 if sort_order == "desc" else 1
+    return sorted(hits, key=lambda hit: (-(hit.get('_score') or 0.0),
+                                         direction * int(hit['_source'].get('year') or 0)))
+
+def perform_semantic_search(es, query, year=None, sort_order=None, num_results=100, department=None,
+                            use_knn=True, num_candidates=None, exact_rescore=False, rerank=False):
     """
     Perform a semantic search query in Elasticsearch using vector embeddings.
 
@@ -160,13 +235,29 @@ def perform_semantic_search(es, query, year=None, sort_order=None, num_results=1
                        If None, sort by relevance only.
     :param num_results: Number of results to return
     :param department: Optional filter by department ('cs' or 'informatics')
+    :param use_knn: Use approximate kNN retrieval (default) instead of brute-force cosine scoring
+    :param num_candidates: kNN candidates per shard (default: SEMANTIC_NUM_CANDIDATES)
+    :param exact_rescore: Rescore the kNN candidates with exact cosine similarity,
+                          which keeps the scores identical to the brute-force mode
+    :param rerank: Rescore the top RERANK_TOP_N hits with the cross-encoder;
+                   ignored when sorting by year
     :return: Search results as a dictionary
     """
     if not query:
         return []
 
-    model = get_model()
-    query_vector = model.encode(query).tolist()
+    rerank = rerank and sort_order not in ["asc", "desc"]
+    embedding = encode_query(query)
+    query_vector = embedding.tolist()
+    size = max(num_results, RERANK_TOP_N) if rerank else num_results
+    knn_scores = use_knn and not exact_rescore
+
+    store = get_vector_store() if LOCAL_VECTOR_STORE == "on" else None
+    if store is not None:
+        hits = sort_semantic_hits(store.search(embedding, size, year, department, knn_scores), sort_order)
+        if rerank:
+            hits = rerank_hits(query, hits)
+        return hits[:num_results]
     
     filter_clause = []
     if year:
@@ -175,32 +266,17 @@ def perform_semantic_search(es, query, year=None, sort_order=None, num_results=1
     if department:
         filter_clause.append({"term": {"department": department}})
     
-    search_query = {
-        "query": {
-            "script_score": {
-                "query": {
-                    "bool": {
-                        "filter": filter_clause
-                    }
-                },
-                "script": {
-                    "source": "cosineSimilarity(params.query_vector, 'abstract_vector') + 1.0",
-                    "params": {
-                        "query_vector": query_vector
-                    }
-                }
-            }
-        },
-        "size": num_results,
-        "highlight": {
-            "fields": {
-                "abstract": {},
-                "keywords": {}
-            }
+    search_query = build_semantic_query(query_vector, filter_clause, size, use_knn, num_candidates, exact_rescore)
+    search_query["size"] = size
+    search_query["highlight"] = {
+        "fields": {
+            "abstract": {},
+            "keywords": {}
         }
     }
     
-    if sort_order in ["asc", "desc"]:
+    # Elasticsearch rejects a rescore combined with a sort on anything but _score
+    if sort_order in ["asc", "desc"] and "rescore" not in search_query:
         search_query["sort"] = [
             "_score", 
             {"year": {"order": sort_order}}, 
@@ -208,16 +284,160 @@ def perform_semantic_search(es, query, year=None, sort_order=None, num_results=1
     else:
         search_query["sort"] = ["_score"]  
     
-    if department == "cs":
-        indices = ["cs_theses_semantic"]
-    elif department == "informatics":
-        indices = ["infos_theses_semantic"]
+    indices = resolve_indices(department, semantic=True)
+
+    try:
+        response = es.search(index=indices, body=search_query)
+        hits = response['hits']['hits']
+    except Exception as e:
+        store = get_vector_store() if LOCAL_VECTOR_STORE == "fallback" else None
+        if store is None:
+            raise
+        print(f"Semantic search failed in Elasticsearch, using the local vector store: {str(e)}")
+        hits = sort_semantic_hits(store.search(embedding, size, year, department, knn_scores), sort_order)
+
+    if rerank:
+        hits = rerank_hits(query, hits)
+
+    return hits[:num_results]
+
+HYBRID_FUSION_METHODS = ("rrf", "weighted")
+HYBRID_RRF_K = int(os.environ.get("HYBRID_RRF_K", 60))
+HYBRID_CANDIDATES = int(os.environ.get("HYBRID_CANDIDATES", 50))
+
+# Runs the lexical and vector legs of a hybrid search side by side
+_hybrid_executor = ThreadPoolExecutor(max_workers=int(os.environ.get("HYBRID_MAX_WORKERS", 8)),
+                                      thread_name_prefix="hybrid-search")
+
+def hit_key(hit):
+    """Deduplication key of a hit: its hash_code, or the document id for theses without one"""
+    hash_code = hit.get('_source', {}).get('hash_code')
+    return hash_code if hash_code is not None else (hit.get('_index'), hit.get('_id'))
+
+def _unique_hits(hits):
+    """Keep the best ranked hit per hash_code"""
+    unique = {}
+    for hit in hits:
+        unique.setdefault(hit_key(hit), hit)
+    return list(unique.values())
+
+def reciprocal_rank_fusion(ranked_lists, weights=None, k=HYBRID_RRF_K):
+    """
+    Fuse ranked hit lists with (weighted) reciprocal rank fusion: score = sum(w / (k + rank)).
+
+    :param ranked_lists: Lists of hits, best first
+    :param weights: Optional weight per list (default: 1.0 each)
+    :param k: RRF rank constant
+    :return: Dictionary mapping hit keys to fused scores
+    """
+    weights = weights or [1.0] * len(ranked_lists)
+    scores = {}
+    for hits, weight in zip(ranked_lists, weights):
+        for rank, hit in enumerate(_unique_hits(hits), start=1):
+            key = hit_key(hit)
+            scores[key] = scores.get(key, 0.0) + weight / (k + rank)
+    return scores
+
+def weighted_score_fusion(ranked_lists, weights=None):
+    """
+    Fuse hit lists by min-max normalizing the scores of each list and summing them with weights.
+
+    :param ranked_lists: Lists of hits, best first
+    :param weights: Optional weight per list (default: 1.0 each)
+    :return: Dictionary mapping hit keys to fused scores
+    """
+    weights = weights or [1.0] * len(ranked_lists)
+    scores = {}
+    for hits, weight in zip(ranked_lists, weights):
+        hits = _unique_hits(hits)
+        if not hits:
+            continue
+        raw = [hit.get('_score') or 0.0 for hit in hits]
+        low, high = min(raw), max(raw)
+        for hit, score in zip(hits, raw):
+            normalized = (score - low) / (high - low) if high > low else 1.0
+            key = hit_key(hit)
+            scores[key] = scores.get(key, 0.0) + weight * normalized
+    return scores
+
+def fuse_results(lexical_hits, semantic_hits, fusion="rrf", lexical_weight=1.0, semantic_weight=1.0,
+                 rrf_k=HYBRID_RRF_K):
+    """
+    Fuse the lexical and semantic legs into one ranked list deduplicated by hash_code.
+    Each fused hit keeps the lexical highlights when available and carries its
+    per-leg ranks in '_hybrid'.
+
+    :param lexical_hits: BM25 hits, best first
+    :param semantic_hits: Vector hits, best first
+    :param fusion: 'rrf' (reciprocal rank fusion) or 'weighted' (normalized score fusion)
+    :param lexical_weight: Weight of the lexical leg
+    :param semantic_weight: Weight of the semantic leg
+    :param rrf_k: RRF rank constant
+    :return: List of fused hits, best first
+    """
+    legs = [_unique_hits(lexical_hits), _unique_hits(semantic_hits)]
+    weights = [lexical_weight, semantic_weight]
+    if fusion == "weighted":
+        scores = weighted_score_fusion(legs, weights)
     else:
-        indices = ["cs_theses_semantic", "infos_theses_semantic"] 
-    
-    response = es.search(index=",".join(indices), body=search_query)
-    
-    return response['hits']['hits']
+        scores = reciprocal_rank_fusion(legs, weights, rrf_k)
+
+    fused = {}
+    for leg_name, hits in zip(("lexical", "semantic"), legs):
+        for rank, hit in enumerate(hits, start=1):
+            key = hit_key(hit)
+            if key not in fused:
+                source = {name: value for name, value in hit.get('_source', {}).items() if name != 'abstract_vector'}
+                fused[key] = dict(hit, _source=source, _hybrid={})
+            fused[key]['_hybrid'][f"{leg_name}_rank"] = rank
+            fused[key]['_hybrid'][f"{leg_name}_score"] = hit.get('_score')
+
+    results = sorted(fused.values(), key=lambda hit: scores[hit_key(hit)], reverse=True)
+    for hit in results:
+        hit['_score'] = scores[hit_key(hit)]
+    return results
+
+def perform_hybrid_search(es, query, year=None, sort_order=None, department=None, limit=20,
+                          fusion="rrf", lexical_weight=1.0, semantic_weight=1.0, rrf_k=HYBRID_RRF_K,
+                          num_candidates=None, is_phrase_search=False):
+    """
+    Perform a hybrid search: the BM25 and vector legs run concurrently and are
+    fused into a single ranked list deduplicated by hash_code.
+
+    :param es: Elasticsearch client instance
+    :param query: Search query string
+    :param year: Optional filter by year
+    :param sort_order: Sorting order ('desc' or 'asc') for year-based sorting of the fused list.
+                       If None, sort by fused score only.
+    :param department: Optional filter by department ('cs' or 'informatics')
+    :param limit: Number of fused results to return
+    :param fusion: 'rrf' (default) or 'weighted'
+    :param lexical_weight: Weight of the lexical leg
+    :param semantic_weight: Weight of the semantic leg
+    :param rrf_k: RRF rank constant
+    :param num_candidates: kNN candidates per shard for the vector leg
+    :param is_phrase_search: Use phrase matching in the lexical leg
+    :return: List of fused hits
+    """
+    if not query:
+        return []
+    if fusion not in HYBRID_FUSION_METHODS:
+        raise ValueError(f"Unknown fusion method '{fusion}', expected one of {HYBRID_FUSION_METHODS}")
+
+    candidates = max(limit, HYBRID_CANDIDATES)
+
+    lexical = _hybrid_executor.submit(perform_search, es, query, year, None, is_phrase_search,
+                                      department, False, candidates)
+    semantic = _hybrid_executor.submit(perform_semantic_search, es, query, year, None, candidates,
+                                       department, num_candidates=num_candidates)
+
+    results = fuse_results(lexical.result(), semantic.result(), fusion, lexical_weight, semantic_weight,
+                           rrf_k)[:limit]
+
+    if sort_order in ["asc", "desc"]:
+        results.sort(key=lambda hit: int(hit['_source'].get('year') or 0), reverse=sort_order == "desc")
+
+    return results
 
 def get_document_by_hash(es, hash_code, department=None):
     """
@@ -242,15 +462,10 @@ def get_document_by_hash(es, hash_code, department=None):
         "size": 1
     }
     
-    if department == "cs":
-        indices = ["cs_theses"]
-    elif department == "informatics":
-        indices = ["infos_theses"]
-    else:
-        indices = ["cs_theses", "infos_theses"]
+    indices = resolve_indices(department)
     
     try:
-        response = es.search(index=",".join(indices), body=search_query)
+        response = es.search(index=indices, body=search_query)
         hits = response['hits']['hits']
         if hits:
             return hits[0]
@@ -1,167 +1,243 @@
-from collections import Counter, defaultdict
+from collections import Counter
 from typing import Dict, List, Any, Optional
+import os
 import re
-import string
+from index_aliases import resolve_indices
+from keyword_normalization import NORMALIZED_KEYWORDS_FIELD, extract_and_normalize_keywords
 
-def normalize_keyword(keyword: str) -> str:
+SUPERVISOR_FIELD = "supervisor.keyword"
+KEYWORDS_FIELD = NORMALIZED_KEYWORDS_FIELD
+# Raw keywords of the documents indexed before keywords_normalized existed
+LEGACY_KEYWORDS_FIELD = "keywords.keyword"
+DEPARTMENT_FIELD = "department.keyword"
+MAX_TERM_BUCKETS = int(os.getenv("STATISTICS_MAX_TERM_BUCKETS", "10000"))
+RECENT_THESES_FIELDS = ["author", "year", "department", "supervisor", "hash_code"]
+
+# Computed from _source at query time, so no reindex is needed for the average abstract length
+ABSTRACT_LENGTH_RUNTIME_MAPPINGS = {
+    "abstract_length": {
+        "type": "long",
+        "script": {
+            "source": "def abstract = params['_source']['abstract']; "
+                      "if (abstract instanceof String && abstract.length() > 0) { emit(abstract.length()); }"
+        }
+    }
+}
+
+def build_filters(department: str = None, year: int = None) -> List[Dict[str, Any]]:
+    """Build the department/year filter clauses shared by the statistics queries"""
+    filters = []
+    if department:
+        filters.append({"term": {"department": department}})
+    if year:
+        filters.append({"term": {"year": year}})
+    return filters
+
+def build_keyword_aggregations() -> Dict[str, Any]:
     """
-    Normalize a keyword to handle duplicates and variations.
-    
-    :param keyword: Raw keyword string
-    :return: Normalized keyword string
+    Build the keyword aggregations: terms on keywords_normalized, and terms on the raw
+    keywords of the documents that were indexed before that field existed, so the keyword
+    cloud keeps working until every index has been re-indexed.
+
+    :return: Aggregations clause, merged by merge_keyword_buckets
     """
-    if not keyword or not isinstance(keyword, str):
-        return ""
+    return {
+        "keywords": {"terms": {"field": KEYWORDS_FIELD, "size": MAX_TERM_BUCKETS}},
+        "legacy_keywords": {
+            "filter": {"bool": {"must_not": [{"exists": {"field": KEYWORDS_FIELD}}]}},
+            "aggs": {"keywords": {"terms": {"field": LEGACY_KEYWORDS_FIELD, "size": MAX_TERM_BUCKETS}}}
+        }
+    }
 
-    normalized = keyword.lower().strip()
+def build_statistics_aggregations(recent_size: int = 10) -> Dict[str, Any]:
+    """
+    Build the aggregations behind the statistics dashboard.
 
-    normalized = normalized.strip(string.punctuation + ' ')
-    
-    normalized = re.sub(r'[.,;:!?()"\']', '', normalized)
-    
-    normalized = re.sub(r'\s+', ' ', normalized)
-    normalized = re.sub(r'-+', '-', normalized)
-    
-    keyword_mappings = {
-        'javascript': 'JavaScript',
-        'python': 'Python',
-        'java': 'Java',
-        'react': 'React',
-        'angular': 'Angular',
-        'vue': 'Vue',
-        'nodejs': 'Node.js',
-        'node.js': 'Node.js',
-        'node js': 'Node.js',
-        
-        'machine learning': 'Machine Learning',
-        'machine-learning': 'Machine Learning',
-        'ml': 'Machine Learning',
-        'artificial intelligence': 'Artificial Intelligence',
-        'artificial-intelligence': 'Artificial Intelligence',
-        'ai': 'Artificial Intelligence',
-        'deep learning': 'Deep Learning',
-        'deep-learning': 'Deep Learning',
-        'neural networks': 'Neural Networks',
-        'neural-networks': 'Neural Networks',
-        'cnn': 'CNN',
-        'convolutional neural networks': 'CNN',
-        'rnn': 'RNN',
-        
-        'mysql': 'MySQL',
-        'postgresql': 'PostgreSQL',
-        'mongodb': 'MongoDB',
-        'database': 'Database',
-        'db': 'Database',
-        
-        'html': 'HTML',
-        'css': 'CSS',
-        'web application': 'Web Application',
-        'web app': 'Web Application',
-        'webapp': 'Web Application',
-        'web-application': 'Web Application',
-        'mobile app': 'Mobile Application',
-        'mobile application': 'Mobile Application',
-        'mobile-application': 'Mobile Application',
-        
-        'spring boot': 'Spring Boot',
-        'spring-boot': 'Spring Boot',
-        'express': 'Express.js',
-        'express.js': 'Express.js',
-        'expressjs': 'Express.js',
-        'flask': 'Flask',
-        'django': 'Django',
-        
-        'iot': 'IoT',
-        'internet of things': 'IoT',
-        'api': 'API',
-        'rest api': 'REST API',
-        'rest-api': 'REST API',
-        'restapi': 'REST API',
-        'bluetooth': 'Bluetooth',
-        'wifi': 'WiFi',
-        'wi-fi': 'WiFi',
-        
-        'image processing': 'Image Processing',
-        'image-processing': 'Image Processing',
-        'opencv': 'OpenCV',
-        'computer vision': 'Computer Vision',
-        'computer-vision': 'Computer Vision',
-        
-        'arduino': 'Arduino',
-        'raspberry pi': 'Raspberry Pi',
-        'raspberry-pi': 'Raspberry Pi',
-        'esp32': 'ESP32',
-        'microcontroller': 'Microcontroller',
-        'fpga': 'FPGA',
-        
-        'user interface': 'User Interface',
-        'user-interface': 'User Interface',
-        'ui': 'User Interface',
-        'user experience': 'User Experience',
-        'user-experience': 'User Experience',
-        'ux': 'User Experience',
-        'algorithm': 'Algorithm',
-        'algorithms': 'Algorithm',
-        'data mining': 'Data Mining',
-        'data-mining': 'Data Mining',
-        'data analysis': 'Data Analysis',
-        'data-analysis': 'Data Analysis',
- 
-        'medical imaging': 'Medical Imaging',
-        'medical-imaging': 'Medical Imaging',
-        'healthcare': 'Healthcare',
-        'health care': 'Healthcare',
-        'telemedicine': 'Telemedicine',
-        
-        'cybersecurity': 'Cybersecurity',
-        'cyber security': 'Cybersecurity',
-        'cyber-security': 'Cybersecurity',
-        'encryption': 'Encryption',
-        'authentication': 'Authentication',
-        'security': 'Security',
-        
-        'network': 'Network',
-        'networking': 'Network',
-        'wireless': 'Wireless',
-        'protocol': 'Protocol',
-        'protocols': 'Protocol',
+    :param recent_size: Number of most recent theses returned by the top_hits aggregation
+    :return: Aggregations clause of the search body
+    """
+    return {
+        "by_year": {"histogram": {"field": "year", "interval": 1, "min_doc_count": 1}},
+        "by_department": {"terms": {"field": DEPARTMENT_FIELD, "size": 100}},
+        "by_supervisor": {"terms": {"field": SUPERVISOR_FIELD, "size": MAX_TERM_BUCKETS}},
+        "supervisor_values": {"cardinality": {"field": SUPERVISOR_FIELD}},
+        **build_keyword_aggregations(),
+        "average_abstract_length": {"avg": {"field": "abstract_length"}},
+        "recent_theses": {
+            "top_hits": {
+                "size": recent_size,
+                "sort": [{"year": {"order": "desc", "missing": "_last"}}],
+                "_source": RECENT_THESES_FIELDS
+            }
+        }
     }
-    
-    if normalized in keyword_mappings:
-        return keyword_mappings[normalized]
-    
-    return normalized.title() if normalized else ""
 
-def extract_and_normalize_keywords(keyword_field) -> List[str]:
+def build_statistics_query(filters: List[Dict[str, Any]], recent_size: int = 10,
+                           query: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
     """
-    Extract and normalize keywords from various field formats.
-    
-    :param keyword_field: Keywords in string or list format
-    :return: List of normalized keywords
+    Build a size 0 search body that computes all statistics server-side.
+
+    :param filters: Filter clauses
+    :param recent_size: Number of most recent theses to return
+    :param query: Optional scoring-free query the filters are combined with
+    :return: Search body
     """
-    keywords = []
-    
-    if isinstance(keyword_field, str):
-        if ',' in keyword_field:
-            keywords = [kw.strip() for kw in keyword_field.split(',') if kw.strip()]
-        elif ';' in keyword_field:
-            keywords = [kw.strip() for kw in keyword_field.split(';') if kw.strip()]
-        elif keyword_field.strip():
-            keywords = [keyword_field.strip()]
-    elif isinstance(keyword_field, list):
-        keywords = [kw.strip() for kw in keyword_field if kw and isinstance(kw, str) and kw.strip()]
-
-    normalized_keywords = []
-    for keyword in keywords:
-        normalized = normalize_keyword(keyword)
-        if normalized and len(normalized) > 1:
-            normalized_keywords.append(normalized)
-    
-    return normalized_keywords
+    if query is not None:
+        query = {"bool": {"must": [query], "filter": filters}} if filters else query
+    else:
+        query = {"bool": {"filter": filters}} if filters else {"match_all": {}}
+
+    return {
+        "query": query,
+        "size": 0,
+        "track_total_hits": True,
+        "runtime_mappings": ABSTRACT_LENGTH_RUNTIME_MAPPINGS,
+        "aggs": build_statistics_aggregations(recent_size)
+    }
+
+def escape_regexp(value: str) -> str:
+    """Escape the Lucene regular expression operators in a literal value"""
+    return re.sub(r'([.?+*|{}\[\]()"\\#@&<>~])', r'\\\1', value)
+
+def build_supervisor_query(supervisor: str) -> Dict[str, Any]:
+    """
+    Match theses supervised by exactly this supervisor, whether the field
+    holds a list of names or a single comma-separated string.
+
+    :param supervisor: The supervisor name
+    :return: Query clause
+    """
+    name = escape_regexp(supervisor)
+    return {
+        "bool": {
+            "should": [
+                {"term": {SUPERVISOR_FIELD: supervisor}},
+                {"regexp": {SUPERVISOR_FIELD: {"value": f"([ ]*|.*,[ ]*){name}([ ]*|[ ]*,.*)"}}}
+            ],
+            "minimum_should_match": 1
+        }
+    }
+
+def merge_supervisor_buckets(buckets: List[Dict[str, Any]]) -> Counter:
+    """
+    Count theses per supervisor from terms buckets, splitting comma-separated supervisor values.
+
+    :param buckets: Buckets of a terms aggregation on the supervisor keyword field
+    :return: Counter of supervisor names
+    """
+    counts = Counter()
+    for bucket in buckets:
+        for name in str(bucket["key"]).split(','):
+            name = name.strip()
+            if name:
+                counts[name] += bucket["doc_count"]
+    return counts
+
+def merge_keyword_buckets(aggregations: Dict[str, Any]) -> Counter:
+    """
+    Count the theses per keyword from the aggregations of build_keyword_aggregations.
+    A keyword counts once per thesis, as keywords_normalized holds the distinct canonical
+    keywords of each thesis. Raw keywords of documents without that field are normalized here.
+
+    :param aggregations: Aggregation results containing 'keywords' and optionally 'legacy_keywords'
+    :return: Counter of normalized keywords
+    """
+    counts = Counter({bucket["key"]: bucket["doc_count"] for bucket in aggregations["keywords"]["buckets"]})
+    legacy = aggregations.get("legacy_keywords", {})
+    if legacy.get("doc_count"):
+        for bucket in legacy["keywords"]["buckets"]:
+            for keyword in dict.fromkeys(extract_and_normalize_keywords(bucket["key"])):
+                counts[keyword] += bucket["doc_count"]
+    return counts
+
+def format_recent_thesis(source: Dict[str, Any]) -> Dict[str, Any]:
+    """Shape a thesis source for the recent theses list"""
+    supervisor_field = source.get('supervisor', [])
+    display_supervisor = supervisor_field
+    if isinstance(supervisor_field, str) and ',' in supervisor_field:
+        display_supervisor = [part.strip() for part in supervisor_field.split(',') if part.strip()]
+
+    return {
+        'author': source.get('author', 'Unknown'),
+        'year': source.get('year', 'Unknown'),
+        'department': source.get('department', 'Unknown'),
+        'supervisor': display_supervisor,
+        'hash_code': source.get('hash_code')
+    }
+
+def empty_statistics() -> Dict[str, Any]:
+    """Statistics of an empty result set"""
+    return {
+        "by_year": {},
+        "by_department": {},
+        "by_supervisor": {},
+        "top_keywords": {},
+        "keyword_cloud_data": [],
+        "year_range": {"min": None, "max": None},
+        "average_abstract_length": 0,
+        "supervisors_count": 0,
+        "recent_theses": []
+    }
+
+def calculate_aggregated_statistics(aggregations: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Turn the aggregation results of build_statistics_query into dashboard statistics.
+
+    :param aggregations: The 'aggregations' section of the search response
+    :return: Dictionary containing calculated statistics
+    """
+    year_counts = {
+        int(bucket["key"]): bucket["doc_count"]
+        for bucket in aggregations["by_year"]["buckets"]
+    }
+    department_counts = {
+        bucket["key"]: bucket["doc_count"]
+        for bucket in aggregations["by_department"]["buckets"]
+    }
+    supervisor_counts = merge_supervisor_buckets(aggregations["by_supervisor"]["buckets"])
+    keyword_counts = merge_keyword_buckets(aggregations)
+
+    supervisor_values = aggregations.get("supervisor_values", {}).get("value", 0)
+    if supervisor_values > MAX_TERM_BUCKETS:
+        print(f"Warning: {supervisor_values} distinct supervisor values, only {MAX_TERM_BUCKETS} counted")
+
+    keyword_cloud_data = [
+        {"text": keyword, "value": count}
+        for keyword, count in sorted(keyword_counts.items(), key=lambda x: x[1], reverse=True)[:50]
+    ]
+
+    years = sorted(year_counts)
+    current_year = years[-1] if years else 2023
+    recent_theses = [
+        format_recent_thesis(hit['_source'])
+        for hit in aggregations["recent_theses"]["hits"]["hits"]
+    ]
+    recent_theses = [
+        doc for doc in recent_theses
+        if doc['year'] != 'Unknown' and int(doc['year']) >= current_year - 2
+    ]
+
+    average_length = aggregations["average_abstract_length"].get("value")
+
+    return {
+        "by_year": dict(sorted(year_counts.items())),
+        "by_department": department_counts,
+        "by_supervisor": dict(sorted(supervisor_counts.items(), key=lambda x: x[1], reverse=True)[:20]),
+        "top_keywords": dict(sorted(keyword_counts.items(), key=lambda x: x[1], reverse=True)[:15]),
+        "keyword_cloud_data": keyword_cloud_data,
+        "year_range": {
+            "min": years[0] if years else None,
+            "max": years[-1] if years else None
+        },
+        "average_abstract_length": int(average_length) if average_length else 0,
+        "supervisors_count": len(supervisor_counts),
+        "recent_theses": recent_theses[:10]
+    }
 
 def get_statistics(es, department: str = None, year: int = None, supervisor: str = None):
     """
     Get comprehensive statistics from the thesis database.
+    All counting happens in Elasticsearch aggregations, no hits are transferred.
     
     :param es: Elasticsearch client instance
     :param department: Optional filter by department ('cs' or 'informatics')
@@ -174,41 +250,22 @@ def get_statistics(es, department: str = None, year: int = None, supervisor: str
     if supervisor:
         return get_supervisor_specific_statistics(es, supervisor, department, year)
 
-    filters = []
-    if department:
-        filters.append({"term": {"department": department}})
-    if year:
-        filters.append({"term": {"year": year}})
-    
-    if department == "cs":
-        indices = ["cs_theses"]
-    elif department == "informatics":
-        indices = ["infos_theses"]
-    else:
-        indices = ["cs_theses", "infos_theses"]
+    filters = build_filters(department, year)
+    indices = resolve_indices(department)
     
     print(f"Searching indices: {indices} with {len(filters)} filters")
     
-    base_query = {
-        "query": {
-            "bool": {
-                "filter": filters
-            }
-        } if filters else {"match_all": {}},
-        "size": 10000
-    }
-    
     try:
-        response = es.search(index=",".join(indices), body=base_query)
-        documents = response['hits']['hits']
+        response = es.search(index=indices, body=build_statistics_query(filters))
+        total = response['hits']['total']['value']
         
-        print(f"Found {len(documents)} documents matching filters")
+        print(f"Found {total} documents matching filters")
         
-        stats = calculate_document_statistics(documents)
+        stats = calculate_aggregated_statistics(response['aggregations']) if total else empty_statistics()
         
         return {
             "success": True,
-            "total_documents": len(documents),
+            "total_documents": total,
             "statistics": stats,
             "filters_applied": {
                 "department": department,
@@ -229,7 +286,7 @@ def get_statistics(es, department: str = None, year: int = None, supervisor: str
 
 def get_supervisor_specific_statistics(es, supervisor: str, department: str = None, year: int = None):
     """
-    Get statistics specifically for a selected supervisor by finding ALL their theses.
+    Get statistics specifically for a selected supervisor by aggregating over ALL their theses.
     
     :param es: Elasticsearch client instance
     :param supervisor: The supervisor name to filter by
@@ -239,61 +296,30 @@ def get_supervisor_specific_statistics(es, supervisor: str, department: str = No
     """
     print(f"Getting supervisor-specific statistics for: {supervisor}")
     
-    if department == "cs":
-        indices = ["cs_theses"]
-    elif department == "informatics":
-        indices = ["infos_theses"]
-    else:
-        indices = ["cs_theses", "infos_theses"]
-    
-    supervisor_query = {
-        "query": {
-            "bool": {
-                "should": [
-                    {"term": {"supervisor.keyword": supervisor}},
-                    {"match": {"supervisor": supervisor}}
-                ],
-                "minimum_should_match": 1
-            }
-        },
-        "size": 10000
-    }
+    indices = resolve_indices(department)
+    body = build_statistics_query(build_filters(department, year), recent_size=20,
+                                  query=build_supervisor_query(supervisor))
     
     try:
-        response = es.search(index=",".join(indices), body=supervisor_query)
-        all_supervisor_documents = response['hits']['hits']
+        response = es.search(index=indices, body=body)
+        total = response['hits']['total']['value']
         
-        print(f"Found {len(all_supervisor_documents)} total documents for supervisor: {supervisor}")
+        print(f"Found {total} documents for supervisor: {supervisor}")
         
-        filtered_documents = []
-        for hit in all_supervisor_documents:
-            source = hit['_source']
-            supervisor_field = source.get('supervisor', [])
-
-            is_supervised_by = False
-            if isinstance(supervisor_field, str):
-                if ',' in supervisor_field:
-                    supervisor_list = [s.strip() for s in supervisor_field.split(',')]
-                    is_supervised_by = supervisor in supervisor_list
-                else:
-                    is_supervised_by = supervisor_field.strip() == supervisor
-            elif isinstance(supervisor_field, list):
-                is_supervised_by = supervisor in [s.strip() for s in supervisor_field if s]
-            
-            if is_supervised_by:
-                if year and source.get('year') != year:
-                    continue
-                if department and source.get('department') != department:
-                    continue
-                filtered_documents.append(hit)
-        
-        print(f"After exact matching and filters: {len(filtered_documents)} documents")
-        
-        stats = calculate_supervisor_specific_statistics(filtered_documents, supervisor)
+        if total:
+            stats = calculate_aggregated_statistics(response['aggregations'])
+            stats["recent_theses"] = [
+                format_recent_thesis(hit['_source'])
+                for hit in response['aggregations']["recent_theses"]["hits"]["hits"]
+            ]
+        else:
+            stats = empty_statistics()
+        stats["by_supervisor"] = {supervisor: total}
+        stats["supervisors_count"] = 1
         
         return {
             "success": True,
-            "total_documents": len(filtered_documents),
+            "total_documents": total,
             "statistics": stats,
             "filters_applied": {
                 "department": department,
@@ -312,189 +338,6 @@ def get_supervisor_specific_statistics(es, supervisor: str, department: str = No
             "filters_applied": {}
         }
 
-def calculate_supervisor_specific_statistics(documents: List[Dict], supervisor: str) -> Dict[str, Any]:
-    """
-    Calculate statistics specifically for a supervisor's theses.
-    
-    :param documents: List of Elasticsearch document hits for this supervisor
-    :param supervisor: The supervisor name
-    :return: Dictionary containing calculated statistics
-    """
-    if not documents:
-        return {
-            "by_year": {},
-            "by_department": {},
-            "by_supervisor": {supervisor: 0},
-            "top_keywords": {},
-            "keyword_cloud_data": [],
-            "year_range": {"min": None, "max": None},
-            "average_abstract_length": 0,
-            "supervisors_count": 1,
-            "recent_theses": []
-        }
-    
-    years = []
-    departments = []
-    keywords = []
-    abstract_lengths = []
-    all_docs = []
-    
-    for hit in documents:
-        source = hit['_source']
-        
-        if source.get('year'):
-            years.append(int(source['year']))
-        
-        if source.get('department'):
-            departments.append(source['department'])
-        
-        keyword_field = source.get('keywords', [])
-        normalized_keywords = extract_and_normalize_keywords(keyword_field)
-        keywords.extend(normalized_keywords)
-
-        abstract = source.get('abstract', '')
-        if abstract:
-            abstract_lengths.append(len(abstract))
-        
-        all_docs.append({
-            'author': source.get('author', 'Unknown'),
-            'year': source.get('year', 'Unknown'),
-            'department': source.get('department', 'Unknown'),
-            'supervisor': source.get('supervisor', []),
-            'hash_code': source.get('hash_code')
-        })
-    
-    year_counts = Counter(years)
-    department_counts = Counter(departments)
-    keyword_counts = Counter(keywords)
-
-    keyword_cloud_data = [
-        {"text": keyword, "value": count}
-        for keyword, count in sorted(keyword_counts.items(), key=lambda x: x[1], reverse=True)[:50]
-    ]
-
-    all_docs.sort(key=lambda x: int(x['year']) if x['year'] != 'Unknown' else 0, reverse=True)
-    
-    return {
-        "by_year": dict(sorted(year_counts.items())),
-        "by_department": dict(department_counts),
-        "by_supervisor": {supervisor: len(documents)},
-        "top_keywords": dict(sorted(keyword_counts.items(), key=lambda x: x[1], reverse=True)[:15]),
-        "keyword_cloud_data": keyword_cloud_data,
-        "year_range": {
-            "min": min(years) if years else None,
-            "max": max(years) if years else None
-        },
-        "average_abstract_length": int(sum(abstract_lengths) / len(abstract_lengths)) if abstract_lengths else 0,
-        "supervisors_count": 1,
-        "recent_theses": all_docs[:20]
-    }
-
-def calculate_document_statistics(documents: List[Dict]) -> Dict[str, Any]:
-    """
-    Calculate comprehensive statistics from a list of documents.
-    
-    :param documents: List of Elasticsearch document hits
-    :return: Dictionary containing calculated statistics
-    """
-    if not documents:
-        return {
-            "by_year": {},
-            "by_department": {},
-            "by_supervisor": {},
-            "top_keywords": {},
-            "keyword_cloud_data": [],
-            "year_range": {"min": None, "max": None},
-            "average_abstract_length": 0,
-            "supervisors_count": 0,
-            "recent_theses": []
-        }
-    
-    years = []
-    departments = []
-    supervisors = []
-    keywords = []
-    abstract_lengths = []
-    all_docs = []
-    
-    for hit in documents:
-        source = hit['_source']
-        
-        if source.get('year'):
-            years.append(int(source['year']))
-        
-        if source.get('department'):
-            departments.append(source['department'])
-        
-        supervisor_field = source.get('supervisor', [])
-        if supervisor_field:
-            if isinstance(supervisor_field, str):
-                if ',' in supervisor_field:
-                    supervisor_parts = [part.strip() for part in supervisor_field.split(',')]
-                    for part in supervisor_parts:
-                        if part:
-                            supervisors.append(part)
-                else:
-                    supervisors.append(supervisor_field.strip())
-            elif isinstance(supervisor_field, list):
-                for sup in supervisor_field:
-                    if sup and isinstance(sup, str) and sup.strip():
-                        supervisors.append(sup.strip())
-        
-        keyword_field = source.get('keywords', [])
-        normalized_keywords = extract_and_normalize_keywords(keyword_field)
-        keywords.extend(normalized_keywords)
-
-        abstract = source.get('abstract', '')
-        if abstract:
-            abstract_lengths.append(len(abstract))
-        
-        display_supervisor = supervisor_field
-        if isinstance(supervisor_field, list):
-            display_supervisor = supervisor_field
-        elif isinstance(supervisor_field, str) and ',' in supervisor_field:
-            display_supervisor = [part.strip() for part in supervisor_field.split(',') if part.strip()]
-        
-        all_docs.append({
-            'author': source.get('author', 'Unknown'),
-            'year': source.get('year', 'Unknown'),
-            'department': source.get('department', 'Unknown'),
-            'supervisor': display_supervisor,
-            'hash_code': source.get('hash_code')
-        })
-    
-    year_counts = Counter(years)
-    department_counts = Counter(departments)
-    supervisor_counts = Counter(supervisors)
-    keyword_counts = Counter(keywords)
-
-    keyword_cloud_data = [
-        {"text": keyword, "value": count}
-        for keyword, count in sorted(keyword_counts.items(), key=lambda x: x[1], reverse=True)[:50]
-    ]
-
-    current_year = max(years) if years else 2023
-    recent_theses = [
-        doc for doc in all_docs 
-        if doc['year'] != 'Unknown' and int(doc['year']) >= current_year - 2
-    ]
-    recent_theses.sort(key=lambda x: int(x['year']) if x['year'] != 'Unknown' else 0, reverse=True)
-    
-    return {
-        "by_year": dict(sorted(year_counts.items())),
-        "by_department": dict(department_counts),
-        "by_supervisor": dict(sorted(supervisor_counts.items(), key=lambda x: x[1], reverse=True)[:20]),
-        "top_keywords": dict(sorted(keyword_counts.items(), key=lambda x: x[1], reverse=True)[:15]),
-        "keyword_cloud_data": keyword_cloud_data,
-        "year_range": {
-            "min": min(years) if years else None,
-            "max": max(years) if years else None
-        },
-        "average_abstract_length": int(sum(abstract_lengths) / len(abstract_lengths)) if abstract_lengths else 0,
-        "supervisors_count": len(set(supervisors)),
-        "recent_theses": recent_theses[:10]
-    }
-
 def get_unique_supervisors(es, department: str = None, year: int = None):
     """
     Get a list of unique supervisors for filter dropdown.
@@ -506,55 +349,27 @@ def get_unique_supervisors(es, department: str = None, year: int = None):
     """
     print(f"Getting supervisors for department: {department}, year: {year}")
     
-    filters = []
-    if department:
-        filters.append({"term": {"department": department}})
-    if year:
-        filters.append({"term": {"year": year}})
-    
-    if department == "cs":
-        indices = ["cs_theses"]
-    elif department == "informatics":
-        indices = ["infos_theses"]
-    else:
-        indices = ["cs_theses", "infos_theses"]
+    filters = build_filters(department, year)
+    indices = resolve_indices(department)
     
     print(f"Searching indices: {indices} with filters: {filters}")
 
     try:
-        if filters:
-            manual_query = {
-                "query": {
-                    "bool": {"filter": filters}
-                },
-                "size": 10000,
-                "_source": ["supervisor"]
+        query = {
+            "query": {"bool": {"filter": filters}} if filters else {"match_all": {}},
+            "size": 0,
+            "aggs": {
+                "supervisors": {"terms": {"field": SUPERVISOR_FIELD, "size": MAX_TERM_BUCKETS}}
             }
-        else:
-            manual_query = {
-                "query": {"match_all": {}},
-                "size": 10000,
-                "_source": ["supervisor"]
-            }
-        
-        print(f"Query: {manual_query}")
+        }
         
-        response = es.search(index=",".join(indices), body=manual_query)
+        response = es.search(index=indices, body=query)
         supervisor_set = set()
         
-        print(f"Processing {len(response['hits']['hits'])} documents")
-        
-        for hit in response['hits']['hits']:
-            supervisor_field = hit['_source'].get('supervisor')
-            
-            if supervisor_field:
-                if isinstance(supervisor_field, list):
-                    for sup in supervisor_field:
-                        if sup and isinstance(sup, str) and sup.strip():
-                            supervisor_set.add(sup.strip())
-                elif isinstance(supervisor_field, str):
-                    if supervisor_field.strip():
-                        supervisor_set.add(supervisor_field.strip())
+        for bucket in response['aggregations']['supervisors']['buckets']:
+            supervisor = str(bucket['key']).strip()
+            if supervisor:
+                supervisor_set.add(supervisor)
         
         supervisors = sorted(list(supervisor_set))
         print(f"Found {len(supervisors)} unique supervisors for the given filters")
@@ -572,49 +387,23 @@ def get_unique_years(es, department: str = None):
     :param department: Optional filter by department
     :return: List of unique years
     """
-    filters = []
-    if department:
-        filters.append({"term": {"department": department}})
-    
-    if department == "cs":
-        indices = ["cs_theses"]
-    elif department == "informatics":
-        indices = ["infos_theses"]
-    else:
-        indices = ["cs_theses", "infos_theses"]
+    filters = build_filters(department)
+    indices = resolve_indices(department)
 
     try:
-        if filters:
-            manual_query = {
-                "query": {
-                    "bool": {"filter": filters}
-                },
-                "size": 10000,
-                "_source": ["year"]
-            }
-        else:
-            manual_query = {
-                "query": {"match_all": {}},
-                "size": 10000,
-                "_source": ["year"]
+        query = {
+            "query": {"bool": {"filter": filters}} if filters else {"match_all": {}},
+            "size": 0,
+            "aggs": {
+                "years": {"histogram": {"field": "year", "interval": 1, "min_doc_count": 1}}
             }
+        }
         
-        response = es.search(index=",".join(indices), body=manual_query)
-        year_set = set()
-        
-        for hit in response['hits']['hits']:
-            year_field = hit['_source'].get('year')
-            if year_field:
-                try:
-                    year_int = int(year_field)
-                    year_set.add(year_int)
-                except (ValueError, TypeError):
-                    pass
-        
-        years = sorted(list(year_set), reverse=True) 
+        response = es.search(index=indices, body=query)
+        years = sorted({int(bucket['key']) for bucket in response['aggregations']['years']['buckets']},
+                       reverse=True)
         return years
         
     except Exception as e:
         print(f"Error extracting years: {e}")
         return []
-    
\ No newline at end of file
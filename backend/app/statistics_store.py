@@ -0,0 +1,398 @@
+"""
+Materialized statistics store.
+The indexing scripts roll the theses up per department, year and supervisor into a small
+statistics index, which /search/statistics merges instead of aggregating over the theses.
+"""
+
+import os
+import uuid
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional
+from elasticsearch import helpers
+from index_aliases import INDEX_ALIASES
+import statistics_service
+from statistics_service import (
+    ABSTRACT_LENGTH_RUNTIME_MAPPINGS,
+    MAX_TERM_BUCKETS,
+    RECENT_THESES_FIELDS,
+    SUPERVISOR_FIELD,
+    build_keyword_aggregations,
+    empty_statistics,
+    format_recent_thesis,
+    merge_keyword_buckets
+)
+
+STATISTICS_INDEX = os.environ.get("STATISTICS_INDEX", "thesis_statistics")
+STATISTICS_STORE_ENABLED = os.environ.get("STATISTICS_STORE_ENABLED", "true").lower() != "false"
+RECENT_THESES_PER_ROW = 20
+UNKNOWN_YEAR = 0
+
+STATISTICS_MAPPING = {
+    "mappings": {
+        "properties": {
+            "department": {"type": "keyword"},
+            "year": {"type": "integer"},
+            "level": {"type": "keyword"},
+            "supervisor": {"type": "keyword"},
+            "count": {"type": "integer"},
+            "abstract_length_sum": {"type": "long"},
+            "abstract_count": {"type": "integer"},
+            "keyword_counts": {"type": "object", "enabled": False},
+            "supervisor_counts": {"type": "object", "enabled": False},
+            "recent_theses": {"type": "object", "enabled": False},
+            "source_index": {"type": "keyword"},
+            "refresh_id": {"type": "keyword"},
+            "refreshed_at": {"type": "date"}
+        }
+    }
+}
+
+def rollup_id(row: Dict[str, Any]) -> str:
+    """Document id of a rollup row"""
+    if row["level"] == "meta":
+        return f"{row['department']}:meta"
+    return f"{row['department']}:{row['year']}:{row['level']}:{row.get('supervisor') or ''}"
+
+def build_rollup_years_query(years: Optional[Iterable[int]] = None) -> Dict[str, Any]:
+    """
+    Build the aggregation listing the years of a department index.
+
+    :param years: Optional years to refresh; all years if None
+    :return: Search body
+    """
+    return {
+        "query": {"terms": {"year": sorted(years)}} if years else {"match_all": {}},
+        "size": 0,
+        "aggs": {
+            "years": {"terms": {"field": "year", "missing": UNKNOWN_YEAR, "size": MAX_TERM_BUCKETS}}
+        }
+    }
+
+def build_rollup_query(year: int) -> Dict[str, Any]:
+    """
+    Build the aggregation that rolls one year of a department index up, in total and per supervisor.
+    Rolling up a single year per request keeps the supervisor x keyword buckets far below
+    search.max_buckets, which all years of a department together can exceed.
+
+    :param year: Year to roll up, UNKNOWN_YEAR for the theses without one
+    :return: Search body
+    """
+    leaf_aggs = {
+        **build_keyword_aggregations(),
+        "abstract_length": {"stats": {"field": "abstract_length"}},
+        "recent_theses": {
+            "top_hits": {
+                "size": RECENT_THESES_PER_ROW,
+                "_source": RECENT_THESES_FIELDS
+            }
+        }
+    }
+
+    if year == UNKNOWN_YEAR:
+        query = {"bool": {"must_not": [{"exists": {"field": "year"}}]}}
+    else:
+        query = {"term": {"year": year}}
+
+    return {
+        "query": query,
+        "size": 0,
+        "runtime_mappings": ABSTRACT_LENGTH_RUNTIME_MAPPINGS,
+        "aggs": {
+            "years": {
+                "terms": {"field": "year", "missing": UNKNOWN_YEAR, "size": 1},
+                "aggs": {
+                    **leaf_aggs,
+                    "supervisors": {
+                        "terms": {"field": SUPERVISOR_FIELD, "size": MAX_TERM_BUCKETS},
+                        "aggs": leaf_aggs
+                    }
+                }
+            }
+        }
+    }
+
+def _new_row(department: str, year: int, level: str, supervisor: Optional[str] = None) -> Dict[str, Any]:
+    row = {
+        "department": department,
+        "year": year,
+        "level": level,
+        "count": 0,
+        "abstract_length_sum": 0,
+        "abstract_count": 0,
+        "keyword_counts": Counter(),
+        "recent_theses": []
+    }
+    if supervisor:
+        row["supervisor"] = supervisor
+    return row
+
+def _add_bucket(row: Dict[str, Any], bucket: Dict[str, Any]):
+    """Accumulate the leaf aggregations of a bucket into a rollup row"""
+    row["count"] += bucket["doc_count"]
+    row["abstract_length_sum"] += int(bucket["abstract_length"].get("sum") or 0)
+    row["abstract_count"] += bucket["abstract_length"].get("count", 0)
+    row["keyword_counts"].update(merge_keyword_buckets(bucket))
+    if len(row["recent_theses"]) < RECENT_THESES_PER_ROW:
+        hits = bucket["recent_theses"]["hits"]["hits"]
+        row["recent_theses"].extend(format_recent_thesis(hit["_source"]) for hit in hits)
+        del row["recent_theses"][RECENT_THESES_PER_ROW:]
+
+def _serialize_row(row: Dict[str, Any]) -> Dict[str, Any]:
+    row = dict(row)
+    row["keyword_counts"] = [
+        {"keyword": keyword, "count": count} for keyword, count in row["keyword_counts"].most_common()
+    ]
+    return row
+
+def rows_from_aggregations(department: str, aggregations: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Turn the response of build_rollup_query into rollup rows.
+    Comma-separated supervisor values are split, so every supervisor gets its own row.
+
+    :param department: Department the rows belong to ('cs' or 'informatics')
+    :param aggregations: The 'aggregations' section of the search response
+    :return: List of rollup rows ready to be indexed
+    """
+    rows = []
+    for year_bucket in aggregations["years"]["buckets"]:
+        year = int(year_bucket["key"])
+
+        total = _new_row(department, year, "total")
+        _add_bucket(total, year_bucket)
+
+        supervisor_rows = {}
+        for bucket in year_bucket["supervisors"]["buckets"]:
+            for name in str(bucket["key"]).split(','):
+                name = name.strip()
+                if not name:
+                    continue
+                if name not in supervisor_rows:
+                    supervisor_rows[name] = _new_row(department, year, "supervisor", name)
+                _add_bucket(supervisor_rows[name], bucket)
+
+        total["supervisor_counts"] = [
+            {"name": name, "count": row["count"]} for name, row in supervisor_rows.items()
+        ]
+        rows.append(_serialize_row(total))
+        rows.extend(_serialize_row(row) for row in supervisor_rows.values())
+    return rows
+
+def ensure_statistics_index(es):
+    """Create the statistics index if it does not exist yet"""
+    if not es.indices.exists(index=STATISTICS_INDEX):
+        es.indices.create(index=STATISTICS_INDEX, body=STATISTICS_MAPPING)
+
+def refresh_statistics(es, department: str, source_index: Optional[str] = None,
+                       years: Optional[Iterable[int]] = None) -> int:
+    """
+    Recompute the rollup rows of a department, or only of some of its years, one year per request.
+    New rows are written before the stale ones are removed, so readers never see a gap.
+
+    :param es: Elasticsearch client instance
+    :param department: Department to refresh ('cs' or 'informatics')
+    :param source_index: Index to roll up; the department's keyword alias by default
+    :param years: Optional years whose theses changed; all years if None
+    :return: Number of rollup rows written
+    """
+    source_index = source_index or INDEX_ALIASES[department]["keyword"]
+    years = sorted(set(years)) if years is not None else None
+    if years is not None and not years:
+        return 0
+
+    ensure_statistics_index(es)
+    response = es.search(index=source_index, body=build_rollup_years_query(years))
+    rows = []
+    for bucket in response["aggregations"]["years"]["buckets"]:
+        response = es.search(index=source_index, body=build_rollup_query(int(bucket["key"])))
+        rows.extend(rows_from_aggregations(department, response["aggregations"]))
+
+    refresh_id = uuid.uuid4().hex
+    refreshed_at = datetime.now(timezone.utc).isoformat()
+    rows.append({
+        "department": department,
+        "level": "meta",
+        "source_index": source_index
+    })
+
+    actions = []
+    for row in rows:
+        row["refresh_id"] = refresh_id
+        row["refreshed_at"] = refreshed_at
+        actions.append({"_index": STATISTICS_INDEX, "_id": rollup_id(row), "_source": row})
+    helpers.bulk(es, actions, refresh="wait_for")
+
+    scope = [{"term": {"department": department}}]
+    if years is not None:
+        scope.append({"terms": {"year": years}})
+    es.delete_by_query(index=STATISTICS_INDEX, refresh=True, body={
+        "query": {
+            "bool": {
+                "filter": scope,
+                "must_not": [
+                    {"term": {"refresh_id": refresh_id}},
+                    {"term": {"level": "meta"}}
+                ]
+            }
+        }
+    })
+
+    print(f"Refreshed {len(rows) - 1} statistics rows for {department}"
+          + (f" (years: {years})" if years is not None else ""))
+    return len(rows) - 1
+
+def refresh_statistics_after_sync(es, department: str, sync_result: Dict[str, Any],
+                                  changed_years: Iterable[Optional[int]],
+                                  source_index: Optional[str] = None) -> int:
+    """
+    Refresh the rollups touched by an incremental index sync.
+    Deleted theses carry no year, so any deletion triggers a full refresh of the department.
+
+    :param es: Elasticsearch client instance
+    :param department: Department that was synced
+    :param sync_result: Result of sync_index
+    :param changed_years: Years of the added or updated theses
+    :param source_index: Index to roll up; the department's keyword alias by default
+    :return: Number of rollup rows written
+    """
+    changed_years = set(changed_years)
+    if sync_result.get("deleted") or None in changed_years:
+        return refresh_statistics(es, department, source_index)
+    return refresh_statistics(es, department, source_index, years=sorted({int(year) for year in changed_years}))
+
+def store_covers(es, departments: List[str]) -> bool:
+    """Whether every department has been rolled up into the statistics store"""
+    try:
+        response = es.mget(index=STATISTICS_INDEX, ids=[f"{department}:meta" for department in departments])
+    except Exception as e:
+        print(f"Statistics store not available: {e}")
+        return False
+    return all(doc.get("found") for doc in response["docs"])
+
+def fetch_rollup_rows(es, departments: List[str], year: int = None,
+                      supervisor: str = None) -> List[Dict[str, Any]]:
+    """
+    Fetch the rollup rows matching the filters.
+
+    :param es: Elasticsearch client instance
+    :param departments: Departments to include
+    :param year: Optional year filter
+    :param supervisor: Optional supervisor filter; selects the per-supervisor rows
+    :return: List of rollup row sources
+    """
+    filters = [{"terms": {"department": departments}}]
+    if year:
+        filters.append({"term": {"year": year}})
+    if supervisor:
+        filters.append({"term": {"level": "supervisor"}})
+        filters.append({"term": {"supervisor": supervisor}})
+    else:
+        filters.append({"term": {"level": "total"}})
+
+    response = es.search(index=STATISTICS_INDEX, body={
+        "query": {"bool": {"filter": filters}},
+        "size": MAX_TERM_BUCKETS
+    })
+    return [hit["_source"] for hit in response["hits"]["hits"]]
+
+def merge_rollup_rows(rows: List[Dict[str, Any]], supervisor: str = None) -> Dict[str, Any]:
+    """
+    Merge rollup rows into the statistics shape returned by get_statistics.
+
+    :param rows: Rollup rows from fetch_rollup_rows
+    :param supervisor: The supervisor the rows were selected for, if any
+    :return: Dictionary containing calculated statistics
+    """
+    total = sum(row["count"] for row in rows)
+    if not total:
+        stats = empty_statistics()
+        if supervisor:
+            stats["by_supervisor"] = {supervisor: 0}
+            stats["supervisors_count"] = 1
+        return stats
+
+    year_counts = Counter()
+    department_counts = Counter()
+    supervisor_counts = Counter()
+    keyword_counts = Counter()
+    abstract_length_sum = 0
+    abstract_count = 0
+    recent = []
+
+    for row in rows:
+        if row["year"] != UNKNOWN_YEAR:
+            year_counts[row["year"]] += row["count"]
+        department_counts[row["department"]] += row["count"]
+        for item in row.get("supervisor_counts", []):
+            supervisor_counts[item["name"]] += item["count"]
+        for item in row["keyword_counts"]:
+            keyword_counts[item["keyword"]] += item["count"]
+        abstract_length_sum += row["abstract_length_sum"]
+        abstract_count += row["abstract_count"]
+        recent.extend(row["recent_theses"])
+
+    years = sorted(year_counts)
+    recent.sort(key=lambda x: int(x['year']) if x['year'] != 'Unknown' else 0, reverse=True)
+    if supervisor:
+        supervisor_counts = Counter({supervisor: total})
+        recent_theses = recent[:20]
+    else:
+        current_year = years[-1] if years else 2023
+        recent_theses = [
+            doc for doc in recent
+            if doc['year'] != 'Unknown' and int(doc['year']) >= current_year - 2
+        ][:10]
+
+    return {
+        "by_year": dict(sorted(year_counts.items())),
+        "by_department": dict(department_counts),
+        "by_supervisor": dict(sorted(supervisor_counts.items(), key=lambda x: x[1], reverse=True)[:20]),
+        "top_keywords": dict(sorted(keyword_counts.items(), key=lambda x: x[1], reverse=True)[:15]),
+        "keyword_cloud_data": [
+            {"text": keyword, "value": count}
+            for keyword, count in sorted(keyword_counts.items(), key=lambda x: x[1], reverse=True)[:50]
+        ],
+        "year_range": {
+            "min": years[0] if years else None,
+            "max": years[-1] if years else None
+        },
+        "average_abstract_length": int(abstract_length_sum / abstract_count) if abstract_count else 0,
+        "supervisors_count": len(supervisor_counts),
+        "recent_theses": recent_theses
+    }
+
+def get_statistics(es, department: str = None, year: int = None, supervisor: str = None):
+    """
+    Get comprehensive statistics from the materialized rollups, falling back to
+    live aggregations when the store does not cover the requested departments.
+
+    :param es: Elasticsearch client instance
+    :param department: Optional filter by department ('cs' or 'informatics')
+    :param year: Optional filter by year
+    :param supervisor: Optional filter by supervisor
+    :return: Dictionary containing various statistics
+    """
+    departments = [department] if department else list(INDEX_ALIASES)
+    if not STATISTICS_STORE_ENABLED or any(d not in INDEX_ALIASES for d in departments) \
+            or not store_covers(es, departments):
+        return statistics_service.get_statistics(es, department, year, supervisor)
+
+    try:
+        rows = fetch_rollup_rows(es, departments, year, supervisor)
+        stats = merge_rollup_rows(rows, supervisor)
+        print(f"Answered statistics from {len(rows)} rollup rows")
+
+        return {
+            "success": True,
+            "total_documents": sum(row["count"] for row in rows),
+            "statistics": stats,
+            "filters_applied": {
+                "department": department,
+                "year": year,
+                "supervisor": supervisor
+            }
+        }
+
+    except Exception as e:
+        print(f"Error reading statistics store, using live aggregations: {e}")
+        return statistics_service.get_statistics(es, department, year, supervisor)
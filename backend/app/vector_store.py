@@ -0,0 +1,234 @@
+"""
+In-process, memory-mapped index of the abstract vectors, used for semantic search
+instead of or as a fallback for Elasticsearch (LOCAL_VECTOR_STORE).
+"""
+
+import json
+import os
+import threading
+import time
+import uuid
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from elasticsearch import helpers
+from index_aliases import INDEX_ALIASES
+
+LOCAL_VECTOR_STORE = os.environ.get("LOCAL_VECTOR_STORE", "off").lower()
+VECTOR_STORE_PATH = os.environ.get(
+    "VECTOR_STORE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data', 'vector_store'))
+VECTOR_STORE_DTYPE = os.environ.get("VECTOR_STORE_DTYPE", "float32")
+
+MANIFEST = "manifest.json"
+VECTOR_FIELD = "abstract_vector"
+
+def write_vector_store(directory: str, records: Iterable[Tuple[str, Dict[str, Any], List[float]]],
+                       dtype: str = VECTOR_STORE_DTYPE, model_name: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Write a new version of the store and switch the manifest to it.
+    The previous version is kept so processes that still map it keep working.
+
+    :param directory: Store directory
+    :param records: (department, hit metadata with '_index', '_id' and '_source', vector) tuples
+    :param dtype: 'float32', or 'int8' for a quarter of the size with per-row scales
+    :param model_name: Embedding model the vectors were made with
+    :raises ValueError: If the dtype is unknown or there are no records
+    :return: Manifest of the written version
+    """
+    if dtype not in ("float32", "int8"):
+        raise ValueError(f"Unknown vector store dtype {dtype}, expected float32 or int8")
+
+    metadata = []
+    vectors = []
+    for department, hit, vector in records:
+        metadata.append({"_index": hit["_index"], "_id": hit["_id"], "department": department,
+                         "_source": hit["_source"]})
+        vectors.append(np.asarray(vector, dtype=np.float32))
+    if not vectors:
+        raise ValueError("No vectors to write")
+
+    matrix = np.stack(vectors)
+    matrix /= np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+
+    os.makedirs(directory, exist_ok=True)
+    # The random suffix keeps two builds within the same second from overwriting the live files
+    version = f"{time.strftime('%Y%m%d%H%M%S')}_{uuid.uuid4().hex[:8]}"
+    files = {"vectors": f"vectors_{version}.npy", "metadata": f"metadata_{version}.json"}
+    if dtype == "int8":
+        scales = np.maximum(np.abs(matrix).max(axis=1), 1e-12) / 127.0
+        matrix = np.round(matrix / scales[:, None]).astype(np.int8)
+        files["scales"] = f"scales_{version}.npy"
+        np.save(os.path.join(directory, files["scales"]), scales.astype(np.float32))
+    np.save(os.path.join(directory, files["vectors"]), matrix)
+    with open(os.path.join(directory, files["metadata"]), "w", encoding="utf-8") as f:
+        json.dump(metadata, f, ensure_ascii=False)
+
+    manifest_path = os.path.join(directory, MANIFEST)
+    previous = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            previous = json.load(f)
+
+    manifest = {
+        "version": version,
+        "count": int(matrix.shape[0]),
+        "dims": int(matrix.shape[1]),
+        "dtype": dtype,
+        "model": model_name,
+        "files": files
+    }
+    tmp_path = manifest_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, manifest_path)
+
+    keep = set(files.values()) | set(previous.get("files", {}).values())
+    for name in os.listdir(directory):
+        if name.split("_")[0] in ("vectors", "metadata", "scales") and name not in keep:
+            try:
+                os.remove(os.path.join(directory, name))
+            except OSError as e:
+                print(f"Could not remove old vector store file {name}: {e}")
+
+    return manifest
+
+def export_from_elasticsearch(es, directory: str = VECTOR_STORE_PATH, dtype: str = VECTOR_STORE_DTYPE,
+                              model_name: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Build the store from the abstract vectors of every department's semantic index.
+
+    :param es: Elasticsearch client instance
+    :param directory: Store directory
+    :param dtype: 'float32' or 'int8'
+    :param model_name: Embedding model the vectors were made with
+    :return: Manifest of the written version
+    """
+    def records():
+        for department, aliases in INDEX_ALIASES.items():
+            for hit in helpers.scan(es, index=aliases["semantic"], query={"query": {"match_all": {}}}):
+                source = hit["_source"]
+                vector = source.pop(VECTOR_FIELD, None)
+                if vector is None:
+                    continue
+                yield department, hit, vector
+
+    return write_vector_store(directory, records(), dtype, model_name)
+
+class LocalVectorStore:
+    """Memory-mapped abstract vectors with their hit metadata and precomputed filter masks"""
+
+    def __init__(self, vectors: np.ndarray, metadata: List[Dict[str, Any]], scales: Optional[np.ndarray] = None,
+                 manifest: Optional[Dict[str, Any]] = None):
+        if len(vectors) != len(metadata):
+            raise ValueError(f"{len(vectors)} vectors but {len(metadata)} metadata entries")
+        self.vectors = vectors
+        self.metadata = metadata
+        self.scales = scales
+        self.manifest = manifest or {}
+
+        years = np.array([int(entry["_source"].get("year") or 0) for entry in metadata])
+        departments = np.array([entry.get("department") or "" for entry in metadata])
+        self.year_masks = {int(year): years == year for year in np.unique(years)}
+        self.department_masks = {str(department): departments == department for department in np.unique(departments)}
+        self._empty = np.zeros(len(metadata), dtype=bool)
+
+    @classmethod
+    def load(cls, directory: str = VECTOR_STORE_PATH):
+        """
+        Load the version named by the manifest, memory-mapping the vectors.
+
+        :raises FileNotFoundError: If the store has not been built
+        """
+        with open(os.path.join(directory, MANIFEST), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        files = manifest["files"]
+        vectors = np.load(os.path.join(directory, files["vectors"]), mmap_mode="r")
+        scales = np.load(os.path.join(directory, files["scales"])) if "scales" in files else None
+        with open(os.path.join(directory, files["metadata"]), "r", encoding="utf-8") as f:
+            metadata = json.load(f)
+        return cls(vectors, metadata, scales, manifest)
+
+    def __len__(self) -> int:
+        return len(self.metadata)
+
+    def filter_mask(self, year=None, department: Optional[str] = None) -> Optional[np.ndarray]:
+        """Boolean mask of the rows matching the filters, or None if there are none"""
+        mask = None
+        if year:
+            mask = self.year_masks.get(int(year), self._empty)
+        if department in INDEX_ALIASES:
+            department_mask = self.department_masks.get(department, self._empty)
+            mask = department_mask if mask is None else mask & department_mask
+        return mask
+
+    def search(self, query_vector, k: int, year=None, department: Optional[str] = None,
+               knn_scores: bool = True) -> List[Dict[str, Any]]:
+        """
+        Exact cosine search.
+
+        :param query_vector: Query embedding
+        :param k: Number of hits to return
+        :param year: Optional filter by year
+        :param department: Optional filter by department ('cs' or 'informatics')
+        :param knn_scores: Report scores like an Elasticsearch kNN query, (1 + cos) / 2,
+                           instead of the cosineSimilarity + 1.0 of the script_score mode
+        :return: Hits shaped like Elasticsearch hits, best first
+        """
+        query = np.asarray(query_vector, dtype=np.float32)
+        query = query / max(float(np.linalg.norm(query)), 1e-12)
+
+        scores = self.vectors @ query
+        if self.scales is not None:
+            scores = scores * self.scales
+
+        mask = self.filter_mask(year, department)
+        available = len(scores) if mask is None else int(mask.sum())
+        k = min(k, available)
+        if k <= 0:
+            return []
+        if mask is not None:
+            scores = np.where(mask, scores, -np.inf)
+
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+
+        hits = []
+        for i in top:
+            entry = self.metadata[i]
+            cosine = float(scores[i])
+            hits.append({
+                "_index": entry["_index"],
+                "_id": entry["_id"],
+                "_score": (1.0 + cosine) / 2.0 if knn_scores else cosine + 1.0,
+                "_source": dict(entry["_source"])
+            })
+        return hits
+
+_store = None
+_store_mtime = None
+_store_lock = threading.Lock()
+
+def get_vector_store(directory: str = VECTOR_STORE_PATH) -> Optional[LocalVectorStore]:
+    """
+    Get the shared store, reloading it when a new version has been written.
+
+    :return: The store, or None if it has not been built or cannot be read
+    """
+    global _store, _store_mtime
+    manifest_path = os.path.join(directory, MANIFEST)
+    try:
+        mtime = os.path.getmtime(manifest_path)
+    except OSError:
+        return None
+
+    if _store is None or mtime != _store_mtime:
+        with _store_lock:
+            if _store is None or mtime != _store_mtime:
+                try:
+                    _store = LocalVectorStore.load(directory)
+                    _store_mtime = mtime
+                    print(f"Loaded local vector store version {_store.manifest.get('version')} "
+                          f"with {len(_store)} vectors")
+                except Exception as e:
+                    print(f"Error loading local vector store: {e}")
+                    _store_mtime = mtime
+    return _store
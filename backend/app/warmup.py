@@ -0,0 +1,153 @@
+"""
+Background warm-up of the models after startup, and the readiness report
+of GET /search/ready based on the models actually loaded.
+"""
+
+import sys
+import threading
+import time
+import os
+from typing import Any, Callable, Dict, Optional
+
+WARMUP_ENABLED = os.environ.get("WARMUP_ENABLED", "true").lower() == "true"
+WARMUP_RERANKER = os.environ.get("WARMUP_RERANKER", "false").lower() == "true"
+
+WARMUP_TEXT = "Warming up the thesis search models."
+
+REQUIRED_CAPABILITIES = ("keyword", "semantic")
+
+# Module and attribute holding the lazily loaded model of each capability
+CAPABILITY_MODELS = {
+    "semantic": ("embedding_service", "_model"),
+    "rerank": ("reranker", "_model"),
+    "gemini": ("ollama_rag_service", "_genai")
+}
+
+def capability_loaded(name: str) -> bool:
+    """Whether the model of a capability is loaded, by the warm-up or by a request, without importing it"""
+    if name not in CAPABILITY_MODELS:
+        return False
+    module_name, attribute = CAPABILITY_MODELS[name]
+    module = sys.modules.get(module_name)
+    return module is not None and getattr(module, attribute, None) is not None
+
+def warm_encoder():
+    """Load the sentence encoder and run one encode so lazily initialized kernels are ready"""
+    from embedding_service import get_model
+    get_model().encode(WARMUP_TEXT)
+
+def warm_reranker():
+    from reranker import get_model
+    get_model().predict([(WARMUP_TEXT, WARMUP_TEXT)], show_progress_bar=False)
+
+def warm_gemini():
+    from ollama_rag_service import get_genai
+    get_genai()
+
+def default_tasks() -> Dict[str, Callable[[], Any]]:
+    """Warm-up tasks by capability, in the order they are run"""
+    from ollama_rag_service import GEMINI_API_KEY
+
+    tasks = {"semantic": warm_encoder}
+    if WARMUP_RERANKER:
+        tasks["rerank"] = warm_reranker
+    if GEMINI_API_KEY:
+        tasks["gemini"] = warm_gemini
+    return tasks
+
+class Warmup:
+    """
+    Runs the warm-up tasks once, in a background thread, and tracks the state of each
+    capability: cold, warming, ready or failed.
+    """
+
+    def __init__(self, tasks: Optional[Dict[str, Callable[[], Any]]] = None,
+                 loaded: Callable[[str], bool] = capability_loaded, enabled: bool = WARMUP_ENABLED):
+        """
+        :param tasks: Warm-up tasks by capability; default_tasks() if None
+        :param loaded: Tells whether the model of a capability is loaded
+        :param enabled: Whether the warm-up runs at all; if not, models load on their first request
+        """
+        self.tasks = tasks
+        self.loaded = loaded
+        self.enabled = enabled
+        self._states = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self) -> bool:
+        """
+        Start the warm-up thread unless it was already started.
+
+        :return: True if this call started it
+        """
+        with self._lock:
+            if self._thread is not None:
+                return False
+            if self.tasks is None:
+                self.tasks = default_tasks()
+            for name in self.tasks:
+                self._states[name] = {"status": "cold"}
+            self._thread = threading.Thread(target=self._run, name="model-warmup", daemon=True)
+            self._thread.start()
+            return True
+
+    def join(self, timeout: Optional[float] = None):
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _set(self, name: str, **state):
+        with self._lock:
+            self._states[name] = state
+
+    def _run(self):
+        for name, task in self.tasks.items():
+            self._set(name, status="warming")
+            started = time.perf_counter()
+            try:
+                task()
+            except Exception as e:
+                print(f"Error warming up {name}: {str(e)}")
+                self._set(name, status="failed", error=str(e))
+                continue
+            load_ms = (time.perf_counter() - started) * 1000
+            print(f"Warmed up {name} in {load_ms:.0f} ms")
+            self._set(name, status="ready", load_ms=round(load_ms, 1))
+
+    def status(self) -> Dict[str, Any]:
+        """
+        State of every capability. Keyword search needs no model and is always ready;
+        other capabilities are ready once their model is loaded, cold until the warm-up
+        thread has been started, and on_demand if the warm-up is disabled.
+        The overall ready flag only covers the required capabilities that are warmed up.
+        """
+        with self._lock:
+            capabilities = {"keyword": {"status": "ready"}}
+            capabilities.update({name: dict(state) for name, state in self._states.items()})
+            started = self._thread is not None
+        if not started:
+            tasks = self.tasks if self.tasks is not None else default_tasks()
+            status = "cold" if self.enabled else "on_demand"
+            capabilities.update({name: {"status": status} for name in tasks})
+
+        for name, state in capabilities.items():
+            if state["status"] != "ready" and self.loaded(name):
+                capabilities[name] = {"status": "ready"}
+
+        required = [name for name in REQUIRED_CAPABILITIES
+                    if name in capabilities and capabilities[name]["status"] != "on_demand"]
+        return {
+            "ready": all(capabilities[name]["status"] == "ready" for name in required),
+            "capabilities": capabilities
+        }
+
+_warmup = Warmup()
+
+def get_warmup() -> Warmup:
+    return _warmup
+
+def start_warmup() -> bool:
+    """Start the shared warm-up thread if WARMUP_ENABLED and not started yet"""
+    if not WARMUP_ENABLED:
+        return False
+    return _warmup.start()
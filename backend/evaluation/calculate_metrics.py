@@ -94,26 +94,18 @@ def calculate_metrics(results_file):
         print(f"Error reading results file: {e}")
         return None
     
-    keyword_ranks = df['keyword_search'].tolist()
-    semantic_ranks = df['semantic_search'].tolist()
-    
-    keyword_mrr = calculate_mrr(keyword_ranks)
-    semantic_mrr = calculate_mrr(semantic_ranks)
-    
-    metrics = {
-        'keyword_search': {
-            'mrr': keyword_mrr,
-            'recall@1': calculate_recall_at_k(keyword_ranks, 1),
-            'recall@3': calculate_recall_at_k(keyword_ranks, 3),
-            'recall@5': calculate_recall_at_k(keyword_ranks, 5)
-        },
-        'semantic_search': {
-            'mrr': semantic_mrr,
-            'recall@1': calculate_recall_at_k(semantic_ranks, 1),
-            'recall@3': calculate_recall_at_k(semantic_ranks, 3),
-            'recall@5': calculate_recall_at_k(semantic_ranks, 5)
+    metrics = {}
+    # Results from before the hybrid search was added have no hybrid_search column
+    for search_method in ['keyword_search', 'semantic_search', 'hybrid_search']:
+        if search_method not in df.columns:
+            continue
+        ranks = df[search_method].tolist()
+        metrics[search_method] = {
+            'mrr': calculate_mrr(ranks),
+            'recall@1': calculate_recall_at_k(ranks, 1),
+            'recall@3': calculate_recall_at_k(ranks, 3),
+            'recall@5': calculate_recall_at_k(ranks, 5)
         }
-    }
     
     return metrics
 
@@ -136,25 +128,25 @@ def generate_charts(metrics, output_dir):
     plt.figure(figsize=(12, 8))
     
     plt.subplot(2, 2, 1)
-    plt.bar(search_methods, mrr_values, color=['blue', 'orange'])
+    plt.bar(search_methods, mrr_values, color=['blue', 'orange', 'green'][:len(search_methods)])
     plt.title('Mean Reciprocal Rank (MRR)')
     plt.ylabel('MRR')
     plt.ylim(0, 1)
     
     plt.subplot(2, 2, 2)
-    plt.bar(search_methods, recall_1_values, color=['blue', 'orange'])
+    plt.bar(search_methods, recall_1_values, color=['blue', 'orange', 'green'][:len(search_methods)])
     plt.title('Recall@1')
     plt.ylabel('Recall')
     plt.ylim(0, 1)
     
     plt.subplot(2, 2, 3)
-    plt.bar(search_methods, recall_3_values, color=['blue', 'orange'])
+    plt.bar(search_methods, recall_3_values, color=['blue', 'orange', 'green'][:len(search_methods)])
     plt.title('Recall@3')
     plt.ylabel('Recall')
     plt.ylim(0, 1)
     
     plt.subplot(2, 2, 4)
-    plt.bar(search_methods, recall_5_values, color=['blue', 'orange'])
+    plt.bar(search_methods, recall_5_values, color=['blue', 'orange', 'green'][:len(search_methods)])
     plt.title('Recall@5')
     plt.ylabel('Recall')
     plt.ylim(0, 1)
@@ -166,14 +158,16 @@ def generate_charts(metrics, output_dir):
     plt.figure(figsize=(10, 6))
     
     labels = ['MRR', 'Recall@1', 'Recall@3', 'Recall@5']
-    keyword_values = [metrics['keyword_search'][metric] for metric in ['mrr', 'recall@1', 'recall@3', 'recall@5']]
-    semantic_values = [metrics['semantic_search'][metric] for metric in ['mrr', 'recall@1', 'recall@3', 'recall@5']]
     
     x = np.arange(len(labels))
-    width = 0.35 
+    width = 0.8 / len(search_methods)
     
-    plt.bar(x - width/2, keyword_values, width, label='Keyword Search')
-    plt.bar(x + width/2, semantic_values, width, label='Semantic Search')
+    for j, method in enumerate(search_methods):
+        values = [metrics[method][metric] for metric in ['mrr', 'recall@1', 'recall@3', 'recall@5']]
+        offset = (j - (len(search_methods) - 1) / 2) * width
+        plt.bar(x + offset, values, width, label=method.replace('_', ' ').title())
+        for i, v in enumerate(values):
+            plt.text(i + offset, v + 0.02, f'{v:.2f}', ha='center')
     
     plt.ylabel('Value')
     plt.title('Search Metrics Comparison')
@@ -181,12 +175,6 @@ def generate_charts(metrics, output_dir):
     plt.legend(loc='lower left')
     plt.ylim(0, 1)
     
-    for i, v in enumerate(keyword_values):
-        plt.text(i - width/2, v + 0.02, f'{v:.2f}', ha='center')
-    
-    for i, v in enumerate(semantic_values):
-        plt.text(i + width/2, v + 0.02, f'{v:.2f}', ha='center')
-    
     plt.tight_layout()
     plt.savefig(os.path.join(output_dir, 'search_metrics_combined.png'))
     
@@ -212,11 +200,10 @@ def main():
     
     with open(METRICS_OUTPUT, 'w', newline='') as f:
         writer = csv.writer(f)
-        writer.writerow(['Metric', 'Keyword Search', 'Semantic Search'])
-        writer.writerow(['MRR', metrics['keyword_search']['mrr'], metrics['semantic_search']['mrr']])
-        writer.writerow(['Recall@1', metrics['keyword_search']['recall@1'], metrics['semantic_search']['recall@1']])
-        writer.writerow(['Recall@3', metrics['keyword_search']['recall@3'], metrics['semantic_search']['recall@3']])
-        writer.writerow(['Recall@5', metrics['keyword_search']['recall@5'], metrics['semantic_search']['recall@5']])
+        search_methods = list(metrics.keys())
+        writer.writerow(['Metric'] + [method.replace('_', ' ').title() for method in search_methods])
+        for label, metric in [('MRR', 'mrr'), ('Recall@1', 'recall@1'), ('Recall@3', 'recall@3'), ('Recall@5', 'recall@5')]:
+            writer.writerow([label] + [metrics[method][metric] for method in search_methods])
     
     print(f"\nMetrics saved to {METRICS_OUTPUT}")
     
@@ -0,0 +1,131 @@
+"""
+Benchmarks the encoder backends, each in a fresh process: load time, query latency,
+batch throughput, memory and cosine parity with the torch vectors.
+Exits with status 1 if a backend is below the parity threshold.
+"""
+
+import csv
+import os
+import sys
+import time
+import multiprocessing
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app'))
+from encoder_backends import BACKENDS, PARITY_MIN_COSINE, check_parity, load_encoder
+
+TEST_DATASET_PATH = "backend/evaluation/test_dataset_classified.csv"
+
+modell_name = 'all-MiniLM-L6-v2'
+
+MAX_TEXTS = 200
+BATCH_SIZE = 32
+WARMUP_QUERIES = 5
+
+def rss_mb():
+    """Current and peak resident set size of this process in MB"""
+    try:
+        with open("/proc/self/status", "r") as f:
+            status = dict(line.split(":", 1) for line in f if ":" in line)
+        return int(status["VmRSS"].split()[0]) / 1024, int(status["VmHWM"].split()[0]) / 1024
+    except (OSError, KeyError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        peak = peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+        return peak, peak
+
+def load_texts(path=TEST_DATASET_PATH, max_texts=MAX_TEXTS):
+    """Queries and abstracts of the evaluation dataset"""
+    queries, abstracts = [], []
+    with open(path, "r", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        next(reader)
+        for row in reader:
+            if len(row) >= 2 and row[0].strip() and row[1].strip():
+                queries.append(row[0].strip())
+                abstracts.append(row[1].strip())
+            if len(queries) >= max_texts:
+                break
+    return queries, abstracts
+
+def run_backend(backend, queries, abstracts, results):
+    """Benchmark one backend; runs in its own process"""
+    try:
+        started = time.perf_counter()
+        model = load_encoder(modell_name, backend)
+        load_s = time.perf_counter() - started
+
+        for query in queries[:WARMUP_QUERIES]:
+            model.encode(query)
+
+        latencies = []
+        query_vectors = []
+        for query in queries:
+            started = time.perf_counter()
+            query_vectors.append(model.encode(query))
+            latencies.append((time.perf_counter() - started) * 1000)
+
+        started = time.perf_counter()
+        abstract_vectors = model.encode(abstracts, batch_size=BATCH_SIZE)
+        batch_s = time.perf_counter() - started
+
+        rss_after, rss_peak = rss_mb()
+        results[backend] = {
+            "load_s": load_s,
+            "p50_ms": float(np.percentile(latencies, 50)),
+            "p95_ms": float(np.percentile(latencies, 95)),
+            "texts_per_s": len(abstracts) / batch_s if batch_s else 0.0,
+            "rss_mb": rss_after,
+            "rss_peak_mb": rss_peak,
+            "vectors": np.vstack([np.stack(query_vectors), np.asarray(abstract_vectors)]).astype(np.float32)
+        }
+    except Exception as e:
+        results[backend] = {"error": str(e)}
+
+def main():
+    if not os.path.exists(TEST_DATASET_PATH):
+        print(f"Test dataset not found at {TEST_DATASET_PATH}")
+        exit(1)
+
+    queries, abstracts = load_texts()
+    print(f"Benchmarking {modell_name} on {len(queries)} queries and {len(abstracts)} abstracts")
+
+    context = multiprocessing.get_context("spawn")
+    results = context.Manager().dict()
+    for backend in BACKENDS:
+        print(f"Running the {backend} backend...")
+        process = context.Process(target=run_backend, args=(backend, queries, abstracts, results))
+        process.start()
+        process.join()
+
+    reference = results.get("torch", {}).get("vectors")
+    failed = False
+    print()
+    print(f"{'backend':<10} {'load s':>7} {'p50 ms':>7} {'p95 ms':>7} {'texts/s':>8} "
+          f"{'RSS MB':>7} {'peak MB':>8} {'min cos':>8} {'mean cos':>9}")
+    for backend in BACKENDS:
+        result = results.get(backend, {"error": "process exited without a result"})
+        if "error" in result:
+            print(f"{backend:<10} error: {result['error']}")
+            failed = failed or backend == "torch"
+            continue
+
+        min_cosine = mean_cosine = float("nan")
+        if reference is not None:
+            parity = check_parity(reference, result["vectors"], min_cosine=-1.0)
+            min_cosine, mean_cosine = parity["min_cosine"], parity["mean_cosine"]
+            if min_cosine < PARITY_MIN_COSINE:
+                print(f"Parity check failed for {backend}: minimum cosine {min_cosine:.4f}")
+                failed = True
+
+        print(f"{backend:<10} {result['load_s']:>7.2f} {result['p50_ms']:>7.2f} {result['p95_ms']:>7.2f} "
+              f"{result['texts_per_s']:>8.1f} {result['rss_mb']:>7.0f} {result['rss_peak_mb']:>8.0f} "
+              f"{min_cosine:>8.4f} {mean_cosine:>9.4f}")
+
+    print()
+    print(f"Parity threshold: minimum cosine {PARITY_MIN_COSINE} against the torch vectors")
+    if failed:
+        exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -2,17 +2,9 @@ import csv
 import os
 from dotenv import load_dotenv
 from elasticsearch import Elasticsearch
-import sys
-import json
-import numpy as np
-from sentence_transformers import SentenceTransformer
 
-from search_services import perform_search, perform_semantic_search
-
-modell_name = 'all-MiniLM-L6-v2'
-#modell_name = 'BAAI/bge-small-en' 
-#modell_name = 'BAAI/bge-base-en'
-#modell_name = 'BAAI/bge-large-en'
+from search_services import perform_search, perform_semantic_search, perform_hybrid_search
+from embedding_service import get_model, get_cache_stats
 
 load_dotenv()
 
@@ -35,17 +27,6 @@ DEBUG_LOG_PATH = "backend/evaluation/search_debug.log"
 
 MAX_RESULTS = 50
 
-_model = None
-
-def get_model():
-    """Get or initialize the SentenceTransformer model"""
-    global _model
-    if _model is None:
-        print("Loading SentenceTransformer model...")
-        _model = SentenceTransformer(modell_name)
-        print("Model loaded successfully")
-    return _model
-
 def find_document_by_abstract(abstract):
     """
     Find a document in the index by its abstract using vector similarity
@@ -214,7 +195,7 @@ def main():
     
     with open(RESULTS_PATH, 'w', newline='', encoding='utf-8') as results_file:
         results_writer = csv.writer(results_file)
-        results_writer.writerow(['user_input', 'reference_hash', 'keyword_search', 'semantic_search'])
+        results_writer.writerow(['user_input', 'reference_hash', 'keyword_search', 'semantic_search', 'hybrid_search'])
         
         with open(TEST_DATASET_PATH, 'r', encoding='utf-8') as dataset_file:
             dataset_reader = csv.reader(dataset_file)
@@ -230,7 +211,7 @@ def main():
                 
                 if not reference_hash:
                     print(f"Warning: Reference context not found in index for row {i+1}")
-                    results_writer.writerow([user_input, "not found", "not found", "not found"])
+                    results_writer.writerow([user_input, "not found", "not found", "not found", "not found"])
                     continue
                 
                 try:
@@ -240,6 +221,9 @@ def main():
                     
                     semantic_results = perform_semantic_search(es, user_input, None, None, MAX_RESULTS)
                     semantic_rank = find_rank_in_results(semantic_results, reference_hash)
+
+                    hybrid_results = perform_hybrid_search(es, user_input, limit=MAX_RESULTS)
+                    hybrid_rank = find_rank_in_results(hybrid_results, reference_hash)
                     
                     log_debug_info(DEBUG_LOG_PATH, user_input, reference_hash, keyword_results, semantic_results)
                     
@@ -247,13 +231,15 @@ def main():
                         user_input,
                         reference_hash,
                         keyword_rank if keyword_rank > 0 else "not found", 
-                        semantic_rank if semantic_rank > 0 else "not found"
+                        semantic_rank if semantic_rank > 0 else "not found",
+                        hybrid_rank if hybrid_rank > 0 else "not found"
                     ])
                     
                     print(f"  Query: {user_input[:50]}...")
                     print(f"  Reference hash: {reference_hash}")
                     print(f"  Keyword rank: {keyword_rank if keyword_rank > 0 else 'not found'}")
                     print(f"  Semantic rank: {semantic_rank if semantic_rank > 0 else 'not found'}")
+                    print(f"  Hybrid rank: {hybrid_rank if hybrid_rank > 0 else 'not found'}")
                     print()
                 except Exception as e:
                     print(f"Error processing query '{user_input}': {e}")
@@ -261,10 +247,12 @@ def main():
                         user_input,
                         reference_hash,
                         "error",
+                        "error",
                         "error"
                     ])
     
     print(f"Evaluation completed. Results saved to {RESULTS_PATH}")
+    print(f"Query embedding cache: {get_cache_stats()}")
     print(f"Debug information saved to {DEBUG_LOG_PATH}")
 
 if __name__ == "__main__":
@@ -0,0 +1,35 @@
+"""
+Builds the local vector store (VECTOR_STORE_PATH) from the abstract vectors of the
+semantic indices. Run it after the embedding scripts; running backends pick up the
+new version on their next semantic query.
+"""
+
+from dotenv import load_dotenv
+import os
+import sys
+from elasticsearch import Elasticsearch
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'app'))
+from vector_store import VECTOR_STORE_DTYPE, VECTOR_STORE_PATH, export_from_elasticsearch
+
+modell_name = 'all-MiniLM-L6-v2'
+
+load_dotenv()
+
+ELASTIC_PASSWORD = os.getenv("ELASTIC_PASSWORD")
+ELASTIC_USERNAME = os.getenv("ELASTIC_USERNAME")
+
+es = Elasticsearch(
+    "http://localhost:9200",
+    basic_auth=(ELASTIC_USERNAME, ELASTIC_PASSWORD)
+)
+
+if not es.ping():
+    print("Failed to connect to Elasticsearch")
+    exit(1)
+print("Connected to Elasticsearch!")
+
+print(f"Exporting abstract vectors to {VECTOR_STORE_PATH} as {VECTOR_STORE_DTYPE}...")
+manifest = export_from_elasticsearch(es, VECTOR_STORE_PATH, VECTOR_STORE_DTYPE, modell_name)
+print(f"Vector store version {manifest['version']} written with {manifest['count']} vectors "
+      f"of {manifest['dims']} dimensions")
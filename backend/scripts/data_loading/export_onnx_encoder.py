@@ -0,0 +1,23 @@
+"""
+Exports the sentence encoder to ONNX (model.onnx) plus a dynamically quantized
+int8 copy (model_int8.onnx), for EMBEDDING_BACKEND=onnx or onnx-int8.
+Check the export with backend/evaluation/encoder_benchmark.py.
+"""
+
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'app'))
+from encoder_backends import default_onnx_dir, export_onnx
+
+modell_name = 'all-MiniLM-L6-v2'
+#modell_name = 'BAAI/bge-small-en'
+#modell_name = 'BAAI/bge-base-en'
+#modell_name = 'BAAI/bge-large-en'
+
+output_dir = sys.argv[1] if len(sys.argv) > 1 else default_onnx_dir(modell_name)
+
+print(f"Exporting {modell_name} to {output_dir}...")
+config = export_onnx(modell_name, output_dir, quantize=True)
+print(f"Export completed: {config['dims']} dimensions, {config['pooling']} pooling, "
+      f"normalized: {config['normalize']}")
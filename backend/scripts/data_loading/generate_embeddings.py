@@ -1,16 +1,26 @@
 from dotenv import load_dotenv
 import os
-import json
-import numpy as np
-from elasticsearch import Elasticsearch, helpers
-from sentence_transformers import SentenceTransformer
+import sys
+from elasticsearch import Elasticsearch
+from index_sync import sync_index, rebuild_index
+from index_versions import is_concrete_index
+from streaming_indexer import iter_theses
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'app'))
+from encoder_backends import EMBEDDING_BACKEND, load_encoder
 
 """
 This script:
-1. Loads your existing JSON data
-2. Creates embeddings for each abstract using SentenceTransformer
+1. Streams your existing JSON data
+2. Creates embeddings for the abstracts in batches using the EMBEDDING_BACKEND encoder
+   (torch by default, or the ONNX export)
 3. Updates the Elasticsearch mapping to include vector fields
-4. Indexes the data with embeddings into a new index
+4. Indexes the data with embeddings into the index behind the cs_theses_semantic alias
+
+With INDEX_SYNC_MODE=incremental (default) only new or changed theses are
+re-embedded; INDEX_SYNC_MODE=rebuild builds a new versioned index and
+atomically swaps the alias to it. A legacy concrete index with positional ids
+is always rebuilt, so it is replaced by the alias.
 """
 
 modell_name = 'all-MiniLM-L6-v2'
@@ -20,6 +30,11 @@ modell_name = 'all-MiniLM-L6-v2'
 
 load_dotenv()
 
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", 64))
+BULK_CHUNK_SIZE = int(os.getenv("BULK_CHUNK_SIZE", 200))
+BULK_THREAD_COUNT = int(os.getenv("BULK_THREAD_COUNT", 1))
+INDEX_SYNC_MODE = os.getenv("INDEX_SYNC_MODE", "incremental")
+
 ELASTIC_PASSWORD = os.getenv("ELASTIC_PASSWORD")
 ELASTIC_USERNAME = os.getenv("ELASTIC_USERNAME")
 
@@ -33,24 +48,18 @@ if not es.ping():
     exit(1)
 print("Connected to Elasticsearch!")
 
-try:
-    with open("backend\scripts\pdf_processing\cs_pdf_processing\cleaned_data.json", "r", encoding="utf-8") as f:
-        theses_data = json.load(f)
-    print(f"Loaded {len(theses_data)} theses from JSON file")
-except Exception as e:
-    print(f"Error loading JSON data: {e}")
+DATA_PATH = "backend\scripts\pdf_processing\cs_pdf_processing\cleaned_data.json"
+
+if not os.path.exists(DATA_PATH):
+    print(f"Data file not found: {DATA_PATH}")
     exit(1)
 
-print("Loading SentenceTransformer model...")
-model = SentenceTransformer(modell_name)
+print(f"Loading {modell_name} on the {EMBEDDING_BACKEND} backend...")
+model = load_encoder(modell_name)
 print("Model loaded successfully")
 
 index_name = "cs_theses_semantic"
 
-if es.indices.exists(index=index_name):
-    print(f"Deleting existing index: {index_name}")
-    es.indices.delete(index=index_name)
-
 mapping = {
     "mappings": {
         "properties": {
@@ -62,46 +71,27 @@ mapping = {
                 "similarity": "cosine"
             },
             "author": {"type": "text"},
-            "supervisor": {"type": "text"},
+            "supervisor": {"type": "text", "fields": {"keyword": {"type": "keyword", "ignore_above": 256}}},
             "year": {"type": "integer"},
-            "keywords": {"type": "text"}
+            "keywords": {"type": "text", "fields": {"keyword": {"type": "keyword", "ignore_above": 256}}},
+            "keywords_normalized": {"type": "keyword"},
+            "content_fingerprint": {"type": "keyword"}
         }
     }
 }
 
-print(f"Creating index with vector mapping: {index_name}")
-es.indices.create(index=index_name, body=mapping)
-
-bulk_data = []
-for i, thesis in enumerate(theses_data, start=1):
-    if not thesis.get("abstract"):
-        print(f"Skipping thesis {i} - no abstract")
-        continue
-    
-    try:
-        abstract = thesis["abstract"]
-        embedding = model.encode(abstract)
-        
-        thesis_with_embedding = thesis.copy()
-        thesis_with_embedding["abstract_vector"] = embedding.tolist()
-        
-        bulk_data.append({
-            "_index": index_name,
-            "_id": i,
-            "_source": thesis_with_embedding
-        })
-        
-        if i % 10 == 0:
-            print(f"Processed {i} theses")
-            
-    except Exception as e:
-        print(f"Error processing thesis {i}: {e}")
-
-if bulk_data:
-    print(f"Indexing {len(bulk_data)} theses with embeddings...")
-    success, failed = helpers.bulk(es, bulk_data, stats_only=True)
-    print(f"Indexed {success} documents, {failed} failed")
+if INDEX_SYNC_MODE == "rebuild" or is_concrete_index(es, index_name):
+    print(f"Rebuilding {index_name} from {DATA_PATH} into a new versioned index...")
+    result = rebuild_index(es, index_name, mapping, iter_theses(DATA_PATH), model, modell_name,
+                           batch_size=EMBEDDING_BATCH_SIZE,
+                           chunk_size=BULK_CHUNK_SIZE, thread_count=BULK_THREAD_COUNT)
 else:
-    print("No data to index")
+    print(f"Incrementally syncing theses from {DATA_PATH} into {index_name}...")
+    result = sync_index(es, index_name, mapping, iter_theses(DATA_PATH), model, modell_name,
+                        batch_size=EMBEDDING_BATCH_SIZE,
+                        chunk_size=BULK_CHUNK_SIZE, thread_count=BULK_THREAD_COUNT)
+
+print(f"Indexed {result['success']} documents, {result['failed']} failed "
+      f"in {result['elapsed']:.1f}s ({result['docs_per_sec']:.1f} docs/sec)")
 
 print("Semantic index created successfully!")
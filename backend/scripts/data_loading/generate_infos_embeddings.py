@@ -1,16 +1,29 @@
 from dotenv import load_dotenv
 import os
-import json
-import numpy as np
-from elasticsearch import Elasticsearch, helpers
-from sentence_transformers import SentenceTransformer
+import sys
+from elasticsearch import Elasticsearch
+from index_sync import sync_index, rebuild_index
+from index_versions import is_concrete_index
+from streaming_indexer import iter_theses
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'app'))
+from statistics_store import refresh_statistics, refresh_statistics_after_sync
+from encoder_backends import EMBEDDING_BACKEND, load_encoder
 
 """
 This script:
-1. Loads the cleaned informatics theses data
-2. Creates embeddings for each abstract using SentenceTransformer
+1. Streams the cleaned informatics theses data
+2. Creates embeddings for the abstracts in batches using the EMBEDDING_BACKEND encoder
+   (torch by default, or the ONNX export)
 3. Creates an Elasticsearch index with vector fields
-4. Indexes the data with embeddings into the new index
+4. Indexes the data with embeddings into the indices behind the infos_theses_semantic
+   and infos_theses aliases
+5. Refreshes the materialized statistics of both departments
+
+With INDEX_SYNC_MODE=incremental (default) only new or changed theses are
+re-embedded; INDEX_SYNC_MODE=rebuild builds new versioned indices and
+atomically swaps the aliases to them. Legacy concrete indices with positional
+ids are always rebuilt, so they are replaced by the aliases.
 """
 
 modell_name = 'all-MiniLM-L6-v2'
@@ -20,6 +33,11 @@ modell_name = 'all-MiniLM-L6-v2'
 
 load_dotenv()
 
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", 64))
+BULK_CHUNK_SIZE = int(os.getenv("BULK_CHUNK_SIZE", 200))
+BULK_THREAD_COUNT = int(os.getenv("BULK_THREAD_COUNT", 1))
+INDEX_SYNC_MODE = os.getenv("INDEX_SYNC_MODE", "incremental")
+
 ELASTIC_PASSWORD = os.getenv("ELASTIC_PASSWORD")
 ELASTIC_USERNAME = os.getenv("ELASTIC_USERNAME")
 
@@ -33,24 +51,18 @@ if not es.ping():
     exit(1)
 print("Connected to Elasticsearch!")
 
-try:
-    with open("backend\scripts\pdf_processing\info_pdf_processing\cleaned_infos_data.json", "r", encoding="utf-8") as f:
-        theses_data = json.load(f)
-    print(f"Loaded {len(theses_data)} informatics theses from JSON file")
-except Exception as e:
-    print(f"Error loading JSON data: {e}")
+DATA_PATH = "backend\scripts\pdf_processing\info_pdf_processing\cleaned_infos_data.json"
+
+if not os.path.exists(DATA_PATH):
+    print(f"Data file not found: {DATA_PATH}")
     exit(1)
 
-print("Loading SentenceTransformer model...")
-model = SentenceTransformer(modell_name) 
+print(f"Loading {modell_name} on the {EMBEDDING_BACKEND} backend...")
+model = load_encoder(modell_name)
 print("Model loaded successfully")
 
 index_name = "infos_theses_semantic"
 
-if es.indices.exists(index=index_name):
-    print(f"Deleting existing index: {index_name}")
-    es.indices.delete(index=index_name)
-
 mapping = {
     "mappings": {
         "properties": {
@@ -62,85 +74,63 @@ mapping = {
                 "similarity": "cosine"
             },
             "author": {"type": "text"},
-            "supervisor": {"type": "text"},
+            "supervisor": {"type": "text", "fields": {"keyword": {"type": "keyword", "ignore_above": 256}}},
             "year": {"type": "integer"},
-            "keywords": {"type": "text"},
-            "department": {"type": "keyword"} 
+            "keywords": {"type": "text", "fields": {"keyword": {"type": "keyword", "ignore_above": 256}}},
+            "keywords_normalized": {"type": "keyword"},
+            "department": {"type": "keyword", "fields": {"keyword": {"type": "keyword"}}},
+            "content_fingerprint": {"type": "keyword"}
         }
     }
 }
 
-print(f"Creating index with vector mapping: {index_name}")
-es.indices.create(index=index_name, body=mapping)
-
-bulk_data = []
-for i, thesis in enumerate(theses_data, start=1):
-    if not thesis.get("abstract"):
-        print(f"Skipping thesis {i} - no abstract")
-        continue
-    
-    try:
-        abstract = thesis["abstract"]
-        embedding = model.encode(abstract)
-        
-        thesis_with_embedding = thesis.copy()
-        thesis_with_embedding["abstract_vector"] = embedding.tolist()
-        
-        bulk_data.append({
-            "_index": index_name,
-            "_id": f"infos_{i}", 
-            "_source": thesis_with_embedding
-        })
-        
-        if i % 10 == 0:
-            print(f"Processed {i} theses")
-            
-    except Exception as e:
-        print(f"Error processing thesis {i}: {e}")
-
-if bulk_data:
-    print(f"Indexing {len(bulk_data)} theses with embeddings...")
-    success, failed = helpers.bulk(es, bulk_data, stats_only=True)
-    print(f"Indexed {success} documents, {failed} failed")
+if INDEX_SYNC_MODE == "rebuild" or is_concrete_index(es, index_name):
+    print(f"Rebuilding {index_name} from {DATA_PATH} into a new versioned index...")
+    result = rebuild_index(es, index_name, mapping, iter_theses(DATA_PATH), model, modell_name,
+                           batch_size=EMBEDDING_BATCH_SIZE, id_prefix="infos_",
+                           chunk_size=BULK_CHUNK_SIZE, thread_count=BULK_THREAD_COUNT)
 else:
-    print("No data to index")
+    print(f"Incrementally syncing informatics theses from {DATA_PATH} into {index_name}...")
+    result = sync_index(es, index_name, mapping, iter_theses(DATA_PATH), model, modell_name,
+                        batch_size=EMBEDDING_BATCH_SIZE, id_prefix="infos_",
+                        chunk_size=BULK_CHUNK_SIZE, thread_count=BULK_THREAD_COUNT)
+
+print(f"Indexed {result['success']} documents, {result['failed']} failed "
+      f"in {result['elapsed']:.1f}s ({result['docs_per_sec']:.1f} docs/sec)")
 
 print("Semantic index created successfully!")
 
 print("Creating regular index for basic search...")
 regular_index_name = "infos_theses"
 
-if es.indices.exists(index=regular_index_name):
-    print(f"Deleting existing index: {regular_index_name}")
-    es.indices.delete(index=regular_index_name)
-
 regular_mapping = {
     "mappings": {
         "properties": {
             "abstract": {"type": "text"},
             "author": {"type": "text"},
-            "supervisor": {"type": "text"},
+            "supervisor": {"type": "text", "fields": {"keyword": {"type": "keyword", "ignore_above": 256}}},
             "year": {"type": "integer"},
-            "keywords": {"type": "text"},
-            "department": {"type": "keyword"}
+            "keywords": {"type": "text", "fields": {"keyword": {"type": "keyword", "ignore_above": 256}}},
+            "keywords_normalized": {"type": "keyword"},
+            "department": {"type": "keyword", "fields": {"keyword": {"type": "keyword"}}},
+            "content_fingerprint": {"type": "keyword"}
         }
     }
 }
 
-es.indices.create(index=regular_index_name, body=regular_mapping)
-
-regular_bulk_data = []
-for i, thesis in enumerate(theses_data, start=1):
-    regular_bulk_data.append({
-        "_index": regular_index_name,
-        "_id": f"infos_{i}",
-        "_source": thesis
-    })
+if INDEX_SYNC_MODE == "rebuild" or is_concrete_index(es, regular_index_name):
+    print("Rebuilding regular index into a new versioned index...")
+    result = rebuild_index(es, regular_index_name, regular_mapping, iter_theses(DATA_PATH), id_prefix="infos_",
+                           chunk_size=BULK_CHUNK_SIZE, thread_count=BULK_THREAD_COUNT)
+    refresh_statistics(es, "informatics", regular_index_name)
+else:
+    print("Incrementally syncing theses into regular index...")
+    changed_years = set()
+    result = sync_index(es, regular_index_name, regular_mapping, iter_theses(DATA_PATH), id_prefix="infos_",
+                        chunk_size=BULK_CHUNK_SIZE, thread_count=BULK_THREAD_COUNT, changed_years=changed_years)
+    refresh_statistics_after_sync(es, "informatics", result, changed_years, regular_index_name)
 
-if regular_bulk_data:
-    print(f"Indexing {len(regular_bulk_data)} theses into regular index...")
-    success, failed = helpers.bulk(es, regular_bulk_data, stats_only=True)
-    print(f"Indexed {success} documents, {failed} failed")
+print(f"Indexed {result['success']} documents, {result['failed']} failed")
 
 print("All indexes created successfully!")
 
@@ -166,3 +156,6 @@ try:
     print("Department field added successfully to existing CS theses")
 except Exception as e:
     print(f"Error updating CS theses: {e}")
+
+print("Refreshing CS statistics...")
+refresh_statistics(es, "cs", "cs_theses")
@@ -0,0 +1,73 @@
+"""
+Splits the full thesis texts of the PDF extraction into passages, embeds them and
+indexes them behind the cs_theses_chunks and infos_theses_chunks aliases.
+Set RAG_USE_PASSAGES=true for the backend to retrieve RAG context from them.
+"""
+
+from dotenv import load_dotenv
+import os
+import sys
+from elasticsearch import Elasticsearch
+from passage_index import rebuild_passage_index
+from streaming_indexer import iter_theses
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'app'))
+from encoder_backends import EMBEDDING_BACKEND, load_encoder
+
+modell_name = 'all-MiniLM-L6-v2'
+#modell_name = 'BAAI/bge-small-en'
+#modell_name = 'BAAI/bge-base-en'
+#modell_name = 'BAAI/bge-large-en'
+
+load_dotenv()
+
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", 64))
+BULK_CHUNK_SIZE = int(os.getenv("BULK_CHUNK_SIZE", 200))
+BULK_THREAD_COUNT = int(os.getenv("BULK_THREAD_COUNT", 1))
+
+ELASTIC_PASSWORD = os.getenv("ELASTIC_PASSWORD")
+ELASTIC_USERNAME = os.getenv("ELASTIC_USERNAME")
+
+DEPARTMENTS = [
+    {
+        "alias": "cs_theses_chunks",
+        "full_text_path": "backend\scripts\pdf_processing\cs_pdf_processing\\full_text_data.jsonl",
+        "data_path": "backend\scripts\pdf_processing\cs_pdf_processing\cleaned_data.json"
+    },
+    {
+        "alias": "infos_theses_chunks",
+        "full_text_path": "backend\scripts\pdf_processing\info_pdf_processing\\full_text_infos_data.jsonl",
+        "data_path": "backend\scripts\pdf_processing\info_pdf_processing\cleaned_infos_data.json"
+    }
+]
+
+es = Elasticsearch(
+    "http://localhost:9200",
+    basic_auth=(ELASTIC_USERNAME, ELASTIC_PASSWORD)
+)
+
+if not es.ping():
+    print("Failed to connect to Elasticsearch")
+    exit(1)
+print("Connected to Elasticsearch!")
+
+print(f"Loading {modell_name} on the {EMBEDDING_BACKEND} backend...")
+model = load_encoder(modell_name)
+print("Model loaded successfully")
+
+for department in DEPARTMENTS:
+    if not os.path.exists(department["full_text_path"]) or not os.path.exists(department["data_path"]):
+        print(f"Skipping {department['alias']}: run the PDF extraction first to write {department['full_text_path']}")
+        continue
+
+    theses = {thesis.get("hash_code"): thesis for thesis in iter_theses(department["data_path"])}
+
+    print(f"Building {department['alias']} from {department['full_text_path']}...")
+    result = rebuild_passage_index(es, department["alias"], iter_theses(department["full_text_path"]), theses, model,
+                                   batch_size=EMBEDDING_BATCH_SIZE, chunk_size=BULK_CHUNK_SIZE,
+                                   thread_count=BULK_THREAD_COUNT)
+
+    print(f"{department['alias']}: {result['passages']} passages from {result['theses']} theses "
+          f"({result['skipped']} skipped) in {result['elapsed']:.1f}s ({result['docs_per_sec']:.1f} docs/sec)")
+
+print("Passage indices created successfully!")
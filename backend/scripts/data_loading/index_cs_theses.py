@@ -1,10 +1,33 @@
 from dotenv import load_dotenv
 import os
-import json
+import sys
 from elasticsearch import Elasticsearch
+from index_sync import sync_index, rebuild_index
+from index_versions import is_concrete_index
+from streaming_indexer import iter_theses
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'app'))
+from statistics_store import refresh_statistics, refresh_statistics_after_sync
+
+"""
+This script:
+1. Streams the cleaned CS theses data
+2. Indexes it into the versioned index behind the cs_theses alias, with the
+   hash_code of each thesis as document id (the same ids the ingestion pipeline uses)
+3. Refreshes the materialized CS statistics
+
+With INDEX_SYNC_MODE=incremental (default) only new or changed theses are
+re-indexed and vanished ones deleted; INDEX_SYNC_MODE=rebuild builds a new
+versioned index and atomically swaps the alias to it. A legacy concrete cs_theses
+index with positional ids is always rebuilt, so it is replaced by the alias.
+"""
 
 load_dotenv()
 
+BULK_CHUNK_SIZE = int(os.getenv("BULK_CHUNK_SIZE", 200))
+BULK_THREAD_COUNT = int(os.getenv("BULK_THREAD_COUNT", 1))
+INDEX_SYNC_MODE = os.getenv("INDEX_SYNC_MODE", "incremental")
+
 ELASTIC_PASSWORD = os.getenv("ELASTIC_PASSWORD")
 ELASTIC_USERNAME = os.getenv("ELASTIC_USERNAME")
 
@@ -13,10 +36,45 @@ es = Elasticsearch(
     basic_auth=(ELASTIC_USERNAME, ELASTIC_PASSWORD)
 )
 
-with open("backend\scripts\pdf_processing\cs_pdf_processing\cleaned_data.json", "r", encoding="utf-8") as f:
-    theses_data = json.load(f)
+if not es.ping():
+    print("Failed to connect to Elasticsearch")
+    exit(1)
+print("Connected to Elasticsearch!")
+
+DATA_PATH = "backend\scripts\pdf_processing\cs_pdf_processing\cleaned_data.json"
+
+if not os.path.exists(DATA_PATH):
+    print(f"Data file not found: {DATA_PATH}")
+    exit(1)
+
+index_name = "cs_theses"
+
+mapping = {
+    "mappings": {
+        "properties": {
+            "abstract": {"type": "text"},
+            "author": {"type": "text"},
+            "supervisor": {"type": "text", "fields": {"keyword": {"type": "keyword", "ignore_above": 256}}},
+            "year": {"type": "integer"},
+            "keywords": {"type": "text", "fields": {"keyword": {"type": "keyword", "ignore_above": 256}}},
+            "keywords_normalized": {"type": "keyword"},
+            "department": {"type": "keyword", "fields": {"keyword": {"type": "keyword"}}},
+            "content_fingerprint": {"type": "keyword"}
+        }
+    }
+}
 
-for i, thesis in enumerate(theses_data, start=1):
-    es.index(index="cs_theses", id=i, document=thesis)
+if INDEX_SYNC_MODE == "rebuild" or is_concrete_index(es, index_name):
+    print(f"Rebuilding {index_name} from {DATA_PATH} into a new versioned index...")
+    result = rebuild_index(es, index_name, mapping, iter_theses(DATA_PATH),
+                           chunk_size=BULK_CHUNK_SIZE, thread_count=BULK_THREAD_COUNT)
+    refresh_statistics(es, "cs", index_name)
+else:
+    print(f"Incrementally syncing theses from {DATA_PATH} into {index_name}...")
+    changed_years = set()
+    result = sync_index(es, index_name, mapping, iter_theses(DATA_PATH),
+                        chunk_size=BULK_CHUNK_SIZE, thread_count=BULK_THREAD_COUNT, changed_years=changed_years)
+    refresh_statistics_after_sync(es, "cs", result, changed_years, index_name)
 
-print("Data indexed successfully with explicit IDs.")
+print(f"Indexed {result['success']} documents, {result['failed']} failed "
+      f"in {result['elapsed']:.1f}s ({result['docs_per_sec']:.1f} docs/sec)")
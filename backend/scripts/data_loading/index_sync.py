@@ -0,0 +1,291 @@
+"""
+Incremental index sync: only theses whose content fingerprint changed are re-embedded
+and re-indexed, and theses missing from the input are deleted unless the input looks
+truncated. Full rebuilds into a new versioned index use the same actions.
+"""
+
+import hashlib
+import json
+import os
+import sys
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set
+from elasticsearch import helpers
+from streaming_indexer import batched, bulk_index, ThroughputReporter
+from index_versions import ensure_alias, rebuild_with_alias_swap
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'app'))
+from keyword_normalization import NORMALIZED_KEYWORDS_FIELD, normalize_thesis_keywords
+from index_aliases import mark_index_updated
+
+FINGERPRINT_FIELD = "content_fingerprint"
+NON_CONTENT_FIELDS = {"abstract_vector", FINGERPRINT_FIELD}
+
+SYNC_MIN_SEEN_RATIO = float(os.environ.get("SYNC_MIN_SEEN_RATIO", 0.5))
+SYNC_ALLOW_MASS_DELETE = os.environ.get("SYNC_ALLOW_MASS_DELETE", "false").lower() == "true"
+
+def thesis_fingerprint(thesis: Dict[str, Any], model_name: Optional[str] = None) -> str:
+    """
+    Compute a stable fingerprint of a thesis and the model used to embed it.
+
+    :param thesis: Thesis dictionary
+    :param model_name: Embedding model name, or None for indices without vectors
+    :return: Hex encoded SHA-256 fingerprint
+    """
+    content = {key: value for key, value in thesis.items() if key not in NON_CONTENT_FIELDS}
+    payload = json.dumps({"model": model_name, "thesis": content}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def thesis_doc_id(thesis: Dict[str, Any], id_prefix: str = "") -> str:
+    """
+    Stable document id of a thesis, based on its hash_code rather than its position in the input file.
+
+    :param thesis: Thesis dictionary
+    :param id_prefix: Optional prefix for document ids, e.g. 'infos_'
+    :return: Document id
+    """
+    hash_code = thesis.get("hash_code")
+    if hash_code is None:
+        raise ValueError(f"Thesis by {thesis.get('author', 'unknown author')} has no hash_code")
+    return f"{id_prefix}{hash_code}"
+
+def ensure_index(es, index_name: str, mapping: Dict[str, Any]):
+    """Create the aliased index if it is missing and make sure it can store fingerprints and canonical keywords"""
+    ensure_alias(es, index_name, mapping)
+
+    es.indices.put_mapping(
+        index=index_name,
+        body={"properties": {
+            FINGERPRINT_FIELD: {"type": "keyword"},
+            NORMALIZED_KEYWORDS_FIELD: {"type": "keyword"}
+        }}
+    )
+
+def fetch_fingerprints(es, index_name: str) -> Dict[str, Optional[str]]:
+    """Map every document id in the index to its stored fingerprint (None if it has none)"""
+    fingerprints = {}
+    for hit in helpers.scan(es, index=index_name, query={"_source": [FINGERPRINT_FIELD]}):
+        fingerprints[hit["_id"]] = hit.get("_source", {}).get(FINGERPRINT_FIELD)
+    return fingerprints
+
+class SyncActionBuilder:
+    """
+    Turns batches of theses into index actions for new or changed theses, and the
+    theses that never showed up into delete actions once the input is exhausted.
+    Unchanged theses are skipped without being re-embedded.
+    """
+
+    def __init__(self, existing: Dict[str, Optional[str]], index_name: str, model=None,
+                 model_name: Optional[str] = None, batch_size: int = 64, id_prefix: str = "",
+                 stats: Optional[Dict[str, int]] = None, reporter: Optional[ThroughputReporter] = None,
+                 changed_years: Optional[Set] = None, allow_mass_delete: bool = SYNC_ALLOW_MASS_DELETE):
+        """
+        :param existing: Document id to fingerprint map of the current index contents
+        :param index_name: Target index name
+        :param model: Embedding model, or None for indices without vectors
+        :param model_name: Name of the embedding model, part of the fingerprint
+        :param batch_size: Number of abstracts encoded per model call
+        :param id_prefix: Optional prefix for document ids, e.g. 'infos_'
+        :param stats: Optional dictionary updated with added/updated/unchanged/deleted/skipped counts
+        :param reporter: Optional throughput reporter updated per encoded batch
+        :param changed_years: Optional set collecting the years of new or changed theses
+        :param allow_mass_delete: Delete vanished documents even if the input looks truncated
+        """
+        self.existing = existing
+        self.index_name = index_name
+        self.model = model
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.id_prefix = id_prefix
+        self.stats = stats if stats is not None else {}
+        self.reporter = reporter
+        self.changed_years = changed_years
+        self.allow_mass_delete = allow_mass_delete
+        self.seen = set()
+        for key in ("added", "updated", "unchanged", "deleted", "skipped", "delete_blocked"):
+            self.stats.setdefault(key, 0)
+
+    def batch_actions(self, batch: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Index actions for the new or changed theses of a batch, embedding their abstracts together"""
+        stats = self.stats
+        changed = []
+        for thesis in batch:
+            if self.model is not None and not thesis.get("abstract"):
+                stats["skipped"] += 1
+                continue
+            try:
+                doc_id = thesis_doc_id(thesis, self.id_prefix)
+            except ValueError as e:
+                print(f"Skipping thesis: {e}")
+                stats["skipped"] += 1
+                continue
+
+            self.seen.add(doc_id)
+            normalize_thesis_keywords(thesis)
+            fingerprint = thesis_fingerprint(thesis, self.model_name)
+            if self.existing.get(doc_id) == fingerprint:
+                stats["unchanged"] += 1
+                continue
+
+            stats["updated" if doc_id in self.existing else "added"] += 1
+            thesis[FINGERPRINT_FIELD] = fingerprint
+            changed.append((doc_id, thesis))
+            if self.changed_years is not None:
+                self.changed_years.add(thesis.get("year"))
+
+        if not changed:
+            return []
+
+        if self.model is not None:
+            embeddings = self.model.encode([thesis["abstract"] for _, thesis in changed], batch_size=self.batch_size)
+            for (_, thesis), embedding in zip(changed, embeddings):
+                thesis["abstract_vector"] = embedding.tolist()
+            if self.reporter:
+                self.reporter.add(len(changed))
+
+        return [{
+            "_op_type": "index",
+            "_index": self.index_name,
+            "_id": doc_id,
+            "_source": thesis
+        } for doc_id, thesis in changed]
+
+    def keep(self, theses: Iterable[Dict[str, Any]]):
+        """Keep the documents of theses that are not re-indexed in this sync, e.g. PDFs whose extraction failed"""
+        for thesis in theses:
+            try:
+                self.seen.add(thesis_doc_id(thesis, self.id_prefix))
+            except ValueError:
+                continue
+
+    def delete_actions(self) -> Iterator[Dict[str, Any]]:
+        """
+        Delete actions for the documents of the index that were not in any batch.
+        Nothing is deleted if the input covered fewer than SYNC_MIN_SEEN_RATIO of the
+        existing documents, e.g. because of an empty folder or a crashed extraction,
+        unless allow_mass_delete is set.
+        """
+        vanished = [doc_id for doc_id in self.existing if doc_id not in self.seen]
+        if not vanished:
+            return
+        if not self.allow_mass_delete and len(self.seen) < SYNC_MIN_SEEN_RATIO * len(self.existing):
+            self.stats["delete_blocked"] += len(vanished)
+            print(f"Refusing to delete {len(vanished)} of {len(self.existing)} documents from {self.index_name}: "
+                  f"the input only had {len(self.seen)} of them. Set SYNC_ALLOW_MASS_DELETE=true to delete anyway.")
+            return
+
+        for doc_id in vanished:
+            self.stats["deleted"] += 1
+            yield {
+                "_op_type": "delete",
+                "_index": self.index_name,
+                "_id": doc_id
+            }
+
+def mark_synced(es, index_name: str, stats: Dict[str, int]):
+    """Record a new content version in the index if the sync added, updated or deleted documents"""
+    if stats.get("added") or stats.get("updated") or stats.get("deleted"):
+        mark_index_updated(es, index_name)
+
+def generate_sync_actions(theses: Iterable[Dict[str, Any]], existing: Dict[str, Optional[str]], index_name: str,
+                          model=None, model_name: Optional[str] = None, batch_size: int = 64,
+                          id_prefix: str = "", stats: Optional[Dict[str, int]] = None,
+                          reporter: Optional[ThroughputReporter] = None,
+                          changed_years: Optional[Set] = None,
+                          allow_mass_delete: bool = SYNC_ALLOW_MASS_DELETE) -> Iterator[Dict[str, Any]]:
+    """
+    Yield index actions for new or changed theses followed by delete actions for vanished ones.
+    Unchanged theses are skipped without being re-embedded.
+
+    :param theses: Iterable of thesis dictionaries
+    :param existing: Document id to fingerprint map of the current index contents
+    :param index_name: Target index name
+    :param model: Embedding model, or None for indices without vectors
+    :param model_name: Name of the embedding model, part of the fingerprint
+    :param batch_size: Number of abstracts encoded per model call
+    :param id_prefix: Optional prefix for document ids, e.g. 'infos_'
+    :param stats: Optional dictionary updated with added/updated/unchanged/deleted/skipped counts
+    :param reporter: Optional throughput reporter updated per encoded batch
+    :param changed_years: Optional set collecting the years of new or changed theses
+    :param allow_mass_delete: Delete vanished documents even if the input looks truncated
+    :return: Iterator over bulk actions
+    """
+    builder = SyncActionBuilder(existing, index_name, model, model_name, batch_size, id_prefix,
+                                stats, reporter, changed_years, allow_mass_delete)
+    for batch in batched(theses, batch_size):
+        yield from builder.batch_actions(batch)
+    yield from builder.delete_actions()
+
+def sync_index(es, index_name: str, mapping: Dict[str, Any], theses: Iterable[Dict[str, Any]],
+               model=None, model_name: Optional[str] = None, batch_size: int = 64, id_prefix: str = "",
+               chunk_size: int = 200, thread_count: int = 1, changed_years: Optional[Set] = None,
+               allow_mass_delete: bool = SYNC_ALLOW_MASS_DELETE) -> Dict[str, Any]:
+    """
+    Incrementally bring an index in line with the given theses.
+
+    :param es: Elasticsearch client instance
+    :param index_name: Target index name
+    :param mapping: Mapping used if the index has to be created
+    :param theses: Iterable of thesis dictionaries, typically streamed from disk
+    :param model: Embedding model, or None for indices without vectors
+    :param model_name: Name of the embedding model, part of the fingerprint
+    :param batch_size: Number of abstracts encoded per model call
+    :param id_prefix: Optional prefix for document ids, e.g. 'infos_'
+    :param chunk_size: Number of actions per bulk request
+    :param thread_count: Number of parallel bulk threads
+    :param changed_years: Optional set collecting the years of new or changed theses
+    :param allow_mass_delete: Delete vanished documents even if the input looks truncated
+    :return: Sync counters merged with the bulk indexing result
+    """
+    ensure_index(es, index_name, mapping)
+    existing = fetch_fingerprints(es, index_name)
+    print(f"Found {len(existing)} existing documents in {index_name}")
+
+    stats = {}
+    reporter = ThroughputReporter("Encoded", report_every=batch_size) if model is not None else None
+    actions = generate_sync_actions(theses, existing, index_name, model, model_name, batch_size,
+                                    id_prefix, stats, reporter, changed_years, allow_mass_delete)
+    result = bulk_index(es, actions, chunk_size=chunk_size, thread_count=thread_count, label=f"Synced {index_name}")
+    es.indices.refresh(index=index_name)
+    mark_synced(es, index_name, stats)
+
+    stats.update(result)
+    print(f"{index_name}: {stats['added']} added, {stats['updated']} updated, "
+          f"{stats['unchanged']} unchanged, {stats['deleted']} deleted, {stats['skipped']} skipped")
+    return stats
+
+def rebuild_index(es, alias: str, mapping: Dict[str, Any], theses: Iterable[Dict[str, Any]],
+                  model=None, model_name: Optional[str] = None, batch_size: int = 64, id_prefix: str = "",
+                  chunk_size: int = 200, thread_count: int = 1) -> Dict[str, Any]:
+    """
+    Rebuild an index from scratch into a new versioned index and swap the alias to it.
+    Documents get the same ids and fingerprints as with sync_index, so later
+    incremental syncs only touch what changed.
+
+    :param es: Elasticsearch client instance
+    :param alias: Read alias queried by the services
+    :param mapping: Mapping of the new index
+    :param theses: Iterable of thesis dictionaries, typically streamed from disk
+    :param model: Embedding model, or None for indices without vectors
+    :param model_name: Name of the embedding model, part of the fingerprint
+    :param batch_size: Number of abstracts encoded per model call
+    :param id_prefix: Optional prefix for document ids, e.g. 'infos_'
+    :param chunk_size: Number of actions per bulk request
+    :param thread_count: Number of parallel bulk threads
+    :return: Sync counters merged with the bulk indexing result
+    """
+    stats = {}
+    reporter = ThroughputReporter("Encoded", report_every=batch_size) if model is not None else None
+    dims = mapping["mappings"]["properties"].get("abstract_vector", {}).get("dims")
+
+    result = rebuild_with_alias_swap(
+        es, alias, mapping,
+        lambda target: generate_sync_actions(theses, {}, target, model, model_name, batch_size,
+                                             id_prefix, stats, reporter),
+        chunk_size=chunk_size,
+        thread_count=thread_count,
+        vector_field="abstract_vector" if dims else None,
+        dims=dims
+    )
+
+    stats.update(result)
+    return stats
@@ -0,0 +1,142 @@
+"""
+Zero-downtime rebuilds: a new versioned index is built, validated and then swapped
+atomically behind the read alias, keeping the previous version for rollback.
+"""
+
+import re
+from typing import Any, Callable, Dict, Iterable, List, Optional
+from streaming_indexer import bulk_index
+
+KEEP_VERSIONS = 2
+MIN_COUNT_RATIO = 0.9
+
+def versioned_indices(es, alias: str) -> List[str]:
+    """List the versioned indices of an alias, oldest first"""
+    pattern = re.compile(rf"^{re.escape(alias)}_v(\d+)$")
+    names = [name for name in es.indices.get(index=f"{alias}_v*") if pattern.match(name)]
+    return sorted(names, key=lambda name: int(pattern.match(name).group(1)))
+
+def next_index_version(es, alias: str) -> str:
+    """Name of the next versioned index for an alias"""
+    existing = versioned_indices(es, alias)
+    version = int(existing[-1].rsplit("_v", 1)[1]) + 1 if existing else 1
+    return f"{alias}_v{version}"
+
+def alias_targets(es, alias: str) -> List[str]:
+    """Indices the alias currently points to (empty if the alias does not exist)"""
+    if not es.indices.exists_alias(name=alias):
+        return []
+    return list(es.indices.get_alias(name=alias).keys())
+
+def is_concrete_index(es, name: str) -> bool:
+    """Whether name is a real index rather than an alias, e.g. one created before aliases were used"""
+    return bool(es.indices.exists(index=name)) and not es.indices.exists_alias(name=name)
+
+def create_versioned_index(es, alias: str, mapping: Dict[str, Any]) -> str:
+    """Create the next versioned index for an alias without pointing the alias at it yet"""
+    index_name = next_index_version(es, alias)
+    print(f"Creating versioned index: {index_name}")
+    es.indices.create(index=index_name, body=mapping)
+    return index_name
+
+def warm_up_index(es, index_name: str, vector_field: Optional[str] = None, dims: Optional[int] = None):
+    """
+    Refresh the new index and run representative queries so that segments
+    and the HNSW graph are loaded before it starts serving traffic.
+    """
+    es.indices.refresh(index=index_name)
+    es.search(index=index_name, body={"query": {"match_all": {}}, "size": 1})
+    if vector_field and dims:
+        es.search(index=index_name, body={
+            "query": {
+                "knn": {
+                    "field": vector_field,
+                    "query_vector": [1.0] * dims,
+                    "num_candidates": 10
+                }
+            },
+            "size": 1
+        })
+
+def validate_index(es, index_name: str, expected_count: int, alias: str, min_ratio: float = MIN_COUNT_RATIO):
+    """
+    Check the document count of a freshly built index before it goes live.
+
+    :raises ValueError: If the count does not match what was indexed, or the new
+                        index is much smaller than the one currently serving
+    """
+    count = es.count(index=index_name)["count"]
+    if count != expected_count:
+        raise ValueError(f"{index_name} contains {count} documents, expected {expected_count}")
+    if count == 0:
+        raise ValueError(f"{index_name} is empty")
+
+    if es.indices.exists(index=alias):
+        live_count = es.count(index=alias)["count"]
+        if count < live_count * min_ratio:
+            raise ValueError(f"{index_name} has {count} documents but {alias} serves {live_count}")
+
+def swap_alias(es, alias: str, new_index: str):
+    """Atomically point the alias at new_index, replacing a legacy concrete index of the same name"""
+    actions = []
+    if is_concrete_index(es, alias):
+        print(f"Replacing legacy index {alias} with an alias")
+        actions.append({"remove_index": {"index": alias}})
+    for index_name in alias_targets(es, alias):
+        if index_name != new_index:
+            actions.append({"remove": {"index": index_name, "alias": alias}})
+    actions.append({"add": {"index": new_index, "alias": alias}})
+
+    es.indices.update_aliases(body={"actions": actions})
+    print(f"Alias {alias} now points to {new_index}")
+
+def cleanup_old_versions(es, alias: str, keep: int = KEEP_VERSIONS):
+    """Delete all but the newest `keep` versioned indices that the alias does not point to"""
+    live = set(alias_targets(es, alias))
+    versions = versioned_indices(es, alias)
+    for index_name in versions[:-keep] if keep else versions:
+        if index_name not in live:
+            print(f"Deleting old index version: {index_name}")
+            es.indices.delete(index=index_name)
+
+def ensure_alias(es, alias: str, mapping: Dict[str, Any]):
+    """Make sure the alias exists, creating a first versioned index for it if needed"""
+    if es.indices.exists(index=alias):
+        return
+    swap_alias(es, alias, create_versioned_index(es, alias, mapping))
+
+def rebuild_with_alias_swap(es, alias: str, mapping: Dict[str, Any],
+                            actions_factory: Callable[[str], Iterable[Dict[str, Any]]],
+                            chunk_size: int = 200, thread_count: int = 1,
+                            vector_field: Optional[str] = None, dims: Optional[int] = None,
+                            keep: int = KEEP_VERSIONS) -> Dict[str, Any]:
+    """
+    Build a new versioned index and atomically swap the alias to it once validated.
+    The alias keeps serving the previous version if the build or validation fails.
+
+    :param es: Elasticsearch client instance
+    :param alias: Read alias queried by the services
+    :param mapping: Mapping of the new index
+    :param actions_factory: Callable returning the bulk actions for a given index name
+    :param chunk_size: Number of actions per bulk request
+    :param thread_count: Number of parallel bulk threads
+    :param vector_field: Optional dense_vector field used to warm up the HNSW graph
+    :param dims: Dimensions of vector_field
+    :param keep: Number of versioned indices to keep for rollback
+    :return: Bulk indexing result with the name of the new index
+    """
+    new_index = create_versioned_index(es, alias, mapping)
+    try:
+        result = bulk_index(es, actions_factory(new_index), chunk_size=chunk_size,
+                            thread_count=thread_count, label=f"Indexed {new_index}")
+        warm_up_index(es, new_index, vector_field, dims)
+        validate_index(es, new_index, result["success"], alias)
+    except Exception as e:
+        print(f"Rebuild of {alias} failed, keeping the current version: {e}")
+        es.indices.delete(index=new_index)
+        raise
+
+    swap_alias(es, alias, new_index)
+    cleanup_old_versions(es, alias, keep)
+    result["index"] = new_index
+    return result
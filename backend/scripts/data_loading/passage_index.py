@@ -0,0 +1,154 @@
+"""
+Passage indices over the full thesis text, one document per overlapping word window,
+which the RAG service queries and collapses per thesis.
+"""
+
+import re
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from streaming_indexer import batched, ThroughputReporter
+from index_versions import rebuild_with_alias_swap
+
+PASSAGE_WORDS = 150
+PASSAGE_OVERLAP = 30
+MIN_PASSAGE_WORDS = 20
+THESIS_FIELDS = ("author", "supervisor", "year", "department", "hash_code")
+
+_HYPHENATED_BREAK = re.compile(r"(\w)-\s*\n\s*(\w)")
+
+def passage_mapping(dims: int) -> Dict[str, Any]:
+    """Mapping of a *_chunks index for embeddings with the given dimensions"""
+    return {
+        "mappings": {
+            "properties": {
+                "hash_code": {"type": "long"},
+                "passage_index": {"type": "integer"},
+                "text": {"type": "text"},
+                "passage_vector": {
+                    "type": "dense_vector",
+                    "dims": dims,
+                    "index": True,
+                    "similarity": "cosine"
+                },
+                "author": {"type": "text"},
+                "supervisor": {"type": "text", "fields": {"keyword": {"type": "keyword", "ignore_above": 256}}},
+                "year": {"type": "integer"},
+                "department": {"type": "keyword"}
+            }
+        }
+    }
+
+def split_passages(text: str, passage_words: int = PASSAGE_WORDS, overlap: int = PASSAGE_OVERLAP,
+                   min_words: int = MIN_PASSAGE_WORDS) -> List[str]:
+    """
+    Split a thesis body into overlapping passages of passage_words words.
+    A short tail is merged into the previous passage.
+
+    :param text: Full text extracted from the PDF
+    :param passage_words: Words per passage
+    :param overlap: Words shared by consecutive passages
+    :param min_words: Texts shorter than this produce no passages
+    :return: List of passages
+    """
+    if overlap >= passage_words:
+        raise ValueError("overlap must be smaller than passage_words")
+
+    words = _HYPHENATED_BREAK.sub(r"\1\2", text or "").split()
+    if len(words) < min_words:
+        return []
+
+    step = passage_words - overlap
+    passages = []
+    start = 0
+    while True:
+        end = start + passage_words
+        if len(words) - end < min_words:
+            passages.append(" ".join(words[start:]))
+            return passages
+        passages.append(" ".join(words[start:end]))
+        start += step
+
+def iter_passages(full_texts: Iterable[Dict[str, Any]], theses: Dict[Any, Dict[str, Any]],
+                  stats: Optional[Dict[str, int]] = None) -> Iterator[Tuple[Dict[str, Any], int, str]]:
+    """
+    Yield (thesis metadata, passage index, passage) for every full-text record with a known thesis.
+
+    :param full_texts: Records with 'hash_code' and 'text', as written by the PDF extraction scripts
+    :param theses: Cleaned thesis dictionaries by hash_code
+    :param stats: Optional dictionary updated with theses/passages/skipped counts
+    """
+    if stats is None:
+        stats = {}
+    for key in ("theses", "passages", "skipped"):
+        stats.setdefault(key, 0)
+
+    for record in full_texts:
+        thesis = theses.get(record.get("hash_code"))
+        if thesis is None:
+            print(f"Skipping full text of unknown thesis {record.get('hash_code')}")
+            stats["skipped"] += 1
+            continue
+        metadata = {field: thesis.get(field) for field in THESIS_FIELDS}
+        passages = split_passages(record.get("text", ""))
+        stats["theses"] += 1
+        stats["passages"] += len(passages)
+        for passage_index, passage in enumerate(passages):
+            yield metadata, passage_index, passage
+
+def generate_passage_actions(full_texts: Iterable[Dict[str, Any]], theses: Dict[Any, Dict[str, Any]], model,
+                             index_name: str, batch_size: int = 64, stats: Optional[Dict[str, int]] = None,
+                             reporter: Optional[ThroughputReporter] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Encode passages in batches and yield one bulk index action per passage.
+
+    :param full_texts: Records with 'hash_code' and 'text'
+    :param theses: Cleaned thesis dictionaries by hash_code
+    :param model: SentenceTransformer (or compatible) model with a batched encode()
+    :param index_name: Target index name
+    :param batch_size: Number of passages encoded per model call
+    :param stats: Optional dictionary updated with theses/passages/skipped counts
+    :param reporter: Optional throughput reporter updated per encoded batch
+    :return: Iterator over bulk actions
+    """
+    for batch in batched(iter_passages(full_texts, theses, stats), batch_size):
+        embeddings = model.encode([passage for _, _, passage in batch], batch_size=batch_size)
+        for (metadata, passage_index, passage), embedding in zip(batch, embeddings):
+            yield {
+                "_index": index_name,
+                "_id": f"{metadata['hash_code']}_{passage_index}",
+                "_source": dict(metadata, passage_index=passage_index, text=passage,
+                                passage_vector=embedding.tolist())
+            }
+        if reporter:
+            reporter.add(len(batch))
+
+def rebuild_passage_index(es, alias: str, full_texts: Iterable[Dict[str, Any]], theses: Dict[Any, Dict[str, Any]],
+                          model, batch_size: int = 64, chunk_size: int = 200,
+                          thread_count: int = 1) -> Dict[str, Any]:
+    """
+    Build a new versioned passage index and swap the alias to it.
+
+    :param es: Elasticsearch client instance
+    :param alias: Read alias queried by the RAG service, e.g. 'cs_theses_chunks'
+    :param full_texts: Records with 'hash_code' and 'text', typically streamed from disk
+    :param theses: Cleaned thesis dictionaries by hash_code
+    :param model: Embedding model
+    :param batch_size: Number of passages encoded per model call
+    :param chunk_size: Number of actions per bulk request
+    :param thread_count: Number of parallel bulk threads
+    :return: Passage counters merged with the bulk indexing result
+    """
+    dims = model.get_sentence_embedding_dimension()
+    stats = {}
+    reporter = ThroughputReporter("Encoded passages", report_every=batch_size)
+
+    result = rebuild_with_alias_swap(
+        es, alias, passage_mapping(dims),
+        lambda target: generate_passage_actions(full_texts, theses, model, target, batch_size, stats, reporter),
+        chunk_size=chunk_size,
+        thread_count=thread_count,
+        vector_field="passage_vector",
+        dims=dims
+    )
+
+    stats.update(result)
+    return stats
@@ -0,0 +1,214 @@
+"""
+Streaming helpers for the indexing scripts: theses are read lazily, encoded in batches
+and bulk indexed, so memory does not grow with the input file.
+"""
+
+import json
+import time
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+from elasticsearch import helpers
+
+READ_CHUNK_SIZE = 1 << 16
+
+def iter_json_array(path: str, chunk_size: int = READ_CHUNK_SIZE) -> Iterator[Dict[str, Any]]:
+    """
+    Lazily yield the objects of a top-level JSON array without loading the whole file.
+
+    :param path: Path to a file containing a JSON array of objects
+    :param chunk_size: Number of characters read from disk at a time
+    :return: Iterator over the array items
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    started = False
+    eof = False
+
+    with open(path, "r", encoding="utf-8") as f:
+        def read_more():
+            nonlocal buffer, eof
+            chunk = f.read(chunk_size)
+            eof = not chunk
+            buffer += chunk
+
+        while True:
+            buffer = buffer.lstrip()
+            if not buffer:
+                if eof:
+                    raise ValueError(f"Unexpected end of file in {path}")
+                read_more()
+                continue
+
+            if not started:
+                if not buffer.startswith("["):
+                    raise ValueError(f"{path} does not contain a JSON array")
+                buffer = buffer[1:]
+                started = True
+                continue
+
+            if buffer.startswith(","):
+                buffer = buffer[1:]
+                continue
+            if buffer.startswith("]"):
+                return
+
+            try:
+                item, end = decoder.raw_decode(buffer)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                read_more()
+                continue
+
+            # Only accept an item once its delimiter has been read, otherwise a
+            # number split across two chunks would be decoded too early
+            rest = buffer[end:].lstrip()
+            if rest[:1] not in (",", "]"):
+                if eof:
+                    raise ValueError(f"Malformed JSON array in {path}")
+                read_more()
+                continue
+
+            buffer = buffer[end:]
+            yield item
+
+def iter_theses(path: str) -> Iterator[Dict[str, Any]]:
+    """
+    Lazily read theses from a .json array or a .jsonl/.ndjson file.
+
+    :param path: Path to the cleaned theses file
+    :return: Iterator over thesis dictionaries
+    """
+    if path.endswith((".jsonl", ".ndjson")):
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+    else:
+        yield from iter_json_array(path)
+
+def batched(iterable: Iterable, batch_size: int) -> Iterator[List]:
+    """Yield successive lists of at most batch_size items"""
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, batch_size))
+        if not batch:
+            return
+        yield batch
+
+class ThroughputReporter:
+    """Count processed documents and periodically print docs/sec"""
+
+    def __init__(self, label: str, report_every: int = 100):
+        self.label = label
+        self.report_every = report_every
+        self.count = 0
+        self.started = time.perf_counter()
+        self._next_report = report_every
+
+    def add(self, n: int = 1):
+        self.count += n
+        if self.count >= self._next_report:
+            self.report()
+            self._next_report = self.count + self.report_every
+
+    @property
+    def rate(self) -> float:
+        elapsed = time.perf_counter() - self.started
+        return self.count / elapsed if elapsed > 0 else 0.0
+
+    def report(self):
+        print(f"{self.label}: {self.count} docs, {self.rate:.1f} docs/sec")
+
+def generate_embedding_actions(theses: Iterable[Dict[str, Any]], model, index_name: str,
+                               batch_size: int = 64, id_prefix: str = "",
+                               reporter: Optional[ThroughputReporter] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Encode abstracts in batches and yield one bulk index action per thesis.
+    Document ids keep the 1-based position of the thesis in the input file.
+
+    :param theses: Iterable of thesis dictionaries
+    :param model: SentenceTransformer (or compatible) model with a batched encode()
+    :param index_name: Target index name
+    :param batch_size: Number of abstracts encoded per model call
+    :param id_prefix: Optional prefix for document ids, e.g. 'infos_'
+    :param reporter: Optional throughput reporter updated per encoded batch
+    :return: Iterator over bulk actions
+    """
+    numbered = enumerate(theses, start=1)
+    for batch in batched(numbered, batch_size):
+        to_encode = []
+        for i, thesis in batch:
+            if not thesis.get("abstract"):
+                print(f"Skipping thesis {i} - no abstract")
+                continue
+            to_encode.append((i, thesis))
+
+        if not to_encode:
+            continue
+
+        try:
+            embeddings = model.encode([thesis["abstract"] for _, thesis in to_encode], batch_size=batch_size)
+        except Exception as e:
+            print(f"Error encoding theses {to_encode[0][0]}-{to_encode[-1][0]}: {e}")
+            continue
+
+        for (i, thesis), embedding in zip(to_encode, embeddings):
+            thesis["abstract_vector"] = embedding.tolist()
+            yield {
+                "_index": index_name,
+                "_id": f"{id_prefix}{i}",
+                "_source": thesis
+            }
+
+        if reporter:
+            reporter.add(len(to_encode))
+
+def generate_index_actions(theses: Iterable[Dict[str, Any]], index_name: str,
+                           id_prefix: str = "") -> Iterator[Dict[str, Any]]:
+    """Yield one bulk index action per thesis without embeddings"""
+    for i, thesis in enumerate(theses, start=1):
+        yield {
+            "_index": index_name,
+            "_id": f"{id_prefix}{i}",
+            "_source": thesis
+        }
+
+def bulk_index(es, actions: Iterable[Dict[str, Any]], chunk_size: int = 200,
+               thread_count: int = 1, label: str = "Indexed") -> Dict[str, float]:
+    """
+    Send bulk actions with bounded memory and report throughput.
+    Uses helpers.parallel_bulk when thread_count > 1, otherwise helpers.streaming_bulk.
+
+    :param es: Elasticsearch client instance
+    :param actions: Iterable of bulk actions, typically a generator
+    :param chunk_size: Number of actions per bulk request
+    :param thread_count: Number of parallel bulk threads
+    :param label: Prefix for progress output
+    :return: Dictionary with success/failed counts, elapsed seconds and docs/sec
+    """
+    reporter = ThroughputReporter(label, report_every=chunk_size)
+    failed = 0
+
+    if thread_count > 1:
+        results = helpers.parallel_bulk(es, actions, thread_count=thread_count, chunk_size=chunk_size,
+                                        queue_size=thread_count, raise_on_error=False)
+    else:
+        results = helpers.streaming_bulk(es, actions, chunk_size=chunk_size, raise_on_error=False)
+
+    for ok, item in results:
+        if ok:
+            reporter.add()
+        else:
+            failed += 1
+            print(f"Failed to index document: {item}")
+
+    elapsed = time.perf_counter() - reporter.started
+    reporter.report()
+    return {
+        "success": reporter.count,
+        "failed": failed,
+        "elapsed": elapsed,
+        "docs_per_sec": reporter.rate
+    }
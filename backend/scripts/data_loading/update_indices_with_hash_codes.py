@@ -81,7 +81,8 @@ def update_indices_with_hash_codes():
             
             try:
                 mapping = es.indices.get_mapping(index=index_name)
-                properties = mapping[index_name]['mappings']['properties']
+                # index_name may be an alias, so take the mapping of the index behind it
+                properties = next(iter(mapping.values()))['mappings']['properties']
                 
                 if 'hash_code' not in properties:
                     print(f"Adding hash_code field to {index_name}")
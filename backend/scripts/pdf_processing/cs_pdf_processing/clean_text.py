@@ -1,15 +1,14 @@
 import json
+import os
 import re
-from keybert import KeyBERT
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from keyword_generation import backfill_keywords, reusable_embeddings
 
 input_file = 'backend\scripts\pdf_processing\cs_pdf_processing\extracted_data.json'
 output_file = 'backend\scripts\pdf_processing\cs_pdf_processing\cleaned_data.json'
 
-with open(input_file, 'r', encoding='utf-8') as f:
-    data = json.load(f)
-
-kw_model = KeyBERT()
-
 titles_to_remove = [
     r'Dr\.', r'Conf\.', r'Ș\.l\.', r'ing\.', r'Prof\.', r'habil\.',
     r'conferențiar universitar', r'Șef\. lucr\.', r'ing'
@@ -51,30 +50,7 @@ def clean_keywords(keywords_list):
             keywords_list[-1] = last_keyword.rstrip('.')
     return keywords_list
 
-def generate_keywords(abstract_str, num_keywords=4, max_length=25):
-    keywords = kw_model.extract_keywords(
-        abstract_str,
-        keyphrase_ngram_range=(1, 2),
-        stop_words='english',
-        top_n=num_keywords * 2,
-        use_mmr=True,
-        diversity=0.7
-    )
-    
-    selected_keywords = []
-    seen_roots = set()
-    
-    for keyword, _ in keywords:
-        if len(keyword) > max_length:
-            continue
-        root = keyword.split()[0].lower()
-        if root not in seen_roots and len(selected_keywords) < num_keywords:
-            selected_keywords.append(keyword)
-            seen_roots.add(root)
-    
-    return selected_keywords
-
-for thesis in data:
+def clean_thesis(thesis):
     if 'year' in thesis and isinstance(thesis['year'], str):
         thesis['year'] = int(thesis['year'])
     
@@ -86,12 +62,24 @@ for thesis in data:
     
     if 'keywords' in thesis:
         thesis['keywords'] = clean_keywords(thesis['keywords'])
-        if not thesis['keywords'] and 'abstract' in thesis:
-            thesis['keywords'] = generate_keywords(thesis['abstract'])
+    
+    return thesis
+
+def main():
+    with open(input_file, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+
+    for thesis in data:
+        clean_thesis(thesis)
+
+    backfill_keywords([thesis for thesis in data if 'keywords' in thesis], embeddings=reusable_embeddings())
+
+    data = clean_hyphen_space(data)
 
-data = clean_hyphen_space(data)
+    with open(output_file, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=4)
 
-with open(output_file, 'w', encoding='utf-8') as f:
-    json.dump(data, f, ensure_ascii=False, indent=4)
+    print(f"Refactored JSON saved to {output_file}")
 
-print(f"Refactored JSON saved to {output_file}")
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,14 @@
-import pdfplumber
 import re
 import os
+import sys
 import json
 import hashlib
-from typing import Dict, Optional, List
+from typing import Any, Dict, Optional, List
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from pdf_extraction import extract_front_matter, extract_pages, join_pages, list_pdfs, run_extraction
+
+EXTRACT_FULL_TEXT = os.environ.get("EXTRACT_FULL_TEXT", "false").lower() == "true"
 
 FIELD_NAMES = {
     "author": "author",
@@ -43,16 +48,10 @@ def title_to_hash_code(title):
     
     return ten_digit_hash
 
-def extract_text_from_pdf(pdf_path: str) -> Optional[str]:
-    """Extract raw text from a PDF file using pdfplumber."""
+def extract_text_from_pdf(pdf_path: str, max_pages: Optional[int] = None) -> Optional[str]:
+    """Extract raw text from the first max_pages pages (default: all) of a PDF file using pdfplumber."""
     try:
-        with pdfplumber.open(pdf_path) as pdf:
-            text = ''
-            for page in pdf.pages:
-                page_text = page.extract_text()
-                if page_text:
-                    text += page_text + '\n'
-            return text
+        return join_pages(extract_pages(pdf_path, max_pages))
     except Exception as e:
         print(f"Hiba: {pdf_path} - {str(e)}")
         return None
@@ -143,30 +142,46 @@ def extract_info(text: str, pdf_path: str) -> Dict[str, str]:
 
     return info
 
-def process_pdf(pdf_path: str) -> Dict[str, str]:
-    """Process a PDF file and extract required information."""
-    text = extract_text_from_pdf(pdf_path)
-    if text is None:
-        info = {value: "" if key != "keywords" else [] for key, value in FIELD_NAMES.items()}
-        info[FIELD_NAMES["department"]] = "cs"
-        filename = os.path.basename(pdf_path)
-        info[FIELD_NAMES["hash_code"]] = title_to_hash_code(filename)
-        info[FIELD_NAMES["author"]] = os.path.splitext(os.path.basename(pdf_path))[0]
-        return info
-    return extract_info(text, pdf_path)
-
-def process_all_pdfs(folder_path: str) -> List[Dict[str, str]]:
-    """Process all PDFs in the specified folder and return a list of extracted data."""
-    extracted_data = []
-    
-    for filename in os.listdir(folder_path):
-        if filename.lower().endswith('.pdf'):
-            pdf_path = os.path.join(folder_path, filename)
-            print(f"Processing {pdf_path}...")
-            info = process_pdf(pdf_path)
-            extracted_data.append(info)
-    
-    return extracted_data
+def empty_info(pdf_path: str) -> Dict[str, str]:
+    """Fields of a PDF whose text could not be extracted."""
+    info = {value: "" if key != "keywords" else [] for key, value in FIELD_NAMES.items()}
+    info[FIELD_NAMES["department"]] = "cs"
+    filename = os.path.basename(pdf_path)
+    info[FIELD_NAMES["hash_code"]] = title_to_hash_code(filename)
+    info[FIELD_NAMES["author"]] = os.path.splitext(os.path.basename(pdf_path))[0]
+    return info
+
+def process_pdf(pdf_path: str, full_text: bool = False) -> Dict[str, Any]:
+    """
+    Extract the information of one PDF; the worker of the parallel extraction.
+    Pages are read until the required fields have matched, unless the full text is kept.
+    """
+    try:
+        if full_text:
+            pages = extract_pages(pdf_path)
+            page_count = len(pages)
+            info = extract_info(join_pages(pages), pdf_path)
+        else:
+            info, pages, page_count = extract_front_matter(pdf_path, extract_info)
+    except Exception as e:
+        print(f"Hiba: {pdf_path} - {str(e)}")
+        return {"pdf": os.path.basename(pdf_path), "info": empty_info(pdf_path), "pages": 0, "page_count": 0,
+                "text": None, "error": str(e)}
+
+    return {
+        "pdf": os.path.basename(pdf_path),
+        "info": info,
+        "pages": len(pages),
+        "page_count": page_count,
+        "text": join_pages(pages) if full_text else None
+    }
+
+def process_all_pdfs(folder_path: str, records_path: str, full_text_path: Optional[str] = None) -> List[Dict[str, str]]:
+    """
+    Process all PDFs in the specified folder in parallel and return a list of extracted data.
+    Records are streamed to records_path, so an interrupted run resumes where it stopped.
+    """
+    return run_extraction(list_pdfs(folder_path), process_pdf, records_path, full_text_path)
 
 def write_to_json(data: List[Dict[str, str]], json_path: str):
     """Write the list of extracted data to a JSON file."""
@@ -177,11 +192,15 @@ def main():
     """Main function to process all PDFs in the szamteches folder and write to JSON."""
     folder_path = r"backend\scripts\pdf_docs\szamteches"
     json_path = r"backend\scripts\pdf_processing\cs_pdf_processing\extracted_data.json"
+    records_path = r"backend\scripts\pdf_processing\cs_pdf_processing\extracted_data.jsonl"
+    full_text_path = r"backend\scripts\pdf_processing\cs_pdf_processing\full_text_data.jsonl"
 
-    extracted_data = process_all_pdfs(folder_path)
+    extracted_data = process_all_pdfs(folder_path, records_path, full_text_path if EXTRACT_FULL_TEXT else None)
 
     write_to_json(extracted_data, json_path)
     print(f"Data from all PDFs written to {json_path}")
+    if EXTRACT_FULL_TEXT:
+        print(f"Full texts written to {full_text_path}")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,171 @@
+"""
+SQLite cache of the page text of the PDFs, keyed by the SHA-256 of the PDF bytes.
+Bump EXTRACTOR_VERSION whenever the way the page text is produced changes.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import zlib
+from typing import Any, Dict, List, Optional
+
+EXTRACTION_CACHE = os.environ.get("EXTRACTION_CACHE", "true").lower() == "true"
+EXTRACTION_CACHE_PATH = os.environ.get(
+    "EXTRACTION_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'data', 'extraction_cache.sqlite'))
+EXTRACTOR_VERSION = "pdfplumber-extract_text-1"
+
+def file_sha256(path: str, chunk_size: int = 1 << 20) -> str:
+    """SHA-256 hex digest of a file's bytes"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class ExtractionCache:
+    """
+    SQLite store of compressed page text. Every extraction worker process opens its own
+    connection; WAL mode lets them read while another one writes.
+    """
+
+    def __init__(self, path: str = EXTRACTION_CACHE_PATH, extractor_version: str = EXTRACTOR_VERSION):
+        self.path = path
+        self.extractor_version = extractor_version
+        self._connection = None
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        if self._connection is None:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            self._connection = sqlite3.connect(self.path, timeout=60)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS pages ("
+                "sha256 TEXT NOT NULL, extractor TEXT NOT NULL, page_count INTEGER NOT NULL, "
+                "pages_read INTEGER NOT NULL, data BLOB NOT NULL, PRIMARY KEY (sha256, extractor))")
+            self._connection.commit()
+        return self._connection
+
+    def get(self, sha256: str) -> Optional[Dict[str, Any]]:
+        """
+        Cached pages of a PDF.
+
+        :param sha256: Digest of the PDF bytes
+        :return: {"page_count": pages in the PDF, "pages": text of the leading pages read}, or None
+        """
+        row = self.connection.execute(
+            "SELECT page_count, data FROM pages WHERE sha256 = ? AND extractor = ?",
+            (sha256, self.extractor_version)).fetchone()
+        if row is None:
+            return None
+        return {"page_count": row[0], "pages": json.loads(zlib.decompress(row[1]).decode("utf-8"))}
+
+    def put(self, sha256: str, page_count: int, pages: List[str]):
+        """
+        Store the leading pages of a PDF, unless more of them are cached already.
+
+        :param sha256: Digest of the PDF bytes
+        :param page_count: Number of pages in the PDF
+        :param pages: Text of the first len(pages) pages
+        """
+        data = zlib.compress(json.dumps(pages, ensure_ascii=False).encode("utf-8"))
+        with self.connection:
+            self.connection.execute(
+                "INSERT INTO pages (sha256, extractor, page_count, pages_read, data) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (sha256, extractor) DO UPDATE SET page_count = excluded.page_count, "
+                "pages_read = excluded.pages_read, data = excluded.data "
+                "WHERE excluded.pages_read > pages.pages_read",
+                (sha256, self.extractor_version, page_count, len(pages), data))
+
+    def stats(self) -> Dict[str, Any]:
+        """Number of cached PDFs, pages and compressed bytes of the current extractor version"""
+        count, pages_read, size = self.connection.execute(
+            "SELECT COUNT(*), COALESCE(SUM(pages_read), 0), COALESCE(SUM(LENGTH(data)), 0) "
+            "FROM pages WHERE extractor = ?", (self.extractor_version,)).fetchone()
+        return {"pdfs": count, "pages": pages_read, "compressed_bytes": size}
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+_cache = None
+
+def get_extraction_cache() -> Optional[ExtractionCache]:
+    """The cache of this process, or None if EXTRACTION_CACHE is disabled"""
+    global _cache
+    if not EXTRACTION_CACHE:
+        return None
+    if _cache is None:
+        _cache = ExtractionCache()
+    return _cache
+
+class CachedPages:
+    """
+    Page text of one PDF, served from the cache where possible. pdfplumber is only opened
+    when a page beyond the cached ones is requested; the pages read are cached on close().
+    Pages are extracted in order, so the cached ones are always the leading pages.
+    """
+
+    def __init__(self, pdf_path: str, cache: Optional[ExtractionCache] = None):
+        self.pdf_path = pdf_path
+        self.cache = cache
+        self.sha256 = file_sha256(pdf_path) if cache is not None else None
+        entry = cache.get(self.sha256) if cache is not None else None
+        self.pages = entry["pages"] if entry else []
+        self.page_count = entry["page_count"] if entry else None
+        self.cached_pages = len(self.pages)
+        self._pdf = None
+
+    def _open(self):
+        if self._pdf is None:
+            import pdfplumber
+            self._pdf = pdfplumber.open(self.pdf_path)
+            self.page_count = len(self._pdf.pages)
+
+    def __len__(self) -> int:
+        if self.page_count is None:
+            self._open()
+        return self.page_count
+
+    def __getitem__(self, index: int) -> str:
+        if index >= len(self):
+            raise IndexError(index)
+        while len(self.pages) <= index:
+            self._open()
+            self.pages.append(self._pdf.pages[len(self.pages)].extract_text() or "")
+        return self.pages[index]
+
+    def read(self, max_pages: Optional[int] = None) -> List[str]:
+        """Text of the first max_pages pages, all pages if None"""
+        count = len(self) if max_pages is None else min(len(self), max_pages)
+        return [self[i] for i in range(count)]
+
+    def close(self):
+        if self._pdf is not None:
+            self._pdf.close()
+            self._pdf = None
+        if self.cache is not None and len(self.pages) > self.cached_pages:
+            try:
+                self.cache.put(self.sha256, self.page_count, self.pages)
+            except sqlite3.Error as e:
+                print(f"Could not cache the pages of {self.pdf_path}: {e}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else EXTRACTION_CACHE_PATH
+    if not os.path.exists(path):
+        print(f"No extraction cache at {path}")
+        exit(1)
+    stats = ExtractionCache(path).stats()
+    print(f"{path}: {stats['pdfs']} PDFs, {stats['pages']} pages, "
+          f"{stats['compressed_bytes'] / (1024 * 1024):.1f} MB compressed ({EXTRACTOR_VERSION})")
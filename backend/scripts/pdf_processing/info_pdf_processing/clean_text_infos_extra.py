@@ -1,11 +1,14 @@
 import json
 import re
 import os
+import sys
 import logging
 from typing import Dict, List, Any, Set, Tuple
-from keybert import KeyBERT
 from collections import Counter
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from keyword_generation import extract_keywords_batch, get_keyword_model, reusable_embeddings
+
 # Set up logging
 logging.basicConfig(
     level=logging.INFO,
@@ -281,22 +284,27 @@ def clean_supervisor_list(supervisors: List[str]) -> List[str]:
     
     return valid_supervisors
 
-def fix_abstract_with_keybert(text: str, kw_model: KeyBERT) -> str:
+def fix_abstracts_with_keybert(texts: List[str]) -> List[str]:
     """
-    Use KeyBERT to identify potential issues with the text and fix them.
+    Use KeyBERT to identify potential issues with the texts and fix them.
     This helps with:
     1. Stuck words where spaces are missing
     2. Identifying important concepts that might be misformatted
+    The keywords of all texts are extracted in batches with the shared KeyBERT model.
     """
-    if not text or len(text) < 50:  # Skip very short texts
-        return text
+    # Skip very short texts
+    long_texts = [i for i, text in enumerate(texts) if text and len(text) >= 50]
+    fixed_texts = list(texts)
     
     # First apply basic regex fix for camelCase
-    text = fix_sticked_words(text)
+    for i in long_texts:
+        fixed_texts[i] = fix_sticked_words(texts[i])
     
     # Extract keywords to identify important concepts
-    keywords = kw_model.extract_keywords(
-        text, 
+    embeddings = reusable_embeddings()
+    all_keywords = extract_keywords_batch(
+        [fixed_texts[i] for i in long_texts],
+        embeddings,
         keyphrase_ngram_range=(1, 2), 
         stop_words='english',
         use_mmr=True,
@@ -304,6 +312,13 @@ def fix_abstract_with_keybert(text: str, kw_model: KeyBERT) -> str:
         top_n=10
     )
     
+    for i, keywords in zip(long_texts, all_keywords):
+        fixed_texts[i] = fix_keyword_capitalization(fixed_texts[i], keywords)
+    
+    return fixed_texts
+
+def fix_keyword_capitalization(text: str, keywords: List[Tuple[str, float]]) -> str:
+    """Split the extracted keywords of a text that show unusual capitalization patterns."""
     # Look for potential issues with the extracted keywords
     for keyword, _ in keywords:
         # Check if keyword contains unusual capitalization patterns
@@ -360,7 +375,7 @@ def process_thesis_data(thesis_data: List[Dict[str, Any]]) -> List[Dict[str, Any
     # Initialize KeyBERT model
     logger.info("Initializing KeyBERT model...")
     try:
-        kw_model = KeyBERT()
+        kw_model = get_keyword_model()
         logger.info("KeyBERT model initialized successfully")
     except Exception as e:
         logger.error(f"Error initializing KeyBERT model: {e}")
@@ -408,15 +423,17 @@ def process_thesis_data(thesis_data: List[Dict[str, Any]]) -> List[Dict[str, Any
             
             cleaned_thesis['supervisor'] = cleaned_supervisors
         
-        # Fix stuck words in abstract
-        if 'abstract' in cleaned_thesis and cleaned_thesis['abstract']:
-            if kw_model:
-                cleaned_thesis['abstract'] = fix_abstract_with_keybert(cleaned_thesis['abstract'], kw_model)
-            else:
-                cleaned_thesis['abstract'] = fix_sticked_words(cleaned_thesis['abstract'])
-        
         cleaned_data.append(cleaned_thesis)
     
+    # Fix stuck words in abstracts
+    with_abstract = [thesis for thesis in cleaned_data if 'abstract' in thesis and thesis['abstract']]
+    if kw_model:
+        fixed_abstracts = fix_abstracts_with_keybert([thesis['abstract'] for thesis in with_abstract])
+    else:
+        fixed_abstracts = [fix_sticked_words(thesis['abstract']) for thesis in with_abstract]
+    for thesis, abstract in zip(with_abstract, fixed_abstracts):
+        thesis['abstract'] = abstract
+    
     return cleaned_data
 
 def main():
@@ -1,14 +1,21 @@
-import pdfplumber
 import re
 import os
+import sys
 import json
 import hashlib
-from typing import Dict, Optional, List
-from keybert import KeyBERT
+from typing import Any, Dict, Optional
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from pdf_extraction import extract_front_matter, extract_pages, join_pages, list_pdfs, run_extraction
+from keyword_generation import backfill_keywords, reusable_embeddings
+
+EXTRACT_FULL_TEXT = os.environ.get("EXTRACT_FULL_TEXT", "false").lower() == "true"
 
 INPUT_FOLDER = "backend\scripts\pdf_docs\infos"
 OUTPUT_JSON = "backend\scripts\pdf_processing\info_pdf_processing\extracted_infos_data.json"
+RECORDS_JSONL = "backend\scripts\pdf_processing\info_pdf_processing\extracted_infos_data.jsonl"
 CLEANED_OUTPUT_JSON = "backend\scripts\pdf_processing\info_pdf_processing\cleaned_infos_data.json"
+FULL_TEXT_JSONL = "backend\scripts\pdf_processing\info_pdf_processing\\full_text_infos_data.jsonl"
 
 FIELD_NAMES = {
     "author": "author",
@@ -48,16 +55,10 @@ def title_to_hash_code(title):
     
     return ten_digit_hash
 
-def extract_text_from_pdf(pdf_path: str) -> Optional[str]:
-    """Extract raw text from a PDF file using pdfplumber."""
+def extract_text_from_pdf(pdf_path: str, max_pages: Optional[int] = None) -> Optional[str]:
+    """Extract raw text from the first max_pages pages (default: all) of a PDF file using pdfplumber."""
     try:
-        with pdfplumber.open(pdf_path) as pdf:
-            text = ''
-            for page in pdf.pages:
-                page_text = page.extract_text()
-                if page_text:
-                    text += page_text + '\n'
-            return text
+        return join_pages(extract_pages(pdf_path, max_pages))
     except Exception as e:
         print(f"Error: {pdf_path} - {str(e)}")
         return None
@@ -237,61 +238,56 @@ def clean_hyphen_space(obj):
     else:
         return obj
 
-def process_pdf(pdf_path: str) -> Dict[str, str]:
-    """Process a PDF file and extract required information."""
-    text = extract_text_from_pdf(pdf_path)
-    if text is None:
-        info = {value: "" if key != "keywords" else [] for key, value in FIELD_NAMES.items()}
-        info[FIELD_NAMES["author"]] = extract_author_from_filename(pdf_path)
-        info[FIELD_NAMES["department"]] = "informatics"
-        filename = os.path.basename(pdf_path)
-        info[FIELD_NAMES["hash_code"]] = title_to_hash_code(filename)
-        return info
-    
-    return extract_info(text, pdf_path)
+def empty_info(pdf_path: str) -> Dict[str, str]:
+    """Fields of a PDF whose text could not be extracted."""
+    info = {value: "" if key != "keywords" else [] for key, value in FIELD_NAMES.items()}
+    info[FIELD_NAMES["author"]] = extract_author_from_filename(pdf_path)
+    info[FIELD_NAMES["department"]] = "informatics"
+    filename = os.path.basename(pdf_path)
+    info[FIELD_NAMES["hash_code"]] = title_to_hash_code(filename)
+    return info
 
-def generate_keywords(abstract_str, num_keywords=4, max_length=25):
-    """Generate keywords from abstract when they're not available."""
-    if not abstract_str:
-        return []
-    
-    kw_model = KeyBERT()
-    
-    keywords = kw_model.extract_keywords(
-        abstract_str,
-        keyphrase_ngram_range=(1, 2),
-        stop_words='english',
-        top_n=num_keywords * 2,
-        use_mmr=True,
-        diversity=0.7
-    )
-    
-    selected_keywords = []
-    seen_roots = set()
-    
-    for keyword, _ in keywords:
-        if len(keyword) > max_length:
-            continue
-        if not keyword.strip():
-            continue
-        root = keyword.split()[0].lower()
-        if root not in seen_roots and len(selected_keywords) < num_keywords:
-            selected_keywords.append(keyword)
-            seen_roots.add(root)
-    
-    return selected_keywords
+def process_pdf(pdf_path: str, full_text: bool = False) -> Dict[str, Any]:
+    """
+    Extract the information of one PDF; the worker of the parallel extraction.
+    Pages are read until the required fields have matched, unless the full text is kept.
+    """
+    try:
+        if full_text:
+            pages = extract_pages(pdf_path)
+            page_count = len(pages)
+            info = extract_info(join_pages(pages), pdf_path)
+        else:
+            info, pages, page_count = extract_front_matter(pdf_path, extract_info)
+    except Exception as e:
+        print(f"Error: {pdf_path} - {str(e)}")
+        return {"pdf": os.path.basename(pdf_path), "info": empty_info(pdf_path), "pages": 0, "page_count": 0,
+                "text": None, "error": str(e)}
+
+    return {
+        "pdf": os.path.basename(pdf_path),
+        "info": info,
+        "pages": len(pages),
+        "page_count": page_count,
+        "text": join_pages(pages) if full_text else None
+    }
+
+def clean_thesis(thesis):
+    """Clean the year and abstract of one extracted thesis."""
+    if 'year' in thesis and isinstance(thesis['year'], str) and thesis['year'].isdigit():
+        thesis['year'] = int(thesis['year'])
+    
+    if 'abstract' in thesis and thesis['abstract']:
+        thesis['abstract'] = clean_abstract(thesis['abstract'])
+    
+    return thesis
 
 def clean_data(data):
     """Clean and enhance the extracted data."""
     for thesis in data:
-        if 'year' in thesis and isinstance(thesis['year'], str) and thesis['year'].isdigit():
-            thesis['year'] = int(thesis['year'])
-        
-        if 'abstract' in thesis and thesis['abstract']:
-            thesis['abstract'] = clean_abstract(thesis['abstract'])
-        
-        if ('keywords' not in thesis or not thesis['keywords']) and 'abstract' in thesis:
-            thesis['keywords'] = generate_keywords(thesis['abstract'])
+        clean_thesis(thesis)
+    
+    backfill_keywords(data, embeddings=reusable_embeddings())
     
     data = clean_hyphen_space(data)
     
@@ -299,14 +295,8 @@ def clean_data(data):
 
 def main():
     """Main function to process all PDFs in the informatics folder and write to JSON."""
-    extracted_data = []
-    
-    for filename in os.listdir(INPUT_FOLDER):
-        if filename.lower().endswith('.pdf'):
-            pdf_path = os.path.join(INPUT_FOLDER, filename)
-            print(f"Processing {pdf_path}...")
-            info = process_pdf(pdf_path)
-            extracted_data.append(info)
+    extracted_data = run_extraction(list_pdfs(INPUT_FOLDER), process_pdf, RECORDS_JSONL,
+                                    FULL_TEXT_JSONL if EXTRACT_FULL_TEXT else None)
     
     with open(OUTPUT_JSON, 'w', encoding='utf-8') as json_file:
         json.dump(extracted_data, json_file, ensure_ascii=False, indent=4)
@@ -318,6 +308,8 @@ def main():
     
     print(f"Data extraction complete. Raw data written to {OUTPUT_JSON}")
     print(f"Cleaned data written to {CLEANED_OUTPUT_JSON}")
+    if EXTRACT_FULL_TEXT:
+        print(f"Full texts written to {FULL_TEXT_JSONL}")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,162 @@
+"""
+KeyBERT keyword generation for the cleaning scripts, batched over many abstracts and
+reusing the abstract embeddings of the local vector store when they match the model.
+"""
+
+import os
+import sys
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'app'))
+
+KEYWORD_MODEL = os.environ.get("KEYWORD_MODEL", "all-MiniLM-L6-v2")
+KEYWORD_BATCH_SIZE = int(os.environ.get("KEYWORD_BATCH_SIZE", 512))
+KEYWORD_REUSE_EMBEDDINGS = os.environ.get("KEYWORD_REUSE_EMBEDDINGS", "true").lower() == "true"
+
+_kw_model = None
+
+def get_keyword_model():
+    """The KeyBERT model of this process, loaded on first use"""
+    global _kw_model
+    if _kw_model is None:
+        from keybert import KeyBERT
+        print(f"Loading KeyBERT with {KEYWORD_MODEL}...")
+        _kw_model = KeyBERT(model=KEYWORD_MODEL)
+    return _kw_model
+
+def abstract_key(abstract: str) -> str:
+    """Abstract text with the whitespace and line-break hyphens the cleaning steps change removed"""
+    return " ".join(abstract.replace("- ", "").split())
+
+def load_indexed_embeddings(model_name: str = KEYWORD_MODEL) -> Dict[str, np.ndarray]:
+    """
+    Abstract embeddings of the local vector store by abstract_key(), if it was built with model_name.
+
+    :param model_name: Model the keyword embeddings are computed with
+    :return: Embeddings by abstract key, empty if there is no usable store
+    """
+    try:
+        from vector_store import VECTOR_STORE_PATH, LocalVectorStore
+        store = LocalVectorStore.load(VECTOR_STORE_PATH)
+    except (ImportError, OSError, ValueError, KeyError) as e:
+        print(f"No abstract embeddings to reuse from the vector store: {e}")
+        return {}
+
+    store_model = (store.manifest.get("model") or "").split("@")[0]
+    if store_model != model_name:
+        print(f"Not reusing the abstract embeddings of {store_model or 'an unknown model'}, "
+              f"keywords are generated with {model_name}")
+        return {}
+
+    embeddings = {}
+    for i, entry in enumerate(store.metadata):
+        abstract = entry["_source"].get("abstract")
+        if abstract:
+            vector = np.asarray(store.vectors[i], dtype=np.float32)
+            if store.scales is not None:
+                vector = vector * store.scales[i]
+            embeddings[abstract_key(abstract)] = vector
+    print(f"Loaded {len(embeddings)} abstract embeddings from the vector store")
+    return embeddings
+
+def reusable_embeddings() -> Optional[Dict[str, np.ndarray]]:
+    """Abstract embeddings of the vector store to pass to the keyword functions, None if KEYWORD_REUSE_EMBEDDINGS is off"""
+    return load_indexed_embeddings() if KEYWORD_REUSE_EMBEDDINGS else None
+
+def extract_keywords_batch(docs: List[str], embeddings: Optional[Dict[str, np.ndarray]] = None,
+                           batch_size: int = KEYWORD_BATCH_SIZE, **kwargs) -> List[List[Tuple[str, float]]]:
+    """
+    Run KeyBERT over many documents, batch_size documents per call.
+
+    :param docs: Non-empty documents
+    :param embeddings: Known document embeddings by abstract_key()
+    :param batch_size: Documents per KeyBERT call
+    :param kwargs: Options of KeyBERT.extract_keywords
+    :return: (keyword, score) lists in docs order
+    """
+    if not docs:
+        return []
+    kw_model = get_keyword_model()
+    embeddings = embeddings or {}
+    results = []
+    reused = 0
+    for start in range(0, len(docs), batch_size):
+        batch = docs[start:start + batch_size]
+        known = [embeddings.get(abstract_key(doc)) for doc in batch]
+        missing = [i for i, vector in enumerate(known) if vector is None]
+        if missing:
+            encoded = kw_model.model.embed([batch[i] for i in missing])
+            for i, vector in zip(missing, encoded):
+                known[i] = vector
+        reused += len(batch) - len(missing)
+
+        keywords = kw_model.extract_keywords(batch, doc_embeddings=np.vstack(known), **kwargs)
+        # KeyBERT unwraps the result of a single document, and returns [] when no candidate is left
+        if len(batch) == 1 or not keywords:
+            keywords = [keywords] if len(batch) == 1 else [[] for _ in batch]
+        results.extend(keywords)
+
+    print(f"Extracted keywords of {len(docs)} documents, {reused} with reused embeddings")
+    return results
+
+def select_keywords(candidates: List[Tuple[str, float]], num_keywords: int = 4, max_length: int = 25) -> List[str]:
+    """Keep up to num_keywords short candidates, at most one per first word"""
+    selected_keywords = []
+    seen_roots = set()
+
+    for keyword, _ in candidates:
+        if len(keyword) > max_length:
+            continue
+        if not keyword.strip():
+            continue
+        root = keyword.split()[0].lower()
+        if root not in seen_roots and len(selected_keywords) < num_keywords:
+            selected_keywords.append(keyword)
+            seen_roots.add(root)
+
+    return selected_keywords
+
+def generate_keywords_batch(abstracts: List[str], num_keywords: int = 4, max_length: int = 25,
+                            embeddings: Optional[Dict[str, np.ndarray]] = None) -> List[List[str]]:
+    """
+    Generate keywords for abstracts that have none.
+
+    :param abstracts: Abstracts, '' for none
+    :param num_keywords: Keywords per abstract
+    :param max_length: Longest keyword kept
+    :param embeddings: Known abstract embeddings by abstract_key()
+    :return: Keyword lists in abstracts order, [] for empty abstracts
+    """
+    docs = [abstract for abstract in abstracts if abstract]
+    candidates = iter(extract_keywords_batch(
+        docs, embeddings,
+        keyphrase_ngram_range=(1, 2),
+        stop_words='english',
+        top_n=num_keywords * 2,
+        use_mmr=True,
+        diversity=0.7
+    ))
+    return [select_keywords(next(candidates), num_keywords, max_length) if abstract else []
+            for abstract in abstracts]
+
+def backfill_keywords(theses: List[Dict[str, Any]], num_keywords: int = 4, max_length: int = 25,
+                      embeddings: Optional[Dict[str, np.ndarray]] = None) -> int:
+    """
+    Generate the keywords of every thesis that has an abstract but no keywords, in place.
+
+    :param theses: Thesis dictionaries
+    :param num_keywords: Keywords per abstract
+    :param max_length: Longest keyword kept
+    :param embeddings: Known abstract embeddings by abstract_key(), from reusable_embeddings()
+    :return: Number of theses that got generated keywords
+    """
+    missing = [thesis for thesis in theses if not thesis.get('keywords') and 'abstract' in thesis]
+    if not missing:
+        return 0
+
+    abstracts = [thesis['abstract'] or "" for thesis in missing]
+    for thesis, keywords in zip(missing, generate_keywords_batch(abstracts, num_keywords, max_length, embeddings)):
+        thesis['keywords'] = keywords
+    print(f"Generated keywords for {len(missing)} theses")
+    return len(missing)
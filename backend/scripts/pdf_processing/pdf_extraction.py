@@ -0,0 +1,218 @@
+"""
+Parallel, resumable PDF extraction shared by the department scripts.
+A worker is a module-level function worker(pdf_path, full_text) returning
+{"pdf", "info", "pages", "page_count", "text"}, plus "error" if the PDF could not be read;
+such PDFs are retried by the next run.
+"""
+
+import contextlib
+import io
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+from extraction_cache import CachedPages, get_extraction_cache
+
+EXTRACTION_WORKERS = int(os.environ.get("EXTRACTION_WORKERS", os.cpu_count() or 1))
+FRONT_MATTER_PAGES = int(os.environ.get("FRONT_MATTER_PAGES", 8))
+MAX_EXTRACTION_PAGES = int(os.environ.get("MAX_EXTRACTION_PAGES", 30))
+EXTRACTION_RESUME = os.environ.get("EXTRACTION_RESUME", "true").lower() == "true"
+
+REQUIRED_FIELDS = ("supervisor", "year", "abstract")
+OPTIONAL_FIELDS = ("keywords",)
+
+def extract_pages(pdf_path: str, max_pages: Optional[int] = None) -> List[str]:
+    """
+    Extract the text of the first max_pages pages (all pages if None) with pdfplumber,
+    or take it from the extraction cache.
+
+    :param pdf_path: Path of the PDF
+    :param max_pages: Number of leading pages to read
+    :return: Text of every page read, '' for pages without text
+    """
+    with CachedPages(pdf_path, get_extraction_cache()) as pdf:
+        return pdf.read(max_pages)
+
+def join_pages(pages: List[str]) -> str:
+    """Join page texts the way the scripts always have: every non-empty page followed by a newline"""
+    return "".join(page + "\n" for page in pages if page)
+
+def extract_front_matter(pdf_path: str, extract_info: Callable[[str, str], Dict[str, Any]],
+                         required: Sequence[str] = REQUIRED_FIELDS, optional: Sequence[str] = OPTIONAL_FIELDS,
+                         front_matter_pages: int = FRONT_MATTER_PAGES,
+                         max_pages: int = MAX_EXTRACTION_PAGES) -> Tuple[Dict[str, Any], List[str], int]:
+    """
+    Read a PDF page by page, running extract_info on the text read so far, and stop as soon as
+    every required and optional field has matched. A field only counts once one more page did not
+    change it, so a section cut off at a page break is completed first. Optional fields are looked
+    for in the first front_matter_pages pages; deeper pages, up to max_pages, are only read while
+    a required field is still missing.
+
+    :param pdf_path: Path of the PDF
+    :param extract_info: The script's extract_info(text, pdf_path)
+    :param required: Fields worth reading deeper pages for
+    :param optional: Fields only looked for in the front matter
+    :param front_matter_pages: Pages searched for the optional fields
+    :param max_pages: Pages searched for the required fields
+    :return: Extracted info, text of the pages read and total page count
+    """
+    pages = []
+    previous = None
+    with CachedPages(pdf_path, get_extraction_cache()) as pdf:
+        page_count = len(pdf)
+        for index in range(min(page_count, max_pages)):
+            pages.append(pdf[index])
+            # extract_info warns about every field it misses; only the final pass should
+            with contextlib.redirect_stdout(io.StringIO()):
+                info = extract_info(join_pages(pages), pdf_path)
+
+            found = {field: info.get(field) for field in tuple(required) + tuple(optional)}
+            stable = found == previous
+            previous = found
+            if not stable or not all(info.get(field) for field in required):
+                continue
+            if len(pages) >= front_matter_pages or all(info.get(field) for field in optional):
+                break
+
+    return extract_info(join_pages(pages), pdf_path), pages, page_count
+
+def list_pdfs(folder_path: str) -> List[str]:
+    """Paths of the PDFs in a folder, sorted by file name"""
+    return [os.path.join(folder_path, filename) for filename in sorted(os.listdir(folder_path))
+            if filename.lower().endswith('.pdf')]
+
+def read_ndjson(path: str, keep: bool = True) -> List[Dict[str, Any]]:
+    """
+    Read the complete lines of an NDJSON file that is appended to. A line left incomplete
+    by a crash is cut off so new lines are appended after the last complete one.
+
+    :param path: NDJSON file
+    :param keep: Return the parsed lines; False only repairs the file
+    :return: Parsed lines, in file order
+    """
+    lines = []
+    if not os.path.exists(path):
+        return lines
+
+    valid_bytes = 0
+    with open(path, "rb") as f:
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            try:
+                value = json.loads(line.decode("utf-8"))
+            except (UnicodeDecodeError, ValueError):
+                break
+            if keep:
+                lines.append(value)
+            valid_bytes += len(line)
+
+    if valid_bytes < os.path.getsize(path):
+        print(f"Discarding an incomplete line at the end of {path}")
+        with open(path, "r+b") as f:
+            f.truncate(valid_bytes)
+    return lines
+
+def read_records(records_path: str) -> Dict[str, Dict[str, Any]]:
+    """
+    Read the records of a previous run by PDF file name, cutting off an incomplete last record.
+
+    :param records_path: NDJSON file written by run_extraction()
+    :return: Records by PDF file name
+    """
+    return {record["pdf"]: record for record in read_ndjson(records_path)}
+
+def iter_extraction(pdf_paths: List[str], worker: Callable[[str, bool], Dict[str, Any]], records_path: str,
+                    full_text_path: Optional[str] = None, workers: int = EXTRACTION_WORKERS,
+                    resume: bool = EXTRACTION_RESUME) -> Iterator[Dict[str, Any]]:
+    """
+    Extract the PDFs in parallel, appending a record per PDF to records_path as it completes.
+    The records of a previous run come first, then the new ones in completion order.
+
+    :param pdf_paths: PDFs to process
+    :param worker: Module-level function(pdf_path, full_text) returning a record
+    :param records_path: NDJSON file of extraction records
+    :param full_text_path: Optional NDJSON file receiving {"hash_code", "department", "text"} per thesis;
+                           workers then read every page instead of the front matter only
+    :param workers: Number of worker processes
+    :param resume: Skip PDFs already recorded by a previous run instead of starting over
+    :return: Iterator over the records of pdf_paths
+    """
+    full_text = full_text_path is not None
+    if resume:
+        records = read_records(records_path)
+        if full_text:
+            read_ndjson(full_text_path, keep=False)
+    else:
+        records = {}
+        for path in (records_path, full_text_path):
+            if path and os.path.exists(path):
+                os.remove(path)
+
+    def done(pdf_path: str) -> bool:
+        record = records.get(os.path.basename(pdf_path))
+        # Failed PDFs are retried, and records made without the full text are redone when it is requested
+        return record is not None and not record.get("error") and (record.get("full_text") or not full_text)
+
+    pending = [pdf_path for pdf_path in pdf_paths if not done(pdf_path)]
+    if records:
+        print(f"Resuming: {len(pdf_paths) - len(pending)} PDFs already extracted, {len(pending)} to go")
+    for pdf_path in pdf_paths:
+        if done(pdf_path):
+            yield records[os.path.basename(pdf_path)]
+
+    if not pending:
+        return
+
+    pages_read = pages_total = 0
+    full_text_file = open(full_text_path, "a", encoding="utf-8") if full_text else None
+    try:
+        with open(records_path, "a", encoding="utf-8") as records_file, \
+             ProcessPoolExecutor(max_workers=max(1, workers)) as executor:
+            futures = {executor.submit(worker, pdf_path, full_text): pdf_path for pdf_path in pending}
+            for count, future in enumerate(as_completed(futures), start=1):
+                pdf_path = futures[future]
+                try:
+                    record = future.result()
+                except Exception as e:
+                    print(f"Error: {pdf_path} - {str(e)}")
+                    continue
+
+                text = record.pop("text", None)
+                record["full_text"] = full_text
+                if full_text_file is not None and text:
+                    info = record["info"]
+                    full_text_file.write(json.dumps({"hash_code": info["hash_code"], "department": info["department"],
+                                                     "text": text}, ensure_ascii=False) + "\n")
+                    full_text_file.flush()
+                records_file.write(json.dumps(record, ensure_ascii=False) + "\n")
+                records_file.flush()
+                pages_read += record.get("pages", 0)
+                pages_total += record.get("page_count", record.get("pages", 0))
+                print(f"[{count}/{len(pending)}] {record['pdf']}: read {record.get('pages', 0)} "
+                      f"of {record.get('page_count', '?')} pages")
+                yield record
+    finally:
+        if full_text_file is not None:
+            full_text_file.close()
+    if pages_total:
+        print(f"Read {pages_read} of {pages_total} pages ({100.0 * pages_read / pages_total:.1f}%)")
+
+def run_extraction(pdf_paths: List[str], worker: Callable[[str, bool], Dict[str, Any]], records_path: str,
+                   full_text_path: Optional[str] = None, workers: int = EXTRACTION_WORKERS,
+                   resume: bool = EXTRACTION_RESUME) -> List[Dict[str, Any]]:
+    """
+    Extract the PDFs in parallel with iter_extraction() and collect the results.
+
+    :param pdf_paths: PDFs to process
+    :param worker: Module-level function(pdf_path, full_text) returning a record
+    :param records_path: NDJSON file of extraction records
+    :param full_text_path: Optional NDJSON file receiving the full text of every thesis
+    :param workers: Number of worker processes
+    :param resume: Skip PDFs already recorded by a previous run instead of starting over
+    :return: Extracted info dictionaries in pdf_paths order
+    """
+    records = {record["pdf"]: record for record in
+               iter_extraction(pdf_paths, worker, records_path, full_text_path, workers, resume)}
+    return [records[os.path.basename(pdf_path)]["info"] for pdf_path in pdf_paths
+            if os.path.basename(pdf_path) in records]
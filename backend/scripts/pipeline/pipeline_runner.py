@@ -0,0 +1,196 @@
+"""
+Threaded generator pipeline: every stage runs in its own thread and is connected to
+the next by a bounded queue, and records its counts and wait times.
+"""
+
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+import numpy as np
+
+QUEUE_TIMEOUT = 0.1
+
+_DONE = object()
+_STOPPED = object()
+
+class PipelineStopped(Exception):
+    """Raised into a stage reading its input when another stage failed, so it does not finish normally"""
+
+class Stage:
+    """A named pipeline stage: fn(records) yields the records of the next stage"""
+
+    def __init__(self, name: str, fn: Callable[[Iterator[Any]], Iterable[Any]]):
+        self.name = name
+        self.fn = fn
+
+class StageMetrics:
+    """Counts and timings of one stage"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.items_in = 0
+        self.items_out = 0
+        self.wait_in_s = 0.0
+        self.wait_out_s = 0.0
+        self.latencies = []
+        self.started = None
+        self.finished = None
+
+    @property
+    def elapsed_s(self) -> float:
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.perf_counter()) - self.started
+
+    @property
+    def busy_s(self) -> float:
+        """Time spent in the stage itself, not waiting for input or for room downstream"""
+        return max(0.0, self.elapsed_s - self.wait_in_s - self.wait_out_s)
+
+    def summary(self) -> Dict[str, Any]:
+        elapsed = self.elapsed_s
+        return {
+            "stage": self.name,
+            "items_in": self.items_in,
+            "items_out": self.items_out,
+            "elapsed_s": elapsed,
+            "busy_s": self.busy_s,
+            "wait_in_s": self.wait_in_s,
+            "wait_out_s": self.wait_out_s,
+            "in_per_s": self.items_in / elapsed if elapsed > 0 else 0.0,
+            "out_per_s": self.items_out / elapsed if elapsed > 0 else 0.0,
+            "p50_ms": float(np.percentile(self.latencies, 50)) * 1000 if self.latencies else 0.0,
+            "p95_ms": float(np.percentile(self.latencies, 95)) * 1000 if self.latencies else 0.0
+        }
+
+class Pipeline:
+    """
+    Runs a source iterable through the stages, each in its own thread.
+    A failing stage stops the whole pipeline and its exception is raised by run().
+    """
+
+    def __init__(self, stages: List[Stage], queue_size: int = 256):
+        self.stages = stages
+        self.queue_size = queue_size
+        self.metrics = [StageMetrics(stage.name) for stage in stages]
+        self._stop = threading.Event()
+        self._failure = None
+
+    def _get(self, q: queue.Queue) -> Any:
+        while True:
+            try:
+                return q.get(timeout=QUEUE_TIMEOUT)
+            except queue.Empty:
+                if self._stop.is_set():
+                    return _STOPPED
+
+    def _put(self, q: queue.Queue, item: Any) -> bool:
+        while not self._stop.is_set():
+            try:
+                q.put(item, timeout=QUEUE_TIMEOUT)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _read(self, q: queue.Queue, metrics: StageMetrics, mark: List[float]) -> Iterator[Any]:
+        """Yield the items of an input queue, timing how long the stage waits for them"""
+        while True:
+            waited = time.perf_counter()
+            item = self._get(q)
+            waited = time.perf_counter() - waited
+            metrics.wait_in_s += waited
+            mark[1] += waited
+            if item is _STOPPED:
+                raise PipelineStopped()
+            if item is _DONE:
+                return
+            metrics.items_in += 1
+            yield item
+
+    @staticmethod
+    def _count(source: Iterable[Any], metrics: StageMetrics) -> Iterator[Any]:
+        for item in source:
+            metrics.items_in += 1
+            yield item
+
+    def _fail(self, name: str, error: BaseException):
+        if self._failure is None:
+            self._failure = (name, error)
+        self._stop.set()
+
+    def _run_stage(self, stage: Stage, metrics: StageMetrics, inbox: Optional[queue.Queue],
+                   source: Optional[Iterable[Any]], outbox: queue.Queue):
+        # mark[0]: when the stage started working on its next output, mark[1]: input wait since then
+        metrics.started = time.perf_counter()
+        mark = [metrics.started, 0.0]
+        output = None
+        try:
+            records = self._count(source, metrics) if inbox is None else self._read(inbox, metrics, mark)
+            output = stage.fn(records)
+            for item in output:
+                now = time.perf_counter()
+                metrics.latencies.append(max(0.0, now - mark[0] - mark[1]))
+                metrics.items_out += 1
+                if not self._put(outbox, item):
+                    return
+                mark[0], mark[1] = time.perf_counter(), 0.0
+                metrics.wait_out_s += mark[0] - now
+                if self._stop.is_set():
+                    return
+        except PipelineStopped:
+            pass
+        except BaseException as e:
+            self._fail(stage.name, e)
+        finally:
+            # Lets a stopped stage release what it holds, e.g. the extraction worker processes
+            if hasattr(output, "close"):
+                output.close()
+            metrics.finished = time.perf_counter()
+            self._put(outbox, _DONE)
+
+    def run(self, source: Iterable[Any]) -> List[Any]:
+        """
+        Run the pipeline to completion.
+
+        :param source: Records fed to the first stage
+        :raises Exception: The exception of the first stage that failed
+        :return: Items yielded by the last stage
+        """
+        self._failure = None
+        self._stop.clear()
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in self.stages]
+        threads = []
+        for i, (stage, metrics) in enumerate(zip(self.stages, self.metrics)):
+            inbox = queues[i - 1] if i > 0 else None
+            thread = threading.Thread(target=self._run_stage, name=f"pipeline-{stage.name}",
+                                      args=(stage, metrics, inbox, source if i == 0 else None, queues[i]),
+                                      daemon=True)
+            thread.start()
+            threads.append(thread)
+
+        results = []
+        while True:
+            item = self._get(queues[-1])
+            if item is _DONE or item is _STOPPED:
+                break
+            results.append(item)
+
+        for thread in threads:
+            thread.join()
+        if self._failure is not None:
+            name, error = self._failure
+            raise RuntimeError(f"Pipeline stage {name} failed: {error}") from error
+        return results
+
+    def report(self):
+        """Print the throughput and latency of every stage"""
+        print(f"{'stage':<12} {'in':>7} {'out':>7} {'elapsed s':>10} {'busy s':>8} {'wait in s':>10} "
+              f"{'wait out s':>11} {'out/s':>8} {'p50 ms':>8} {'p95 ms':>8}")
+        for metrics in self.metrics:
+            summary = metrics.summary()
+            print(f"{summary['stage']:<12} {summary['items_in']:>7} {summary['items_out']:>7} "
+                  f"{summary['elapsed_s']:>10.2f} {summary['busy_s']:>8.2f} {summary['wait_in_s']:>10.2f} "
+                  f"{summary['wait_out_s']:>11.2f} {summary['out_per_s']:>8.1f} {summary['p50_ms']:>8.1f} "
+                  f"{summary['p95_ms']:>8.1f}")
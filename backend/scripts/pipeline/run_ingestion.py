@@ -0,0 +1,205 @@
+"""
+Runs the ingestion of one or more departments (ingestion_config.json) as one pipeline:
+extract -> clean -> keywords -> save -> embed -> index, then refreshes their statistics.
+The indices are synced incrementally; full rebuilds still go through the per-department scripts.
+
+Usage: python backend/scripts/pipeline/run_ingestion.py [department ...]
+"""
+
+from dotenv import load_dotenv
+import importlib
+import json
+import os
+import sys
+from elasticsearch import Elasticsearch
+
+SCRIPTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.append(os.path.join(SCRIPTS_DIR, 'pdf_processing'))
+sys.path.append(os.path.join(SCRIPTS_DIR, 'data_loading'))
+sys.path.append(os.path.join(SCRIPTS_DIR, '..', 'app'))
+from pipeline_runner import Pipeline, Stage
+from pdf_extraction import iter_extraction, list_pdfs
+from keyword_generation import backfill_keywords, reusable_embeddings
+from index_sync import SYNC_ALLOW_MASS_DELETE, SyncActionBuilder, ensure_index, fetch_fingerprints, mark_synced
+from streaming_indexer import batched, bulk_index
+from statistics_store import refresh_statistics_after_sync
+from encoder_backends import EMBEDDING_BACKEND, load_encoder
+
+load_dotenv()
+
+INGESTION_CONFIG = os.getenv("INGESTION_CONFIG", os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                               "ingestion_config.json"))
+
+ELASTIC_PASSWORD = os.getenv("ELASTIC_PASSWORD")
+ELASTIC_USERNAME = os.getenv("ELASTIC_USERNAME")
+
+def load_function(spec: str):
+    """Resolve a 'module:function' reference of the config, modules relative to pdf_processing"""
+    module_name, function_name = spec.split(":")
+    return getattr(importlib.import_module(module_name), function_name)
+
+def thesis_mapping(dims=None):
+    """Mapping of the thesis indices, with the abstract vector if dims is given"""
+    properties = {
+        "abstract": {"type": "text"},
+        "author": {"type": "text"},
+        "supervisor": {"type": "text", "fields": {"keyword": {"type": "keyword", "ignore_above": 256}}},
+        "year": {"type": "integer"},
+        "keywords": {"type": "text", "fields": {"keyword": {"type": "keyword", "ignore_above": 256}}},
+        "keywords_normalized": {"type": "keyword"},
+        "department": {"type": "keyword", "fields": {"keyword": {"type": "keyword"}}},
+        "content_fingerprint": {"type": "keyword"}
+    }
+    if dims:
+        properties["abstract_vector"] = {"type": "dense_vector", "dims": dims, "index": True, "similarity": "cosine"}
+    return {"mappings": {"properties": properties}}
+
+def extract_stage(department_config, failed):
+    """
+    Extracted theses of the PDFs; the placeholder info of a PDF whose extraction failed is
+    collected in failed instead, so its indexed document is neither overwritten nor deleted
+    """
+    worker = load_function(department_config["extractor"])
+
+    def extract(pdf_paths):
+        for record in iter_extraction(list(pdf_paths), worker, department_config["records_path"],
+                                      department_config.get("full_text_path")):
+            if record.get("error"):
+                print(f"Keeping the indexed thesis of {record['pdf']}: {record['error']}")
+                failed.append(record["info"])
+                continue
+            yield record["info"]
+    return extract
+
+def clean_stage(cleaners):
+    def clean(theses):
+        for thesis in theses:
+            for cleaner in cleaners:
+                thesis = cleaner(thesis)
+            yield thesis
+    return clean
+
+def keyword_stage(finalizers, batch_size):
+    def keywords(theses):
+        embeddings = reusable_embeddings()
+        for batch in batched(theses, batch_size):
+            backfill_keywords(batch, embeddings=embeddings)
+            for thesis in batch:
+                for finalizer in finalizers:
+                    thesis = finalizer(thesis)
+                yield thesis
+    return keywords
+
+def save_stage(path):
+    """Write the cleaned theses as NDJSON, replacing the previous file once all are written"""
+    def save(theses):
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for thesis in theses:
+                f.write(json.dumps(thesis, ensure_ascii=False) + "\n")
+                yield thesis
+        os.replace(tmp_path, path)
+    return save
+
+def embed_stage(builders, batch_size, failed=()):
+    """
+    Index actions of every target; each target gets its own copies of the theses.
+    The documents of the failed theses are kept when the vanished ones are deleted.
+    """
+    def embed(theses):
+        for batch in batched(theses, batch_size):
+            for builder in builders:
+                yield from builder.batch_actions([dict(thesis) for thesis in batch])
+        for builder in builders:
+            builder.keep(failed)
+            yield from builder.delete_actions()
+    return embed
+
+def index_stage(es, chunk_size, thread_count, label):
+    def index(actions):
+        yield bulk_index(es, actions, chunk_size=chunk_size, thread_count=thread_count, label=label)
+    return index
+
+def run_department(es, department, department_config, config, model, model_name):
+    """Run the pipeline of one department and refresh its statistics"""
+    print(f"Ingesting {department} from {department_config['pdf_folder']}...")
+    semantic_index = department_config["semantic_index"]
+    keyword_index = department_config["keyword_index"]
+    id_prefix = department_config.get("id_prefix", "")
+    batch_size = config.get("embedding_batch_size", 64)
+    allow_mass_delete = config.get("allow_mass_delete", SYNC_ALLOW_MASS_DELETE)
+
+    ensure_index(es, semantic_index, thesis_mapping(model.get_sentence_embedding_dimension()))
+    ensure_index(es, keyword_index, thesis_mapping())
+    semantic_stats, keyword_stats, changed_years, failed = {}, {}, set(), []
+    builders = [
+        SyncActionBuilder(fetch_fingerprints(es, semantic_index), semantic_index, model, model_name,
+                          batch_size, id_prefix, semantic_stats, allow_mass_delete=allow_mass_delete),
+        SyncActionBuilder(fetch_fingerprints(es, keyword_index), keyword_index, id_prefix=id_prefix,
+                          stats=keyword_stats, changed_years=changed_years, allow_mass_delete=allow_mass_delete)
+    ]
+
+    stages = [
+        Stage("extract", extract_stage(department_config, failed)),
+        Stage("clean", clean_stage([load_function(spec) for spec in department_config.get("cleaners", [])])),
+        Stage("keywords", keyword_stage([load_function(spec) for spec in department_config.get("finalizers", [])],
+                                        config.get("keyword_batch_size", 64)))
+    ]
+    if department_config.get("cleaned_path"):
+        stages.append(Stage("save", save_stage(department_config["cleaned_path"])))
+    stages += [
+        Stage("embed", embed_stage(builders, batch_size, failed)),
+        Stage("index", index_stage(es, config.get("bulk_chunk_size", 200), config.get("bulk_thread_count", 1),
+                                   f"Synced {department}"))
+    ]
+
+    pipeline = Pipeline(stages, config.get("queue_size", 256))
+    result = pipeline.run(list_pdfs(department_config["pdf_folder"]))[0]
+    es.indices.refresh(index=semantic_index)
+    es.indices.refresh(index=keyword_index)
+    mark_synced(es, semantic_index, semantic_stats)
+    mark_synced(es, keyword_index, keyword_stats)
+
+    for index_name, stats in ((semantic_index, semantic_stats), (keyword_index, keyword_stats)):
+        print(f"{index_name}: {stats['added']} added, {stats['updated']} updated, "
+              f"{stats['unchanged']} unchanged, {stats['deleted']} deleted, {stats['skipped']} skipped"
+              + (f", {stats['delete_blocked']} deletes blocked" if stats['delete_blocked'] else ""))
+    if failed:
+        print(f"{len(failed)} PDFs failed to extract; their indexed theses were kept")
+    print(f"Indexed {result['success']} documents, {result['failed']} failed "
+          f"in {result['elapsed']:.1f}s ({result['docs_per_sec']:.1f} docs/sec)")
+
+    refresh_statistics_after_sync(es, department, keyword_stats, changed_years, keyword_index)
+    pipeline.report()
+
+def main():
+    with open(INGESTION_CONFIG, "r", encoding="utf-8") as f:
+        config = json.load(f)
+
+    departments = sys.argv[1:] or list(config["departments"])
+    unknown = [department for department in departments if department not in config["departments"]]
+    if unknown:
+        print(f"Unknown departments: {', '.join(unknown)}; configured: {', '.join(config['departments'])}")
+        exit(1)
+
+    es = Elasticsearch(
+        "http://localhost:9200",
+        basic_auth=(ELASTIC_USERNAME, ELASTIC_PASSWORD)
+    )
+    if not es.ping():
+        print("Failed to connect to Elasticsearch")
+        exit(1)
+    print("Connected to Elasticsearch!")
+
+    model_name = config.get("embedding_model", "all-MiniLM-L6-v2")
+    print(f"Loading {model_name} on the {EMBEDDING_BACKEND} backend...")
+    model = load_encoder(model_name)
+    print("Model loaded successfully")
+
+    for department in departments:
+        run_department(es, department, config["departments"][department], config, model, model_name)
+
+    print("Ingestion completed successfully!")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+import pytest
+import json
+import sys
+import os
+from unittest.mock import Mock, patch
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'app'))
+
+from app import app
+from rag_jobs import RagJobQueue, QueueFullError
+
+
+def parse_sse(body):
+    """Split a Server-Sent Events body into (event, data) pairs"""
+    events = []
+    for frame in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in frame.split("\n"))
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+class TestRagStreamIntegration:
+    """Integration tests for the streaming RAG endpoint"""
+
+    @pytest.fixture
+    def client(self):
+        """Create a test client for the Flask app"""
+        app.config['TESTING'] = True
+        return app.test_client()
+
+    @pytest.fixture
+    def stream_events(self):
+        """Events produced by stream_rag_response"""
+        return [
+            {"event": "references", "data": {"references": [{"author": "Gáll János"}], "model": "Llama 3.2 (3B)"}},
+            {"event": "token", "data": {"text": "Neural "}},
+            {"event": "token", "data": {"text": "networks."}},
+            {"event": "done", "data": {"retrieval_ms": 3.0, "time_to_first_token_ms": 40.0, "total_ms": 90.0}}
+        ]
+
+    def test_rag_stream_post(self, client, stream_events):
+        """Test that events are framed as text/event-stream"""
+        with patch('routes.stream_rag_response', return_value=iter(stream_events)) as mock_stream, \
+             patch('routes.getattr', return_value=Mock()):
+            response = client.post('/search/rag/stream', json={'query': 'neural networks', 'top_k': 3})
+
+            assert response.status_code == 200
+            assert response.mimetype == 'text/event-stream'
+            assert response.headers['Cache-Control'] == 'no-cache'
+
+            events = parse_sse(response.get_data(as_text=True))
+            assert [event for event, _ in events] == ['references', 'token', 'token', 'done']
+            assert events[0][1]['references'][0]['author'] == 'Gáll János'
+
+            args = mock_stream.call_args[0]
+            assert args[1:] == ('neural networks', 'llama3.2:3b', 3, None)
+
+    def test_rag_stream_get(self, client, stream_events):
+        """Test the query parameter form used by EventSource"""
+        with patch('routes.stream_rag_response', return_value=iter(stream_events)) as mock_stream, \
+             patch('routes.getattr', return_value=Mock()):
+            response = client.get('/search/rag/stream?query=fpga&department=cs&top_k=2')
+
+            assert response.status_code == 200
+            assert mock_stream.call_args[0][1:] == ('fpga', 'llama3.2:3b', 2, 'cs')
+
+    def test_rag_stream_requires_query(self, client):
+        """Test that a missing query is rejected before streaming starts"""
+        with patch('routes.getattr', return_value=Mock()):
+            response = client.post('/search/rag/stream', json={})
+
+            assert response.status_code == 400
+
+
+class TestRagJobsIntegration:
+    """Integration tests for the asynchronous RAG job endpoints"""
+
+    @pytest.fixture
+    def client(self):
+        """Create a test client for the Flask app"""
+        app.config['TESTING'] = True
+        return app.test_client()
+
+    def test_submit_poll_and_stream(self, client):
+        """Test the job lifecycle: 202 with a job id, polling and the event stream"""
+        def runner(es, query, model_id, top_k, department):
+            yield {"event": "references", "data": {"references": []}}
+            yield {"event": "token", "data": {"text": "Answer."}}
+            yield {"event": "done", "data": {"total_ms": 1.0}}
+
+        jobs = RagJobQueue(workers={"ollama": 1}, runner=runner)
+        with patch('routes.get_job_queue', return_value=jobs), patch('routes.getattr', return_value=Mock()):
+            response = client.post('/search/rag/jobs', json={'query': 'What is an FPGA?'})
+            assert response.status_code == 202
+            job_id = response.get_json()['job_id']
+
+            stream = client.get(f'/search/rag/jobs/{job_id}/stream')
+            assert [event for event, _ in parse_sse(stream.get_data(as_text=True))] == ['references', 'token', 'done']
+
+            status = client.get(f'/search/rag/jobs/{job_id}').get_json()
+            assert status['status'] == 'done'
+            assert status['result']['answer'] == 'Answer.'
+
+            assert client.get('/search/rag/jobs/unknown').status_code == 404
+
+    def test_full_queue_returns_429(self, client):
+        """Test that a full queue is reported with Retry-After"""
+        jobs = Mock()
+        jobs.submit.side_effect = QueueFullError('ollama', 42)
+        with patch('routes.get_job_queue', return_value=jobs), patch('routes.getattr', return_value=Mock()):
+            response = client.post('/search/rag/jobs', json={'query': 'What is an FPGA?'})
+
+        assert response.status_code == 429
+        assert response.headers['Retry-After'] == '42'
+        assert response.get_json()['retry_after'] == 42
+
+
+class TestReadinessIntegration:
+    """Integration tests for the readiness endpoint"""
+
+    @pytest.fixture
+    def client(self):
+        """Create a test client for the Flask app"""
+        app.config['TESTING'] = True
+        return app.test_client()
+
+    def test_ready_reports_capabilities(self, client):
+        """Test 503 while a model is warming and 200 once every capability is ready"""
+        warming = {"ready": False, "capabilities": {"keyword": {"status": "ready"}, "semantic": {"status": "warming"}}}
+        ready = {"ready": True, "capabilities": {"keyword": {"status": "ready"}, "semantic": {"status": "ready"}}}
+        warmup = Mock()
+        warmup.status.side_effect = [warming, ready]
+
+        with patch('routes.get_warmup', return_value=warmup):
+            response = client.get('/search/ready')
+            assert response.status_code == 503
+            assert response.get_json()['capabilities']['keyword']['status'] == 'ready'
+
+            response = client.get('/search/ready')
+            assert response.status_code == 200
+            assert response.get_json()['ready'] is True
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,230 @@
+import pytest
+import sys
+import os
+import time
+import numpy as np
+from unittest.mock import Mock, patch
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'app'))
+
+from answer_cache import AnswerCache
+from index_aliases import CONTENT_VERSION_META, mark_index_updated
+from ollama_rag_service import generate_rag_response, stream_rag_response, GENERATION_ERROR
+
+
+def make_doc(hash_code):
+    return {
+        '_id': str(hash_code),
+        '_score': 1.5,
+        '_source': {'author': 'Gáll János', 'year': 2023, 'department': 'cs',
+                    'abstract': 'Neural networks on FPGA.', 'hash_code': hash_code}
+    }
+
+
+@pytest.fixture(autouse=True)
+def packed_context():
+    """Skip sentence scoring, which needs the embedding model"""
+    with patch('ollama_rag_service.build_context', return_value="RELEVANT DOCUMENTS:\n\n") as build_context:
+        yield build_context
+
+
+class TestAnswerCache:
+    """Test cases for the RAG answer cache"""
+
+    def test_exact_tier_normalizes_query(self):
+        """Test that case and whitespace differences share an exact entry"""
+        cache = AnswerCache()
+        cache.put(cache.make_key("What is  FPGA?", "llama3.2:3b", "cs", 5), np.ones(3), frozenset({1}), {"answer": "a"})
+
+        assert cache.get_exact(cache.make_key("what is fpga?", "llama3.2:3b", "cs", 5)) == {"answer": "a"}
+        assert cache.get_exact(cache.make_key("what is fpga?", "llama3.1:8b", "cs", 5)) is None
+        assert cache.get_exact(cache.make_key("what is fpga?", "llama3.2:3b", None, 5)) is None
+
+    def test_semantic_tier_requires_same_documents(self):
+        """Test that a similar query only hits when it retrieved the same hash_codes"""
+        cache = AnswerCache(similarity=0.95)
+        cache.put(cache.make_key("what is an fpga", "llama3.2:3b", None, 5),
+                  np.array([1.0, 0.0, 0.0]), frozenset({1, 2}), {"answer": "a"})
+        key = cache.make_key("explain fpgas", "llama3.2:3b", None, 5)
+        close = np.array([1.0, 0.1, 0.0])
+
+        assert cache.get_semantic(key, close, frozenset({1, 2})) == {"answer": "a"}
+        assert cache.get_semantic(key, close, frozenset({1, 3})) is None
+        assert cache.get_semantic(key, np.array([0.0, 1.0, 0.0]), frozenset({1, 2})) is None
+        assert cache.get_semantic(cache.make_key("explain fpgas", "gemini-1.5-pro", None, 5),
+                                  close, frozenset({1, 2})) is None
+
+        stats = cache.stats()
+        assert stats["semantic_hits"] == 1
+        assert stats["misses"] == 3
+
+    def test_ttl_and_lru(self):
+        """Test that entries expire and the least recently used entry is evicted"""
+        cache = AnswerCache(max_size=2, ttl=0.05)
+        keys = [cache.make_key(f"query {i}", "m", None, 5) for i in range(3)]
+        for key in keys:
+            cache.put(key, np.ones(3), frozenset(), {"answer": key[0]})
+
+        assert cache.get_exact(keys[0]) is None
+        assert cache.get_exact(keys[2]) == {"answer": "query 2"}
+
+        time.sleep(0.06)
+        assert cache.get_exact(keys[2]) is None
+
+    def test_alias_change_clears_cache(self):
+        """Test that pointing an alias at a new index drops all entries"""
+        cache = AnswerCache(alias_check_interval=0)
+        mock_es = Mock()
+        mock_es.indices.get_mapping.return_value = {'cs_theses_semantic_v1': {}, 'infos_theses_semantic_v1': {}}
+        cache.check_aliases(mock_es)
+
+        key = cache.make_key("query", "m", None, 5)
+        cache.put(key, np.ones(3), frozenset(), {"answer": "a"})
+        cache.check_aliases(mock_es)
+        assert cache.get_exact(key) == {"answer": "a"}
+
+        mock_es.indices.get_mapping.return_value = {'cs_theses_semantic_v2': {}, 'infos_theses_semantic_v1': {}}
+        cache.check_aliases(mock_es)
+        assert cache.get_exact(key) is None
+
+    def test_legacy_concrete_indices(self):
+        """Test that concrete indices without an alias are resolved instead of failing the check"""
+        cache = AnswerCache(alias_check_interval=0)
+        mock_es = Mock()
+        mock_es.indices.get_mapping.return_value = {'cs_theses_semantic': {'mappings': {}},
+                                                    'infos_theses_semantic_v1': {'mappings': {}}}
+        cache.check_aliases(mock_es)
+
+        assert mock_es.indices.get_mapping.call_args[1] == {
+            'index': 'cs_theses_semantic,infos_theses_semantic', 'ignore_unavailable': True
+        }
+        assert cache._alias_generation == frozenset({('cs_theses_semantic', None), ('infos_theses_semantic_v1', None)})
+
+    def test_marked_update_clears_cache(self):
+        """Test that a content version recorded by an incremental sync drops all entries"""
+        cache = AnswerCache(alias_check_interval=0)
+        mock_es = Mock()
+        mappings = {'cs_theses_semantic_v1': {'mappings': {}}, 'infos_theses_semantic_v1': {'mappings': {}}}
+        mock_es.indices.get_mapping.return_value = mappings
+        cache.check_aliases(mock_es)
+
+        key = cache.make_key("query", "m", None, 5)
+        cache.put(key, np.ones(3), frozenset(), {"answer": "a"})
+
+        version = mark_index_updated(mock_es, 'cs_theses_semantic')
+        meta = mock_es.indices.put_mapping.call_args[1]['body']['_meta']
+        assert meta == {CONTENT_VERSION_META: version}
+
+        mappings['cs_theses_semantic_v1'] = {'mappings': {'_meta': meta}}
+        cache.check_aliases(mock_es)
+        assert cache.get_exact(key) is None
+
+
+class TestCachedRagResponse:
+    """Test cases for answer caching in generate_rag_response"""
+
+    @pytest.fixture
+    def cache(self):
+        cache = AnswerCache(alias_check_interval=3600)
+        with patch('ollama_rag_service.get_answer_cache', return_value=cache):
+            yield cache
+
+    def test_exact_hit_skips_retrieval_and_generation(self, cache):
+        """Test that a repeated question is answered from the cache"""
+        with patch('ollama_rag_service.retrieve_documents', return_value=[make_doc(1)]) as retrieve, \
+             patch('ollama_rag_service.encode_query', return_value=np.ones(3)), \
+             patch('ollama_rag_service.generate_answer_with_ollama', return_value="FPGAs are fast.") as generate:
+            first = generate_rag_response(Mock(), "What is an FPGA?", "llama3.2:3b")
+            second = generate_rag_response(Mock(), "what is an  FPGA?", "llama3.2:3b")
+
+        assert generate.call_count == 1
+        assert retrieve.call_count == 1
+        assert second["answer"] == first["answer"]
+        assert second["cached"] == "exact"
+        assert "cached" not in first
+
+    def test_semantic_hit_skips_generation(self, cache):
+        """Test that a paraphrase retrieving the same theses reuses the answer"""
+        with patch('ollama_rag_service.retrieve_documents', return_value=[make_doc(1), make_doc(2)]), \
+             patch('ollama_rag_service.encode_query', side_effect=[np.array([1.0, 0.0]), np.array([1.0, 0.05])]), \
+             patch('ollama_rag_service.generate_answer_with_ollama', return_value="FPGAs are fast.") as generate:
+            generate_rag_response(Mock(), "What is an FPGA?", "llama3.2:3b")
+            second = generate_rag_response(Mock(), "Explain FPGAs", "llama3.2:3b")
+
+        assert generate.call_count == 1
+        assert second["cached"] == "semantic"
+
+    def test_errors_are_not_cached(self, cache):
+        """Test that failed generations are retried on the next request"""
+        with patch('ollama_rag_service.retrieve_documents', return_value=[make_doc(1)]), \
+             patch('ollama_rag_service.encode_query', return_value=np.ones(3)), \
+             patch('ollama_rag_service.generate_answer_with_ollama',
+                   return_value=f"{GENERATION_ERROR}: connection refused") as generate:
+            generate_rag_response(Mock(), "What is an FPGA?", "llama3.2:3b")
+            generate_rag_response(Mock(), "What is an FPGA?", "llama3.2:3b")
+
+        assert generate.call_count == 2
+        assert cache.stats()["size"] == 0
+
+
+class TestCachedRagStream:
+    """Test cases for answer caching in stream_rag_response"""
+
+    @pytest.fixture
+    def cache(self):
+        cache = AnswerCache(alias_check_interval=3600)
+        with patch('ollama_rag_service.get_answer_cache', return_value=cache), \
+             patch('ollama_rag_service.prepare_context', return_value="context"):
+            yield cache
+
+    @staticmethod
+    def chunks(*args):
+        return iter([{"response": "FPGAs ", "done": False}, {"response": "are fast.", "done": False},
+                     {"response": "", "done": True}])
+
+    def test_streamed_answer_is_replayed(self, cache):
+        """Test that a streamed answer is cached and replayed as events without generating again"""
+        with patch('ollama_rag_service.retrieve_documents', return_value=[make_doc(1)]) as retrieve, \
+             patch('ollama_rag_service.encode_query', return_value=np.ones(3)), \
+             patch('ollama_rag_service.stream_answer_with_ollama', side_effect=self.chunks) as stream:
+            first = list(stream_rag_response(Mock(), "What is an FPGA?", "llama3.2:3b"))
+            second = list(stream_rag_response(Mock(), "what is an FPGA?", "llama3.2:3b"))
+
+        assert stream.call_count == 1
+        assert retrieve.call_count == 1
+        assert [event["event"] for event in second] == ["references", "token", "done"]
+        assert second[0]["data"] == first[0]["data"]
+        assert second[1]["data"]["text"] == "FPGAs are fast."
+        assert second[-1]["data"]["cached"] == "exact"
+        assert "cached" not in first[-1]["data"]
+
+    def test_generated_answer_is_streamed_from_cache(self, cache):
+        """Test that an answer of generate_rag_response serves the streaming endpoint, semantically"""
+        with patch('ollama_rag_service.retrieve_documents', return_value=[make_doc(1), make_doc(2)]), \
+             patch('ollama_rag_service.encode_query', side_effect=[np.array([1.0, 0.0]), np.array([1.0, 0.05])]), \
+             patch('ollama_rag_service.generate_answer_with_ollama', return_value="FPGAs are fast."), \
+             patch('ollama_rag_service.stream_answer_with_ollama') as stream:
+            generate_rag_response(Mock(), "What is an FPGA?", "llama3.2:3b")
+            events = list(stream_rag_response(Mock(), "Explain FPGAs", "llama3.2:3b"))
+
+        stream.assert_not_called()
+        assert events[1]["data"]["text"] == "FPGAs are fast."
+        assert events[-1]["data"]["cached"] == "semantic"
+
+    def test_failed_stream_is_not_cached(self, cache):
+        """Test that an answer cut off by an error is not cached"""
+        def failing(*args):
+            yield {"response": "FPGAs ", "done": False}
+            raise RuntimeError("connection reset")
+
+        with patch('ollama_rag_service.retrieve_documents', return_value=[make_doc(1)]), \
+             patch('ollama_rag_service.encode_query', return_value=np.ones(3)), \
+             patch('ollama_rag_service.stream_answer_with_ollama', side_effect=failing):
+            events = list(stream_rag_response(Mock(), "What is an FPGA?", "llama3.2:3b"))
+
+        assert events[-1]["event"] == "error"
+        assert cache.stats()["size"] == 0
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,115 @@
+import pytest
+import sys
+import os
+import re
+import numpy as np
+from unittest.mock import Mock, patch
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'app'))
+
+from context_builder import build_context, context_budget, estimate_tokens, split_sentences, CONTEXT_TOKEN_BUDGETS
+from ollama_rag_service import prepare_context
+
+
+def bag_of_words(text, size=256):
+    """Deterministic stand-in for a sentence embedding"""
+    vector = np.zeros(size, dtype=np.float32)
+    for word in re.findall(r"[a-z]+", text.lower()):
+        vector[sum(map(ord, word)) % size] += 1.0
+    return vector
+
+
+@pytest.fixture
+def fake_model():
+    model = Mock()
+    model.encode.side_effect = lambda texts: np.stack([bag_of_words(text) for text in texts])
+    with patch('context_builder.get_model', return_value=model), \
+         patch('context_builder.encode_query', side_effect=bag_of_words):
+        yield model
+
+
+def make_doc(author, abstract):
+    return {'_source': {'author': author, 'year': 2023, 'department': 'cs', 'abstract': abstract}}
+
+
+@pytest.fixture
+def documents():
+    return [
+        make_doc('Gáll János',
+                 'This thesis was written at the university. '
+                 'We implement convolutional neural networks on an FPGA accelerator. '
+                 'The weather was nice during the project. '
+                 'The FPGA design reaches real-time inference for neural networks.'),
+        make_doc('Hammas Attila',
+                 'Smart home systems connect many devices. '
+                 'We implement convolutional neural networks on an FPGA accelerator. '
+                 'An FPGA board controls the lights.'),
+        make_doc('Bálint Adolf', 'Web development thesis abstract. It uses JavaScript.')
+    ]
+
+
+class TestContextBuilder:
+    """Test cases for token-budgeted context packing"""
+
+    def test_split_sentences(self):
+        """Test sentence splitting on terminal punctuation"""
+        assert split_sentences("First one. Second one!  Third?\nFourth") == \
+            ["First one.", "Second one!", "Third?", "Fourth"]
+        assert split_sentences("Version 2.0 of the system. It works.") == ["Version 2.0 of the system.", "It works."]
+
+    def test_relevant_sentences_fit_the_budget(self, fake_model, documents):
+        """Test that a tight budget keeps the relevant sentences and drops boilerplate"""
+        context = build_context(documents, "neural networks on FPGA", token_budget=100)
+
+        assert estimate_tokens(context) <= 100
+        assert 'convolutional neural networks on an FPGA accelerator' in context
+        assert 'The weather was nice' not in context
+        assert 'This thesis was written' not in context
+        assert 'An FPGA board controls the lights.' in context
+
+    def test_duplicate_sentences_are_dropped(self, fake_model, documents):
+        """Test that a sentence repeated across abstracts is packed once"""
+        context = build_context(documents, "neural networks on FPGA", token_budget=1000)
+
+        assert context.count('We implement convolutional neural networks on an FPGA accelerator.') == 1
+        assert '[Hammas Attila (2023)]' in context
+        assert 'An FPGA board controls the lights.' in context
+
+    def test_sentences_keep_document_order(self, fake_model, documents):
+        """Test that documents stay in retrieval order and sentences in abstract order"""
+        context = build_context(documents, "neural networks on FPGA", token_budget=1000)
+
+        assert context.index('Gáll János') < context.index('Hammas Attila') < context.index('Bálint Adolf')
+        assert context.index('We implement convolutional') < context.index('The FPGA design reaches')
+
+    def test_one_encode_call(self, fake_model, documents):
+        """Test that all sentences are embedded in a single batch"""
+        build_context(documents, "neural networks on FPGA", token_budget=1000)
+
+        assert fake_model.encode.call_count == 1
+
+    def test_passages_replace_abstract(self, fake_model):
+        """Test that retrieved passages are packed instead of the abstract"""
+        document = make_doc('Gáll János', 'An abstract about FPGA design.')
+        document['_source']['passages'] = [{'passage_index': 3, 'text': 'Neural networks run on the FPGA fabric.'}]
+
+        context = build_context([document], "neural networks on FPGA", token_budget=1000)
+
+        assert 'Passages: Neural networks run on the FPGA fabric.' in context
+        assert 'An abstract about FPGA design.' not in context
+
+    def test_budget_per_model(self):
+        """Test the per-model budgets and the default"""
+        assert context_budget('llama3.2:1b') == CONTEXT_TOKEN_BUDGETS['llama3.2:1b']
+        assert context_budget('unknown') == context_budget(None)
+
+    def test_prepare_context_without_query(self, documents):
+        """Test that prepare_context keeps the truncating format when no query is given"""
+        context = prepare_context(documents)
+
+        assert context.startswith('RELEVANT DOCUMENTS:')
+        assert 'This thesis was written at the university.' in context
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
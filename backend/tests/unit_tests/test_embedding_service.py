@@ -0,0 +1,181 @@
+import pytest
+import sys
+import os
+import threading
+import numpy as np
+from unittest.mock import Mock, patch
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'app'))
+
+import embedding_service
+from embedding_service import (
+    BatchingEncoder,
+    QueryEmbeddingCache,
+    encode_query,
+    normalize_query
+)
+
+
+def encode_by_length(texts):
+    """Fake encoder returning one vector per text, derived from the text length"""
+    if isinstance(texts, str):
+        return np.full(3, len(texts), dtype=np.float64)
+    return np.array([np.full(3, len(text)) for text in texts], dtype=np.float64)
+
+
+class TestQueryEmbeddingCache:
+    """Test cases for the shared query embedding cache"""
+
+    @pytest.fixture
+    def mock_model(self):
+        """Mock SentenceTransformer returning a vector derived from the text length"""
+        model = Mock()
+        model.encode.side_effect = encode_by_length
+        with patch('embedding_service.get_model', return_value=model):
+            yield model
+
+    @pytest.fixture
+    def fresh_cache(self):
+        """Replace the module cache with an empty one for each test"""
+        cache = QueryEmbeddingCache(max_size=2)
+        with patch.object(embedding_service, '_query_cache', cache):
+            yield cache
+
+    def test_normalize_query(self):
+        """Test whitespace and case normalization of query text"""
+        assert normalize_query('  Machine   LEARNING ') == 'machine learning'
+        assert normalize_query('') == ''
+        assert normalize_query(None) == ''
+
+    def test_repeated_query_hits_cache(self, mock_model, fresh_cache):
+        """Test that a repeated query is encoded only once"""
+        first = encode_query('Neural Networks')
+        second = encode_query('neural   networks')
+
+        assert mock_model.encode.call_count == 1
+        assert first.dtype == np.float32
+        assert np.array_equal(first, second)
+        assert fresh_cache.stats()['hits'] == 1
+        assert fresh_cache.stats()['misses'] == 1
+
+    def test_lru_eviction(self, mock_model, fresh_cache):
+        """Test that the least recently used query is evicted first"""
+        encode_query('a')
+        encode_query('bb')
+        encode_query('a')
+        encode_query('ccc')
+
+        assert fresh_cache.get('a') is not None
+        assert fresh_cache.get('bb') is None
+        assert fresh_cache.stats()['size'] == 2
+
+    def test_cached_vectors_are_read_only(self, mock_model, fresh_cache):
+        """Test that callers cannot mutate a cached vector"""
+        vector = encode_query('iot')
+
+        with pytest.raises(ValueError):
+            vector[0] = 0.0
+
+    def test_persistence_round_trip(self, tmp_path):
+        """Test saving and reloading the cache from disk"""
+        path = str(tmp_path / 'cache.npz')
+        cache = QueryEmbeddingCache(max_size=10, persist_path=path, model_name='test-model')
+        cache.put('machine learning', np.array([1.0, 2.0], dtype=np.float32))
+        cache.save()
+
+        reloaded = QueryEmbeddingCache(max_size=10, persist_path=path, model_name='test-model')
+        assert np.array_equal(reloaded.get('machine learning'), [1.0, 2.0])
+
+        other_model = QueryEmbeddingCache(max_size=10, persist_path=path, model_name='other-model')
+        assert other_model.get('machine learning') is None
+
+
+class TestBatchingEncoder:
+    """Test cases for the micro-batching encoder worker"""
+
+    def test_concurrent_encodes_are_batched(self):
+        """Test that encodes arriving within the window run as one batch"""
+        model = Mock()
+        model.encode.side_effect = encode_by_length
+        batcher = BatchingEncoder(window_ms=200, max_batch_size=8, model_getter=lambda: model)
+
+        texts = ['a', 'bb', 'ccc', 'dddd']
+        results = {}
+
+        def worker(text):
+            results[text] = batcher.encode(text)
+
+        threads = [threading.Thread(target=worker, args=(text,)) for text in texts]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert model.encode.call_count == 1
+        assert sorted(model.encode.call_args[0][0]) == sorted(texts)
+        for text in texts:
+            assert results[text].dtype == np.float32
+            assert results[text][0] == len(text)
+
+    def test_max_batch_size(self):
+        """Test that a full batch is encoded without waiting for the window"""
+        model = Mock()
+        model.encode.side_effect = encode_by_length
+        batcher = BatchingEncoder(window_ms=10000, max_batch_size=2, model_getter=lambda: model)
+
+        futures = [batcher.submit(text) for text in ['a', 'bb']]
+
+        assert futures[1].result(timeout=5)[0] == 2
+        assert batcher.stats()['batches'] == 1
+
+    def test_duplicate_texts_share_future(self):
+        """Test that identical in-flight texts are encoded once"""
+        model = Mock()
+        model.encode.side_effect = encode_by_length
+        batcher = BatchingEncoder(window_ms=100, max_batch_size=8, model_getter=lambda: model)
+
+        first = batcher.submit('iot')
+        second = batcher.submit('iot')
+
+        assert first is second
+        first.result(timeout=5)
+        assert model.encode.call_args[0][0] == ['iot']
+
+    def test_encode_error_is_propagated(self):
+        """Test that a model failure is raised in every waiting caller"""
+        model = Mock()
+        model.encode.side_effect = RuntimeError("model failed")
+        batcher = BatchingEncoder(window_ms=1, max_batch_size=8, model_getter=lambda: model)
+
+        with pytest.raises(RuntimeError):
+            batcher.encode('query')
+
+    def test_stuck_batch_falls_back_to_direct_encode(self):
+        """Test that encode_query does not hang when the batcher never completes"""
+        model = Mock()
+        model.encode.side_effect = encode_by_length
+        batcher = Mock()
+        batcher.encode.side_effect = embedding_service.FutureTimeoutError()
+
+        with patch.object(embedding_service, '_batcher', batcher), \
+             patch.object(embedding_service, '_query_cache', QueryEmbeddingCache(max_size=2)), \
+             patch('embedding_service.get_model', return_value=model):
+            vector = encode_query('timeout')
+
+        batcher.encode.assert_called_once_with('timeout', embedding_service.EMBEDDING_BATCH_TIMEOUT_S)
+        assert vector[0] == len('timeout')
+
+    def test_encode_timeout(self):
+        """Test that a caller waits at most the given timeout for its batch"""
+        release = threading.Event()
+        model = Mock()
+        model.encode.side_effect = lambda texts: release.wait(5) and encode_by_length(texts)
+        batcher = BatchingEncoder(window_ms=1, max_batch_size=8, model_getter=lambda: model)
+
+        with pytest.raises(embedding_service.FutureTimeoutError):
+            batcher.encode('slow', timeout=0.05)
+        release.set()
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
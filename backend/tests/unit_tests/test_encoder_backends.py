@@ -0,0 +1,142 @@
+import pytest
+import sys
+import os
+import numpy as np
+from unittest.mock import Mock, patch
+from tokenizers import Tokenizer
+from tokenizers.models import WordLevel
+from tokenizers.pre_tokenizers import Whitespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'app'))
+
+import encoder_backends
+from encoder_backends import OnnxEncoder, check_parity, encoder_fingerprint, load_encoder
+
+VOCAB = {"[PAD]": 0, "[UNK]": 1, "neural": 2, "networks": 3, "on": 4, "fpga": 5, "smart": 6, "home": 7}
+
+
+def make_tokenizer():
+    """Word-level tokenizer over a tiny vocabulary"""
+    tokenizer = Tokenizer(WordLevel(VOCAB, unk_token="[UNK]"))
+    tokenizer.pre_tokenizer = Whitespace()
+    tokenizer.enable_padding(pad_id=0, pad_token="[PAD]")
+    return tokenizer
+
+
+class FakeSession:
+    """ONNX Runtime session whose hidden state of a token is a one-hot vector of its id"""
+
+    def __init__(self, input_names=("input_ids", "attention_mask", "token_type_ids")):
+        self.inputs = [Mock() for _ in input_names]
+        for node, name in zip(self.inputs, input_names):
+            node.name = name
+        self.feeds = []
+
+    def get_inputs(self):
+        return self.inputs
+
+    def run(self, output_names, feeds):
+        self.feeds.append(feeds)
+        input_ids = feeds["input_ids"]
+        hidden = np.zeros(input_ids.shape + (len(VOCAB),), dtype=np.float32)
+        for row, ids in enumerate(input_ids):
+            for position, token_id in enumerate(ids):
+                hidden[row, position, token_id] = 1.0
+        return [hidden]
+
+
+class TestOnnxEncoder:
+    """Test cases for the ONNX Runtime encoder"""
+
+    def test_mean_pooling_ignores_padding(self):
+        """Test that a text gets the same vector alone and padded in a batch"""
+        encoder = OnnxEncoder(FakeSession(), make_tokenizer(), normalize=False)
+
+        batch = encoder.encode(["neural networks on fpga", "smart home"])
+        single = encoder.encode("smart home")
+
+        assert batch.shape == (2, len(VOCAB))
+        assert single.shape == (len(VOCAB),)
+        np.testing.assert_allclose(batch[1], single)
+        np.testing.assert_allclose(single[[6, 7]], [0.5, 0.5])
+        assert single[0] == 0.0
+
+    def test_normalized_vectors_keep_input_order(self):
+        """Test that length-sorted batching returns vectors in input order, normalized"""
+        encoder = OnnxEncoder(FakeSession(), make_tokenizer())
+        vectors = encoder.encode(["smart", "neural networks on fpga", "home"], batch_size=2)
+
+        np.testing.assert_allclose(np.linalg.norm(vectors, axis=1), 1.0, rtol=1e-6)
+        assert vectors[0].argmax() == 6
+        assert vectors[2].argmax() == 7
+        assert encoder.get_sentence_embedding_dimension() == len(VOCAB)
+
+    def test_feeds_only_model_inputs(self):
+        """Test that token_type_ids is not fed to exports without that input"""
+        session = FakeSession(input_names=("input_ids", "attention_mask"))
+        OnnxEncoder(session, make_tokenizer()).encode("neural networks")
+
+        assert set(session.feeds[0]) == {"input_ids", "attention_mask"}
+        assert session.feeds[0]["input_ids"].dtype == np.int64
+
+    def test_cls_pooling(self):
+        """Test pooling on the first token"""
+        encoder = OnnxEncoder(FakeSession(), make_tokenizer(), pooling="cls", normalize=False)
+
+        assert encoder.encode("smart home").argmax() == 6
+
+
+class TestLoadEncoder:
+    """Test cases for backend selection"""
+
+    def test_unknown_backend(self):
+        with pytest.raises(ValueError):
+            load_encoder("all-MiniLM-L6-v2", "tensorflow")
+
+    def test_missing_export(self, tmp_path):
+        pytest.importorskip("onnxruntime")
+        with pytest.raises(FileNotFoundError):
+            load_encoder("all-MiniLM-L6-v2", "onnx-int8", onnx_dir=str(tmp_path))
+
+    def test_export_of_another_model(self):
+        """Test that an export made from another model is rejected"""
+        encoder = OnnxEncoder(FakeSession(), make_tokenizer(), model_name="BAAI/bge-small-en")
+        with patch.object(OnnxEncoder, 'from_dir', return_value=encoder) as from_dir:
+            with pytest.raises(ValueError):
+                load_encoder("all-MiniLM-L6-v2", "onnx", onnx_dir="/models/onnx")
+
+        from_dir.assert_called_once_with("/models/onnx", "model.onnx")
+
+    def test_fingerprint(self):
+        assert encoder_fingerprint("all-MiniLM-L6-v2", "torch") == "all-MiniLM-L6-v2"
+        assert encoder_fingerprint("all-MiniLM-L6-v2", "onnx-int8") == "all-MiniLM-L6-v2@onnx-int8"
+
+
+class TestParity:
+    """Test cases for the cosine agreement check against the torch vectors"""
+
+    def test_agreeing_vectors(self):
+        rng = np.random.default_rng(0)
+        expected = rng.normal(size=(10, 8)).astype(np.float32)
+        actual = expected * 3.0 + rng.normal(scale=0.01, size=expected.shape)
+
+        result = check_parity(expected, actual)
+
+        assert result["texts"] == 10
+        assert result["min_cosine"] > 0.99
+
+    def test_disagreeing_vectors(self):
+        expected = np.eye(3, dtype=np.float32)
+        actual = expected.copy()
+        actual[2] = [0.0, 1.0, 1.0]
+
+        with pytest.raises(ValueError, match="text 2"):
+            check_parity(expected, actual)
+
+    def test_shape_mismatch(self):
+        with pytest.raises(ValueError):
+            check_parity(np.ones((2, 3)), np.ones((2, 4)))
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,154 @@
+import pytest
+import sys
+import os
+import types
+from unittest.mock import Mock, patch
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'scripts', 'pdf_processing'))
+
+from extraction_cache import CachedPages, ExtractionCache, file_sha256
+
+
+class FakePage:
+    def __init__(self, text, calls):
+        self.text = text
+        self.calls = calls
+
+    def extract_text(self):
+        self.calls.append(self.text)
+        return self.text
+
+
+@pytest.fixture
+def fake_pdfplumber():
+    """pdfplumber stand-in whose PDFs are text files with one page per line, counting page extractions"""
+    calls = []
+
+    def open_pdf(path):
+        with open(path, encoding="utf-8") as f:
+            pdf = Mock()
+            pdf.pages = [FakePage(line.rstrip("\n"), calls) for line in f]
+        return pdf
+
+    module = types.ModuleType("pdfplumber")
+    module.open = Mock(side_effect=open_pdf)
+    module.calls = calls
+    with patch.dict(sys.modules, {"pdfplumber": module}):
+        yield module
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = ExtractionCache(str(tmp_path / "cache" / "extraction_cache.sqlite"))
+    yield cache
+    cache.close()
+
+
+@pytest.fixture
+def pdf_path(tmp_path):
+    path = tmp_path / "thesis.pdf"
+    path.write_text("Title page\nAbstract\nIntroduction\nConclusion\n", encoding="utf-8")
+    return str(path)
+
+
+class TestExtractionCache:
+    """Test cases for the SQLite page text cache"""
+
+    def test_get_missing(self, cache):
+        """Test that an unknown PDF is a miss"""
+        assert cache.get("0" * 64) is None
+
+    def test_put_and_get(self, cache):
+        """Test that pages round-trip, including non-ASCII text"""
+        cache.put("abc", 12, ["Témavezető: Antal Margit", ""])
+
+        assert cache.get("abc") == {"page_count": 12, "pages": ["Témavezető: Antal Margit", ""]}
+        stats = cache.stats()
+        assert (stats["pdfs"], stats["pages"]) == (1, 2)
+        assert stats["compressed_bytes"] > 0
+
+    def test_put_only_grows(self, cache):
+        """Test that an entry is extended with deeper pages but never shortened"""
+        cache.put("abc", 5, ["1", "2"])
+        cache.put("abc", 5, ["1"])
+        assert cache.get("abc")["pages"] == ["1", "2"]
+
+        cache.put("abc", 5, ["1", "2", "3"])
+        assert cache.get("abc")["pages"] == ["1", "2", "3"]
+
+    def test_extractor_version(self, cache):
+        """Test that entries of another extractor version are ignored"""
+        cache.put("abc", 1, ["text"])
+        other = ExtractionCache(cache.path, extractor_version="other")
+
+        assert other.get("abc") is None
+        assert other.stats()["pdfs"] == 0
+        other.close()
+
+    def test_file_sha256(self, tmp_path, pdf_path):
+        """Test that the key depends on the content, not the file name"""
+        copy = tmp_path / "renamed.pdf"
+        copy.write_bytes(open(pdf_path, "rb").read())
+
+        assert file_sha256(pdf_path) == file_sha256(str(copy))
+        copy.write_text("Edited", encoding="utf-8")
+        assert file_sha256(pdf_path) != file_sha256(str(copy))
+
+
+class TestCachedPages:
+    """Test cases for serving page text from the cache"""
+
+    def test_without_cache(self, fake_pdfplumber, pdf_path):
+        """Test that pages are read lazily from pdfplumber"""
+        with CachedPages(pdf_path) as pages:
+            assert len(pages) == 4
+            assert pages[1] == "Abstract"
+
+        assert fake_pdfplumber.calls == ["Title page", "Abstract"]
+
+    def test_second_read_is_served_from_cache(self, fake_pdfplumber, cache, pdf_path):
+        """Test that cached leading pages need no pdfplumber at all"""
+        with CachedPages(pdf_path, cache) as pages:
+            assert pages.read(2) == ["Title page", "Abstract"]
+
+        fake_pdfplumber.open.reset_mock()
+        with CachedPages(pdf_path, cache) as pages:
+            assert len(pages) == 4
+            assert pages.read(2) == ["Title page", "Abstract"]
+
+        fake_pdfplumber.open.assert_not_called()
+        assert fake_pdfplumber.calls == ["Title page", "Abstract"]
+
+    def test_deeper_pages_extend_the_entry(self, fake_pdfplumber, cache, pdf_path):
+        """Test that only the pages beyond the cached ones are extracted and then cached"""
+        with CachedPages(pdf_path, cache) as pages:
+            pages.read(1)
+        with CachedPages(pdf_path, cache) as pages:
+            assert pages.read() == ["Title page", "Abstract", "Introduction", "Conclusion"]
+
+        assert fake_pdfplumber.calls == ["Title page", "Abstract", "Introduction", "Conclusion"]
+        assert cache.get(file_sha256(pdf_path)) == {
+            "page_count": 4, "pages": ["Title page", "Abstract", "Introduction", "Conclusion"]
+        }
+
+    def test_index_out_of_range(self, fake_pdfplumber, pdf_path):
+        """Test that reading past the last page raises IndexError"""
+        with CachedPages(pdf_path) as pages:
+            with pytest.raises(IndexError):
+                pages[4]
+
+    def test_cache_errors_are_not_fatal(self, fake_pdfplumber, pdf_path):
+        """Test that a failing cache write does not fail the extraction"""
+        import sqlite3
+        cache = Mock()
+        cache.get.return_value = None
+        cache.put.side_effect = sqlite3.OperationalError("database is locked")
+
+        with CachedPages(pdf_path, cache) as pages:
+            assert pages[0] == "Title page"
+
+        cache.put.assert_called_once()
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
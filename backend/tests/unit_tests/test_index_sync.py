@@ -0,0 +1,212 @@
+import pytest
+import sys
+import os
+import numpy as np
+from unittest.mock import Mock, patch
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'app'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'scripts', 'data_loading'))
+
+import index_sync
+from index_sync import (
+    FINGERPRINT_FIELD,
+    SyncActionBuilder,
+    generate_sync_actions,
+    sync_index,
+    thesis_doc_id,
+    thesis_fingerprint
+)
+
+
+def make_thesis(hash_code, abstract="An abstract", year=2022):
+    return {"hash_code": hash_code, "author": f"Author {hash_code}", "supervisor": "Supervisor",
+            "year": year, "abstract": abstract, "keywords": ["Machine Learning"]}
+
+
+def indexed_fingerprints(theses, model_name=None, id_prefix=""):
+    """Document id to fingerprint map as fetch_fingerprints returns it after a sync"""
+    actions = generate_sync_actions([dict(thesis) for thesis in theses], {}, "theses",
+                                    model_name=model_name, id_prefix=id_prefix)
+    return {action["_id"]: action["_source"][FINGERPRINT_FIELD] for action in actions}
+
+
+class TestFingerprint:
+    """Test cases for thesis fingerprints and document ids"""
+
+    def test_stable_for_equal_content(self):
+        """Test that key order and the stored vector do not change the fingerprint"""
+        thesis = make_thesis(1)
+        reordered = dict(reversed(list(thesis.items())), abstract_vector=[0.1, 0.2])
+
+        assert thesis_fingerprint(thesis, "model") == thesis_fingerprint(reordered, "model")
+
+    def test_changes_with_content_and_model(self):
+        """Test that edited content or another embedding model changes the fingerprint"""
+        thesis = make_thesis(1)
+
+        assert thesis_fingerprint(thesis, "model") != thesis_fingerprint(make_thesis(1, "Edited"), "model")
+        assert thesis_fingerprint(thesis, "model") != thesis_fingerprint(thesis, "other-model")
+
+    def test_doc_id_uses_hash_code(self):
+        """Test that document ids come from the hash_code and require one"""
+        assert thesis_doc_id(make_thesis(42), "infos_") == "infos_42"
+        with pytest.raises(ValueError):
+            thesis_doc_id({"author": "Nobody"})
+
+
+class TestSyncActionBuilder:
+    """Test cases for the incremental sync actions"""
+
+    @pytest.fixture
+    def model(self):
+        model = Mock()
+        model.encode.side_effect = lambda abstracts, batch_size: np.ones((len(abstracts), 3))
+        return model
+
+    def test_adds_new_theses(self, model):
+        """Test that new theses are embedded together and indexed with their fingerprint"""
+        stats = {}
+        builder = SyncActionBuilder({}, "theses", model, "model", stats=stats)
+
+        actions = builder.batch_actions([make_thesis(1), make_thesis(2)])
+
+        assert [action["_id"] for action in actions] == ["1", "2"]
+        assert actions[0]["_source"]["abstract_vector"] == [1.0, 1.0, 1.0]
+        assert FINGERPRINT_FIELD in actions[0]["_source"]
+        model.encode.assert_called_once()
+        assert stats["added"] == 2
+
+    def test_skips_unchanged_theses(self, model):
+        """Test that unchanged theses are neither embedded nor indexed"""
+        theses = [make_thesis(1), make_thesis(2)]
+        existing = indexed_fingerprints(theses, "model")
+        stats = {}
+        builder = SyncActionBuilder(existing, "theses", model, "model", stats=stats)
+
+        actions = builder.batch_actions([dict(thesis) for thesis in theses])
+
+        assert actions == []
+        model.encode.assert_not_called()
+        assert stats["unchanged"] == 2
+
+    def test_updates_changed_theses(self, model):
+        """Test that a changed thesis is re-embedded under the same id"""
+        existing = indexed_fingerprints([make_thesis(1), make_thesis(2)], "model")
+        stats = {}
+        changed_years = set()
+        builder = SyncActionBuilder(existing, "theses", model, "model", stats=stats, changed_years=changed_years)
+
+        actions = builder.batch_actions([make_thesis(1), make_thesis(2, "Edited", 2023)])
+
+        assert [action["_id"] for action in actions] == ["2"]
+        assert stats["updated"] == 1
+        assert stats["unchanged"] == 1
+        assert changed_years == {2023}
+
+    def test_skips_theses_without_abstract_or_id(self, model):
+        """Test that theses without an abstract or hash_code are skipped"""
+        stats = {}
+        builder = SyncActionBuilder({}, "theses", model, "model", stats=stats)
+
+        actions = builder.batch_actions([make_thesis(1, abstract=""), {"author": "Nobody", "abstract": "Text"}])
+
+        assert actions == []
+        assert stats["skipped"] == 2
+
+    def test_keyword_index_keeps_theses_without_abstract(self):
+        """Test that indices without vectors keep theses that have no abstract"""
+        builder = SyncActionBuilder({}, "theses")
+
+        actions = builder.batch_actions([make_thesis(1, abstract="")])
+
+        assert [action["_id"] for action in actions] == ["1"]
+        assert "abstract_vector" not in actions[0]["_source"]
+
+    def test_deletes_vanished_theses(self):
+        """Test that documents missing from the input are deleted after the batches"""
+        existing = indexed_fingerprints([make_thesis(i) for i in range(4)])
+        stats = {}
+        builder = SyncActionBuilder(existing, "theses", stats=stats)
+
+        builder.batch_actions([make_thesis(i) for i in range(3)])
+        deletes = list(builder.delete_actions())
+
+        assert deletes == [{"_op_type": "delete", "_index": "theses", "_id": "3"}]
+        assert stats["deleted"] == 1
+
+    @pytest.mark.parametrize("seen_count", [0, 1])
+    def test_blocks_mass_delete(self, seen_count):
+        """Test that nothing is deleted when the input covers too few of the existing documents"""
+        existing = indexed_fingerprints([make_thesis(i) for i in range(4)])
+        stats = {}
+        builder = SyncActionBuilder(existing, "theses", stats=stats)
+
+        builder.batch_actions([make_thesis(i) for i in range(seen_count)])
+        deletes = list(builder.delete_actions())
+
+        assert deletes == []
+        assert stats["deleted"] == 0
+        assert stats["delete_blocked"] == 4 - seen_count
+
+    def test_allows_mass_delete_when_requested(self):
+        """Test that the guard can be overridden explicitly"""
+        existing = indexed_fingerprints([make_thesis(i) for i in range(4)])
+        builder = SyncActionBuilder(existing, "theses", allow_mass_delete=True)
+
+        deletes = list(builder.delete_actions())
+
+        assert [action["_id"] for action in deletes] == ["0", "1", "2", "3"]
+
+    def test_generate_sync_actions_batches_and_deletes(self, model):
+        """Test that generate_sync_actions encodes per batch and deletes at the end"""
+        existing = indexed_fingerprints([make_thesis(i) for i in range(1, 5)], "model", "infos_")
+        theses = [make_thesis(i) for i in range(5)] + [make_thesis(5, "Edited")]
+        existing["infos_99"] = "old"
+        stats = {}
+
+        actions = list(generate_sync_actions(theses, existing, "theses", model, "model", batch_size=2,
+                                             id_prefix="infos_", stats=stats))
+
+        assert [(action.get("_op_type", "index"), action["_id"]) for action in actions] == [
+            ("index", "infos_0"), ("index", "infos_5"), ("delete", "infos_99")]
+        assert model.encode.call_count == 2
+        assert stats == {"added": 2, "updated": 0, "unchanged": 4, "deleted": 1,
+                         "skipped": 0, "delete_blocked": 0}
+
+
+class TestSyncIndex:
+    """Test cases for sync_index with a mocked Elasticsearch client"""
+
+    def test_sync_index_bulk_indexes_changes(self):
+        """Test that sync_index sends only the changed documents and refreshes the index"""
+        es = Mock()
+        existing = indexed_fingerprints([make_thesis(1)])
+
+        def fake_bulk(es, actions, **kwargs):
+            sent = list(actions)
+            return {"success": len(sent), "failed": 0, "actions": sent}
+
+        with patch.object(index_sync, "ensure_index") as mock_ensure, \
+             patch.object(index_sync, "fetch_fingerprints", return_value=existing), \
+             patch.object(index_sync, "bulk_index", side_effect=fake_bulk):
+            stats = sync_index(es, "theses", {}, [make_thesis(1), make_thesis(2)])
+
+        mock_ensure.assert_called_once_with(es, "theses", {})
+        assert [action["_id"] for action in stats["actions"]] == ["2"]
+        assert stats["added"] == 1
+        assert stats["unchanged"] == 1
+        es.indices.refresh.assert_called_once_with(index="theses")
+        assert "_meta" in es.indices.put_mapping.call_args[1]["body"]
+
+    def test_sync_index_without_changes_keeps_content_version(self):
+        """Test that a sync that changed nothing does not invalidate cached answers"""
+        es = Mock()
+        existing = indexed_fingerprints([make_thesis(1)])
+
+        with patch.object(index_sync, "ensure_index"), \
+             patch.object(index_sync, "fetch_fingerprints", return_value=existing), \
+             patch.object(index_sync, "bulk_index", side_effect=lambda es, actions, **kwargs: {
+                 "success": len(list(actions)), "failed": 0}):
+            sync_index(es, "theses", {}, [make_thesis(1)])
+
+        es.indices.put_mapping.assert_not_called()
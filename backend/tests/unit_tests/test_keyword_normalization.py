@@ -0,0 +1,44 @@
+import pytest
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'app'))
+
+from keyword_normalization import normalize_keyword, normalize_thesis_keywords
+
+
+class TestKeywordNormalization:
+    """Test cases for ingest-time keyword canonicalization"""
+
+    def test_separator_runs(self):
+        """Test that punctuation is dropped and whitespace and hyphens are collapsed"""
+        assert normalize_keyword('machine . learning') == 'Machine Learning'
+        assert normalize_keyword('deep\t\n learning') == 'Deep Learning'
+        assert normalize_keyword('rest--api') == 'REST API'
+        assert normalize_keyword('(Computer-Vision)!') == 'Computer Vision'
+        assert normalize_keyword('graph - theory') == 'Graph - Theory'
+
+    def test_alias_table(self):
+        """Test that aliases map to their canonical keyword"""
+        assert normalize_keyword('ML') == 'Machine Learning'
+        assert normalize_keyword('Wi-Fi') == 'WiFi'
+        assert normalize_keyword('nodejs') == 'Node.js'
+
+    def test_normalize_thesis_keywords(self):
+        """Test that the ingest stage stores distinct canonical keywords"""
+        thesis = {'keywords': ['machine learning', 'ML', 'iot', '']}
+
+        result = normalize_thesis_keywords(thesis)
+
+        assert result is thesis
+        assert thesis['keywords_normalized'] == ['Machine Learning', 'IoT']
+
+    def test_normalize_thesis_keywords_string_and_missing(self):
+        """Test comma-separated and missing keyword fields"""
+        assert normalize_thesis_keywords({'keywords': 'data mining, algorithms'})['keywords_normalized'] == ['Data Mining', 'Algorithm']
+        assert normalize_thesis_keywords({'keywords': 'data mining; iot'})['keywords_normalized'] == ['Data Mining', 'IoT']
+        assert normalize_thesis_keywords({})['keywords_normalized'] == []
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,155 @@
+import pytest
+import sys
+import os
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'app'))
+
+from llm_client import ProviderClient, ProviderBusyError
+
+
+class FakeOllamaHandler(BaseHTTPRequestHandler):
+    """Keep-alive fake of the Ollama API that can fail the first requests"""
+
+    protocol_version = "HTTP/1.1"
+    failures = 0
+    delay = 0.0
+    calls = []
+    connections = set()
+    active = 0
+    max_active = 0
+    lock = threading.Lock()
+
+    def respond(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        cls = FakeOllamaHandler
+        cls.calls.append(self.path)
+        cls.connections.add(self.client_address)
+        self.respond(200, {"models": [{"name": "llama3.2:3b"}, {"name": "llama3.1:8b"}]})
+
+    def do_POST(self):
+        cls = FakeOllamaHandler
+        self.rfile.read(int(self.headers["Content-Length"]))
+        cls.calls.append(self.path)
+        cls.connections.add(self.client_address)
+        if cls.failures > 0:
+            cls.failures -= 1
+            self.respond(503, {"error": "model is loading"})
+            return
+        with cls.lock:
+            cls.active += 1
+            cls.max_active = max(cls.max_active, cls.active)
+        time.sleep(cls.delay)
+        with cls.lock:
+            cls.active -= 1
+        self.respond(200, {"response": "ok", "done": True})
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def fake_ollama():
+    """Run a fake Ollama server on a free port"""
+    FakeOllamaHandler.failures = 0
+    FakeOllamaHandler.delay = 0.0
+    FakeOllamaHandler.calls = []
+    FakeOllamaHandler.connections = set()
+    FakeOllamaHandler.active = 0
+    FakeOllamaHandler.max_active = 0
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeOllamaHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    FakeOllamaHandler.api_base = f"http://127.0.0.1:{server.server_port}/api"
+    yield FakeOllamaHandler
+    server.shutdown()
+    server.server_close()
+
+
+class TestProviderClient:
+    """Test cases for the pooled LLM provider client"""
+
+    def test_connections_are_reused(self, fake_ollama):
+        """Test that sequential calls share one keep-alive connection"""
+        client = ProviderClient(api_base=fake_ollama.api_base)
+        for _ in range(5):
+            assert client.post("generate", {"model": "llama3.2:3b"}).json()["response"] == "ok"
+
+        assert len(fake_ollama.calls) == 5
+        assert len(fake_ollama.connections) == 1
+        client.close()
+
+    def test_retries_unavailable_server(self, fake_ollama):
+        """Test that 503 responses are retried with backoff"""
+        fake_ollama.failures = 2
+        client = ProviderClient(api_base=fake_ollama.api_base, max_retries=2, backoff=0.01)
+
+        assert client.post("generate", {"model": "llama3.2:3b"}).json()["response"] == "ok"
+        assert fake_ollama.calls == ["/api/generate"] * 3
+
+    def test_gives_up_after_max_retries(self, fake_ollama):
+        """Test that the last error is raised once the retries are used up"""
+        fake_ollama.failures = 5
+        client = ProviderClient(api_base=fake_ollama.api_base, max_retries=1, backoff=0.01)
+
+        with pytest.raises(Exception):
+            client.post("generate", {"model": "llama3.2:3b"})
+        assert len(fake_ollama.calls) == 2
+
+    def test_model_list_is_cached(self, fake_ollama):
+        """Test that the model list is probed once per TTL"""
+        client = ProviderClient(api_base=fake_ollama.api_base, model_list_ttl=60)
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(lambda _: client.ollama_models(), range(20)))
+
+        assert all(models == {"llama3.2:3b", "llama3.1:8b"} for models in results)
+        assert fake_ollama.calls == ["/api/tags"]
+
+        client.invalidate_models()
+        client.ollama_models()
+        assert fake_ollama.calls == ["/api/tags", "/api/tags"]
+
+    def test_unreachable_model_list(self):
+        """Test that an unreachable server yields None and is not probed again within the TTL"""
+        client = ProviderClient(api_base="http://127.0.0.1:9/api", max_retries=0, model_list_ttl=60)
+
+        assert client.ollama_models() is None
+        assert client._models_expire > time.monotonic()
+
+    def test_concurrency_limit(self, fake_ollama):
+        """Test that no more than the provider limit of generations run at once"""
+        fake_ollama.delay = 0.05
+        client = ProviderClient(api_base=fake_ollama.api_base, concurrency={"ollama": 2})
+
+        def generate(_):
+            with client.slot("ollama"):
+                return client.post("generate", {"model": "llama3.2:3b"}).status_code
+
+        with ThreadPoolExecutor(max_workers=6) as executor:
+            assert list(executor.map(generate, range(6))) == [200] * 6
+
+        assert fake_ollama.max_active == 2
+
+    def test_busy_provider(self):
+        """Test that waiting longer than the queue timeout raises ProviderBusyError"""
+        client = ProviderClient(concurrency={"ollama": 1}, queue_timeout=0.05)
+
+        with client.slot("ollama"):
+            with pytest.raises(ProviderBusyError):
+                with client.slot("ollama"):
+                    pass
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,215 @@
+import pytest
+import sys
+import os
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import Mock, patch
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'app'))
+
+import llm_client
+import ollama_rag_service
+import numpy as np
+from ollama_rag_service import build_prompt, build_references, retrieve_documents, stream_answer_with_ollama, stream_rag_response
+
+
+class FakeOllamaHandler(BaseHTTPRequestHandler):
+    """Answers /api/generate with NDJSON chunks like a streaming Ollama server"""
+
+    tokens = ["Neural ", "networks ", "are ", "used."]
+    token_delay = 0.0
+    requests = []
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        FakeOllamaHandler.requests.append((self.path, body))
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.end_headers()
+        for token in self.tokens:
+            time.sleep(self.token_delay)
+            self.wfile.write((json.dumps({"response": token, "done": False}) + "\n").encode())
+            self.wfile.flush()
+        self.wfile.write((json.dumps({
+            "response": "", "done": True,
+            "prompt_eval_duration": 12_000_000, "eval_duration": 48_000_000, "eval_count": 4
+        }) + "\n").encode())
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def fake_ollama():
+    """Run a fake Ollama server and point the service at it"""
+    FakeOllamaHandler.requests = []
+    FakeOllamaHandler.token_delay = 0.0
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeOllamaHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    with patch.object(llm_client, "OLLAMA_API_BASE", f"http://127.0.0.1:{server.server_port}/api"):
+        yield FakeOllamaHandler
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture(autouse=True)
+def packed_context():
+    """Skip sentence scoring, which needs the embedding model"""
+    with patch('ollama_rag_service.build_context', return_value="RELEVANT DOCUMENTS:\n\n") as build_context:
+        yield build_context
+
+
+@pytest.fixture(autouse=True)
+def no_answer_cache():
+    """Generate every answer; answer caching is tested in test_answer_cache"""
+    with patch('ollama_rag_service.get_answer_cache', return_value=None):
+        yield
+
+
+@pytest.fixture
+def sample_documents():
+    """Retrieved documents as returned by retrieve_documents"""
+    return [
+        {
+            '_id': '1',
+            '_score': 0.92,
+            '_source': {
+                'author': 'Gáll János',
+                'year': 2023,
+                'department': 'cs',
+                'abstract': 'This is a test abstract about machine learning and neural networks.',
+                'hash_code': 123456
+            }
+        }
+    ]
+
+
+class TestStreamingRag:
+    """Test cases for streaming RAG answers"""
+
+    def test_stream_answer_with_ollama(self, fake_ollama):
+        """Test that NDJSON chunks are forwarded as they arrive"""
+        chunks = list(stream_answer_with_ollama("llama3.2:3b", "context", "What is used?"))
+
+        assert [chunk["response"] for chunk in chunks] == fake_ollama.tokens + [""]
+        assert chunks[-1]["done"] is True
+
+        path, body = fake_ollama.requests[0]
+        assert path == "/api/generate"
+        assert body["stream"] is True
+        assert body["prompt"] == build_prompt("context", "What is used?")
+
+    def test_stream_rag_response_events(self, fake_ollama, sample_documents):
+        """Test the event order: references, tokens, then timings"""
+        with patch('ollama_rag_service.retrieve_documents', return_value=sample_documents):
+            events = list(stream_rag_response(Mock(), "What is used?", "llama3.2:3b"))
+
+        names = [event["event"] for event in events]
+        assert names == ["references"] + ["token"] * len(fake_ollama.tokens) + ["done"]
+
+        references = events[0]["data"]["references"]
+        assert references[0]["author"] == "Gáll János"
+        assert references[0]["hash_code"] == 123456
+        assert "".join(event["data"]["text"] for event in events[1:-1]) == "Neural networks are used."
+
+        timing = events[-1]["data"]
+        assert timing["eval_duration_ms"] == 48.0
+        assert timing["eval_count"] == 4
+        assert timing["retrieval_ms"] <= timing["time_to_first_token_ms"] <= timing["total_ms"]
+
+    def test_references_sent_before_generation(self, fake_ollama, sample_documents):
+        """Test that the references arrive before the model has produced anything"""
+        fake_ollama.token_delay = 0.2
+        with patch('ollama_rag_service.retrieve_documents', return_value=sample_documents):
+            events = stream_rag_response(Mock(), "What is used?", "llama3.2:3b")
+            start = time.perf_counter()
+            first = next(events)
+            assert first["event"] == "references"
+            assert time.perf_counter() - start < 0.2
+            list(events)
+
+    def test_unknown_model(self):
+        """Test that an unknown model yields a single error event"""
+        events = list(stream_rag_response(Mock(), "query", "missing-model"))
+
+        assert events == [{"event": "error", "data": {"error": "Model missing-model not found"}}]
+
+    def test_generation_failure(self, sample_documents):
+        """Test that a failing model call ends the stream with an error event"""
+        with patch('ollama_rag_service.retrieve_documents', return_value=sample_documents), \
+             patch.object(llm_client, "OLLAMA_API_BASE", "http://127.0.0.1:9/api"):
+            events = list(stream_rag_response(Mock(), "query", "llama3.2:3b"))
+
+        assert [event["event"] for event in events] == ["references", "error"]
+
+    def test_context_failure(self, packed_context, sample_documents):
+        """Test that a failure while building the context ends the stream with an error event"""
+        packed_context.side_effect = RuntimeError("encoder unavailable")
+        with patch('ollama_rag_service.retrieve_documents', return_value=sample_documents):
+            events = list(stream_rag_response(Mock(), "query", "llama3.2:3b"))
+
+        assert [event["event"] for event in events] == ["references", "error"]
+        assert events[-1]["data"] == {"error": "encoder unavailable"}
+
+
+class TestPassageRetrieval:
+    """Test cases for retrieving full-text passages collapsed per thesis"""
+
+    @pytest.fixture
+    def passage_response(self):
+        """Collapsed search response of a *_chunks index"""
+        return {
+            'hits': {'hits': [{
+                '_id': '123456_7',
+                '_score': 1.8,
+                '_source': {'hash_code': 123456, 'passage_index': 7, 'author': 'Gáll János',
+                            'year': 2023, 'department': 'cs'},
+                'inner_hits': {'passages': {'hits': {'hits': [
+                    {'_source': {'passage_index': 7, 'text': 'The accelerator runs at 200 MHz.'}},
+                    {'_source': {'passage_index': 2, 'text': 'Convolutions are mapped to DSP blocks.'}}
+                ]}}}
+            }]}
+        }
+
+    def test_passages_collapsed_per_thesis(self, passage_response):
+        """Test the chunk query and the shape of the returned theses"""
+        mock_es = Mock()
+        mock_es.search.return_value = passage_response
+
+        with patch('ollama_rag_service.encode_query', return_value=np.ones(3)):
+            documents = retrieve_documents(mock_es, 'FPGA clock', top_k=4, department='cs', passages=True)
+
+        kwargs = mock_es.search.call_args[1]
+        assert kwargs['index'] == 'cs_theses_chunks'
+        assert kwargs['body']['collapse']['field'] == 'hash_code'
+        assert kwargs['body']['query']['knn']['field'] == 'passage_vector'
+        assert kwargs['body']['size'] == 4
+
+        assert len(documents) == 1
+        source = documents[0]['_source']
+        assert [passage['passage_index'] for passage in source['passages']] == [2, 7]
+        assert 'passage_index' not in source
+
+        reference = build_references(documents)[0]
+        assert reference['hash_code'] == 123456
+        assert reference['passages'] == [2, 7]
+        assert reference['abstract_snippet'].startswith('Convolutions are mapped')
+
+    def test_falls_back_to_abstracts(self, sample_documents):
+        """Test that a missing passage index falls back to abstract retrieval"""
+        mock_es = Mock()
+        mock_es.search.side_effect = [Exception('index_not_found_exception'), {'hits': {'hits': sample_documents}}]
+
+        with patch('ollama_rag_service.encode_query', return_value=np.ones(3)):
+            documents = retrieve_documents(mock_es, 'FPGA clock', passages=True)
+
+        assert documents == sample_documents
+        assert mock_es.search.call_args[1]['index'] == 'cs_theses_semantic,infos_theses_semantic'
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
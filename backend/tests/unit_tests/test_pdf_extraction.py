@@ -0,0 +1,116 @@
+import pytest
+import sys
+import os
+import json
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'scripts', 'pdf_processing'))
+
+from pdf_extraction import iter_extraction, read_ndjson, read_records
+
+
+def fake_worker(pdf_path, full_text):
+    """Module-level worker, so the extraction processes can run it"""
+    name = os.path.basename(pdf_path)
+    return {"pdf": name, "info": {"hash_code": name, "department": "cs"}, "pages": 1, "page_count": 3,
+            "text": f"Full text of {name}" if full_text else None}
+
+
+def write_lines(path, records, tail=""):
+    with open(path, "w", encoding="utf-8") as f:
+        for record in records:
+            f.write(json.dumps(record) + "\n")
+        f.write(tail)
+
+
+def record(name, **extra):
+    return dict({"pdf": name, "info": {"hash_code": name, "department": "cs"}, "pages": 1,
+                 "page_count": 3, "full_text": False}, **extra)
+
+
+class TestReadRecords:
+    """Test cases for reading the NDJSON records of a previous extraction run"""
+
+    def test_missing_file(self, tmp_path):
+        """Test that a first run starts without records"""
+        assert read_records(str(tmp_path / "records.jsonl")) == {}
+
+    def test_truncates_incomplete_last_line(self, tmp_path):
+        """Test that a record cut off by a crash is dropped from the file"""
+        path = str(tmp_path / "records.jsonl")
+        write_lines(path, [record("a.pdf"), record("b.pdf")], tail='{"pdf": "c.pdf", "info": {')
+
+        records = read_records(path)
+
+        assert list(records) == ["a.pdf", "b.pdf"]
+        with open(path, encoding="utf-8") as f:
+            assert [json.loads(line)["pdf"] for line in f] == ["a.pdf", "b.pdf"]
+
+    def test_complete_line_without_newline_is_dropped(self, tmp_path):
+        """Test that a last line without its newline counts as incomplete"""
+        path = str(tmp_path / "records.jsonl")
+        write_lines(path, [record("a.pdf")], tail=json.dumps(record("b.pdf")))
+
+        assert list(read_records(path)) == ["a.pdf"]
+        assert os.path.getsize(path) == len(json.dumps(record("a.pdf"))) + 1
+
+    def test_repair_only(self, tmp_path):
+        """Test that keep=False repairs the file without returning its lines"""
+        path = str(tmp_path / "full_text.jsonl")
+        write_lines(path, [{"hash_code": 1, "text": "x"}], tail='{"hash_code": 2, "te')
+
+        assert read_ndjson(path, keep=False) == []
+        assert read_ndjson(path) == [{"hash_code": 1, "text": "x"}]
+
+
+class TestIterExtraction:
+    """Test cases for resuming the parallel extraction"""
+
+    @pytest.fixture
+    def pdfs(self, tmp_path):
+        paths = []
+        for name in ("a.pdf", "b.pdf", "c.pdf"):
+            path = tmp_path / name
+            path.write_bytes(b"%PDF")
+            paths.append(str(path))
+        return paths
+
+    def test_resume_skips_recorded_pdfs(self, tmp_path, pdfs):
+        """Test that recorded PDFs are yielded first and only the others are extracted"""
+        path = str(tmp_path / "records.jsonl")
+        write_lines(path, [record("a.pdf"), record("b.pdf", error="broken")], tail='{"pdf": "c.p')
+
+        results = list(iter_extraction(pdfs, fake_worker, path, workers=1, resume=True))
+
+        assert [result["pdf"] for result in results][0] == "a.pdf"
+        assert sorted(result["pdf"] for result in results[1:]) == ["b.pdf", "c.pdf"]
+        assert all("error" not in result for result in results)
+        assert len(read_records(path)) == 3
+
+    def test_full_text_file_is_repaired_before_appending(self, tmp_path, pdfs):
+        """Test that the full-text file gets no line glued to an incomplete one"""
+        path = str(tmp_path / "records.jsonl")
+        full_text_path = str(tmp_path / "full_text.jsonl")
+        write_lines(path, [record("a.pdf", full_text=True)])
+        write_lines(full_text_path, [{"hash_code": "a.pdf", "department": "cs", "text": "A"}],
+                    tail='{"hash_code": "b.pdf", "tex')
+
+        list(iter_extraction(pdfs, fake_worker, path, full_text_path, workers=1, resume=True))
+
+        texts = read_ndjson(full_text_path)
+        assert sorted(text["hash_code"] for text in texts) == ["a.pdf", "b.pdf", "c.pdf"]
+        assert os.path.getsize(full_text_path) == sum(len(json.dumps(text, ensure_ascii=False)) + 1
+                                                      for text in texts)
+
+    def test_no_resume_starts_over(self, tmp_path, pdfs):
+        """Test that resume=False discards the previous records"""
+        path = str(tmp_path / "records.jsonl")
+        write_lines(path, [record("a.pdf", pages=9)])
+
+        results = list(iter_extraction(pdfs[:1], fake_worker, path, workers=1, resume=False))
+
+        assert [result["pages"] for result in results] == [1]
+        assert read_records(path)["a.pdf"]["pages"] == 1
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
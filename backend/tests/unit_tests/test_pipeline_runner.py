@@ -0,0 +1,147 @@
+import pytest
+import sys
+import os
+import threading
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'app'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'scripts', 'pipeline'))
+
+from pipeline_runner import Pipeline, Stage
+import run_ingestion
+from run_ingestion import embed_stage, extract_stage
+from index_sync import SyncActionBuilder, generate_sync_actions
+
+
+def double(items):
+    for item in items:
+        yield item * 2
+
+
+def make_thesis(hash_code):
+    return {"hash_code": hash_code, "author": f"Author {hash_code}", "year": 2022, "abstract": "An abstract"}
+
+
+class TestPipeline:
+    """Test cases for the threaded generator pipeline"""
+
+    def test_results_and_metrics(self):
+        """Test that records flow through every stage in order and are counted"""
+        pipeline = Pipeline([Stage("double", double), Stage("plus", lambda items: (item + 1 for item in items))],
+                            queue_size=2)
+
+        results = pipeline.run(range(50))
+
+        assert results == [item * 2 + 1 for item in range(50)]
+        summaries = [metrics.summary() for metrics in pipeline.metrics]
+        assert [(summary["items_in"], summary["items_out"]) for summary in summaries] == [(50, 50), (50, 50)]
+        assert all(summary["elapsed_s"] >= summary["busy_s"] >= 0 for summary in summaries)
+
+    def test_stage_can_change_the_record_count(self):
+        """Test that a stage may batch or drop records"""
+        pipeline = Pipeline([Stage("sum", lambda items: [sum(items)])])
+
+        assert pipeline.run(range(5)) == [10]
+
+    def test_failure_is_raised(self):
+        """Test that the exception of a failing stage is raised by run()"""
+        def fail(items):
+            for item in items:
+                if item == 6:
+                    raise ValueError("broken record")
+                yield item
+
+        pipeline = Pipeline([Stage("double", double), Stage("check", fail), Stage("plus", double)])
+
+        with pytest.raises(RuntimeError, match="Pipeline stage check failed: broken record") as error:
+            pipeline.run(range(10))
+        assert isinstance(error.value.__cause__, ValueError)
+
+    def test_source_failure_is_raised(self):
+        """Test that an exception of the source iterable fails the first stage"""
+        def source():
+            yield 1
+            raise OSError("folder not found")
+
+        with pytest.raises(RuntimeError, match="folder not found"):
+            Pipeline([Stage("double", double)]).run(source())
+
+    def test_downstream_does_not_finish_after_a_failure(self):
+        """Test that the stages after a failing one stop without running their end-of-input code"""
+        finished = threading.Event()
+        closed = threading.Event()
+
+        def fail(items):
+            yield next(iter(items))
+            raise ValueError("extraction crashed")
+
+        def finish(items):
+            try:
+                for item in items:
+                    yield item
+                finished.set()
+            finally:
+                closed.set()
+
+        with pytest.raises(RuntimeError):
+            Pipeline([Stage("extract", fail), Stage("finish", finish)]).run(range(10))
+
+        assert not finished.is_set()
+        assert closed.is_set()
+
+    def test_failing_extraction_emits_no_deletes(self):
+        """Test that the embed stage yields no delete actions when a stage before it fails"""
+        existing = {action["_id"]: action["_source"]["content_fingerprint"]
+                    for action in generate_sync_actions([make_thesis(i) for i in range(4)], {}, "theses")}
+        builder = SyncActionBuilder(existing, "theses", allow_mass_delete=True)
+        actions = []
+
+        def extract(items):
+            yield make_thesis(0)
+            raise OSError("pdfplumber crashed")
+
+        def collect(items):
+            for action in items:
+                actions.append(action)
+                yield action
+
+        pipeline = Pipeline([Stage("extract", extract), Stage("embed", embed_stage([builder], 64)),
+                             Stage("index", collect)])
+        with pytest.raises(RuntimeError):
+            pipeline.run([None])
+
+        assert not any(action.get("_op_type") == "delete" for action in actions)
+
+    def test_failed_extraction_keeps_indexed_thesis(self):
+        """Test that a PDF whose extraction failed neither overwrites nor deletes its indexed document"""
+        existing = {action["_id"]: action["_source"]["content_fingerprint"]
+                    for action in generate_sync_actions([make_thesis(i) for i in range(4)], {}, "theses")}
+        builder = SyncActionBuilder(existing, "theses", allow_mass_delete=True)
+        records = [{"pdf": f"{i}.pdf", "info": make_thesis(i)} for i in range(3)]
+        records.append({"pdf": "3.pdf", "info": {"hash_code": 3, "author": "3", "abstract": ""},
+                        "error": "pdfplumber crashed"})
+        failed = []
+
+        with patch.object(run_ingestion, "load_function"), \
+             patch.object(run_ingestion, "iter_extraction", return_value=records):
+            actions = Pipeline([Stage("extract", extract_stage({"extractor": "x:y", "records_path": "r"}, failed)),
+                                Stage("embed", embed_stage([builder], 64, failed))]).run([])
+
+        assert actions == []
+        assert failed == [records[3]["info"]]
+        assert builder.stats["unchanged"] == 3
+
+    def test_report(self, capsys):
+        """Test that the report prints a line per stage"""
+        pipeline = Pipeline([Stage("double", double), Stage("again", double)])
+        pipeline.run(range(3))
+
+        pipeline.report()
+
+        lines = capsys.readouterr().out.strip().splitlines()
+        assert len(lines) == 3
+        assert lines[1].split()[:3] == ["double", "3", "3"]
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,108 @@
+import pytest
+import sys
+import os
+import threading
+import time
+from unittest.mock import Mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'app'))
+
+from rag_jobs import RagJobQueue, QueueFullError
+
+
+def fake_runner(release=None, fail=False):
+    """stream_rag_response stand-in that optionally blocks until released"""
+    def run(es, query, model_id, top_k, department):
+        yield {"event": "references", "data": {"references": [{"author": "Gáll János"}], "model": model_id}}
+        if release is not None:
+            release.wait(5)
+        if fail:
+            yield {"event": "error", "data": {"error": "Ollama is down"}}
+            return
+        for token in ("FPGAs ", "are ", "fast."):
+            yield {"event": "token", "data": {"text": token}}
+        yield {"event": "done", "data": {"total_ms": 12.0}}
+    return run
+
+
+def wait_for(job, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not job.finished_status and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return job
+
+
+class TestRagJobQueue:
+    """Test cases for the asynchronous RAG job queue"""
+
+    def test_job_completes(self):
+        """Test that a job runs in the background and assembles the answer"""
+        jobs = RagJobQueue(workers={"ollama": 1}, runner=fake_runner())
+        job = wait_for(jobs.submit(Mock(), "What is an FPGA?", "llama3.2:3b"))
+
+        assert job.status == "done"
+        assert job.result["answer"] == "FPGAs are fast."
+        assert job.result["references"] == [{"author": "Gáll János"}]
+        assert job.result["timing"] == {"total_ms": 12.0}
+        assert jobs.get(job.id) is job
+
+    def test_failed_job(self):
+        """Test that an error event marks the job as failed"""
+        jobs = RagJobQueue(workers={"ollama": 1}, runner=fake_runner(fail=True))
+        job = wait_for(jobs.submit(Mock(), "What is an FPGA?", "llama3.2:3b"))
+
+        assert job.status == "failed"
+        assert job.error == "Ollama is down"
+        assert "result" not in job.to_dict()
+
+    def test_unknown_model(self):
+        """Test that unknown models are rejected before queueing"""
+        jobs = RagJobQueue(runner=fake_runner())
+
+        with pytest.raises(ValueError):
+            jobs.submit(Mock(), "query", "missing-model")
+
+    def test_full_queue(self):
+        """Test backpressure: submissions beyond workers plus queue size are refused"""
+        release = threading.Event()
+        jobs = RagJobQueue(workers={"ollama": 1}, queue_size=1, runner=fake_runner(release))
+
+        running = jobs.submit(Mock(), "first", "llama3.2:3b")
+        while running.status != "running":
+            time.sleep(0.01)
+        queued = jobs.submit(Mock(), "second", "llama3.2:3b")
+
+        with pytest.raises(QueueFullError) as error:
+            jobs.submit(Mock(), "third", "llama3.2:3b")
+        assert error.value.retry_after >= 1
+        assert queued.status == "queued"
+
+        jobs.submit(Mock(), "gemini question", "gemini-1.5-flash")
+
+        release.set()
+        assert wait_for(queued).status == "done"
+
+    def test_follow_replays_and_waits(self):
+        """Test that a follower gets earlier events and then the live ones"""
+        release = threading.Event()
+        jobs = RagJobQueue(workers={"ollama": 1}, runner=fake_runner(release))
+        job = jobs.submit(Mock(), "What is an FPGA?", "llama3.2:3b")
+        while not job.events:
+            time.sleep(0.01)
+
+        threading.Timer(0.05, release.set).start()
+        events = [event["event"] for event in job.follow(timeout=0.01) if event is not None]
+
+        assert events == ["references", "token", "token", "token", "done"]
+
+    def test_expired_jobs_are_dropped(self):
+        """Test that finished jobs are forgotten after the TTL"""
+        jobs = RagJobQueue(workers={"ollama": 1}, job_ttl=0.0, runner=fake_runner())
+        job = wait_for(jobs.submit(Mock(), "What is an FPGA?", "llama3.2:3b"))
+        time.sleep(0.01)
+
+        assert jobs.get(job.id) is None
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
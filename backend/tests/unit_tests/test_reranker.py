@@ -0,0 +1,151 @@
+import pytest
+import sys
+import os
+import time
+import numpy as np
+from unittest.mock import Mock, patch
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'app'))
+
+from reranker import PairScoreCache, rerank_hits, score_pairs
+from search_services import perform_search, perform_semantic_search
+from ollama_rag_service import retrieve_documents
+
+
+def make_hit(hash_code, abstract, score=1.0):
+    return {'_index': 'cs_theses', '_id': str(hash_code), '_score': score,
+            '_source': {'hash_code': hash_code, 'abstract': abstract}}
+
+
+class FakeCrossEncoder:
+    """Scores a pair by how many query words the text contains"""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.calls = []
+
+    def predict(self, pairs, batch_size=32, show_progress_bar=False):
+        self.calls.append(list(pairs))
+        time.sleep(self.delay)
+        return np.array([sum(word in text.lower() for word in query.lower().split()) for query, text in pairs],
+                        dtype=np.float32)
+
+
+@pytest.fixture
+def hits():
+    return [
+        make_hit(1, 'A thesis about web development.', 3.0),
+        make_hit(2, 'Neural networks on an FPGA accelerator.', 2.0),
+        make_hit(3, 'Neural networks for image processing.', 1.0),
+        make_hit(4, 'Smart home systems.', 0.5)
+    ]
+
+
+class TestReranker:
+    """Test cases for the cross-encoder rerank stage"""
+
+    def test_reorders_top_n(self, hits):
+        """Test that the top N hits are reordered and the rest keep their order"""
+        model = FakeCrossEncoder()
+        reranked = rerank_hits('neural networks fpga', hits, top_n=3, cache=PairScoreCache(),
+                               model_getter=lambda: model)
+
+        assert [hit['_source']['hash_code'] for hit in reranked] == [2, 3, 1, 4]
+        assert reranked[0]['_rerank_score'] == 3.0
+        assert '_rerank_score' not in reranked[3]
+        assert '_rerank_score' not in hits[1]
+
+    def test_one_batched_forward_pass(self, hits):
+        """Test that all uncached pairs go to the model in a single predict call"""
+        model = FakeCrossEncoder()
+        score_pairs('neural networks', hits, cache=PairScoreCache(), model_getter=lambda: model)
+
+        assert len(model.calls) == 1
+        assert len(model.calls[0]) == 4
+
+    def test_pair_scores_are_cached(self, hits):
+        """Test that repeated queries only score pairs not seen before"""
+        model = FakeCrossEncoder()
+        cache = PairScoreCache()
+        score_pairs('Neural  Networks', hits[:2], cache=cache, model_getter=lambda: model)
+        score_pairs('neural networks', hits, cache=cache, model_getter=lambda: model)
+
+        assert [len(call) for call in model.calls] == [2, 2]
+        assert cache.stats()['hits'] == 2
+
+    def test_budget_fallback(self, hits):
+        """Test that a slow model falls back to the first-stage order"""
+        model = FakeCrossEncoder(delay=0.3)
+        cache = PairScoreCache()
+        started = time.perf_counter()
+        reranked = rerank_hits('neural networks', hits, budget_ms=50, cache=cache, model_getter=lambda: model)
+
+        assert time.perf_counter() - started < 0.25
+        assert reranked == hits
+
+        time.sleep(0.4)
+        assert cache.stats()['size'] == 4
+
+    def test_model_load_is_outside_the_budget(self, hits):
+        """Test that a cold model load does not make the first rerank fall back"""
+        model = FakeCrossEncoder()
+
+        def load_model():
+            time.sleep(0.2)
+            return model
+
+        reranked = rerank_hits('neural networks fpga', hits, budget_ms=50, cache=PairScoreCache(),
+                               model_getter=load_model)
+
+        assert [hit['_source']['hash_code'] for hit in reranked][:2] == [2, 3]
+
+    def test_model_load_errors_fall_back(self, hits):
+        """Test that a model that cannot be loaded keeps the first-stage order"""
+        def load_model():
+            raise OSError('model not found')
+
+        assert rerank_hits('neural networks', hits, cache=PairScoreCache(), model_getter=load_model) == hits
+
+    def test_model_errors_fall_back(self, hits):
+        """Test that a failing model keeps the first-stage order"""
+        model = Mock()
+        model.predict.side_effect = RuntimeError('model not available')
+
+        assert rerank_hits('neural networks', hits, cache=PairScoreCache(), model_getter=lambda: model) == hits
+
+    def test_search_services_rerank(self, hits):
+        """Test that rerank=true fetches enough candidates and trims to the limit"""
+        mock_es = Mock()
+        mock_es.search.return_value = {'hits': {'hits': hits}}
+
+        with patch('search_services.rerank_hits', side_effect=lambda query, h: list(reversed(h))) as rerank, \
+             patch('search_services.RERANK_TOP_N', 20), \
+             patch('search_services.encode_query', return_value=np.ones(3, dtype=np.float32)):
+            results = perform_semantic_search(mock_es, 'neural networks', num_results=2, rerank=True)
+            assert mock_es.search.call_args[1]['body']['size'] == 20
+            assert [hit['_source']['hash_code'] for hit in results] == [4, 3]
+
+            results = perform_search(mock_es, 'neural networks', sort_order=None, limit=2, rerank=True)
+            assert [hit['_source']['hash_code'] for hit in results] == [4, 3]
+
+            perform_search(mock_es, 'neural networks', sort_order='desc', limit=2, rerank=True)
+            perform_semantic_search(mock_es, 'neural networks', sort_order='desc', num_results=2, rerank=True)
+            assert rerank.call_count == 2
+            assert mock_es.search.call_args[1]['body']['size'] == 2
+
+    def test_rag_retriever_rerank(self, hits):
+        """Test that the RAG retriever reranks a wider candidate set down to top_k"""
+        mock_es = Mock()
+        mock_es.search.return_value = {'hits': {'hits': hits}}
+
+        with patch('ollama_rag_service.rerank_hits', side_effect=lambda query, h: list(reversed(h))), \
+             patch('ollama_rag_service.RERANK_TOP_N', 20), \
+             patch('ollama_rag_service.encode_query', return_value=np.ones(3, dtype=np.float32)):
+            documents = retrieve_documents(mock_es, 'neural networks', top_k=2, passages=False, rerank=True)
+
+        assert mock_es.search.call_args[1]['body']['size'] == 20
+        assert [doc['_source']['hash_code'] for doc in documents] == [4, 3]
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
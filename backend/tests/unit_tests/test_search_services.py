@@ -0,0 +1,180 @@
+import pytest
+import sys
+import os
+import time
+import numpy as np
+from unittest.mock import Mock, patch
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'app'))
+
+from search_services import (
+    perform_search,
+    perform_semantic_search,
+    perform_hybrid_search,
+    build_semantic_query,
+    fuse_results,
+    SEMANTIC_NUM_CANDIDATES
+)
+from index_aliases import resolve_indices
+
+
+class TestSemanticSearch:
+    """Test cases for semantic search query building"""
+
+    @pytest.fixture
+    def mock_es(self):
+        """Mock Elasticsearch instance"""
+        es = Mock()
+        es.search.return_value = {'hits': {'hits': []}}
+        return es
+
+    @pytest.fixture
+    def mock_model(self):
+        """Mock SentenceTransformer returning a fixed vector"""
+        model = Mock()
+        model.encode.return_value = np.array([0.1, 0.2, 0.3], dtype=np.float32)
+        with patch('search_services.encode_query', model.encode):
+            yield model
+
+    def test_knn_query_is_default(self, mock_es, mock_model):
+        """Test that semantic search uses the kNN query by default"""
+        perform_semantic_search(mock_es, 'neural networks', num_results=10)
+
+        body = mock_es.search.call_args[1]['body']
+        assert 'knn' in body['query']
+        assert 'script_score' not in body['query']
+        assert body['query']['knn']['field'] == 'abstract_vector'
+        assert body['query']['knn']['num_candidates'] == SEMANTIC_NUM_CANDIDATES
+        assert body['size'] == 10
+        assert 'rescore' not in body
+
+    def test_knn_prefilters_year_and_department(self, mock_es, mock_model):
+        """Test that year and department filters are applied inside the kNN query"""
+        perform_semantic_search(mock_es, 'iot', year='2023', department='cs')
+
+        body = mock_es.search.call_args[1]['body']
+        filters = body['query']['knn']['filter']
+        assert {'term': {'year': 2023}} in filters
+        assert {'term': {'department': 'cs'}} in filters
+        assert mock_es.search.call_args[1]['index'] == 'cs_theses_semantic'
+
+    def test_num_candidates_never_below_num_results(self):
+        """Test that num_candidates is raised to the requested result size"""
+        query = build_semantic_query([0.1], [], 500, num_candidates=50)
+
+        assert query['query']['knn']['num_candidates'] == 500
+
+    def test_exact_rescore(self, mock_es, mock_model):
+        """Test exact cosine rescoring of the kNN candidates"""
+        perform_semantic_search(mock_es, 'security', sort_order='desc', num_candidates=200, exact_rescore=True)
+
+        body = mock_es.search.call_args[1]['body']
+        rescore = body['rescore']
+        assert rescore['window_size'] == 200
+        assert rescore['query']['query_weight'] == 0.0
+        assert 'cosineSimilarity' in rescore['query']['rescore_query']['script_score']['script']['source']
+        assert body['sort'] == ['_score']
+
+    def test_brute_force_mode(self, mock_es, mock_model):
+        """Test that use_knn=False keeps the brute-force script_score query"""
+        perform_semantic_search(mock_es, 'web', sort_order='asc', use_knn=False)
+
+        body = mock_es.search.call_args[1]['body']
+        assert 'script_score' in body['query']
+        assert 'knn' not in body['query']
+        assert body['sort'] == ['_score', {'year': {'order': 'asc'}}]
+
+    def test_empty_query(self, mock_es):
+        """Test that an empty query returns no results without searching"""
+        assert perform_semantic_search(mock_es, '') == []
+        mock_es.search.assert_not_called()
+
+
+def make_hit(hash_code, score, **source):
+    """Build a search hit with the given hash_code and score"""
+    return {'_index': 'cs_theses', '_id': str(hash_code), '_score': score,
+            '_source': dict(source, hash_code=hash_code)}
+
+
+class TestHybridSearch:
+    """Test cases for hybrid lexical and vector retrieval"""
+
+    def test_rrf_fusion_deduplicates_by_hash_code(self):
+        """Test that documents found by both legs are merged and ranked first"""
+        lexical = [make_hit(1, 12.0), make_hit(2, 8.0), make_hit(1, 5.0)]
+        semantic = [make_hit(2, 1.9, abstract_vector=[0.1]), make_hit(3, 1.8)]
+
+        results = fuse_results(lexical, semantic, fusion='rrf')
+
+        assert [hit['_source']['hash_code'] for hit in results] == [2, 1, 3]
+        assert results[0]['_hybrid'] == {
+            'lexical_rank': 2, 'lexical_score': 8.0,
+            'semantic_rank': 1, 'semantic_score': 1.9
+        }
+        assert results[0]['_score'] == pytest.approx(1 / 62 + 1 / 61)
+        assert 'abstract_vector' not in results[0]['_source']
+
+    def test_weighted_fusion_normalizes_scores(self):
+        """Test min-max normalized score fusion with leg weights"""
+        lexical = [make_hit(1, 20.0), make_hit(2, 10.0)]
+        semantic = [make_hit(2, 1.9), make_hit(1, 1.5)]
+
+        results = fuse_results(lexical, semantic, fusion='weighted', lexical_weight=0.3, semantic_weight=0.7)
+
+        assert [hit['_source']['hash_code'] for hit in results] == [2, 1]
+        assert results[0]['_score'] == pytest.approx(0.7)
+        assert results[1]['_score'] == pytest.approx(0.3)
+
+    def test_legs_run_concurrently(self):
+        """Test that the latency is close to the slower leg rather than the sum of both"""
+        def slow_lexical(*args, **kwargs):
+            time.sleep(0.3)
+            return [make_hit(1, 10.0)]
+
+        def slow_semantic(*args, **kwargs):
+            time.sleep(0.3)
+            return [make_hit(2, 1.5)]
+
+        with patch('search_services.perform_search', side_effect=slow_lexical) as lexical, \
+                patch('search_services.perform_semantic_search', side_effect=slow_semantic) as semantic:
+            started = time.perf_counter()
+            results = perform_hybrid_search(Mock(), 'iot', year='2023', department='cs', limit=5)
+            elapsed = time.perf_counter() - started
+
+        assert elapsed < 0.55
+        assert {hit['_source']['hash_code'] for hit in results} == {1, 2}
+        assert lexical.call_args[0][5] == 'cs'
+        assert semantic.call_args[0][5] == 'cs'
+
+    def test_unknown_fusion_method(self):
+        """Test that an unknown fusion method is rejected"""
+        with pytest.raises(ValueError):
+            perform_hybrid_search(Mock(), 'iot', fusion='max')
+
+    def test_empty_query(self):
+        """Test that an empty query returns no results"""
+        assert perform_hybrid_search(Mock(), '') == []
+
+
+class TestIndexResolution:
+    """Test cases for resolving the index aliases"""
+
+    def test_resolve_indices(self):
+        """Test alias resolution per department and index kind"""
+        assert resolve_indices('cs') == 'cs_theses'
+        assert resolve_indices('informatics', semantic=True) == 'infos_theses_semantic'
+        assert resolve_indices() == 'cs_theses,infos_theses'
+        assert resolve_indices(None, semantic=True) == 'cs_theses_semantic,infos_theses_semantic'
+
+    def test_keyword_search_queries_aliases(self):
+        """Test that keyword search queries the read aliases"""
+        es = Mock()
+        es.search.return_value = {'hits': {'hits': []}}
+
+        perform_search(es, 'machine learning', department='informatics')
+
+        assert es.search.call_args[1]['index'] == 'infos_theses'
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -1,7 +1,7 @@
 import pytest
 import sys
 import os
-from unittest.mock import Mock, patch
+from unittest.mock import Mock
 from collections import Counter
 
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'app'))
@@ -10,10 +10,62 @@ from statistics_service import (
     get_statistics,
     get_unique_supervisors,
     get_unique_years,
-    calculate_document_statistics,
-    extract_and_normalize_keywords,
-    normalize_keyword
+    build_statistics_aggregations,
+    calculate_aggregated_statistics,
+    merge_keyword_buckets,
+    merge_supervisor_buckets,
+    escape_regexp
 )
+from keyword_normalization import extract_and_normalize_keywords, normalize_keyword, normalize_thesis_keywords
+
+
+def terms_buckets(values):
+    """Build terms aggregation buckets from per-document field values, like Elasticsearch does"""
+    counts = Counter()
+    for value in values:
+        if isinstance(value, list):
+            counts.update(set(v for v in value if v))
+        elif value:
+            counts[value] += 1
+    return [{'key': key, 'doc_count': count} for key, count in counts.most_common()]
+
+
+def aggregation_response(documents, recent_size=10):
+    """Build the size 0 aggregation response Elasticsearch returns for the given documents"""
+    sources = [doc['_source'] for doc in documents]
+    years = Counter(source['year'] for source in sources if source.get('year'))
+    lengths = [len(source['abstract']) for source in sources if source.get('abstract')]
+    recent = sorted(documents, key=lambda doc: doc['_source'].get('year') or 0, reverse=True)
+
+    return {
+        'hits': {'total': {'value': len(documents)}, 'hits': []},
+        'aggregations': {
+            'by_year': {'buckets': [{'key': float(year), 'doc_count': count} for year, count in sorted(years.items())]},
+            'by_department': {'buckets': terms_buckets(source.get('department') for source in sources)},
+            'by_supervisor': {'buckets': terms_buckets(source.get('supervisor') for source in sources)},
+            'supervisor_values': {'value': len(terms_buckets(source.get('supervisor') for source in sources))},
+            'keywords': {'buckets': terms_buckets(normalize_thesis_keywords(dict(source))['keywords_normalized']
+                                                  for source in sources)},
+            'average_abstract_length': {'value': sum(lengths) / len(lengths) if lengths else None},
+            'recent_theses': {'hits': {'hits': recent[:recent_size]}}
+        }
+    }
+
+
+def aggregations_with(by_year=(), by_supervisor=(), recent_theses=(), legacy_keywords=None):
+    """Aggregation results written out by hand, empty apart from the given parts"""
+    aggregations = {
+        'by_year': {'buckets': list(by_year)},
+        'by_department': {'buckets': [{'key': 'cs', 'doc_count': 2}]},
+        'by_supervisor': {'buckets': list(by_supervisor)},
+        'supervisor_values': {'value': len(by_supervisor)},
+        'keywords': {'buckets': []},
+        'average_abstract_length': {'value': None},
+        'recent_theses': {'hits': {'hits': list(recent_theses)}}
+    }
+    if legacy_keywords is not None:
+        aggregations['legacy_keywords'] = legacy_keywords
+    return aggregations
 
 
 class TestStatisticsService:
@@ -104,84 +156,156 @@ class TestStatisticsService:
         assert extract_and_normalize_keywords('') == []
         assert extract_and_normalize_keywords(None) == []
     
-    def test_calculate_document_statistics_basic(self, sample_documents):
-        """Test basic document statistics calculation"""
-        stats = calculate_document_statistics(sample_documents)
-        
+    def test_calculate_aggregated_statistics(self, sample_documents):
+        """Test the statistics calculated from the aggregation response"""
+        stats = calculate_aggregated_statistics(aggregation_response(sample_documents)['aggregations'])
+
         assert stats['by_year'] == {2022: 1, 2023: 2}
-        
         assert stats['by_department'] == {'cs': 2, 'informatics': 1}
-        
-        expected_supervisors = {'Bakó László', 'Brassai Sándor Tihamér', 'Antal Margit', 'Lefkovits László', 'Kátai Zoltán'}
-        assert stats['supervisors_count'] == len(expected_supervisors)
-        
+        assert stats['by_supervisor'] == {
+            'Bakó László': 1, 'Brassai Sándor Tihamér': 1, 'Antal Margit': 1,
+            'Lefkovits László': 1, 'Kátai Zoltán': 1
+        }
+        assert stats['top_keywords'] == {
+            'Machine Learning': 1, 'Artificial Intelligence': 1, 'Data Mining': 1, 'Algorithm': 1,
+            'Deep Learning': 1, 'Web Development': 1, 'JavaScript': 1
+        }
+        assert {item['text'] for item in stats['keyword_cloud_data']} == set(stats['top_keywords'])
+        assert stats['year_range'] == {'min': 2022, 'max': 2023}
+        assert stats['average_abstract_length'] == 46
+        assert stats['supervisors_count'] == 5
         assert len(stats['recent_theses']) == 3
-        
-        assert stats['year_range']['min'] == 2022
-        assert stats['year_range']['max'] == 2023
-    
-    def test_calculate_document_statistics_empty(self):
-        """Test statistics calculation with empty document list"""
-        stats = calculate_document_statistics([])
-        
-        assert stats['by_year'] == {}
-        assert stats['by_department'] == {}
+
+    def test_merge_supervisor_buckets(self):
+        """Test that comma-separated supervisor values are split into names"""
+        buckets = [
+            {'key': 'Lefkovits László, Kátai Zoltán', 'doc_count': 2},
+            {'key': 'Kátai Zoltán', 'doc_count': 1},
+        ]
+
+        counts = merge_supervisor_buckets(buckets)
+
+        assert counts == {'Lefkovits László': 2, 'Kátai Zoltán': 3}
+
+    def test_supervisor_field_handling(self):
+        """Test that single, list and comma-separated supervisor values count every name once per thesis"""
+        # supervisor.keyword buckets of: 'Antal Margit'; ['Bakó László', 'Antal Margit'];
+        # 'Lefkovits László, Kátai Zoltán'; 'Kátai Zoltán , Antal Margit'
+        aggregations = aggregations_with(by_supervisor=[
+            {'key': 'Antal Margit', 'doc_count': 2},
+            {'key': 'Bakó László', 'doc_count': 1},
+            {'key': 'Kátai Zoltán , Antal Margit', 'doc_count': 1},
+            {'key': 'Lefkovits László, Kátai Zoltán', 'doc_count': 1},
+        ])
+
+        stats = calculate_aggregated_statistics(aggregations)
+
+        assert stats['by_supervisor'] == {
+            'Antal Margit': 3, 'Kátai Zoltán': 2, 'Bakó László': 1, 'Lefkovits László': 1
+        }
+        assert list(stats['by_supervisor'])[:2] == ['Antal Margit', 'Kátai Zoltán']
+        assert stats['supervisors_count'] == 4
+
+    def test_malformed_supervisor_field(self):
+        """Test that empty supervisor values do not count as supervisors"""
+        # None, [] and missing values produce no bucket; empty strings are indexed as keywords
+        aggregations = aggregations_with(by_supervisor=[
+            {'key': '', 'doc_count': 2},
+            {'key': ' , ', 'doc_count': 1},
+        ])
+
+        stats = calculate_aggregated_statistics(aggregations)
+
         assert stats['by_supervisor'] == {}
-        assert stats['top_keywords'] == {}
-        assert stats['year_range']['min'] is None
-        assert stats['year_range']['max'] is None
         assert stats['supervisors_count'] == 0
-        assert stats['recent_theses'] == []
-        assert stats['average_abstract_length'] == 0
-    
-    def test_supervisor_field_handling(self):
-        """Test different supervisor field formats"""
-        documents = [
-            {'_source': {'supervisor': 'Antal Margit', 'year': 2023, 'department': 'cs', 'abstract': 'test'}},
-            {'_source': {'supervisor': ['Bakó László', 'Brassai Sándor Tihamér'], 'year': 2023, 'department': 'cs', 'abstract': 'test'}},
-            {'_source': {'supervisor': 'Lefkovits László, Kátai Zoltán', 'year': 2023, 'department': 'cs', 'abstract': 'test'}},
+
+    def test_malformed_keywords_field(self):
+        """Test that empty keyword values produce no keywords, at ingest time and in legacy documents"""
+        for keywords in ('', None, [], ' , ', ['', '  ']):
+            assert normalize_thesis_keywords({'keywords': keywords})['keywords_normalized'] == []
+        assert normalize_thesis_keywords({})['keywords_normalized'] == []
+
+        aggregations = aggregations_with(legacy_keywords={'doc_count': 2, 'keywords': {'buckets': [
+            {'key': '', 'doc_count': 1},
+            {'key': ' , ', 'doc_count': 1},
+        ]}})
+        stats = calculate_aggregated_statistics(aggregations)
+
+        assert stats['top_keywords'] == {}
+        assert stats['keyword_cloud_data'] == []
+
+    def test_legacy_keywords_fallback(self):
+        """Test that documents without keywords_normalized are counted from their raw keywords"""
+        aggregations = {
+            'keywords': {'buckets': [{'key': 'Machine Learning', 'doc_count': 3}]},
+            'legacy_keywords': {'doc_count': 2, 'keywords': {'buckets': [
+                {'key': 'machine-learning', 'doc_count': 2},
+                {'key': 'ML', 'doc_count': 1},
+                {'key': 'data mining, ai', 'doc_count': 1},
+            ]}}
+        }
+
+        counts = merge_keyword_buckets(aggregations)
+
+        assert counts == {'Machine Learning': 6, 'Data Mining': 1, 'Artificial Intelligence': 1}
+
+    def test_keyword_aggregations(self):
+        """Test that only documents without keywords_normalized are aggregated on the raw keywords"""
+        aggs = build_statistics_aggregations()
+
+        assert aggs['keywords']['terms']['field'] == 'keywords_normalized'
+        assert aggs['legacy_keywords']['filter'] == {
+            'bool': {'must_not': [{'exists': {'field': 'keywords_normalized'}}]}
+        }
+        assert aggs['legacy_keywords']['aggs']['keywords']['terms']['field'] == 'keywords.keyword'
+
+    def test_missing_year_field(self):
+        """Test that theses without a year are left out of the year statistics and recent theses"""
+        # The year histogram skips documents without a year; top_hits sorts them last
+        aggregations = aggregations_with(
+            by_year=[{'key': 2023.0, 'doc_count': 1}],
+            recent_theses=[
+                {'_source': {'author': 'Gáll János', 'department': 'cs', 'supervisor': 'Bakó László', 'year': 2023}},
+                {'_source': {'author': 'Hammas Attila', 'department': 'cs', 'supervisor': 'Antal Margit'}},
+            ]
+        )
+
+        stats = calculate_aggregated_statistics(aggregations)
+
+        assert stats['by_year'] == {2023: 1}
+        assert stats['year_range'] == {'min': 2023, 'max': 2023}
+        assert [thesis['author'] for thesis in stats['recent_theses']] == ['Gáll János']
+        assert build_statistics_aggregations()['recent_theses']['top_hits']['sort'] == [
+            {'year': {'order': 'desc', 'missing': '_last'}}
         ]
-        
-        stats = calculate_document_statistics(documents)
-        
-        expected_supervisors = {'Antal Margit', 'Bakó László', 'Brassai Sándor Tihamér', 'Lefkovits László', 'Kátai Zoltán'}
-        assert stats['supervisors_count'] == len(expected_supervisors)
-    
-    def test_keyword_processing(self, sample_documents):
-        """Test keyword processing and cloud data generation"""
-        stats = calculate_document_statistics(sample_documents)
-        
-        assert 'top_keywords' in stats
-        assert 'keyword_cloud_data' in stats
-        
-        assert len(stats['top_keywords']) > 0
-        assert isinstance(stats['keyword_cloud_data'], list)
-        
-        if stats['keyword_cloud_data']:
-            keyword_item = stats['keyword_cloud_data'][0]
-            assert 'text' in keyword_item
-            assert 'value' in keyword_item
-    
-    def test_abstract_length_calculation(self, sample_documents):
-        """Test average abstract length calculation"""
-        stats = calculate_document_statistics(sample_documents)
-        
-        abstracts = [doc['_source']['abstract'] for doc in sample_documents]
-        expected_avg = sum(len(abstract) for abstract in abstracts) / len(abstracts)
-        
-        assert stats['average_abstract_length'] == int(expected_avg)
-    
+
+    def test_no_year_at_all(self):
+        """Test statistics of theses none of which has a year"""
+        aggregations = aggregations_with(recent_theses=[
+            {'_source': {'author': 'Hammas Attila', 'department': 'cs'}},
+        ])
+
+        stats = calculate_aggregated_statistics(aggregations)
+
+        assert stats['by_year'] == {}
+        assert stats['year_range'] == {'min': None, 'max': None}
+        assert stats['recent_theses'] == []
+
+    def test_escape_regexp(self):
+        """Test escaping of regular expression operators in supervisor names"""
+        assert escape_regexp('Dr. Antal (Margit)') == 'Dr\\. Antal \\(Margit\\)'
+        assert escape_regexp('Bakó László') == 'Bakó László'
+
     def test_get_statistics_no_filters(self, mock_es, sample_documents):
         """Test get_statistics without any filters"""
-        mock_es.search.return_value = {
-            'hits': {'hits': sample_documents}
-        }
+        mock_es.search.return_value = aggregation_response(sample_documents)
         
         result = get_statistics(mock_es)
         
         assert result['success'] is True
         assert result['total_documents'] == 3
         assert 'statistics' in result
+        assert result['statistics']['by_year'] == {2022: 1, 2023: 2}
         assert result['filters_applied'] == {
             'department': None,
             'year': None,
@@ -191,12 +315,15 @@ class TestStatisticsService:
         mock_es.search.assert_called_once()
         call_args = mock_es.search.call_args
         assert 'cs_theses,infos_theses' in call_args[1]['index']
+
+        body = call_args[1]['body']
+        assert body['size'] == 0
+        assert body['aggs']['by_supervisor']['terms']['field'] == 'supervisor.keyword'
+        assert body['aggs']['keywords']['terms']['field'] == 'keywords_normalized'
     
     def test_get_statistics_with_department_filter(self, mock_es, sample_documents):
         """Test get_statistics with department filter"""
-        mock_es.search.return_value = {
-            'hits': {'hits': sample_documents[:2]}
-        }
+        mock_es.search.return_value = aggregation_response(sample_documents[:2])
         
         result = get_statistics(mock_es, department='cs')
         
@@ -213,9 +340,7 @@ class TestStatisticsService:
     
     def test_get_statistics_with_year_filter(self, mock_es, sample_documents):
         """Test get_statistics with year filter"""
-        mock_es.search.return_value = {
-            'hits': {'hits': [sample_documents[0], sample_documents[2]]}
-        }
+        mock_es.search.return_value = aggregation_response([sample_documents[0], sample_documents[2]])
         
         result = get_statistics(mock_es, year=2023)
         
@@ -227,6 +352,17 @@ class TestStatisticsService:
         year_filter = next((f for f in filters if 'year' in f.get('term', {})), None)
         assert year_filter is not None
         assert year_filter['term']['year'] == 2023
+
+    def test_get_statistics_no_results(self, mock_es):
+        """Test get_statistics when no document matches"""
+        mock_es.search.return_value = aggregation_response([])
+
+        result = get_statistics(mock_es, year=1990)
+
+        assert result['success'] is True
+        assert result['total_documents'] == 0
+        assert result['statistics']['by_year'] == {}
+        assert result['statistics']['recent_theses'] == []
     
     def test_get_statistics_elasticsearch_error(self, mock_es):
         """Test get_statistics error handling"""
@@ -242,12 +378,14 @@ class TestStatisticsService:
     def test_get_unique_supervisors_no_filters(self, mock_es):
         """Test get_unique_supervisors without filters"""
         mock_es.search.return_value = {
-            'hits': {
-                'hits': [
-                    {'_source': {'supervisor': 'Antal Margit'}},
-                    {'_source': {'supervisor': ['Bakó László', 'Brassai Sándor Tihamér']}},
-                    {'_source': {'supervisor': 'Lefkovits László, Kátai Zoltán'}},
-                ]
+            'aggregations': {
+                'supervisors': {
+                    'buckets': terms_buckets([
+                        'Antal Margit',
+                        ['Bakó László', 'Brassai Sándor Tihamér'],
+                        'Lefkovits László, Kátai Zoltán',
+                    ])
+                }
             }
         }
         
@@ -258,15 +396,13 @@ class TestStatisticsService:
         
         call_args = mock_es.search.call_args
         assert call_args[1]['body']['query'] == {'match_all': {}}
+        assert call_args[1]['body']['size'] == 0
     
     def test_get_unique_supervisors_with_filters(self, mock_es):
         """Test get_unique_supervisors with department and year filters"""
         mock_es.search.return_value = {
-            'hits': {
-                'hits': [
-                    {'_source': {'supervisor': 'Antal Margit'}},
-                    {'_source': {'supervisor': 'Bakó László'}},
-                ]
+            'aggregations': {
+                'supervisors': {'buckets': terms_buckets(['Antal Margit', 'Bakó László'])}
             }
         }
         
@@ -283,13 +419,14 @@ class TestStatisticsService:
     def test_get_unique_years_no_filters(self, mock_es):
         """Test get_unique_years without filters"""
         mock_es.search.return_value = {
-            'hits': {
-                'hits': [
-                    {'_source': {'year': 2023}},
-                    {'_source': {'year': 2022}},
-                    {'_source': {'year': 2021}},
-                    {'_source': {'year': 2023}},
-                ]
+            'aggregations': {
+                'years': {
+                    'buckets': [
+                        {'key': 2021.0, 'doc_count': 1},
+                        {'key': 2022.0, 'doc_count': 1},
+                        {'key': 2023.0, 'doc_count': 2},
+                    ]
+                }
             }
         }
         
@@ -299,16 +436,19 @@ class TestStatisticsService:
         
         call_args = mock_es.search.call_args
         assert call_args[1]['body']['query'] == {'match_all': {}}
-        assert call_args[1]['body']['_source'] == ['year']
+        assert call_args[1]['body']['size'] == 0
+        assert call_args[1]['body']['aggs']['years']['histogram']['field'] == 'year'
     
     def test_get_unique_years_with_department_filter(self, mock_es):
         """Test get_unique_years with department filter"""
         mock_es.search.return_value = {
-            'hits': {
-                'hits': [
-                    {'_source': {'year': 2023}},
-                    {'_source': {'year': 2022}}
-                ]
+            'aggregations': {
+                'years': {
+                    'buckets': [
+                        {'key': 2022.0, 'doc_count': 1},
+                        {'key': 2023.0, 'doc_count': 1}
+                    ]
+                }
             }
         }
         
@@ -355,58 +495,19 @@ class TestStatisticsService:
             }
         ]
         
-        mock_es.search.return_value = {
-            'hits': {'hits': supervisor_docs}
-        }
+        mock_es.search.return_value = aggregation_response(supervisor_docs, recent_size=20)
         
         result = get_statistics(mock_es, supervisor='Bakó László')
         
         assert result['success'] is True
         assert result['filters_applied']['supervisor'] == 'Bakó László'
         assert result['total_documents'] == 2
-    
-    def test_malformed_supervisor_field(self):
-        """Test handling of malformed supervisor fields"""
-        documents = [
-            {'_source': {'supervisor': '', 'year': 2023, 'department': 'cs'}},
-            {'_source': {'supervisor': None, 'year': 2023, 'department': 'cs'}},
-            {'_source': {'supervisor': [], 'year': 2023, 'department': 'cs'}},
-            {'_source': {'year': 2023, 'department': 'cs'}},
-        ]
-        
-        stats = calculate_document_statistics(documents)
-        
-        assert stats['supervisors_count'] == 0
-        assert stats['by_supervisor'] == {}
-    
-    def test_malformed_keywords_field(self):
-        """Test handling of malformed keywords fields"""
-        documents = [
-            {'_source': {'keywords': '', 'year': 2023, 'department': 'cs'}},
-            {'_source': {'keywords': None, 'year': 2023, 'department': 'cs'}},
-            {'_source': {'keywords': [], 'year': 2023, 'department': 'cs'}},
-            {'_source': {'year': 2023, 'department': 'cs'}},
-        ]
-        
-        stats = calculate_document_statistics(documents)
-        
-        assert stats['top_keywords'] == {}
-        assert stats['keyword_cloud_data'] == []
-    
-    def test_missing_year_field(self):
-        """Test handling of documents without year field"""
-        documents = [
-            {'_source': {'department': 'cs', 'supervisor': 'Antal Margit'}},
-            {'_source': {'department': 'cs', 'supervisor': 'Bakó László', 'year': 2023}},
-        ]
-        
-        stats = calculate_document_statistics(documents)
-        
-        assert stats['by_year'] == {2023: 1}
-        assert stats['year_range']['min'] == 2023
-        assert stats['year_range']['max'] == 2023
-        
-        assert len(stats['recent_theses']) >= 1
+        assert result['statistics']['by_supervisor'] == {'Bakó László': 2}
+        assert result['statistics']['supervisors_count'] == 1
+        assert len(result['statistics']['recent_theses']) == 2
+
+        should = mock_es.search.call_args[1]['body']['query']['bool']['should']
+        assert {'term': {'supervisor.keyword': 'Bakó László'}} in should
 
 
 if __name__ == '__main__':
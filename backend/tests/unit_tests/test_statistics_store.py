@@ -0,0 +1,255 @@
+import pytest
+import sys
+import os
+from unittest.mock import Mock, patch
+from collections import defaultdict
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'app'))
+
+import statistics_store
+from statistics_store import (
+    get_statistics,
+    merge_rollup_rows,
+    refresh_statistics,
+    refresh_statistics_after_sync,
+    rows_from_aggregations
+)
+from keyword_normalization import normalize_thesis_keywords
+
+
+def terms_buckets(values, leaf):
+    """Build terms buckets with leaf aggregations from (value, document) pairs"""
+    groups = defaultdict(list)
+    for value, doc in values:
+        keys = set(v for v in value if v) if isinstance(value, list) else ([value] if value else [])
+        for key in keys:
+            groups[key].append(doc)
+    return [dict(key=key, **leaf(docs)) for key, docs in groups.items()]
+
+
+def leaf_aggregations(docs):
+    """Leaf aggregations of build_rollup_query for a group of documents"""
+    sources = [doc['_source'] for doc in docs]
+    lengths = [len(source['abstract']) for source in sources if source.get('abstract')]
+    keyword_buckets = terms_buckets([(normalize_thesis_keywords(dict(source))['keywords_normalized'], None)
+                                     for source in sources],
+                                    lambda group: {'doc_count': len(group)})
+    return {
+        'doc_count': len(docs),
+        'keywords': {'buckets': keyword_buckets},
+        'abstract_length': {'sum': float(sum(lengths)), 'count': len(lengths)},
+        'recent_theses': {'hits': {'hits': docs[:statistics_store.RECENT_THESES_PER_ROW]}}
+    }
+
+
+def rollup_aggregations(documents):
+    """Build the aggregation response Elasticsearch returns for build_rollup_query"""
+    by_year = defaultdict(list)
+    for doc in documents:
+        by_year[doc['_source'].get('year') or 0].append(doc)
+
+    buckets = []
+    for year, docs in by_year.items():
+        bucket = dict(key=year, **leaf_aggregations(docs))
+        bucket['supervisors'] = {
+            'buckets': terms_buckets([(doc['_source'].get('supervisor'), doc) for doc in docs], leaf_aggregations)
+        }
+        buckets.append(bucket)
+    return {'years': {'buckets': buckets}}
+
+
+def rollup_search(documents):
+    """Fake es.search answering the years query and the per-year rollup queries of refresh_statistics"""
+    def search(index, body):
+        query = body['query']
+        if 'runtime_mappings' not in body:
+            years = query.get('terms', {}).get('year')
+            keys = sorted({doc['_source'].get('year') or 0 for doc in documents})
+            return {'aggregations': {'years': {'buckets': [
+                {'key': key, 'doc_count': 0} for key in keys if years is None or key in years
+            ]}}}
+        year = query['term']['year'] if 'term' in query else 0
+        docs = [doc for doc in documents if (doc['_source'].get('year') or 0) == year]
+        return {'hits': {'total': {'value': len(docs)}}, 'aggregations': rollup_aggregations(docs)}
+    return search
+
+
+class TestStatisticsStore:
+    """Test cases for the materialized statistics store"""
+
+    @pytest.fixture
+    def sample_documents(self):
+        """Sample Elasticsearch documents for testing"""
+        return [
+            {
+                '_source': {
+                    'author': 'Gáll János',
+                    'supervisor': 'Bakó László',
+                    'year': 2023,
+                    'department': 'cs',
+                    'keywords': ['machine learning', 'ai'],
+                    'abstract': 'This is a test abstract about machine learning and neural networks.',
+                    'hash_code': 123456
+                }
+            },
+            {
+                '_source': {
+                    'author': 'Hammas Attila',
+                    'supervisor': ['Bakó László', 'Antal Margit'],
+                    'year': 2022,
+                    'department': 'cs',
+                    'keywords': 'data mining, algorithm, deep learning',
+                    'abstract': 'Another test abstract about data science.',
+                    'hash_code': 789012
+                }
+            },
+            {
+                '_source': {
+                    'author': 'Bálint Adolf',
+                    'supervisor': 'Lefkovits László, Kátai Zoltán',
+                    'year': 2023,
+                    'department': 'cs',
+                    'keywords': ['web development', 'javascript'],
+                    'abstract': 'Web development thesis abstract.',
+                    'hash_code': 456789
+                }
+            }
+        ]
+
+    def test_rollups_merge_to_department_statistics(self, sample_documents):
+        """Test that merging the total rows gives the statistics of the whole department"""
+        rows = rows_from_aggregations('cs', rollup_aggregations(sample_documents))
+        totals = [row for row in rows if row['level'] == 'total']
+
+        merged = merge_rollup_rows(totals)
+
+        assert merged['by_year'] == {2022: 1, 2023: 2}
+        assert merged['by_department'] == {'cs': 3}
+        assert merged['by_supervisor'] == {
+            'Bakó László': 2, 'Antal Margit': 1, 'Lefkovits László': 1, 'Kátai Zoltán': 1
+        }
+        assert merged['top_keywords'] == {
+            'Machine Learning': 1, 'Artificial Intelligence': 1, 'Data Mining': 1, 'Algorithm': 1,
+            'Deep Learning': 1, 'Web Development': 1, 'JavaScript': 1
+        }
+        assert merged['year_range'] == {'min': 2022, 'max': 2023}
+        assert merged['average_abstract_length'] == 46
+        assert merged['supervisors_count'] == 4
+        assert len(merged['recent_theses']) == 3
+
+    def test_supervisor_rows(self, sample_documents):
+        """Test that comma-separated supervisors get their own rows and merge per supervisor"""
+        rows = rows_from_aggregations('cs', rollup_aggregations(sample_documents))
+        supervisor_rows = [row for row in rows if row['level'] == 'supervisor']
+
+        assert {row['supervisor'] for row in supervisor_rows} == {
+            'Bakó László', 'Antal Margit', 'Lefkovits László', 'Kátai Zoltán'
+        }
+
+        bako = [row for row in supervisor_rows if row['supervisor'] == 'Bakó László']
+        stats = merge_rollup_rows(bako, supervisor='Bakó László')
+
+        assert stats['by_supervisor'] == {'Bakó László': 2}
+        assert stats['supervisors_count'] == 1
+        assert stats['by_year'] == {2022: 1, 2023: 1}
+        assert [thesis['year'] for thesis in stats['recent_theses']] == [2023, 2022]
+
+    def test_merge_empty_rows(self):
+        """Test merging when no rollup row matches the filters"""
+        stats = merge_rollup_rows([], supervisor='Antal Margit')
+
+        assert stats['by_year'] == {}
+        assert stats['by_supervisor'] == {'Antal Margit': 0}
+        assert stats['recent_theses'] == []
+
+    def test_get_statistics_from_store(self, sample_documents):
+        """Test that statistics are answered from the rollup rows when the store covers the departments"""
+        rows = rows_from_aggregations('cs', rollup_aggregations(sample_documents))
+        mock_es = Mock()
+        mock_es.mget.return_value = {'docs': [{'found': True}]}
+        mock_es.search.return_value = {
+            'hits': {'hits': [{'_source': row} for row in rows if row['level'] == 'total']}
+        }
+
+        with patch('statistics_service.get_statistics') as live_statistics:
+            result = get_statistics(mock_es, department='cs', year=2023)
+
+        live_statistics.assert_not_called()
+        assert result['success'] is True
+        assert result['total_documents'] == 3
+        assert result['filters_applied'] == {'department': 'cs', 'year': 2023, 'supervisor': None}
+
+        filters = mock_es.search.call_args[1]['body']['query']['bool']['filter']
+        assert {'terms': {'department': ['cs']}} in filters
+        assert {'term': {'year': 2023}} in filters
+        assert {'term': {'level': 'total'}} in filters
+
+    def test_get_statistics_falls_back_to_live_aggregations(self):
+        """Test the fallback when a department has not been rolled up yet"""
+        mock_es = Mock()
+        mock_es.mget.return_value = {'docs': [{'found': True}, {'found': False}]}
+
+        with patch('statistics_service.get_statistics', return_value={'success': True}) as live_statistics:
+            result = get_statistics(mock_es)
+
+        assert result == {'success': True}
+        live_statistics.assert_called_once_with(mock_es, None, None, None)
+        mock_es.search.assert_not_called()
+
+    def test_refresh_statistics_replaces_stale_rows(self, sample_documents):
+        """Test that a refresh writes new rows and then removes the stale ones"""
+        mock_es = Mock()
+        mock_es.indices.exists.return_value = True
+        mock_es.search.side_effect = rollup_search(sample_documents)
+
+        with patch('statistics_store.helpers.bulk') as bulk:
+            written = refresh_statistics(mock_es, 'cs', years=[2023])
+
+        actions = list(bulk.call_args[0][1])
+        refresh_ids = {action['_source']['refresh_id'] for action in actions}
+        assert written == len(actions) - 1
+        assert len(refresh_ids) == 1
+        assert 'cs:meta' in {action['_id'] for action in actions}
+        assert {action['_source'].get('year') for action in actions} == {2023, None}
+
+        assert mock_es.search.call_args_list[0][1]['body']['query'] == {'terms': {'year': [2023]}}
+        query = mock_es.delete_by_query.call_args[1]['body']['query']['bool']
+        assert {'terms': {'year': [2023]}} in query['filter']
+        assert {'term': {'refresh_id': refresh_ids.pop()}} in query['must_not']
+
+    def test_refresh_statistics_one_year_per_request(self, sample_documents):
+        """Test that every year is rolled up by its own request, including theses without a year"""
+        sample_documents.append({'_source': {'author': 'Nobody', 'supervisor': 'Antal Margit',
+                                             'department': 'cs', 'hash_code': 1}})
+        mock_es = Mock()
+        mock_es.indices.exists.return_value = True
+        mock_es.search.side_effect = rollup_search(sample_documents)
+
+        with patch('statistics_store.helpers.bulk') as bulk:
+            refresh_statistics(mock_es, 'cs')
+
+        queries = [call[1]['body']['query'] for call in mock_es.search.call_args_list]
+        assert queries == [
+            {'match_all': {}},
+            {'bool': {'must_not': [{'exists': {'field': 'year'}}]}},
+            {'term': {'year': 2022}},
+            {'term': {'year': 2023}}
+        ]
+        for call in mock_es.search.call_args_list[1:]:
+            assert call[1]['body']['aggs']['years']['terms']['size'] == 1
+
+        totals = [action['_source'] for action in bulk.call_args[0][1] if action['_source']['level'] == 'total']
+        assert {row['year']: row['count'] for row in totals} == {0: 1, 2022: 1, 2023: 2}
+
+    def test_refresh_after_sync(self):
+        """Test that only changed years are refreshed unless theses were deleted"""
+        with patch('statistics_store.refresh_statistics') as refresh:
+            refresh_statistics_after_sync(Mock(), 'informatics', {'deleted': 0}, {2022, '2023'})
+            assert refresh.call_args[1]['years'] == [2022, 2023]
+
+            refresh_statistics_after_sync(Mock(), 'informatics', {'deleted': 1}, {2022})
+            assert 'years' not in refresh.call_args[1]
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,186 @@
+import pytest
+import sys
+import os
+import numpy as np
+from unittest.mock import Mock, patch
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'app'))
+
+import vector_store
+from vector_store import LocalVectorStore, get_vector_store, write_vector_store
+from search_services import perform_semantic_search
+
+
+def make_records(count=40, dims=8, seed=0):
+    """Random theses spread over two departments and three years"""
+    rng = np.random.default_rng(seed)
+    records = []
+    for i in range(count):
+        department = "cs" if i % 2 == 0 else "informatics"
+        index = "cs_theses_semantic_v1" if department == "cs" else "infos_theses_semantic_v1"
+        hit = {"_index": index, "_id": str(i),
+               "_source": {"hash_code": i, "year": 2020 + i % 3, "abstract": f"Thesis {i}"}}
+        records.append((department, hit, rng.normal(size=dims).tolist()))
+    return records
+
+
+def brute_force(records, query, k, year=None, department=None):
+    """Reference ranking of the hash codes by cosine similarity"""
+    scored = []
+    for record_department, hit, vector in records:
+        if year and hit["_source"]["year"] != year:
+            continue
+        if department and record_department != department:
+            continue
+        vector = np.asarray(vector)
+        scored.append((float(vector @ query / np.linalg.norm(vector) / np.linalg.norm(query)), hit["_source"]["hash_code"]))
+    return [hash_code for _, hash_code in sorted(scored, reverse=True)[:k]]
+
+
+class TestLocalVectorStore:
+    """Test cases for the in-process vector store"""
+
+    @pytest.fixture
+    def records(self):
+        return make_records()
+
+    @pytest.fixture
+    def store_dir(self, tmp_path, records):
+        write_vector_store(str(tmp_path), records)
+        return str(tmp_path)
+
+    def test_matches_brute_force(self, store_dir, records):
+        """Test that results equal an exact cosine ranking"""
+        store = LocalVectorStore.load(store_dir)
+        query = np.asarray(records[5][2]) + 0.1
+
+        hits = store.search(query, 5)
+
+        assert isinstance(store.vectors, np.memmap)
+        assert [hit["_source"]["hash_code"] for hit in hits] == brute_force(records, query, 5)
+        assert hits[0]["_index"] == "infos_theses_semantic_v1"
+        assert 0.0 <= hits[-1]["_score"] <= hits[0]["_score"] <= 1.0
+        assert "abstract_vector" not in hits[0]["_source"]
+
+    def test_filters(self, store_dir, records):
+        """Test the precomputed year and department masks"""
+        store = LocalVectorStore.load(store_dir)
+        query = np.asarray(records[0][2])
+
+        hits = store.search(query, 100, year="2021", department="cs")
+
+        assert [hit["_source"]["hash_code"] for hit in hits] == brute_force(records, query, 100, 2021, "cs")
+        assert all(hit["_source"]["year"] == 2021 and hit["_index"].startswith("cs_") for hit in hits)
+        assert store.search(query, 10, year=1999) == []
+
+    def test_script_score_scale(self, store_dir, records):
+        """Test cosineSimilarity + 1.0 scores for the brute-force mode"""
+        store = LocalVectorStore.load(store_dir)
+        hit = store.search(records[3][2], 1, knn_scores=False)[0]
+
+        assert hit["_source"]["hash_code"] == 3
+        assert hit["_score"] == pytest.approx(2.0, abs=1e-5)
+
+    def test_int8(self, tmp_path, records):
+        """Test that the int8 store keeps the ranking of the float32 store"""
+        write_vector_store(str(tmp_path), records, dtype="int8")
+        store = LocalVectorStore.load(str(tmp_path))
+        query = np.asarray(records[7][2]) + 0.05
+
+        assert store.vectors.dtype == np.int8
+        assert [hit["_source"]["hash_code"] for hit in store.search(query, 3)] == brute_force(records, query, 3)
+
+    def test_new_version_is_reloaded(self, tmp_path, records):
+        """Test that the shared store follows the manifest and old versions are cleaned up"""
+        directory = str(tmp_path)
+        with patch.object(vector_store, '_store', None), patch.object(vector_store, '_store_mtime', None):
+            assert get_vector_store(directory) is None
+
+            write_vector_store(directory, records[:10])
+            assert len(get_vector_store(directory)) == 10
+
+            write_vector_store(directory, records)
+            os.utime(os.path.join(directory, 'manifest.json'), (1e10, 1e10))
+            assert len(get_vector_store(directory)) == 40
+
+            write_vector_store(directory, records[:5])
+            assert len([name for name in os.listdir(directory) if name.startswith('vectors_')]) == 2
+
+    def test_builds_in_the_same_second_do_not_collide(self, tmp_path, records):
+        """Test that a second build within the same second keeps the files of the live version"""
+        directory = str(tmp_path)
+        with patch('vector_store.time.strftime', return_value='20990101000000'):
+            first = write_vector_store(directory, records[:10])
+            live = LocalVectorStore.load(directory)
+            second = write_vector_store(directory, records)
+
+        assert first['version'] != second['version']
+        assert all(os.path.exists(os.path.join(directory, name)) for name in first['files'].values())
+        assert len(live) == 10
+        assert len(LocalVectorStore.load(directory)) == 40
+
+
+class TestSemanticSearchWithVectorStore:
+    """Test cases for the LOCAL_VECTOR_STORE switch of perform_semantic_search"""
+
+    @pytest.fixture
+    def store(self, tmp_path):
+        write_vector_store(str(tmp_path), make_records())
+        return LocalVectorStore.load(str(tmp_path))
+
+    @pytest.fixture
+    def mock_model(self):
+        with patch('search_services.encode_query', return_value=np.asarray(make_records()[4][2], dtype=np.float32)):
+            yield
+
+    def test_local_store_skips_elasticsearch(self, store, mock_model):
+        mock_es = Mock()
+        with patch('search_services.LOCAL_VECTOR_STORE', 'on'), \
+             patch('search_services.get_vector_store', return_value=store):
+            hits = perform_semantic_search(mock_es, 'neural networks', num_results=3, department='cs')
+
+        mock_es.search.assert_not_called()
+        assert hits[0]["_source"]["hash_code"] == 4
+        assert len(hits) == 3
+
+    def test_fallback_when_elasticsearch_fails(self, store, mock_model):
+        mock_es = Mock()
+        mock_es.search.side_effect = ConnectionError('Elasticsearch is unavailable')
+        with patch('search_services.LOCAL_VECTOR_STORE', 'fallback'), \
+             patch('search_services.get_vector_store', return_value=store):
+            hits = perform_semantic_search(mock_es, 'neural networks', num_results=3)
+
+        mock_es.search.assert_called_once()
+        assert hits[0]["_source"]["hash_code"] == 4
+
+    @pytest.mark.parametrize("mode", ["on", "fallback"])
+    def test_year_sort_breaks_score_ties(self, mode):
+        """Test that the store hits are ordered like the Elasticsearch request: _score, then year"""
+        store = Mock()
+        store.search.return_value = [
+            {"_score": 0.9, "_source": {"hash_code": 1, "year": 2021}},
+            {"_score": 0.8, "_source": {"hash_code": 2, "year": 2020}},
+            {"_score": 0.8, "_source": {"hash_code": 3, "year": 2023}},
+            {"_score": 0.7, "_source": {"hash_code": 4}}
+        ]
+        mock_es = Mock()
+        mock_es.search.side_effect = ConnectionError('Elasticsearch is unavailable')
+        with patch('search_services.LOCAL_VECTOR_STORE', mode), \
+             patch('search_services.get_vector_store', return_value=store), \
+             patch('search_services.encode_query', return_value=np.ones(3, dtype=np.float32)):
+            descending = perform_semantic_search(mock_es, 'neural networks', sort_order='desc', num_results=4)
+            ascending = perform_semantic_search(mock_es, 'neural networks', sort_order='asc', num_results=4)
+
+        assert [hit["_source"]["hash_code"] for hit in descending] == [1, 3, 2, 4]
+        assert [hit["_source"]["hash_code"] for hit in ascending] == [1, 2, 3, 4]
+
+    def test_errors_without_store(self, mock_model):
+        mock_es = Mock()
+        mock_es.search.side_effect = ConnectionError('Elasticsearch is unavailable')
+        with patch('search_services.LOCAL_VECTOR_STORE', 'off'):
+            with pytest.raises(ConnectionError):
+                perform_semantic_search(mock_es, 'neural networks')
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
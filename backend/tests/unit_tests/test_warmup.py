@@ -0,0 +1,109 @@
+import pytest
+import sys
+import os
+import subprocess
+import threading
+from unittest.mock import Mock, patch
+
+APP_DIR = os.path.join(os.path.dirname(__file__), '..', '..', 'app')
+sys.path.insert(0, APP_DIR)
+
+from warmup import Warmup, capability_loaded
+
+
+class TestWarmup:
+    """Test cases for the background model warm-up"""
+
+    def test_tasks_run_in_background(self):
+        """Test that capabilities go from cold over warming to ready"""
+        release = threading.Event()
+        warmup = Warmup({"semantic": release.wait, "gemini": Mock()})
+
+        status = warmup.status()
+        assert status["ready"] is False
+        assert status["capabilities"]["keyword"]["status"] == "ready"
+        assert status["capabilities"]["semantic"]["status"] == "cold"
+
+        assert warmup.start() is True
+        assert warmup.start() is False
+
+        release.set()
+        warmup.join(timeout=5)
+        status = warmup.status()
+        assert status["ready"] is True
+        assert status["capabilities"]["semantic"]["status"] == "ready"
+        assert "load_ms" in status["capabilities"]["gemini"]
+
+    def test_failed_task(self):
+        """Test that a failing task is reported and the others still run"""
+        gemini = Mock()
+        warmup = Warmup({"semantic": Mock(side_effect=OSError("model not found")), "gemini": gemini})
+        warmup.start()
+        warmup.join(timeout=5)
+
+        status = warmup.status()
+        assert status["ready"] is False
+        assert status["capabilities"]["semantic"] == {"status": "failed", "error": "model not found"}
+        assert status["capabilities"]["gemini"]["status"] == "ready"
+        gemini.assert_called_once()
+
+    def test_optional_failure_does_not_block_readiness(self):
+        """Test that a failed optional capability is reported without making the service unready"""
+        warmup = Warmup({"semantic": Mock(), "rerank": Mock(side_effect=OSError("model not found"))},
+                        loaded=lambda name: False)
+        warmup.start()
+        warmup.join(timeout=5)
+
+        status = warmup.status()
+        assert status["ready"] is True
+        assert status["capabilities"]["rerank"]["status"] == "failed"
+
+    def test_model_loaded_after_failed_warmup(self):
+        """Test that a model loaded by a later request makes the capability ready"""
+        loaded = set()
+        warmup = Warmup({"semantic": Mock(side_effect=OSError("timeout"))}, loaded=lambda name: name in loaded)
+        warmup.start()
+        warmup.join(timeout=5)
+        assert warmup.status()["ready"] is False
+
+        loaded.add("semantic")
+        status = warmup.status()
+        assert status["ready"] is True
+        assert status["capabilities"]["semantic"] == {"status": "ready"}
+
+    def test_disabled_warmup(self):
+        """Test that with the warm-up disabled the models are on demand and the service is ready"""
+        loaded = set()
+        warmup = Warmup({"semantic": Mock(), "rerank": Mock()}, loaded=lambda name: name in loaded, enabled=False)
+
+        status = warmup.status()
+        assert status["ready"] is True
+        assert status["capabilities"]["semantic"] == {"status": "on_demand"}
+
+        loaded.add("semantic")
+        assert warmup.status()["capabilities"]["semantic"] == {"status": "ready"}
+
+    def test_capability_loaded_reads_the_model_globals(self):
+        """Test that the loaded state comes from the lazily initialized module globals"""
+        import reranker
+
+        with patch.object(reranker, "_model", None):
+            assert capability_loaded("rerank") is False
+        with patch.object(reranker, "_model", Mock()):
+            assert capability_loaded("rerank") is True
+        assert capability_loaded("keyword") is False
+
+    def test_routes_import_without_ml_libraries(self):
+        """Test that importing the routes loads neither torch nor the Gemini SDK"""
+        heavy = ["torch", "sentence_transformers", "google.generativeai"]
+        code = (f"import sys; sys.path.insert(0, {os.path.abspath(APP_DIR)!r}); import routes; "
+                f"print([m for m in {heavy!r} if m in sys.modules])")
+        result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, timeout=60,
+                                env=dict(os.environ, ELASTIC_USERNAME="x", ELASTIC_PASSWORD="y"))
+
+        assert result.returncode == 0, result.stderr
+        assert result.stdout.strip().splitlines()[-1] == "[]"
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])